@@ -0,0 +1,171 @@
+"""Throughput and memory of the HPROF class histogram, or of the object graph and
+dominator tree (--retained), on a synthetic heap dump. With --index, the histogram
+and retainer queries go through the dump's sidecar index: one process builds it,
+a second one answers from it.
+
+The dump mixes small instances, byte arrays and object arrays over a few hundred
+classes, roughly like a service heap, and is written in ~1GB segments as jmap
+does. Instances form a binary tree through their first two fields and point at a
+random object with the third. Each run happens in a subprocess so peak RSS is
+measured in isolation::
+
+    PYTHONPATH=src python benchmarks/bench_hprof.py --objects 5000000 --repeat 3
+    PYTHONPATH=src python benchmarks/bench_hprof.py --objects 1000000 --retained
+    PYTHONPATH=src python benchmarks/bench_hprof.py --objects 1000000 --index
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import struct
+import subprocess
+import sys
+import tempfile
+import time
+
+SEGMENT_BYTES = 1 << 30
+
+
+def write_synthetic_hprof(path: str, objects: int, classes: int = 300) -> None:
+    ident = struct.Struct(">Q").pack
+    rnd = random.Random(0)
+    base = 0x7F0000000
+    with open(path, "wb") as f:
+        f.write(b"JAVA PROFILE 1.0.2\0" + struct.pack(">III", 8, 0, 0))
+        for c in range(classes):
+            name = f"com/example/gen/Type{c}".encode()
+            f.write(struct.pack(">BII", 0x01, 0, 8 + len(name)) + ident(c + 1) + name)
+            f.write(struct.pack(">BII", 0x02, 0, 24) + struct.pack(">I", c + 1) + ident(0x100000 + c) + struct.pack(">I", 0) + ident(c + 1))
+        field_names = 0x10000
+        for i, field in enumerate((b"left", b"right", b"other")):
+            f.write(struct.pack(">BII", 0x01, 0, 8 + len(field)) + ident(field_names + i) + field)
+
+        instance = struct.Struct(">BQIQI")
+        obj_array = struct.Struct(">BQIIQ")
+        prim_array = struct.Struct(">BQIIB")
+        segment_start, size = -1, 0
+
+        def close_segment() -> None:
+            # The segment length is only known at the end, so it is patched in.
+            if segment_start >= 0:
+                f.seek(segment_start + 5)
+                f.write(struct.pack(">I", size))
+                f.seek(0, os.SEEK_END)
+
+        def emit(rec: bytes) -> None:
+            nonlocal segment_start, size
+            if segment_start < 0 or size >= SEGMENT_BYTES - 256:
+                close_segment()
+                segment_start, size = f.tell(), 0
+                f.write(struct.pack(">BII", 0x1C, 0, 0))
+            f.write(rec)
+            size += len(rec)
+
+        fields = struct.pack(">H", 3) + b"".join(ident(field_names + i) + b"\x02" for i in range(3))
+        for c in range(classes):
+            emit(b"\x20" + ident(0x100000 + c) + struct.pack(">I", 0) + ident(0) * 6 + struct.pack(">IHH", 24, 0, 0) + fields)
+        emit(b"\x05" + ident(base))  # sticky class root: the tree's top node
+        for i in range(objects):
+            obj = base + 16 * i
+            kind = i % 10
+            if kind < 7:
+                refs = [2 * i + 1, 2 * i + 2, rnd.randrange(objects)]
+                data = b"".join(ident(base + 16 * r) if r < objects else ident(0) for r in refs)
+                rec = instance.pack(0x21, obj, 0, 0x100000 + (i * 7) % classes, 24) + data
+            elif kind < 9:
+                rec = prim_array.pack(0x23, obj, 0, 40, 8) + b"\0" * 40
+            else:
+                rec = obj_array.pack(0x22, obj, 0, 6, 0x100000) + b"".join(ident(base + 16 * rnd.randrange(objects)) for _ in range(6))
+            emit(rec)
+        close_segment()
+        f.write(struct.pack(">BII", 0x2C, 0, 0))
+
+
+def measure_index(path: str) -> dict:
+    from heap_analyzer_mcp.dominators import summarize_retainers
+    from heap_analyzer_mcp.heapindex import open_heap_index
+    from heap_analyzer_mcp.hprof import summarize_histogram
+
+    start = time.perf_counter()
+    with open_heap_index(path) as index:
+        summarize_histogram(index.histogram())
+        summarize_retainers(index, index.retention(max_objects=0))
+        objects = index.node_count - 1
+    seconds = time.perf_counter() - start
+    rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return dict(seconds=seconds, objects_per_s=objects / seconds, peak_rss_mb=rss_kb / 1024)
+
+
+def measure(path: str, repeat: int, retained: bool) -> dict:
+    from heap_analyzer_mcp.dominators import compute_retention, summarize_retainers
+    from heap_analyzer_mcp.heapgraph import parse_heap_graph
+    from heap_analyzer_mcp.hprof import parse_hprof_file
+
+    size = os.path.getsize(path)
+    best = float("inf")
+    phases = {}
+    for _ in range(repeat):
+        start = time.perf_counter()
+        if retained:
+            graph = parse_heap_graph(path, max_objects=0)
+            built = time.perf_counter()
+            retention = compute_retention(graph)
+            dominated = time.perf_counter()
+            summarize_retainers(graph, retention)
+            phases = {"graph_s": built - start, "dominators_s": dominated - built, "report_s": time.perf_counter() - dominated}
+            objects = graph.node_count - 1
+            graph.close()
+        else:
+            objects = parse_hprof_file(path).total_instances
+        best = min(best, time.perf_counter() - start)
+    rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return dict(
+        phases,
+        seconds=best,
+        mb_per_s=size / 1e6 / best,
+        objects_per_s=objects / best,
+        peak_rss_mb=rss_kb / 1024,
+    )
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--objects", type=int, default=5_000_000)
+    ap.add_argument("--repeat", type=int, default=3)
+    ap.add_argument("--retained", action="store_true", help="build the object graph and dominator tree")
+    ap.add_argument("--index", action="store_true", help="build the sidecar index, then query it from a new process")
+    ap.add_argument("--child", metavar="PATH", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.child:
+        print(json.dumps(measure_index(args.child) if args.index else measure(args.child, args.repeat, args.retained)))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "heap.hprof")
+        write_synthetic_hprof(path, args.objects)
+        print(f"{args.objects} objects, {os.path.getsize(path) / 1e6:.1f} MB")
+        if args.index:
+            for label in ("build", "reuse"):
+                out = subprocess.run(
+                    [sys.executable, __file__, "--index", "--child", path], check=True, capture_output=True, text=True
+                ).stdout
+                r = json.loads(out)
+                print(f"{label}: {r['seconds']:.3f}s, peak RSS {r['peak_rss_mb']:.0f} MB")
+            return
+        out = subprocess.run(
+            [sys.executable, __file__, "--repeat", str(args.repeat), "--child", path] + (["--retained"] if args.retained else []),
+            check=True, capture_output=True, text=True,
+        ).stdout
+        r = json.loads(out)
+        print(
+            f"best {r['seconds']:.3f}s, {r['mb_per_s']:.1f} MB/s, {r['objects_per_s'] / 1e6:.2f}M objects/s, "
+            f"peak RSS {r['peak_rss_mb']:.0f} MB"
+        )
+        if args.retained:
+            print(f"graph {r['graph_s']:.2f}s, dominators {r['dominators_s']:.2f}s, report {r['report_s']:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Compares the mmap/bytes scanner with the streaming line parser.
+
+Each parser runs in a fresh subprocess so peak RSS (ru_maxrss) is measured in
+isolation, next to best-of-N throughput and the tracemalloc peak of one parse::
+
+    PYTHONPATH=src python benchmarks/bench_mmap.py --threads 100000 --repeat 5
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from bench_parser import write_synthetic_dump
+
+PARSERS = {
+    "lines": ("heap_analyzer_mcp.parser", "parse_thread_dump_file"),
+    "mmap": ("heap_analyzer_mcp.bytescan", "parse_thread_dump_mmap"),
+}
+
+
+def measure(kind: str, path: str, threads: int, repeat: int) -> dict:
+    module, name = PARSERS[kind]
+    parse = getattr(__import__(module, fromlist=[name]), name)
+    size = os.path.getsize(path)
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        analysis = parse(path, max_threads=threads, max_bytes=size)
+        best = min(best, time.perf_counter() - start)
+    rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    del analysis
+    tracemalloc.start()
+    parse(path, max_threads=threads, max_bytes=size)
+    _, traced_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"parser": kind, "seconds": best, "mb_per_s": size / 1e6 / best, "peak_rss_mb": rss_kb / 1024, "traced_peak_mb": traced_peak / 1e6}
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--threads", type=int, default=100_000)
+    ap.add_argument("--depth", type=int, default=12)
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--child", nargs=2, metavar=("PARSER", "PATH"), help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.child:
+        print(json.dumps(measure(args.child[0], args.child[1], args.threads, args.repeat)))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "dump.txt")
+        write_synthetic_dump(path, args.threads, args.depth)
+        size = os.path.getsize(path)
+        print(f"{args.threads} threads, {size / 1e6:.1f} MB")
+        for kind in PARSERS:
+            out = subprocess.run(
+                [sys.executable, __file__, "--threads", str(args.threads), "--repeat", str(args.repeat), "--child", kind, path],
+                check=True, capture_output=True, text=True,
+            ).stdout
+            r = json.loads(out)
+            print(
+                f"{kind:>6}: best {r['seconds']:.3f}s, {r['mb_per_s']:.1f} MB/s, "
+                f"peak RSS {r['peak_rss_mb']:.0f} MB, traced peak {r['traced_peak_mb']:.0f} MB"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+"""Scaling benchmark for chunked parallel parsing of one large dump.
+
+Parses the same synthetic dump with 1, 2, 4 and 8 workers and reports wall time
+and speedup over the single-worker (sequential) parse::
+
+    PYTHONPATH=src python benchmarks/bench_parallel.py --threads 200000 --kind process
+"""
+import argparse
+import os
+import tempfile
+import time
+
+from bench_parser import write_synthetic_dump
+
+from heap_analyzer_mcp.parallel import POOL_KINDS, ParsePool
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--threads", type=int, default=200_000)
+    ap.add_argument("--kind", choices=POOL_KINDS, default="process")
+    ap.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    ap.add_argument("--repeat", type=int, default=3)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "dump.txt")
+        write_synthetic_dump(path, args.threads)
+        size = os.path.getsize(path)
+        print(f"{args.threads} threads, {size / 1e6:.1f} MB, {os.cpu_count()} CPUs, {args.kind} pool")
+        baseline = None
+        for workers in args.workers:
+            pool = ParsePool(workers=workers, kind=args.kind, chunk_bytes=1)
+            try:
+                pool.parse_file(path, max_threads=1, max_bytes=size)  # warm up worker processes
+                best = float("inf")
+                for _ in range(args.repeat):
+                    start = time.perf_counter()
+                    pool.parse_file(path, max_threads=args.threads, max_bytes=size)
+                    best = min(best, time.perf_counter() - start)
+            finally:
+                pool.shutdown()
+            baseline = baseline or best
+            print(f"  {workers} workers: {best:.3f}s, {size / 1e6 / best:.1f} MB/s, speedup x{baseline / best:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""Throughput benchmark for the thread dump parser.
+
+Generates a synthetic HotSpot dump (100k threads by default) and reports the
+best-of-N parse throughput in MB/s::
+
+    PYTHONPATH=src python benchmarks/bench_parser.py --threads 100000 --repeat 5
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from heap_analyzer_mcp.parser import parse_thread_dump_file
+
+STATES = ("RUNNABLE", "WAITING", "TIMED_WAITING", "BLOCKED")
+
+
+def write_synthetic_dump(path: str, threads: int, depth: int = 12, seed: int = 1) -> None:
+    rnd = random.Random(seed)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("Full thread dump OpenJDK 64-Bit Server VM (17.0.2+8 mixed mode):\n\n")
+        for i in range(threads):
+            f.write(
+                f'"worker-{i}" #{i + 10} daemon prio=5 os_prio=0 cpu=1.00ms elapsed=10.00s '
+                f"tid=0x00007f{i:08x} nid=0x{i:x} waiting on condition  [0x00007f0000000000]\n"
+            )
+            f.write(f"   java.lang.Thread.State: {rnd.choice(STATES)}\n")
+            for d in range(depth):
+                f.write(f"\tat com.example.pkg{d % 4}.Service{d}.method{rnd.randint(0, 3)}(Service{d}.java:{d * 10 + 1})\n")
+                if d == 2:
+                    f.write(f"\t- parking to wait for  <0x00000007{i % 50:08x}> (a java.lang.Object)\n")
+            f.write("\n")
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--threads", type=int, default=100_000)
+    ap.add_argument("--depth", type=int, default=12)
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "dump.txt")
+        write_synthetic_dump(path, args.threads, args.depth)
+        size = os.path.getsize(path)
+        best = float("inf")
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            analysis = parse_thread_dump_file(path, max_threads=args.threads, max_bytes=size)
+            best = min(best, time.perf_counter() - start)
+        print(f"{args.threads} threads, {size / 1e6:.1f} MB: best {best:.3f}s, {size / 1e6 / best:.1f} MB/s")
+        print(analysis.summary)
+
+
+if __name__ == "__main__":
+    main()
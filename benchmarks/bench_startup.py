@@ -0,0 +1,192 @@
+"""Cold start benchmark for the stdio server, checked against a time budget.
+
+The server is spawned once per client session, so the time until it can answer
+its first request is paid on every connection. Three measurements, each the
+median over fresh interpreters:
+
+- import: ``python -X importtime -c "import heap_analyzer_mcp.engine"``, the
+  cumulative import time of the engine and tool registry, with the package's
+  slowest modules listed;
+- first response: from spawning a process until it has answered. With the mcp
+  package installed this is the real server (``python -m heap_analyzer_mcp``)
+  answering ``initialize`` and ``tools/list`` over stdio; without it, a process
+  that builds the engine and prints the tools/list payload;
+- first call: analyze_thread_dump on a small generated dump in a fresh engine,
+  which now pays for the modules the registry no longer loads up front.
+
+::
+
+    PYTHONPATH=src python benchmarks/bench_startup.py
+    PYTHONPATH=src python benchmarks/bench_startup.py --import-budget-ms 80 --response-budget-ms 150
+
+Exits with status 1 when the median import or first response time is over its
+budget. Bytecode is compiled before measuring, so the numbers are those of an
+installed package, not of a first run.
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "tests"))
+
+from dumpgen import DumpGenerator  # noqa: E402
+
+_IMPORTTIME_RE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|\s*(\S+)")
+
+_ENGINE_READY = """
+import json
+from heap_analyzer_mcp.engine import Engine
+engine = Engine.from_env()
+tools = [{"name": s.name, "description": s.description, "inputSchema": s.input_schema} for s in engine.specs]
+print(json.dumps({"tools": tools}), flush=True)
+"""
+
+_FIRST_CALL = """
+import json, sys, time
+start = time.perf_counter()
+from heap_analyzer_mcp.engine import Engine
+engine = Engine.from_env()
+ready = time.perf_counter()
+res = engine.call("analyze_thread_dump", {"path": sys.argv[1]})
+assert res.ok, res.error_message
+done = time.perf_counter()
+engine.shutdown()
+print(json.dumps({"ready_ms": (ready - start) * 1e3, "call_ms": (done - ready) * 1e3}))
+"""
+
+_MCP_REQUESTS = [
+    {
+        "jsonrpc": "2.0", "id": 1, "method": "initialize",
+        "params": {"protocolVersion": "2024-11-05", "capabilities": {}, "clientInfo": {"name": "bench", "version": "0"}},
+    },
+    {"jsonrpc": "2.0", "method": "notifications/initialized"},
+    {"jsonrpc": "2.0", "id": 2, "method": "tools/list"},
+]
+
+
+def _env():
+    env = dict(os.environ)
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    return env
+
+
+def _median(samples):
+    return statistics.median(samples)
+
+
+def measure_import(runs):
+    """Median cumulative import time of the engine, and the slowest package modules by self time."""
+    totals, selfs = [], {}
+    for _ in range(runs):
+        err = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", "import heap_analyzer_mcp.engine"],
+            env=_env(), check=True, capture_output=True, text=True,
+        ).stderr
+        for line in err.splitlines():
+            m = _IMPORTTIME_RE.match(line)
+            if m is None:
+                continue
+            self_us, cumulative_us, name = m.groups()
+            if name == "heap_analyzer_mcp.engine":
+                totals.append(int(cumulative_us) / 1e3)
+            if name.startswith("heap_analyzer_mcp"):
+                selfs.setdefault(name, []).append(int(self_us) / 1e3)
+    modules = sorted(((name, _median(v)) for name, v in selfs.items()), key=lambda kv: -kv[1])
+    return _median(totals), modules
+
+
+def _time_to_answer(argv, stdin_lines=()):
+    start = time.perf_counter()
+    proc = subprocess.Popen(argv, env=_env(), stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+    try:
+        for line in stdin_lines:
+            proc.stdin.write(line + "\n")
+        proc.stdin.flush()
+        answered = 0
+        expected = sum(1 for line in stdin_lines if '"id"' in line) or 1
+        while answered < expected:
+            if not proc.stdout.readline():
+                raise RuntimeError(f"{' '.join(argv)} exited before answering")
+            answered += 1
+        return (time.perf_counter() - start) * 1e3
+    finally:
+        proc.kill()
+        proc.wait()
+
+
+def _has_mcp():
+    return subprocess.run([sys.executable, "-c", "import mcp"], env=_env(), capture_output=True).returncode == 0
+
+
+def measure_first_response(runs):
+    """Median time from spawn to first answer, and what was measured."""
+    if _has_mcp():
+        argv = [sys.executable, "-m", "heap_analyzer_mcp"]
+        lines = [json.dumps(r) for r in _MCP_REQUESTS]
+        mode = "server: initialize + tools/list over stdio"
+    else:
+        argv = [sys.executable, "-c", _ENGINE_READY]
+        lines = []
+        mode = "engine: registry built and tools/list payload printed (mcp not installed)"
+    samples = [_time_to_answer(argv, lines) for _ in range(runs)]
+    baseline = [_time_to_answer([sys.executable, "-c", "print(flush=True)"]) for _ in range(runs)]
+    return _median(samples), _median(baseline), mode
+
+
+def measure_first_call(runs, threads):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "dump.txt")
+        DumpGenerator(threads=threads, deadlocks=1).write(path)
+        results = [
+            json.loads(subprocess.run(
+                [sys.executable, "-c", _FIRST_CALL, path], env=_env(), check=True, capture_output=True, text=True,
+            ).stdout)
+            for _ in range(runs)
+        ]
+    return _median([r["ready_ms"] for r in results]), _median([r["call_ms"] for r in results])
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--runs", type=int, default=9)
+    ap.add_argument("--threads", type=int, default=200, help="threads in the first call's dump")
+    ap.add_argument("--import-budget-ms", type=float, default=80.0)
+    ap.add_argument("--response-budget-ms", type=float, default=150.0,
+                    help="first response budget without mcp; the real server gets --server-budget-ms")
+    ap.add_argument("--server-budget-ms", type=float, default=1500.0)
+    args = ap.parse_args()
+
+    src = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "src")
+    subprocess.run([sys.executable, "-m", "compileall", "-q", src], env=_env(), check=True)
+
+    over = []
+    import_ms, modules = measure_import(args.runs)
+    print(f"{'import':>16}: {import_ms:.1f}ms (budget {args.import_budget_ms:.0f}ms)")
+    for name, ms in modules[:5]:
+        print(f"{'':>18}{name}: {ms:.1f}ms self")
+    if import_ms > args.import_budget_ms:
+        over.append("import")
+
+    response_ms, python_ms, mode = measure_first_response(args.runs)
+    budget = args.server_budget_ms if mode.startswith("server") else args.response_budget_ms
+    print(f"{'first response':>16}: {response_ms:.1f}ms (budget {budget:.0f}ms; bare interpreter {python_ms:.1f}ms)")
+    print(f"{'':>18}{mode}")
+    if response_ms > budget:
+        over.append("first response")
+
+    ready_ms, call_ms = measure_first_call(args.runs, args.threads)
+    print(f"{'first call':>16}: engine ready in {ready_ms:.1f}ms, "
+          f"analyze_thread_dump ({args.threads} threads) {call_ms:.1f}ms")
+
+    if over:
+        sys.exit("over budget: " + ", ".join(over))
+
+
+if __name__ == "__main__":
+    main()
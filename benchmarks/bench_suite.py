@@ -0,0 +1,206 @@
+"""Benchmark suite over the thread dump parser and tools, with stored baselines.
+
+Generates two deterministic dumps with tests/dumpgen.py and times each case in a
+fresh subprocess: parse_thread_dump on text in memory, parse_thread_dump_file,
+and the analyze_thread_dump and compare_thread_dumps tools through the engine
+(cold: the parse cache is cleared before every call). Each case reports latency
+percentiles, throughput at the median, the tracemalloc peak of one run and the
+peak RSS of its process::
+
+    PYTHONPATH=src python benchmarks/bench_suite.py --threads 20000 --jdk 17
+    PYTHONPATH=src python benchmarks/bench_suite.py --save benchmarks/baselines/default.json
+    PYTHONPATH=src python benchmarks/bench_suite.py --compare benchmarks/baselines/default.json
+
+--save writes the results as JSON. --compare reruns the baseline's workload and
+exits with status 1 when a case's median latency or traced peak grew by more
+than --tolerance / --memory-tolerance; timings only compare on the same machine.
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, "tests"))
+
+from dumpgen import JDK_VARIANTS, DumpGenerator  # noqa: E402
+
+CASES = ("parse_thread_dump", "parse_thread_dump_file", "analyze_thread_dump", "compare_thread_dumps")
+CONFIG_KEYS = ("threads", "depth", "lock_density", "deadlocks", "jdk", "repeat")
+BASELINE_VERSION = 1
+
+
+def percentile(samples, p):
+    ordered = sorted(samples)
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+def _case(name, paths):
+    """Returns a no-argument callable that runs one iteration of ``name``."""
+    if name == "parse_thread_dump":
+        from heap_analyzer_mcp.parser import parse_thread_dump
+
+        with open(paths[0], encoding="utf-8") as f:
+            text = f.read()
+        return lambda: parse_thread_dump(text, max_threads=1 << 30)
+    if name == "parse_thread_dump_file":
+        from heap_analyzer_mcp.parser import parse_thread_dump_file
+
+        return lambda: parse_thread_dump_file(paths[0], max_threads=1 << 30)
+
+    from heap_analyzer_mcp.cache import ParseCache
+    from heap_analyzer_mcp.engine import Engine
+    from heap_analyzer_mcp.parallel import ParsePool
+
+    pool = ParsePool(workers=1)
+    engine = Engine(pool, ParseCache(parser=pool.parse_file))
+    if name == "analyze_thread_dump":
+        arguments = {"path": paths[0], "max_threads": 100_000}
+    else:
+        arguments = {"path_a": paths[0], "path_b": paths[1], "max_threads": 100_000}
+
+    def run():
+        engine.cache.clear()
+        res = engine.call(name, arguments)
+        if not res.ok:
+            raise RuntimeError(res.error_message)
+        return res
+
+    return run
+
+
+def measure(name, paths, repeat):
+    run = _case(name, paths)
+    run()  # warm-up: imports, first-touch page cache
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = run()
+        samples.append(time.perf_counter() - start)
+    del result
+    tracemalloc.start()
+    run()
+    _, traced_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    size = sum(os.path.getsize(p) for p in (paths if name == "compare_thread_dumps" else paths[:1]))
+    p50 = percentile(samples, 50)
+    return {
+        "iterations": repeat,
+        "p50_ms": p50 * 1e3,
+        "p90_ms": percentile(samples, 90) * 1e3,
+        "p99_ms": percentile(samples, 99) * 1e3,
+        "min_ms": min(samples) * 1e3,
+        "mb_per_s": size / 1e6 / p50,
+        "traced_peak_mb": traced_peak / 1e6,
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def run_suite(config, cases):
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        paths = []
+        for seed in (1, 2):
+            path = os.path.join(tmp, f"dump{seed}.txt")
+            DumpGenerator(
+                threads=config["threads"], depth=config["depth"], lock_density=config["lock_density"],
+                deadlocks=config["deadlocks"], jdk=config["jdk"], seed=seed,
+            ).write(path)
+            paths.append(path)
+        print(f"{config['threads']} threads, JDK {config['jdk']}, {os.path.getsize(paths[0]) / 1e6:.1f} MB per dump")
+        for name in cases:
+            out = subprocess.run(
+                [sys.executable, __file__, "--repeat", str(config["repeat"]), "--child", name, *paths],
+                check=True, capture_output=True, text=True,
+            ).stdout
+            results[name] = r = json.loads(out)
+            print(
+                f"{name:>24}: p50 {r['p50_ms']:.1f}ms p90 {r['p90_ms']:.1f}ms p99 {r['p99_ms']:.1f}ms, "
+                f"{r['mb_per_s']:.1f} MB/s, traced peak {r['traced_peak_mb']:.1f} MB, peak RSS {r['peak_rss_mb']:.0f} MB"
+            )
+    return results
+
+
+def environment():
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "machine": platform.machine(),
+        "system": platform.system(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def compare(baseline, results, tolerance, memory_tolerance):
+    """Prints per-case deltas against ``baseline``; returns the regressed cases."""
+    if baseline["environment"] != environment():
+        print("warning: baseline was recorded on a different machine or Python; timings may not compare")
+    regressions = []
+    for name, base in baseline["results"].items():
+        cur = results.get(name)
+        if cur is None:
+            continue
+        checks = (("p50_ms", tolerance), ("traced_peak_mb", memory_tolerance))
+        for metric, tol in checks:
+            change = cur[metric] / base[metric] - 1 if base[metric] else 0.0
+            flag = change > tol
+            print(
+                f"{name:>24} {metric:>14}: {base[metric]:.1f} -> {cur[metric]:.1f} ({change:+.1%})"
+                + ("  REGRESSION" if flag else "")
+            )
+            if flag:
+                regressions.append(f"{name}.{metric}")
+    return regressions
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--threads", type=int, default=20_000)
+    ap.add_argument("--depth", type=int, default=12)
+    ap.add_argument("--lock-density", type=float, default=0.1)
+    ap.add_argument("--deadlocks", type=int, default=2)
+    ap.add_argument("--jdk", choices=JDK_VARIANTS, default="17")
+    ap.add_argument("--repeat", type=int, default=15)
+    ap.add_argument("--cases", nargs="+", choices=CASES, default=list(CASES))
+    ap.add_argument("--save", metavar="PATH", help="write the results as a JSON baseline")
+    ap.add_argument("--compare", metavar="PATH", help="rerun a baseline's workload and flag regressions")
+    ap.add_argument("--tolerance", type=float, default=0.15, help="allowed median latency growth (default 15%%)")
+    ap.add_argument("--memory-tolerance", type=float, default=0.10, help="allowed traced peak growth (default 10%%)")
+    ap.add_argument("--child", nargs="+", metavar="ARG", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.child:
+        print(json.dumps(measure(args.child[0], args.child[1:], args.repeat)))
+        return
+
+    config = {key: getattr(args, key) for key in CONFIG_KEYS}
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("version") != BASELINE_VERSION:
+            sys.exit(f"{args.compare}: unsupported baseline version {baseline.get('version')}")
+        config = baseline["config"]
+
+    results = run_suite(config, args.cases)
+
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump({"version": BASELINE_VERSION, "config": config, "environment": environment(), "results": results},
+                      f, indent=2, sort_keys=True)
+            f.write("\n")
+    if baseline is not None:
+        regressions = compare(baseline, results, args.tolerance, args.memory_tolerance)
+        if regressions:
+            sys.exit("regressions: " + ", ".join(regressions))
+
+
+if __name__ == "__main__":
+    main()
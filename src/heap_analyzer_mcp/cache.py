@@ -0,0 +1,237 @@
+import hashlib
+import os
+import pickle
+import stat
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Optional, Tuple
+
+from .parser import (
+    DEFAULT_MAX_BYTES,
+    DEFAULT_MAX_THREADS,
+    ParseCancelled,
+    ThreadDumpAnalysis,
+    parse_thread_dump_file,
+)
+from .telemetry import count, stage
+
+# In-process cache of parsed thread dumps.
+#
+# Entries are content addressed: the key is a BLAKE2b digest of the file plus the
+# parse budgets, so two copies of the same dump share one entry. To avoid rehashing
+# on every call, the digest of each path is memoised against its (size, mtime_ns);
+# a changed file is rehashed and, if its content changed, reparsed.
+#
+# With a spill directory, parsed models are also pickled to disk so a restarted
+# server starts warm. Unpickling runs arbitrary code, so the directory must be
+# private to the server's user: it is created with mode 0700, and one that is
+# owned by another user or writable by group or others is neither read nor
+# written. The directory is kept under max_spill_bytes by deleting the files
+# used least recently (by mtime, which a load refreshes).
+
+DEFAULT_CACHE_BYTES = 256 * 1024 * 1024
+DEFAULT_SPILL_BYTES = 1024 * 1024 * 1024
+_HASH_CHUNK = 1 << 20
+_SPILL_VERSION = 2
+
+CacheKey = Tuple[str, int, int]
+ParseFn = Callable[[str, int, int, Optional[threading.Event]], ThreadDumpAnalysis]
+
+
+def file_digest(path: str, cancel: Optional[threading.Event] = None) -> str:
+    h = hashlib.blake2b(digest_size=20)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(_HASH_CHUNK), b""):
+            if cancel is not None and cancel.is_set():
+                raise ParseCancelled()
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def estimate_analysis_size(analysis: ThreadDumpAnalysis) -> int:
+    # Rough accounting: fixed per-thread overhead plus each distinct stack tuple once.
+    size = 1024 + 256 * len(analysis.deadlocks)
+    seen_stacks = set()
+    for t in analysis.threads:
+        size += 400 + 120 * len(t.locks)
+        if t.frames and id(t.frames) not in seen_stacks:
+            seen_stacks.add(id(t.frames))
+            size += 56 + 8 * len(t.frames) + sum(len(f) for f in t.frames)
+    return size
+
+
+class ParseCache:
+    def __init__(
+        self,
+        max_bytes: int = DEFAULT_CACHE_BYTES,
+        spill_dir: Optional[str] = None,
+        parser: ParseFn = parse_thread_dump_file,
+        max_spill_bytes: int = DEFAULT_SPILL_BYTES,
+    ) -> None:
+        self.max_bytes = max_bytes
+        self.spill_dir = spill_dir
+        self.max_spill_bytes = max_spill_bytes
+        self.parser = parser
+        self._entries: "OrderedDict[CacheKey, Tuple[ThreadDumpAnalysis, int]]" = OrderedDict()
+        self._fingerprints: Dict[str, Tuple[int, int, str]] = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self.evictions = 0
+
+    @classmethod
+    def from_env(cls, parser: ParseFn = parse_thread_dump_file) -> "ParseCache":
+        # HEAP_ANALYZER_CACHE_MB=0 disables in-memory caching; HEAP_ANALYZER_CACHE_DIR
+        # enables spilling parsed models to disk so a restarted server starts warm,
+        # and HEAP_ANALYZER_CACHE_DIR_MB bounds that directory.
+        mb = os.environ.get("HEAP_ANALYZER_CACHE_MB")
+        max_bytes = int(mb) * 1024 * 1024 if mb else DEFAULT_CACHE_BYTES
+        spill_mb = os.environ.get("HEAP_ANALYZER_CACHE_DIR_MB")
+        return cls(
+            max_bytes=max_bytes,
+            spill_dir=os.environ.get("HEAP_ANALYZER_CACHE_DIR") or None,
+            parser=parser,
+            max_spill_bytes=int(spill_mb) * 1024 * 1024 if spill_mb else DEFAULT_SPILL_BYTES,
+        )
+
+    def get_or_parse(
+        self,
+        path: str,
+        max_threads: int = DEFAULT_MAX_THREADS,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        cancel: Optional[threading.Event] = None,
+    ) -> ThreadDumpAnalysis:
+        key = (self.digest(path, cancel), max_threads, max_bytes)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                count("cache_hits")
+                return entry[0]
+            self.misses += 1
+        count("cache_misses")
+
+        with stage("cache_load"):
+            analysis = self._load_spilled(key)
+        if analysis is not None:
+            with self._lock:
+                self.disk_hits += 1
+            count("cache_disk_hits")
+        else:
+            with stage("parse"):
+                analysis = self.parser(path, max_threads, max_bytes, cancel)
+            count("bytes", analysis.bytes_read)
+            count("threads", len(analysis.threads))
+            self._spill(key, analysis)
+        self._insert(key, analysis)
+        return analysis
+
+    def digest(self, path: str, cancel: Optional[threading.Event] = None) -> str:
+        st = os.stat(path)
+        with self._lock:
+            known = self._fingerprints.get(path)
+        if known is not None and known[0] == st.st_size and known[1] == st.st_mtime_ns:
+            return known[2]
+        with stage("digest"):
+            digest = file_digest(path, cancel)
+        with self._lock:
+            self._fingerprints[path] = (st.st_size, st.st_mtime_ns, digest)
+        return digest
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "disk_hits": self.disk_hits,
+                "evictions": self.evictions,
+            }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._fingerprints.clear()
+            self._bytes = 0
+
+    def _insert(self, key: CacheKey, analysis: ThreadDumpAnalysis) -> None:
+        size = estimate_analysis_size(analysis)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[key] = (analysis, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def _spill_path(self, key: CacheKey) -> Optional[str]:
+        if not self.spill_dir:
+            return None
+        digest, max_threads, max_bytes = key
+        return os.path.join(self.spill_dir, f"{digest}-{max_threads}-{max_bytes}.v{_SPILL_VERSION}.pickle")
+
+    def _spill_dir_is_private(self) -> bool:
+        st = os.stat(self.spill_dir)  # type: ignore[arg-type]
+        if not stat.S_ISDIR(st.st_mode) or st.st_mode & (stat.S_IWGRP | stat.S_IWOTH):
+            return False
+        return not hasattr(os, "getuid") or st.st_uid == os.getuid()
+
+    def _spill(self, key: CacheKey, analysis: ThreadDumpAnalysis) -> None:
+        path = self._spill_path(key)
+        if path is None:
+            return
+        try:
+            os.makedirs(self.spill_dir, mode=0o700, exist_ok=True)  # type: ignore[arg-type]
+            if not self._spill_dir_is_private():
+                return
+            tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp, "wb") as f:
+                pickle.dump(analysis, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp, path)
+            self._trim_spilled()
+        except OSError:
+            # Spilling is best effort; the in-memory entry is still usable.
+            pass
+
+    def _trim_spilled(self) -> None:
+        files = []
+        total = 0
+        with os.scandir(self.spill_dir) as it:  # type: ignore[type-var]
+            for entry in it:
+                if entry.name.endswith(".pickle") and entry.is_file(follow_symlinks=False):
+                    st = entry.stat(follow_symlinks=False)
+                    files.append((st.st_mtime_ns, st.st_size, entry.path))
+                    total += st.st_size
+        files.sort()
+        for _, size, path in files:
+            if total <= self.max_spill_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+
+    def _load_spilled(self, key: CacheKey) -> Optional[ThreadDumpAnalysis]:
+        path = self._spill_path(key)
+        if path is None or not os.path.exists(path):
+            return None
+        try:
+            if not self._spill_dir_is_private():
+                return None
+            with open(path, "rb") as f:
+                analysis = pickle.load(f)
+            os.utime(path)
+        except Exception:
+            return None
+        return analysis if isinstance(analysis, ThreadDumpAnalysis) else None
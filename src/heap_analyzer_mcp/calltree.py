@@ -0,0 +1,183 @@
+import heapq
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from .defaults import DEFAULT_MAX_NODES
+from .parallel import map_concurrently
+from .parser import ThreadDumpAnalysis
+
+# Aggregated call tree ("poor man's profiler") over the stacks of one or more dumps.
+#
+# Frames are interned to integer ids and the tree is stored as flat per-node lists
+# with one (parent, frame id) -> node dict, so memory follows the number of
+# distinct call paths. Each dump is parsed without the parse cache and reduced
+# at once to its distinct stacks with a thread count (the parser already shares
+# one tuple per distinct stack); the full model is then dropped, so only those
+# stacks outlive the parse. Each distinct stack is inserted once with its weight.
+
+ROOT_FRAME = "all"
+
+StackWeights = Dict[Tuple[str, ...], int]
+
+
+def stack_weights(analysis: ThreadDumpAnalysis, states: Optional[Sequence[str]] = None) -> StackWeights:
+    wanted = set(states) if states is not None else None
+    by_id: Dict[int, List] = {}
+    for t in analysis.threads:
+        if not t.frames or (wanted is not None and t.state not in wanted):
+            continue
+        entry = by_id.get(id(t.frames))
+        if entry is None:
+            by_id[id(t.frames)] = [t.frames, 1]
+        else:
+            entry[1] += 1
+    return {frames: weight for frames, weight in by_id.values()}
+
+
+class CallTree:
+    def __init__(self) -> None:
+        self.frame_ids: Dict[str, int] = {}
+        self.frame_names: List[str] = [ROOT_FRAME]
+        # Node 0 is the root; a node's parent always has a smaller id.
+        self.parent: List[int] = [-1]
+        self.frame: List[int] = [0]
+        self.total: List[int] = [0]
+        self.self_count: List[int] = [0]
+        self.children: List[List[int]] = [[]]
+        self._index: Dict[Tuple[int, int], int] = {}
+        self.dumps = 0
+
+    @property
+    def samples(self) -> int:
+        return self.total[0]
+
+    def __len__(self) -> int:
+        return len(self.parent)
+
+    def frame_id(self, name: str) -> int:
+        fid = self.frame_ids.get(name)
+        if fid is None:
+            fid = self.frame_ids[name] = len(self.frame_names)
+            self.frame_names.append(name)
+        return fid
+
+    def add_stack(self, frames: Sequence[str], weight: int = 1) -> None:
+        """Adds one stack, innermost frame first as in a thread dump."""
+        index = self._index
+        total = self.total
+        node = 0
+        total[0] += weight
+        for name in reversed(frames):
+            key = (node, self.frame_id(name))
+            child = index.get(key)
+            if child is None:
+                child = index[key] = len(self.parent)
+                self.parent.append(node)
+                self.frame.append(key[1])
+                total.append(0)
+                self.self_count.append(0)
+                self.children.append([])
+                self.children[node].append(child)
+            total[child] += weight
+            node = child
+        self.self_count[node] += weight
+
+    def add_weights(self, weights: StackWeights) -> None:
+        for frames, weight in weights.items():
+            self.add_stack(frames, weight)
+        self.dumps += 1
+
+    def _path(self, node: int) -> List[str]:
+        names = []
+        while node > 0:
+            names.append(self.frame_names[self.frame[node]])
+            node = self.parent[node]
+        names.reverse()
+        return names
+
+    def keep(self, max_nodes: int) -> List[int]:
+        """Picks up to ``max_nodes`` non-root nodes, heaviest first; a node is only
+        picked after its parent, so the result is always a connected tree."""
+        kept: List[int] = []
+        heap = [(-self.total[c], c) for c in self.children[0]]
+        heapq.heapify(heap)
+        while heap and len(kept) < max_nodes:
+            _, node = heapq.heappop(heap)
+            kept.append(node)
+            for c in self.children[node]:
+                heapq.heappush(heap, (-self.total[c], c))
+        kept.sort()
+        return kept
+
+    def to_tree(self, max_nodes: int = DEFAULT_MAX_NODES) -> Dict[str, object]:
+        # Built without recursion (stacks can be thousands of frames deep): parents
+        # have smaller ids than their children, so visiting kept nodes in id order
+        # always finds the parent's dict already made.
+        root: Dict[str, object] = {"frame": ROOT_FRAME, "total": self.total[0], "self": self.self_count[0], "children": []}
+        made = {0: root}
+        for node in self.keep(max_nodes):
+            d: Dict[str, object] = {
+                "frame": self.frame_names[self.frame[node]],
+                "total": self.total[node],
+                "self": self.self_count[node],
+                "children": [],
+            }
+            made[self.parent[node]]["children"].append(d)  # type: ignore[attr-defined]
+            made[node] = d
+        for d in made.values():
+            children = d["children"]
+            children.sort(key=lambda c: -c["total"])  # type: ignore[attr-defined]
+            omitted = d["total"] - d["self"] - sum(c["total"] for c in children)  # type: ignore[operator, misc]
+            if omitted:
+                d["omitted"] = omitted
+        return root
+
+    def to_folded(self, max_nodes: int = DEFAULT_MAX_NODES) -> str:
+        # Samples of pruned subtrees are charged to their closest kept ancestor, so
+        # the folded counts still add up to the total number of samples.
+        kept = self.keep(max_nodes)
+        kept_set = set(kept)
+        lines = []
+        for node in kept:
+            count = self.self_count[node] + sum(self.total[c] for c in self.children[node] if c not in kept_set)
+            if count:
+                lines.append((";".join(self._path(node)), count))
+        root_count = self.self_count[0] + sum(self.total[c] for c in self.children[0] if c not in kept_set)
+        if root_count:
+            lines.append((ROOT_FRAME, root_count))
+        lines.sort(key=lambda item: (-item[1], item[0]))
+        return "".join(f"{path} {count}\n" for path, count in lines)
+
+
+def build_call_tree(
+    paths: Sequence[str],
+    parse: Callable[[str], ThreadDumpAnalysis],
+    states: Optional[Sequence[str]] = None,
+    max_workers: int = 8,
+) -> CallTree:
+    # Dumps are parsed concurrently but each is reduced to its distinct stacks
+    # first, so only those are held until they are merged in order. ``parse``
+    # should not cache: a cached model would keep every thread of every dump.
+    tree = CallTree()
+    weights = map_concurrently(lambda p: stack_weights(parse(p), states), paths, max_workers=max_workers)
+    for w in weights:
+        tree.add_weights(w)
+    return tree
+
+
+def summarize_call_tree(tree: CallTree, fmt: str = "tree", max_nodes: int = DEFAULT_MAX_NODES) -> Dict[str, object]:
+    payload: Dict[str, object] = {
+        "summary": (
+            f"{tree.samples} thread samples from {tree.dumps} dumps, "
+            f"{len(tree) - 1} distinct call paths over {len(tree.frame_names) - 1} distinct frames"
+        ),
+        "dumps": tree.dumps,
+        "samples": tree.samples,
+        "nodes": len(tree) - 1,
+        "distinct_frames": len(tree.frame_names) - 1,
+        "max_nodes": max_nodes,
+    }
+    if fmt in ("tree", "both"):
+        payload["tree"] = tree.to_tree(max_nodes)
+    if fmt in ("folded", "both"):
+        payload["folded"] = tree.to_folded(max_nodes)
+    return payload
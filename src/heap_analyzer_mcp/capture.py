@@ -0,0 +1,358 @@
+import itertools
+import os
+import shlex
+import subprocess
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import IO, Deque, Dict, List, Optional, Sequence
+
+from .defaults import CAPTURE_PREFIX, CAPTURE_TOOLS, DEFAULT_CAPTURE_INTERVAL_S
+from .parser import (
+    DEFAULT_MAX_BYTES,
+    DEFAULT_MAX_THREADS,
+    ParseCancelled,
+    ThreadDumpAnalysis,
+    ThreadDumpParser,
+    feed_file,
+)
+
+# Live capture of thread dumps from a running JVM.
+#
+# A capture session runs `jcmd <pid> Thread.print -l` (or `jstack -l <pid>`) `count`
+# times, `interval_s` apart, on a background thread, so the tool call that starts
+# it returns at once. The command's stdout is fed straight into the incremental
+# parser as it is produced; nothing is written to disk. Parsed snapshots go into
+# a per-session ring buffer (the oldest is dropped once it is full) and can be
+# passed to the thread dump tools as "capture:<session>/<seq>" in place of a file
+# path, or as a whole session to the series and call tree tools.
+#
+# Sampling is fixed-rate: capture k starts at start + k * interval_s, however
+# long the earlier ones took. A capture that outlives its timeout is killed.
+
+DEFAULT_CAPTURE_SNAPSHOTS = 30
+DEFAULT_CAPTURE_TIMEOUT_S = 30.0
+DEFAULT_MAX_SESSIONS = 8
+_MAX_ERRORS = 10
+_HEAD_BYTES = 512
+
+
+class CaptureError(Exception):
+    pass
+
+
+class _Head:
+    """Passes ``readlines`` through and keeps the first bytes, for error messages."""
+
+    def __init__(self, stream: IO[bytes]) -> None:
+        self._stream = stream
+        self.head = b""
+
+    def readlines(self, hint: int = -1) -> List[bytes]:
+        lines = self._stream.readlines(hint)
+        if len(self.head) < _HEAD_BYTES and lines:
+            self.head += b"".join(lines)[: _HEAD_BYTES - len(self.head)]
+        return lines
+
+
+def _drain(stream: IO[bytes], tail: Deque[bytes]) -> None:
+    for chunk in iter(lambda: stream.read(4096), b""):
+        tail.append(chunk)
+
+
+def _message(data: bytes) -> str:
+    text = " ".join(data.decode("utf-8", errors="replace").split())
+    return text[-300:] or "no output"
+
+
+def capture_thread_dump(
+    argv: Sequence[str],
+    max_threads: int = DEFAULT_MAX_THREADS,
+    max_bytes: int = DEFAULT_MAX_BYTES,
+    cancel: Optional[threading.Event] = None,
+    timeout: float = DEFAULT_CAPTURE_TIMEOUT_S,
+) -> ThreadDumpAnalysis:
+    """Runs ``argv`` and parses its stdout as a thread dump while it is printed.
+
+    Raises CaptureError if the command cannot be run, fails, times out or prints
+    no threads, and ParseCancelled (after killing it) once ``cancel`` is set.
+    """
+    try:
+        proc = subprocess.Popen(list(argv), stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    except OSError as e:
+        raise CaptureError(f"Cannot run {argv[0]}: {e.strerror or e}") from None
+    # stderr is drained on the side so a chatty command cannot block on a full pipe.
+    stderr_tail: Deque[bytes] = deque(maxlen=2)
+    drain = threading.Thread(target=_drain, args=(proc.stderr, stderr_tail), daemon=True)
+    drain.start()
+    timed_out = threading.Event()
+
+    def expire() -> None:
+        timed_out.set()
+        proc.kill()
+
+    timer = threading.Timer(timeout, expire)
+    timer.daemon = True
+    timer.start()
+    parser = ThreadDumpParser(max_threads=max_threads)
+    stdout = _Head(proc.stdout)  # type: ignore[arg-type]
+    finished = False
+    try:
+        bytes_read, over_budget = feed_file(parser, stdout, max_bytes, cancel=cancel)  # type: ignore[arg-type]
+        finished = True
+    finally:
+        timer.cancel()
+        if not finished or parser.done or over_budget:
+            # Stopped reading early: the rest of the output is not wanted.
+            proc.kill()
+        proc.stdout.close()  # type: ignore[union-attr]
+        returncode = proc.wait()
+        drain.join(1.0)
+    if timed_out.is_set():
+        raise CaptureError(f"{argv[0]} timed out after {timeout:g}s")
+    analysis = parser.finish()
+    analysis.truncated = analysis.truncated or over_budget
+    analysis.bytes_read = bytes_read
+    if not analysis.truncated and returncode != 0:
+        detail = _message(b"".join(stderr_tail) or stdout.head)
+        raise CaptureError(f"{argv[0]} exited with status {returncode}: {detail}")
+    if parser.total_threads == 0:
+        raise CaptureError(f"{argv[0]} printed no threads: {_message(stdout.head + b''.join(stderr_tail))}")
+    return analysis
+
+
+class CapturedSnapshot:
+    __slots__ = ("session", "seq", "captured_at", "elapsed_ms", "analysis")
+
+    def __init__(self, session: str, seq: int, captured_at: float, elapsed_ms: float, analysis: ThreadDumpAnalysis):
+        self.session = session
+        self.seq = seq
+        self.captured_at = captured_at
+        self.elapsed_ms = elapsed_ms
+        self.analysis = analysis
+
+    @property
+    def ref(self) -> str:
+        return f"{CAPTURE_PREFIX}{self.session}/{self.seq}"
+
+    def to_dict(self) -> Dict[str, object]:
+        return {
+            "ref": self.ref,
+            "seq": self.seq,
+            "captured_at": round(self.captured_at, 3),
+            "elapsed_ms": round(self.elapsed_ms, 1),
+            "threads": len(self.analysis.threads),
+            "counts": self.analysis.counts,
+            "deadlocks": len(self.analysis.deadlocks),
+            "truncated": self.analysis.truncated,
+            "bytes_read": self.analysis.bytes_read,
+        }
+
+
+class CaptureSession:
+    def __init__(
+        self,
+        session_id: str,
+        pid: int,
+        argv: Sequence[str],
+        count: int,
+        interval_s: float,
+        max_threads: int = DEFAULT_MAX_THREADS,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        capacity: int = DEFAULT_CAPTURE_SNAPSHOTS,
+        timeout: float = DEFAULT_CAPTURE_TIMEOUT_S,
+    ) -> None:
+        self.id = session_id
+        self.pid = pid
+        self.argv = tuple(argv)
+        self.count = count
+        self.interval_s = interval_s
+        self.max_threads = max_threads
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self.started_at = time.time()
+        self.state = "running"
+        self.attempts = 0
+        self.errors: Deque[str] = deque(maxlen=_MAX_ERRORS)
+        self._snapshots: Deque[CapturedSnapshot] = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._done = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"capture-{session_id}", daemon=True)
+
+    def start(self) -> "CaptureSession":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._done.wait(timeout)
+
+    @property
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    def snapshots(self) -> List[CapturedSnapshot]:
+        with self._lock:
+            return list(self._snapshots)
+
+    def snapshot(self, seq: int) -> Optional[CapturedSnapshot]:
+        """Snapshot ``seq``; negative values count back from the latest one."""
+        snapshots = self.snapshots()
+        if seq < 0:
+            return snapshots[seq] if -seq <= len(snapshots) else None
+        for snap in snapshots:
+            if snap.seq == seq:
+                return snap
+        return None
+
+    def to_dict(self, with_snapshots: bool = True) -> Dict[str, object]:
+        snapshots = self.snapshots()
+        out: Dict[str, object] = {
+            "session": self.id,
+            "pid": self.pid,
+            "command": " ".join(self.argv),
+            "state": self.state,
+            "count": self.count,
+            "interval_s": self.interval_s,
+            "attempts": self.attempts,
+            "retained": len(snapshots),
+            "errors": list(self.errors),
+        }
+        if with_snapshots:
+            out["snapshots"] = [s.to_dict() for s in snapshots]
+        return out
+
+    def _run(self) -> None:
+        start = time.monotonic()
+        try:
+            for k in range(self.count):
+                if self._stop.wait(max(0.0, start + k * self.interval_s - time.monotonic())):
+                    break
+                self.attempts += 1
+                began = time.time()
+                t0 = time.perf_counter()
+                try:
+                    analysis = capture_thread_dump(
+                        self.argv, self.max_threads, self.max_bytes, cancel=self._stop, timeout=self.timeout
+                    )
+                except CaptureError as e:
+                    self.errors.append(str(e))
+                    continue
+                except ParseCancelled:
+                    break
+                snap = CapturedSnapshot(self.id, k, began, (time.perf_counter() - t0) * 1e3, analysis)
+                with self._lock:
+                    self._snapshots.append(snap)
+        except Exception as e:  # keep the session inspectable whatever went wrong
+            self.errors.append(f"Exception: {e}")
+        finally:
+            if self._stop.is_set():
+                self.state = "stopped"
+            elif self.errors and not self._snapshots:
+                self.state = "failed"
+            else:
+                self.state = "done"
+            self._done.set()
+
+
+class CaptureManager:
+    """Starts capture sessions and resolves "capture:<session>/<seq>" references."""
+
+    def __init__(
+        self,
+        commands: Optional[Dict[str, Sequence[str]]] = None,
+        capacity: int = DEFAULT_CAPTURE_SNAPSHOTS,
+        timeout: float = DEFAULT_CAPTURE_TIMEOUT_S,
+        max_sessions: int = DEFAULT_MAX_SESSIONS,
+    ) -> None:
+        self.commands: Dict[str, Sequence[str]] = {"jcmd": ("jcmd",), "jstack": ("jstack",)}
+        self.commands.update(commands or {})
+        self.capacity = capacity
+        self.timeout = timeout
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[str, CaptureSession]" = OrderedDict()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "CaptureManager":
+        # HEAP_ANALYZER_JCMD / HEAP_ANALYZER_JSTACK override the commands (e.g. a full
+        # path under $JAVA_HOME/bin); HEAP_ANALYZER_CAPTURE_SNAPSHOTS sizes each
+        # session's ring buffer and HEAP_ANALYZER_CAPTURE_TIMEOUT_S bounds one capture.
+        commands = {}
+        for tool in CAPTURE_TOOLS:
+            value = os.environ.get(f"HEAP_ANALYZER_{tool.upper()}")
+            if value:
+                commands[tool] = shlex.split(value)
+        capacity = os.environ.get("HEAP_ANALYZER_CAPTURE_SNAPSHOTS")
+        timeout = os.environ.get("HEAP_ANALYZER_CAPTURE_TIMEOUT_S")
+        return cls(
+            commands=commands,
+            capacity=int(capacity) if capacity else DEFAULT_CAPTURE_SNAPSHOTS,
+            timeout=float(timeout) if timeout else DEFAULT_CAPTURE_TIMEOUT_S,
+        )
+
+    def command(self, tool: str, pid: int) -> List[str]:
+        prefix = list(self.commands[tool])
+        if tool == "jcmd":
+            return prefix + [str(pid), "Thread.print", "-l"]
+        return prefix + ["-l", str(pid)]
+
+    def start(
+        self,
+        pid: int,
+        count: int = 1,
+        interval_s: float = DEFAULT_CAPTURE_INTERVAL_S,
+        tool: str = "jcmd",
+        max_threads: int = DEFAULT_MAX_THREADS,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+    ) -> CaptureSession:
+        with self._lock:
+            running = sum(1 for s in self._sessions.values() if not s.done)
+            if running >= self.max_sessions:
+                raise CaptureError(f"Too many running capture sessions ({running}); stop one first")
+            # Forget the oldest finished sessions beyond the limit, with their snapshots.
+            finished = [k for k, s in self._sessions.items() if s.done]
+            while finished and len(self._sessions) >= self.max_sessions:
+                del self._sessions[finished.pop(0)]
+            session_id = f"c{next(self._ids)}"
+            session = CaptureSession(
+                session_id, pid, self.command(tool, pid), count, interval_s,
+                max_threads=max_threads, max_bytes=max_bytes, capacity=self.capacity, timeout=self.timeout,
+            )
+            self._sessions[session_id] = session
+        return session.start()
+
+    def session(self, session_id: str) -> Optional[CaptureSession]:
+        with self._lock:
+            return self._sessions.get(session_id)
+
+    def sessions(self) -> List[CaptureSession]:
+        with self._lock:
+            return list(self._sessions.values())
+
+    def resolve(self, ref: str) -> CapturedSnapshot:
+        """The snapshot for "capture:<session>/<seq>" ("capture:<session>" is the latest)."""
+        session_id, _, seq = ref[len(CAPTURE_PREFIX):].partition("/")
+        session = self.session(session_id)
+        if session is None:
+            raise KeyError(f"Unknown capture session: {session_id}")
+        try:
+            index = int(seq) if seq else -1
+        except ValueError:
+            raise KeyError(f"Invalid capture reference: {ref}") from None
+        snap = session.snapshot(index)
+        if snap is None:
+            raise KeyError(f"No snapshot {seq or 'yet'} in capture session {session_id}")
+        return snap
+
+    def shutdown(self) -> None:
+        for session in self.sessions():
+            session.stop()
+
+
+def is_capture_ref(path: str) -> bool:
+    return path.startswith(CAPTURE_PREFIX)
@@ -0,0 +1,81 @@
+from typing import Dict, List, Sequence, Tuple
+
+from .model import ThreadInfo
+from .pagination import DEFAULT_MAX_RESPONSE_BYTES, paginate
+
+# Groups threads whose top frames are identical, so a few thousand pool workers
+# parked on the same stack come back as one entry.
+#
+# The parser interns every stack, so threads with the same stack share one tuple.
+# The top-N signature is therefore computed once per distinct stack (memoised by
+# identity) and each thread costs a dict lookup: clustering is linear in threads,
+# and a response holds at most one page of ``max_clusters`` clusters.
+
+DEFAULT_CLUSTER_DEPTH = 10
+DEFAULT_MAX_CLUSTERS = 20
+_MAX_SAMPLE_NAMES = 5
+
+
+class StackCluster:
+    __slots__ = ("frames", "size", "states", "sample_names")
+
+    def __init__(self, frames: Tuple[str, ...]) -> None:
+        self.frames = frames
+        self.size = 0
+        self.states: Dict[str, int] = {}
+        self.sample_names: List[str] = []
+
+    def add(self, thread: ThreadInfo) -> None:
+        self.size += 1
+        state = thread.state or "UNKNOWN"
+        self.states[state] = self.states.get(state, 0) + 1
+        if len(self.sample_names) < _MAX_SAMPLE_NAMES:
+            self.sample_names.append(thread.name)
+
+    def to_dict(self) -> Dict[str, object]:
+        return {
+            "size": self.size,
+            "states": self.states,
+            "stack": list(self.frames),
+            "sample_threads": self.sample_names,
+        }
+
+
+def cluster_threads(threads: Sequence[ThreadInfo], depth: int = DEFAULT_CLUSTER_DEPTH) -> List[StackCluster]:
+    """Clusters ``threads`` by their top ``depth`` frames, largest cluster first."""
+    by_stack: Dict[int, StackCluster] = {}
+    by_signature: Dict[Tuple[str, ...], StackCluster] = {}
+    for t in threads:
+        frames = t.frames
+        cluster = by_stack.get(id(frames))
+        if cluster is None:
+            signature = frames[:depth]
+            cluster = by_signature.get(signature)
+            if cluster is None:
+                cluster = by_signature[signature] = StackCluster(signature)
+            by_stack[id(frames)] = cluster
+        cluster.add(t)
+    # Stable sort: equal-sized clusters keep the order they first appeared in.
+    return sorted(by_signature.values(), key=lambda c: -c.size)
+
+
+def summarize_clusters(
+    threads: Sequence[ThreadInfo],
+    depth: int = DEFAULT_CLUSTER_DEPTH,
+    max_clusters: int = DEFAULT_MAX_CLUSTERS,
+    offset: int = 0,
+    max_response_bytes: int = DEFAULT_MAX_RESPONSE_BYTES,
+) -> Dict[str, object]:
+    clusters = cluster_threads(threads, depth)
+    shown, page = paginate(clusters, offset, max_clusters, max_response_bytes, render=StackCluster.to_dict)
+    covered = sum(c["size"] for c in shown)  # type: ignore[misc]
+    return {
+        "summary": (
+            f"{len(threads)} threads in {len(clusters)} clusters by top {depth} frames; "
+            f"clusters {offset + 1}-{offset + len(shown)} cover {covered} threads"
+        ),
+        "total_threads": len(threads),
+        "distinct_clusters": len(clusters),
+        "clusters": shown,
+        "page": page,
+    }
@@ -0,0 +1,114 @@
+import io
+import os
+from typing import IO, Optional
+
+# Transparent decompression of archived inputs.
+#
+# Collectors archive thread dumps and GC logs as .gz, .xz or .zst. The format is
+# detected from the file's magic bytes, not its name, and the file is decompressed
+# as a stream straight into the parser: the decompressed content is never written
+# to disk nor held in memory whole. Byte budgets (max_bytes) count decompressed
+# bytes, which is what the parsers consume; a reader opened with a limit stops
+# decompressing just past it, so a small archive that inflates to gigabytes without
+# a newline cannot make a line reader buffer all of it.
+#
+# gzip and xz come with the standard library. zstd uses compression.zstd (Python
+# 3.14+) or, failing that, the optional zstandard package. Each decompressor is
+# imported when the first file in its format is opened.
+
+COMPRESSION_MAGIC = (
+    ("gzip", b"\x1f\x8b"),
+    ("xz", b"\xfd7zXZ\x00"),
+    ("zstd", b"\x28\xb5\x2f\xfd"),
+)
+_SNIFF_BYTES = max(len(magic) for _, magic in COMPRESSION_MAGIC)
+
+
+class UnsupportedCompression(ValueError):
+    pass
+
+
+def sniff_compression(path: str) -> Optional[str]:
+    """The compression format of ``path`` ("gzip", "xz", "zstd") or None for plain files.
+
+    Pipes and devices are never sniffed: reading their first bytes would consume them.
+    """
+    if not os.path.isfile(path):
+        return None
+    with open(path, "rb") as f:
+        head = f.read(_SNIFF_BYTES)
+    for name, magic in COMPRESSION_MAGIC:
+        if head.startswith(magic):
+            return name
+    return None
+
+
+class _Limited(io.RawIOBase):
+    """Passes through at most ``limit`` bytes of ``stream``."""
+
+    def __init__(self, stream: IO[bytes], limit: int) -> None:
+        self._stream = stream
+        self._left = limit
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:  # type: ignore[no-untyped-def]
+        if self._left <= 0:
+            return 0
+        view = memoryview(b)[: self._left]
+        data = self._stream.read(len(view))
+        view[: len(data)] = data
+        self._left -= len(data)
+        return len(data)
+
+    def close(self) -> None:
+        if not self.closed:
+            self._stream.close()
+        super().close()
+
+
+def _open_zstd(path: str) -> IO[bytes]:
+    try:
+        from compression import zstd  # type: ignore[import-not-found]
+
+        return zstd.open(path, "rb")
+    except ImportError:
+        pass
+    try:
+        import zstandard  # type: ignore[import-not-found]
+    except ImportError:
+        raise UnsupportedCompression(
+            f"{path} is zstd-compressed; install the 'zstandard' package to read it"
+        ) from None
+    raw = open(path, "rb")
+    try:
+        reader = zstandard.ZstdDecompressor().stream_reader(raw, read_across_frames=True, closefd=True)
+    except BaseException:
+        raw.close()
+        raise
+    return io.BufferedReader(reader)  # type: ignore[arg-type]
+
+
+def open_input(path: str, limit: Optional[int] = None) -> IO[bytes]:
+    """Opens ``path`` for binary reading, decompressing it on the fly if needed.
+
+    For compressed files, ``limit`` caps the decompressed bytes handed out; callers
+    pass one byte more than their budget so they can still tell the input was cut.
+    """
+    fmt = sniff_compression(path)
+    if fmt is None:
+        return open(path, "rb")
+    if fmt == "gzip":
+        import gzip
+
+        stream: IO[bytes] = gzip.open(path, "rb")  # type: ignore[assignment]
+    elif fmt == "xz":
+        import lzma
+
+        stream = lzma.open(path, "rb")  # type: ignore[assignment]
+    else:
+        stream = _open_zstd(path)
+    if limit is None:
+        return stream
+    return io.BufferedReader(_Limited(stream, limit))  # type: ignore[return-value]
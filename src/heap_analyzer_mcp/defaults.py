@@ -0,0 +1,38 @@
+# Defaults and choices that appear in the tool schemas.
+#
+# The tool registry (engine.TOOLS) needs these to describe and validate every
+# tool, but the modules that use them (heap graphs, GC log patterns, capture
+# subprocesses, the parse pool) are slow to import and most sessions call only a
+# few tools. They live here, free of imports, so the registry can be built and a
+# client answered before any analyzer is loaded; the analyzers import them from here.
+
+# calltree
+DEFAULT_MAX_NODES = 500
+TREE_FORMATS = ("tree", "folded", "both")
+
+# capture
+CAPTURE_TOOLS = ("jcmd", "jstack")
+CAPTURE_PREFIX = "capture:"
+DEFAULT_CAPTURE_INTERVAL_S = 5.0
+MAX_CAPTURE_COUNT = 1000
+
+# dominators
+DEFAULT_MAX_RETAINERS = 20
+DEFAULT_MAX_PATH = 12
+
+# heapgraph
+DEFAULT_MAX_GRAPH_OBJECTS = 4_000_000
+
+# gclog
+DEFAULT_MAX_PAUSES = 10
+DEFAULT_TREND_BUCKETS = 20
+
+# hprof
+DEFAULT_MAX_CLASSES = 50
+HISTOGRAM_SORTS = ("shallow_size", "instances")
+
+# series
+DEFAULT_STUCK_STATES = ("RUNNABLE", "BLOCKED")
+DEFAULT_MIN_SNAPSHOTS = 3
+DEFAULT_MAX_STUCK = 100
+TIMELINE_MODES = ("stuck", "all", "none")
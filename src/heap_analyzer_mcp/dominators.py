@@ -0,0 +1,323 @@
+import heapq
+import threading
+from array import array
+from typing import Dict, List, Optional, Protocol, Sequence
+
+from .defaults import DEFAULT_MAX_PATH, DEFAULT_MAX_RETAINERS
+from .heapgraph import HeapGraph, IntColumn
+from .parser import ParseCancelled
+
+# Dominator tree and retained sizes over a HeapGraph.
+#
+# Immediate dominators are computed with Lengauer-Tarjan (the "simple" variant with
+# path compression, O(E log N)), written without recursion so object chains
+# millions deep do not hit the interpreter's recursion limit. All per-vertex state
+# is kept in typed arrays indexed by DFS preorder number (1 = the super root, 0 =
+# none), so the working set is a fixed number of 4- or 8-byte slots per object.
+# An object's retained size is its shallow size plus that of every object it
+# dominates, summed bottom-up over the tree in reverse preorder.
+#
+# Retention holds what the tools need afterwards, re-indexed by node number:
+# retained size, immediate dominator and shortest-path parent per object, plus
+# the largest retainers in order. Those columns are what the heap index persists.
+
+DEFAULT_KEEP_TOP = 1000
+_CANCEL_EVERY = 1 << 16
+_UNSEEN = 0xFFFFFFFF
+
+
+class DominatorTree:
+    def __init__(self, graph: HeapGraph, vertex: array, dfn: array, idom: array) -> None:
+        self.graph = graph
+        self.vertex = vertex  # preorder number -> node
+        self.dfn = dfn  # node -> preorder number, 0 if unreachable
+        self.idom = idom  # preorder number -> preorder number of the immediate dominator
+        self.retained = retained_sizes(graph, vertex, idom)
+
+    @property
+    def reachable(self) -> int:
+        """Number of objects reachable from a GC root (the super root excluded)."""
+        return len(self.vertex) - 2
+
+
+def _check(cancel: Optional[threading.Event]) -> None:
+    if cancel is not None and cancel.is_set():
+        raise ParseCancelled()
+
+
+def _depth_first(graph: HeapGraph, cancel: Optional[threading.Event]):
+    """Iterative DFS from the super root; returns (vertex, dfn, parent)."""
+    offsets = graph.offsets
+    targets = graph.targets
+    dfn = array("I", bytes(4 * graph.node_count))
+    vertex = array("I", [0, 0])
+    parent = array("I", [0, 0])
+    dfn[0] = 1
+    count = 1
+    stack_node = array("I", [0])
+    stack_pos = array("Q", [offsets[0]])
+    while stack_node:
+        v = stack_node[-1]
+        i = stack_pos[-1]
+        end = offsets[v + 1]
+        while i < end:
+            w = targets[i]
+            i += 1
+            if not dfn[w]:
+                break
+        else:
+            stack_node.pop()
+            stack_pos.pop()
+            continue
+        stack_pos[-1] = i
+        count += 1
+        dfn[w] = count
+        vertex.append(w)
+        parent.append(dfn[v])
+        stack_node.append(w)
+        stack_pos.append(offsets[w])
+        if not count % _CANCEL_EVERY:
+            _check(cancel)
+    return vertex, dfn, parent
+
+
+def _compress(v: int, ancestor: array, label: array, semi: array) -> None:
+    path = []
+    while ancestor[ancestor[v]]:
+        path.append(v)
+        v = ancestor[v]
+    for u in reversed(path):
+        a = ancestor[u]
+        if semi[label[a]] < semi[label[u]]:
+            label[u] = label[a]
+        ancestor[u] = ancestor[a]
+
+
+def compute_dominators(graph: HeapGraph, cancel: Optional[threading.Event] = None) -> DominatorTree:
+    vertex, dfn, parent = _depth_first(graph, cancel)
+    count = len(vertex) - 1
+    pred_starts, preds = graph.predecessors()
+    _check(cancel)
+
+    semi = array("I", range(count + 1))
+    label = array("I", range(count + 1))
+    ancestor = array("I", bytes(4 * (count + 1)))
+    idom = array("I", bytes(4 * (count + 1)))
+    bucket = array("I", bytes(4 * (count + 1)))  # first vertex whose semidominator is w
+    next_in_bucket = array("I", bytes(4 * (count + 1)))
+
+    for w in range(count, 1, -1):
+        node = vertex[w]
+        sw = semi[w]
+        for k in range(pred_starts[node], pred_starts[node + 1]):
+            v = dfn[preds[k]]
+            if not v:
+                continue  # an unreachable object pointing here
+            a = ancestor[v]
+            if a:
+                if ancestor[a]:
+                    _compress(v, ancestor, label, semi)
+                v = label[v]
+            if semi[v] < sw:
+                sw = semi[v]
+        semi[w] = sw
+        next_in_bucket[w] = bucket[sw]
+        bucket[sw] = w
+        p = parent[w]
+        ancestor[w] = p
+        v = bucket[p]
+        while v:
+            u = v
+            a = ancestor[v]
+            if a:
+                if ancestor[a]:
+                    _compress(v, ancestor, label, semi)
+                u = label[v]
+            idom[v] = u if semi[u] < semi[v] else p
+            v = next_in_bucket[v]
+        bucket[p] = 0
+        if not w % _CANCEL_EVERY:
+            _check(cancel)
+
+    for w in range(2, count + 1):
+        if idom[w] != semi[w]:
+            idom[w] = idom[idom[w]]
+    return DominatorTree(graph, vertex, dfn, idom)
+
+
+def retained_sizes(graph: HeapGraph, vertex: array, idom: array) -> array:
+    shallow = graph.shallow
+    retained = array("Q", (shallow[node] for node in vertex))
+    retained[0] = 0
+    # A dominator always precedes the vertices it dominates in preorder.
+    for w in range(len(vertex) - 1, 1, -1):
+        retained[idom[w]] += retained[w]
+    return retained
+
+
+def shortest_paths(graph: HeapGraph, cancel: Optional[threading.Event] = None) -> array:
+    """Breadth-first parents from the GC roots: node -> previous node on a shortest
+    reference path (0 for the roots themselves, _UNSEEN if unreachable)."""
+    offsets = graph.offsets
+    targets = graph.targets
+    previous = array("I", [_UNSEEN]) * graph.node_count
+    previous[0] = 0
+    queue = array("I", [0])
+    head = 0
+    while head < len(queue):
+        v = queue[head]
+        head += 1
+        for i in range(offsets[v], offsets[v + 1]):
+            w = targets[i]
+            if previous[w] == _UNSEEN:
+                previous[w] = v
+                queue.append(w)
+        if not head % _CANCEL_EVERY:
+            _check(cancel)
+    return previous
+
+
+def path_to_root(previous: array, node: int) -> List[int]:
+    path = []
+    while node and node != _UNSEEN:
+        path.append(node)
+        node = previous[node]
+    path.reverse()
+    return path
+
+
+class NodeTable(Protocol):
+    """The per-node columns shared by HeapGraph and a heap index."""
+
+    object_ids: IntColumn
+    shallow: IntColumn
+    truncated: bool
+    bytes_read: int
+
+    @property
+    def node_count(self) -> int: ...
+
+    def describe(self, node: int) -> Dict[str, object]: ...
+
+
+class Retention:
+    def __init__(
+        self,
+        retained: IntColumn,
+        idom: IntColumn,
+        previous: IntColumn,
+        top: IntColumn,
+        reachable: int,
+        references: int,
+        unreachable_size: int,
+        root_kinds: Dict[int, str],
+    ) -> None:
+        self.retained = retained  # node -> retained size, 0 if unreachable
+        self.idom = idom  # node -> immediate dominator node, 0 for the roots and unreachable objects
+        self.previous = previous  # node -> previous node on a shortest path from a GC root
+        self.top = top  # largest retainers first; every reachable object if fewer than the cap
+        self.reachable = reachable
+        self.references = references
+        self.unreachable_size = unreachable_size
+        self.root_kinds = root_kinds
+
+    @property
+    def total(self) -> int:
+        return self.retained[0]
+
+    def largest(self, count: int) -> Sequence[int]:
+        if count <= len(self.top) or len(self.top) == self.reachable:
+            return self.top[:count]
+        retained = self.retained
+        live = (node for node in range(1, len(retained)) if retained[node])
+        return heapq.nlargest(count, live, key=retained.__getitem__)
+
+
+def compute_retention(
+    graph: HeapGraph,
+    cancel: Optional[threading.Event] = None,
+    keep_top: int = DEFAULT_KEEP_TOP,
+) -> Retention:
+    tree = compute_dominators(graph, cancel)
+    n = graph.node_count
+    vertex = tree.vertex
+    tree_idom = tree.idom
+    tree_retained = tree.retained
+    retained = array("Q", bytes(8 * n))
+    idom = array("I", bytes(4 * n))
+    retained[0] = tree_retained[1]
+    for w in range(2, len(vertex)):
+        node = vertex[w]
+        retained[node] = tree_retained[w]
+        idom[node] = vertex[tree_idom[w]]
+    _check(cancel)
+    # Stable, so objects with equal retained sizes stay in node (file) order.
+    top = array("I", heapq.nlargest(keep_top, (vertex[w] for w in range(2, len(vertex))), key=retained.__getitem__))
+    return Retention(
+        retained,
+        idom,
+        shortest_paths(graph, cancel),
+        top,
+        tree.reachable,
+        graph.edge_count - len(graph.root_kinds),
+        sum(graph.shallow) - retained[0],
+        dict(graph.root_kinds),
+    )
+
+
+def summarize_retainers(
+    nodes: NodeTable,
+    retention: Retention,
+    max_retainers: int = DEFAULT_MAX_RETAINERS,
+    max_path: int = DEFAULT_MAX_PATH,
+) -> Dict[str, object]:
+    """``nodes`` is the graph the retention was computed from, or a heap index of it."""
+    retained = retention.retained
+    previous = retention.previous
+    root_kinds = retention.root_kinds
+    total = retention.total
+    retainers = []
+    for node in retention.largest(max_retainers):
+        path = path_to_root(previous, node)
+        steps: List[Dict[str, object]] = [nodes.describe(n) for n in path]
+        if len(steps) > max_path:
+            # Keep the GC root end and the end nearest the object.
+            head = max_path // 2
+            tail = max_path - head
+            steps = steps[:head] + [{"omitted": len(steps) - max_path}] + steps[-tail:]
+        entry = nodes.describe(node)
+        entry.update(
+            {
+                "shallow_size": nodes.shallow[node],
+                "retained_size": retained[node],
+                "retained_percent": round(100.0 * retained[node] / total, 2) if total else 0.0,
+                "gc_root": root_kinds.get(path[0], "unknown") if path else None,
+                "path_length": len(path),
+                "path": steps,
+            }
+        )
+        dominator = retention.idom[node]
+        if dominator:
+            entry["dominator"] = f"0x{nodes.object_ids[dominator]:x}"
+        retainers.append(entry)
+
+    objects = nodes.node_count - 1
+    reachable = retention.reachable
+    unreachable_size = retention.unreachable_size
+    return {
+        "summary": (
+            f"{reachable} of {objects} objects reachable from {len(root_kinds)} GC roots, "
+            f"retaining {total} bytes; {objects - reachable} unreachable objects ({unreachable_size} bytes); "
+            f"top {len(retainers)} retainers by retained size"
+        ),
+        "objects": objects,
+        "references": retention.references,
+        "gc_roots": len(root_kinds),
+        "reachable_objects": reachable,
+        "unreachable_objects": objects - reachable,
+        "unreachable_shallow_size": unreachable_size,
+        "total_retained_size": total,
+        "retainers": retainers,
+        "truncated": nodes.truncated,
+        "bytes_read": nodes.bytes_read,
+    }
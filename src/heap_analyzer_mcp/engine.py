@@ -0,0 +1,985 @@
+import json
+import os
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
+from functools import cached_property
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from .clusters import DEFAULT_CLUSTER_DEPTH, DEFAULT_MAX_CLUSTERS, summarize_clusters
+from .compressed import UnsupportedCompression
+from .defaults import (
+    CAPTURE_TOOLS,
+    DEFAULT_CAPTURE_INTERVAL_S,
+    DEFAULT_MAX_CLASSES,
+    DEFAULT_MAX_GRAPH_OBJECTS,
+    DEFAULT_MAX_NODES,
+    DEFAULT_MAX_PATH,
+    DEFAULT_MAX_PAUSES,
+    DEFAULT_MAX_RETAINERS,
+    DEFAULT_MAX_STUCK,
+    DEFAULT_MIN_SNAPSHOTS,
+    DEFAULT_STUCK_STATES,
+    DEFAULT_TREND_BUCKETS,
+    HISTOGRAM_SORTS,
+    MAX_CAPTURE_COUNT,
+    TIMELINE_MODES,
+    TREE_FORMATS,
+)
+from .locks import analyze_locks, find_deadlocks
+from .pagination import DEFAULT_MAX_RESPONSE_BYTES, DEFAULT_PAGE_LIMIT, CursorError, apply_cursor, finish_page, paginate
+from .parser import (
+    DEFAULT_MAX_BYTES,
+    DEFAULT_MAX_FRAMES,
+    DEFAULT_MAX_THREADS,
+    THREAD_STATES,
+    DumpFormatError,
+    ThreadDumpAnalysis,
+    filter_threads,
+)
+from .telemetry import RequestStats, Telemetry, count, stage
+
+if TYPE_CHECKING:
+    from .cache import ParseCache
+    from .capture import CaptureManager, CaptureSession, CapturedSnapshot
+    from .heapindex import HeapIndex
+    from .parallel import ParsePool
+
+# Core tool engine and tool registry.
+#
+# Every tool is declared once in TOOLS: its name, description, parameters (each
+# with its JSON schema, default and validity check), the handler that computes
+# the payload, and a cost hint. The MCP server (__main__) and the plain-Python
+# adapter (tools_adapter) both dispatch through Engine, so argument validation,
+# cursors, error codes and the analysis behind each tool exist in one place and
+# a change to any of them reaches every entry point.
+#
+# The registry is compiled once per Engine into a dispatch table: tool name ->
+# (spec, tuple of (name, default, check, message, nullable) rows). A call is one
+# dict lookup, one loop over those rows and the handler; nothing is built per
+# request. Handlers raise ToolError for problems the caller can fix, which maps
+# to INVALID_PARAMS; anything else is reported as INTERNAL_ERROR. Every call runs
+# inside a telemetry request (telemetry.py), reported by the server_stats tool.
+#
+# The server is spawned per client session and must answer its first request
+# quickly, so building the registry loads only the thread dump core. Heap dump,
+# GC log, capture, series and call tree modules are imported by their handlers on
+# first call, and the parse pool, cache and capture manager are created on first
+# use; defaults.py holds the values the schemas need from those modules.
+
+# Cost hints: what a call may have to do on a cold start.
+COST_PARSE = "parse"  # parse whole text inputs (cached by content digest)
+COST_INDEX = "index"  # one pass over a heap dump, then served from its index
+COST_GRAPH = "graph"  # build a heap object graph and dominator tree
+COST_STATE = "state"  # answered from the server's own state, no file access
+COST_CAPTURE = "capture"  # runs jcmd/jstack against a live JVM, in the background
+COSTS = (COST_PARSE, COST_INDEX, COST_GRAPH, COST_STATE, COST_CAPTURE)
+
+_PATH_DESCRIPTION = (
+    "Path to a thread dump file (HotSpot text, jcmd JSON, OpenJ9 javacore, or a dump inside a log; "
+    "the format is detected), or capture:<session>/<seq> for a captured snapshot"
+)
+_CURSOR_SCHEMA = {"type": "string", "description": "next_cursor from a previous page; repeats that query"}
+
+
+@dataclass
+class Result:
+    ok: bool
+    text: Optional[str] = None
+    error_code: Optional[str] = None
+    error_message: Optional[str] = None
+
+    @staticmethod
+    def ok_text(payload: Dict) -> "Result":
+        return Result(ok=True, text=json.dumps(payload))
+
+    @staticmethod
+    def err(code: str, message: str) -> "Result":
+        return Result(ok=False, error_code=code, error_message=message)
+
+
+class ToolError(Exception):
+    def __init__(self, message: str, code: str = "INVALID_PARAMS") -> None:
+        super().__init__(message)
+        self.message = message
+        self.code = code
+
+
+@dataclass(frozen=True)
+class Param:
+    name: str
+    schema: Dict[str, Any]
+    check: Optional[Callable[[Any], bool]] = None
+    message: str = ""
+    default: Any = None
+    # A missing or null value is accepted as "not given" (e.g. no state filter).
+    nullable: bool = False
+
+
+Args = Dict[str, Any]
+Cancel = Optional[threading.Event]
+Payload = Dict[str, Any]
+Digest = Optional[str]
+Handler = Callable[["Engine", Args, Cancel, Digest], Payload]
+
+
+@dataclass(frozen=True)
+class ToolSpec:
+    name: str
+    description: str
+    params: Tuple[Param, ...]
+    handler: Handler
+    cost: str = COST_PARSE
+    required: Tuple[str, ...] = ()
+    # Paged tools accept ``cursor`` and restore their query from it, so their
+    # required arguments can be replaced by a cursor.
+    paged: bool = False
+
+    @cached_property
+    def input_schema(self) -> Dict[str, Any]:
+        properties = {p.name: p.schema for p in self.params}
+        if self.paged:
+            properties["cursor"] = _CURSOR_SCHEMA
+        schema: Dict[str, Any] = {"type": "object"}
+        if self.required and self.paged:
+            schema["anyOf"] = [{"required": list(self.required)}, {"required": ["cursor"]}]
+        elif self.required:
+            schema["required"] = list(self.required)
+        schema["properties"] = properties
+        schema["additionalProperties"] = False
+        return schema
+
+
+# Parameter builders. Error messages name the parameter, as clients show them verbatim.
+
+def _int_param(name: str, default: int, minimum: int = 1, description: Optional[str] = None) -> Param:
+    schema: Dict[str, Any] = {"type": "integer", "minimum": minimum, "default": default}
+    if description:
+        schema["description"] = description
+    if minimum == 1:
+        message = f"'{name}' must be a positive integer"
+    elif minimum == 0:
+        message = f"'{name}' must be a non-negative integer"
+    else:
+        message = f"'{name}' must be an integer >= {minimum}"
+    return Param(name, schema, lambda v: isinstance(v, int) and v >= minimum, message, default)
+
+
+def _str_param(name: str, description: str) -> Param:
+    schema = {"type": "string", "description": description}
+    return Param(name, schema, lambda v: isinstance(v, str) and bool(v), f"'{name}' must be a non-empty string")
+
+
+def _enum_param(name: str, choices: Sequence[str], default: str) -> Param:
+    schema = {"type": "string", "enum": list(choices), "default": default}
+    return Param(name, schema, lambda v: v in choices, f"'{name}' must be one of: {'|'.join(choices)}", default)
+
+
+def _states_param(name: str, default: Optional[Sequence[str]] = None, description: Optional[str] = None) -> Param:
+    schema: Dict[str, Any] = {"type": "array", "items": {"type": "string", "enum": list(THREAD_STATES)}}
+    if default is not None:
+        schema["default"] = list(default)
+    if description:
+        schema["description"] = description
+    return Param(
+        name,
+        schema,
+        lambda v: isinstance(v, list) and all(s in THREAD_STATES for s in v),
+        f"'{name}' must be a list of thread states",
+        list(default) if default is not None else None,
+        nullable=default is None,
+    )
+
+
+def _page_params(
+    limit_name: str = "limit",
+    limit_default: int = DEFAULT_PAGE_LIMIT,
+    limit_description: Optional[str] = None,
+    items: str = "items",
+) -> Tuple[Param, ...]:
+    return (
+        _int_param("offset", 0, minimum=0),
+        _int_param(limit_name, limit_default, description=limit_description),
+        _int_param(
+            "max_response_bytes",
+            DEFAULT_MAX_RESPONSE_BYTES,
+            description=f"Byte budget for the serialized {items} of one page",
+        ),
+    )
+
+
+_MAX_THREADS = _int_param("max_threads", DEFAULT_MAX_THREADS)
+_MAX_BYTES = _int_param("max_bytes", DEFAULT_MAX_BYTES, description="Stop reading after this many bytes of the file")
+_CAPTURE_SESSION = Param(
+    "capture",
+    {"type": "string", "description": "Capture session whose retained snapshots to use, instead of files"},
+    lambda v: isinstance(v, str) and bool(v),
+    "'capture' must be a capture session id",
+    nullable=True,
+)
+
+
+# Handler helpers.
+
+def _check_file(path: str) -> None:
+    if not os.path.exists(path):
+        raise ToolError(f"File not found: {path}")
+    if os.path.isdir(path):
+        raise ToolError(f"Path is a directory: {path}")
+
+
+def _stale(path: str) -> ToolError:
+    return ToolError(f"Cursor is stale: {path} changed since the first page")
+
+
+def _check_dump(path: str) -> None:
+    from .capture import is_capture_ref
+
+    if not is_capture_ref(path):
+        _check_file(path)
+
+
+def _captured(engine: "Engine", ref: str) -> "CapturedSnapshot":
+    try:
+        return engine.captures.resolve(ref)
+    except KeyError as e:
+        raise ToolError(e.args[0]) from None
+
+
+def _capture_session(engine: "Engine", session_id: str) -> "CaptureSession":
+    session = engine.captures.session(session_id)
+    if session is None:
+        raise ToolError(f"Unknown capture session: {session_id}")
+    return session
+
+
+def _thread_dump(engine: "Engine", args: Args, cancel: Cancel, cursor_digest: Digest) -> Tuple[ThreadDumpAnalysis, str]:
+    """Parses (or fetches from the cache) the dump at ``args["path"]``, with its digest.
+
+    A captured snapshot's digest is its canonical reference, so a cursor issued for
+    "capture:<session>" (the latest snapshot) goes stale once a newer one arrives.
+    """
+    from .capture import is_capture_ref
+
+    path = args["path"]
+    if is_capture_ref(path):
+        snap = _captured(engine, path)
+        if cursor_digest is not None and cursor_digest != snap.ref:
+            raise _stale(path)
+        return snap.analysis, snap.ref
+    _check_file(path)
+    digest = engine.cache.digest(path, cancel)
+    if cursor_digest is not None and cursor_digest != digest:
+        raise _stale(path)
+    return _parse(engine, args, path, cancel), digest
+
+
+def _parse(engine: "Engine", args: Args, path: str, cancel: Cancel) -> ThreadDumpAnalysis:
+    from .capture import is_capture_ref
+
+    if is_capture_ref(path):
+        return _captured(engine, path).analysis
+    return engine.cache.get_or_parse(path, max_threads=args["max_threads"], max_bytes=args["max_bytes"], cancel=cancel)
+
+
+def _parse_once(engine: "Engine", args: Args, path: str, cancel: Cancel) -> ThreadDumpAnalysis:
+    """Like _parse, but bypasses the cache: for callers that keep only a reduction of the dump
+    (series snapshots, call tree stack weights), so N dumps are never held whole at once."""
+    from .capture import is_capture_ref
+
+    if is_capture_ref(path):
+        return _captured(engine, path).analysis
+    with stage("parse"):
+        analysis = engine.pool.parse_file(path, max_threads=args["max_threads"], max_bytes=args["max_bytes"], cancel=cancel)
+    count("bytes", analysis.bytes_read)
+    count("threads", len(analysis.threads))
+    return analysis
+
+
+def _series_paths(engine: "Engine", args: Args) -> List[str]:
+    if args["capture"] is not None:
+        if args["paths"] is not None or args["glob"] is not None:
+            raise ToolError("Provide 'paths' or 'glob', or 'capture', not both")
+        refs = [snap.ref for snap in _capture_session(engine, args["capture"]).snapshots()]
+        if not refs:
+            raise ToolError(f"Capture session {args['capture']} has no snapshots yet")
+        return refs
+    from .series import resolve_series_paths
+
+    try:
+        return resolve_series_paths(args["paths"], args["glob"])
+    except ValueError as e:
+        raise ToolError(str(e)) from None
+
+
+@contextmanager
+def _heap_index(path: str, cancel: Cancel) -> Iterator["HeapIndex"]:
+    from .heapindex import open_heap_index
+    from .hprof import HprofFormatError
+
+    _check_file(path)
+    try:
+        with open_heap_index(path, cancel=cancel) as index:
+            yield index
+    except HprofFormatError as e:
+        raise ToolError(f"{path}: {e}") from None
+
+
+# Handlers: (engine, validated arguments, cancel event, digest the cursor was issued for) -> payload.
+
+def _analyze_thread_dump(engine: "Engine", args: Args, cancel: Cancel, cursor_digest: Digest) -> Payload:
+    analysis, digest = _thread_dump(engine, args, cancel, cursor_digest)
+    locks = analyze_locks(analysis)
+    deadlocks, page = paginate(
+        locks["deadlocks"], args["offset"], args["limit"], args["max_response_bytes"]  # type: ignore[arg-type]
+    )
+    query = {"path": args["path"], "max_threads": args["max_threads"], "max_bytes": args["max_bytes"]}
+    return {
+        "summary": analysis.summary,
+        "format": analysis.format,
+        "counts": analysis.counts,
+        "deadlocks": deadlocks,
+        "deadlocks_page": finish_page(page, "analyze_thread_dump", query, digest),
+        "hot_locks": locks["hot_locks"],
+        "holder_chains": locks["holder_chains"],
+        "truncated": analysis.truncated,
+        "bytes_read": analysis.bytes_read,
+    }
+
+
+def _compare_thread_dumps(engine: "Engine", args: Args, cancel: Cancel, cursor_digest: Digest) -> Payload:
+    from .parallel import map_concurrently
+
+    for p in (args["path_a"], args["path_b"]):
+        _check_dump(p)
+    a, b = map_concurrently(lambda p: _parse(engine, args, p, cancel), [args["path_a"], args["path_b"]])
+    diff_mode = args["diff_mode"]
+
+    deadlocks_a = find_deadlocks(a)
+    deadlocks_b = find_deadlocks(b)
+    states = sorted(set(list(a.counts.keys()) + list(b.counts.keys())))
+    deltas = {s: (b.counts.get(s, 0) - a.counts.get(s, 0)) for s in states}
+
+    deadlock_note: Optional[str] = None
+    if deadlocks_a and not deadlocks_b:
+        deadlock_note = "Deadlocks present only in A"
+    elif deadlocks_b and not deadlocks_a:
+        deadlock_note = "Deadlocks present only in B"
+    elif deadlocks_a and deadlocks_b:
+        deadlock_note = "Deadlocks present in both"
+
+    parts = []
+    changes = ", ".join(f"{s}={deltas[s]:+d}" for s in states if deltas[s] != 0) or "no changes"
+    parts.append("State deltas: " + changes)
+    if deadlock_note:
+        parts.append(deadlock_note)
+    summary = "; ".join(parts)
+
+    if diff_mode == "summary":
+        return {"summary": summary, "notes": deadlock_note or ""}
+    if diff_mode == "states":
+        return {"summary": summary, "counts_a": a.counts, "counts_b": b.counts, "deltas": deltas}
+    return {
+        "summary": summary,
+        "counts_a": a.counts,
+        "counts_b": b.counts,
+        "deltas": deltas,
+        "deadlocks_a": deadlocks_a,
+        "deadlocks_b": deadlocks_b,
+        "notes": deadlock_note or "",
+        "truncated": a.truncated or b.truncated,
+    }
+
+
+def _analyze_thread_dump_series(engine: "Engine", args: Args, cancel: Cancel, cursor_digest: Digest) -> Payload:
+    from .series import build_series, parse_snapshots
+
+    paths = _series_paths(engine, args)
+    # Each dump is reduced to its snapshot at once; caching the full models would
+    # keep every dump of the series in memory.
+    snapshots = parse_snapshots(paths, lambda p: _parse_once(engine, args, p, cancel))
+    payload = build_series(
+        snapshots,
+        min_snapshots=args["min_snapshots"],
+        stuck_states=args["stuck_states"],
+        timelines=args["timelines"],
+        max_stuck=args["max_stuck"],
+    )
+    payload["paths"] = paths
+    return payload
+
+
+def _cluster_thread_stacks(engine: "Engine", args: Args, cancel: Cancel, cursor_digest: Digest) -> Payload:
+    analysis, digest = _thread_dump(engine, args, cancel, cursor_digest)
+    payload = summarize_clusters(
+        analysis.threads,
+        depth=args["depth"],
+        max_clusters=args["max_clusters"],
+        offset=args["offset"],
+        max_response_bytes=args["max_response_bytes"],
+    )
+    query = {
+        "path": args["path"], "max_threads": args["max_threads"], "max_bytes": args["max_bytes"], "depth": args["depth"],
+    }
+    finish_page(payload["page"], "cluster_thread_stacks", query, digest)  # type: ignore[arg-type]
+    payload["truncated"] = analysis.truncated
+    return payload
+
+
+def _list_threads(engine: "Engine", args: Args, cancel: Cancel, cursor_digest: Digest) -> Payload:
+    analysis, digest = _thread_dump(engine, args, cancel, cursor_digest)
+    max_frames = args["max_frames"]
+    threads = filter_threads(analysis.threads, states=args["states"], name_contains=args["name_contains"])
+    rows, page = paginate(
+        threads, args["offset"], args["limit"], args["max_response_bytes"], render=lambda t: t.to_dict(max_frames)
+    )
+    query = {
+        "path": args["path"], "max_threads": args["max_threads"], "max_bytes": args["max_bytes"],
+        "states": args["states"], "name_contains": args["name_contains"], "max_frames": max_frames,
+    }
+    return {
+        "summary": f"{len(threads)} of {len(analysis.threads)} threads match; returning {len(rows)} from offset {args['offset']}",
+        "threads": rows,
+        "page": finish_page(page, "list_threads", query, digest),
+        "truncated": analysis.truncated,
+    }
+
+
+def _aggregate_call_tree(engine: "Engine", args: Args, cancel: Cancel, cursor_digest: Digest) -> Payload:
+    from .calltree import build_call_tree, summarize_call_tree
+
+    paths = _series_paths(engine, args)
+    tree = build_call_tree(paths, lambda p: _parse_once(engine, args, p, cancel), states=args["states"])
+    payload = summarize_call_tree(tree, fmt=args["format"], max_nodes=args["max_nodes"])
+    payload["paths"] = paths
+    return payload
+
+
+def _analyze_heap_dump(engine: "Engine", args: Args, cancel: Cancel, cursor_digest: Digest) -> Payload:
+    from .hprof import summarize_histogram
+
+    with _heap_index(args["path"], cancel) as index:
+        histogram = index.histogram(cancel=cancel)
+        index_info = index.info()
+    payload = summarize_histogram(histogram, max_classes=args["max_classes"], sort_by=args["sort_by"])
+    payload["index"] = index_info
+    return payload
+
+
+def _find_heap_retainers(engine: "Engine", args: Args, cancel: Cancel, cursor_digest: Digest) -> Payload:
+    from .dominators import summarize_retainers
+    from .heapgraph import graph_options_from_env
+
+    with _heap_index(args["path"], cancel) as index:
+        retention = index.retention(cancel=cancel, **graph_options_from_env())  # type: ignore[arg-type]
+        payload = summarize_retainers(index, retention, max_retainers=args["max_retainers"], max_path=args["max_path"])
+        payload["index"] = index.info()
+    return payload
+
+
+def _list_heap_instances(engine: "Engine", args: Args, cancel: Cancel, cursor_digest: Digest) -> Payload:
+    from .heapindex import summarize_instances
+
+    path, class_name = args["path"], args["class_name"]
+    with _heap_index(path, cancel) as index:
+        index.ensure_nodes(cancel=cancel)
+        if cursor_digest is not None and cursor_digest != index.digest:
+            raise _stale(path)
+        payload = summarize_instances(
+            index, class_name, args["offset"], args["limit"], args["max_response_bytes"], cancel=cancel
+        )
+        query = {"path": path, "class_name": class_name}
+        payload["page"] = finish_page(payload["page"], "list_heap_instances", query, index.digest)  # type: ignore[arg-type]
+        payload["index"] = index.info()
+    return payload
+
+
+def _analyze_gc_log(engine: "Engine", args: Args, cancel: Cancel, cursor_digest: Digest) -> Payload:
+    from .gclog import parse_gc_log_files, rotated_gc_logs, summarize_gc_log
+
+    path = args["path"]
+    _check_file(path)
+    paths = rotated_gc_logs(path) if args["include_rotated"] else [path]
+    with stage("parse"):
+        log = parse_gc_log_files(paths, max_bytes=args["max_bytes"], cancel=cancel)
+    count("bytes", log.bytes_read)
+    count("lines", log.lines)
+    return summarize_gc_log(log, max_pauses=args["max_pauses"], buckets=args["buckets"])
+
+
+def _capture_thread_dumps(engine: "Engine", args: Args, cancel: Cancel, cursor_digest: Digest) -> Payload:
+    from .capture import CaptureError
+
+    try:
+        session = engine.captures.start(
+            args["pid"],
+            count=args["count"],
+            interval_s=args["interval_s"],
+            tool=args["tool"],
+            max_threads=args["max_threads"],
+            max_bytes=args["max_bytes"],
+        )
+    except CaptureError as e:
+        raise ToolError(str(e)) from None
+    if args["wait"]:
+        # A cancelled or timed-out call stops waiting; the session carries on.
+        while not session.wait(0.1):
+            if cancel is not None and cancel.is_set():
+                break
+    return _session_payload(session)
+
+
+def _session_payload(session: "CaptureSession") -> Payload:
+    payload = session.to_dict()
+    payload["summary"] = (
+        f"Capture session {session.id} of pid {session.pid}: {session.state}, "
+        f"{payload['retained']} snapshot(s) retained after {session.attempts} of {session.count} capture(s)"
+    )
+    return payload
+
+
+def _list_capture_sessions(engine: "Engine", args: Args, cancel: Cancel, cursor_digest: Digest) -> Payload:
+    session_id = args["session"]
+    if session_id is None:
+        if args["stop"]:
+            raise ToolError("'stop' needs a 'session'")
+        return {"sessions": [s.to_dict(with_snapshots=False) for s in engine.captures.sessions()]}
+    session = _capture_session(engine, session_id)
+    if args["stop"]:
+        session.stop()
+        session.wait(engine.captures.timeout)
+    return _session_payload(session)
+
+
+def _server_stats(engine: "Engine", args: Args, cancel: Cancel, cursor_digest: Digest) -> Payload:
+    tool = args["profile_next"]
+    if tool is not None:
+        if engine.spec(tool) is None:
+            raise ToolError(f"Unknown tool: {tool}")
+        engine.telemetry.arm_profile(tool)
+    payload = engine.telemetry.snapshot()
+    payload["cache"] = engine.cache.stats()
+    payload["pool"] = {"workers": engine.pool.workers, "kind": engine.pool.kind, "reader": engine.pool.reader}
+    return payload
+
+
+TOOLS: Tuple[ToolSpec, ...] = (
+    ToolSpec(
+        name="analyze_thread_dump",
+        description="Parses a JVM thread dump text and returns a summary of thread states and potential deadlocks.",
+        params=(
+            _str_param("path", _PATH_DESCRIPTION),
+            _MAX_THREADS,
+            _MAX_BYTES,
+            *_page_params(limit_description="Maximum deadlocks per page"),
+        ),
+        handler=_analyze_thread_dump,
+        required=("path",),
+        paged=True,
+    ),
+    ToolSpec(
+        name="analyze_heap_dump",
+        description=(
+            "Reads a JVM HPROF binary heap dump (.hprof) and returns a class histogram: instance count "
+            "and shallow size per class, largest first. The first call indexes the dump in one pass; "
+            "later calls answer from the index."
+        ),
+        params=(
+            _str_param("path", "Path to the .hprof file"),
+            _int_param("max_classes", DEFAULT_MAX_CLASSES),
+            _enum_param("sort_by", HISTOGRAM_SORTS, "shallow_size"),
+        ),
+        handler=_analyze_heap_dump,
+        cost=COST_INDEX,
+        required=("path",),
+    ),
+    ToolSpec(
+        name="find_heap_retainers",
+        description=(
+            "Builds the object graph of a JVM HPROF heap dump, computes its dominator tree and returns the "
+            "objects with the largest retained size, each with a shortest reference path from a GC root. "
+            "Retained sizes are saved in the dump's index, so later calls skip the graph. The graph is "
+            f"built at about 50K objects/s, so dumps with more than {DEFAULT_MAX_GRAPH_OBJECTS} objects "
+            "(HEAP_ANALYZER_GRAPH_MAX_OBJECTS) are refused; analyze_heap_dump has no such limit."
+        ),
+        params=(
+            _str_param("path", "Path to the .hprof file"),
+            _int_param("max_retainers", DEFAULT_MAX_RETAINERS),
+            _int_param(
+                "max_path",
+                DEFAULT_MAX_PATH,
+                minimum=2,
+                description="Longest GC root path returned per object; longer paths are elided in the middle",
+            ),
+        ),
+        handler=_find_heap_retainers,
+        cost=COST_GRAPH,
+        required=("path",),
+    ),
+    ToolSpec(
+        name="list_heap_instances",
+        description=(
+            "Lists the instances of one class in a JVM HPROF heap dump, in file order, with shallow size "
+            "(and retained size once find_heap_retainers has run on the dump). Uses the dump's index."
+        ),
+        params=(
+            _str_param("path", "Path to the .hprof file"),
+            _str_param("class_name", "Fully qualified class name, e.g. java.util.HashMap or byte[]"),
+            *_page_params(),
+        ),
+        handler=_list_heap_instances,
+        cost=COST_INDEX,
+        required=("path", "class_name"),
+        paged=True,
+    ),
+    ToolSpec(
+        name="analyze_gc_log",
+        description=(
+            "Parses a JVM GC log (unified -Xlog:gc* or legacy -XX:+PrintGCDetails), including its rotated "
+            "files, and returns pause percentiles, allocation and promotion rates, the heap-after-GC trend "
+            "and whether a rising post-GC baseline suggests a leak."
+        ),
+        params=(
+            _str_param("path", "Path to the GC log file"),
+            Param(
+                "include_rotated",
+                {
+                    "type": "boolean",
+                    "default": True,
+                    "description": "Also read rotated siblings such as gc.log.0 or gc.log.1.current",
+                },
+                lambda v: isinstance(v, bool),
+                "'include_rotated' must be a boolean",
+                True,
+            ),
+            _int_param("max_bytes", DEFAULT_MAX_BYTES),
+            _int_param("max_pauses", DEFAULT_MAX_PAUSES),
+            _int_param("buckets", DEFAULT_TREND_BUCKETS, description="Number of time buckets in the heap-after-GC trend"),
+        ),
+        handler=_analyze_gc_log,
+        required=("path",),
+    ),
+    ToolSpec(
+        name="compare_thread_dumps",
+        description="Parses two JVM thread dump text files and returns a comparison of thread state counts and deadlocks.",
+        params=(
+            _str_param("path_a", "Path to first thread dump text file"),
+            _str_param("path_b", "Path to second thread dump text file"),
+            _MAX_THREADS,
+            _MAX_BYTES,
+            _enum_param("diff_mode", ("summary", "states", "full"), "full"),
+        ),
+        handler=_compare_thread_dumps,
+        required=("path_a", "path_b"),
+    ),
+    ToolSpec(
+        name="analyze_thread_dump_series",
+        description=(
+            "Parses a series of JVM thread dumps of the same process (e.g. jstack every few seconds) and "
+            "returns state count series, per-thread state timelines and threads stuck in the same state "
+            "with the same top frame."
+        ),
+        params=(
+            _MAX_THREADS,
+            _int_param("max_bytes", DEFAULT_MAX_BYTES),
+            _int_param(
+                "min_snapshots",
+                DEFAULT_MIN_SNAPSHOTS,
+                minimum=2,
+                description="Consecutive dumps with the same state and top frame to count as stuck",
+            ),
+            _int_param("max_stuck", DEFAULT_MAX_STUCK),
+            _states_param("stuck_states", default=DEFAULT_STUCK_STATES),
+            _enum_param("timelines", TIMELINE_MODES, "stuck"),
+            # paths and glob are checked together by resolve_series_paths.
+            Param("paths", {"type": "array", "items": {"type": "string"}, "description": "Thread dump files in capture order"}),
+            Param("glob", {"type": "string", "description": "Glob pattern for the dumps; matches are sorted by name"}),
+            _CAPTURE_SESSION,
+        ),
+        handler=_analyze_thread_dump_series,
+    ),
+    ToolSpec(
+        name="cluster_thread_stacks",
+        description=(
+            "Parses a JVM thread dump and groups threads with identical top stack frames, largest "
+            "group first, with a representative stack and state breakdown for each."
+        ),
+        params=(
+            _str_param("path", _PATH_DESCRIPTION),
+            _MAX_THREADS,
+            _int_param("max_bytes", DEFAULT_MAX_BYTES),
+            _int_param("depth", DEFAULT_CLUSTER_DEPTH, description="Number of top frames that must match"),
+            *_page_params(
+                limit_name="max_clusters",
+                limit_default=DEFAULT_MAX_CLUSTERS,
+                limit_description="Maximum clusters per page",
+                items="clusters",
+            ),
+        ),
+        handler=_cluster_thread_stacks,
+        required=("path",),
+        paged=True,
+    ),
+    ToolSpec(
+        name="list_threads",
+        description=(
+            "Parses a JVM thread dump and returns one page of threads with their header fields, state, "
+            "top stack frames and lock lines, optionally filtered by state or name."
+        ),
+        params=(
+            _str_param("path", _PATH_DESCRIPTION),
+            _MAX_THREADS,
+            _int_param("max_bytes", DEFAULT_MAX_BYTES),
+            _states_param("states"),
+            Param(
+                "name_contains",
+                {"type": "string", "description": "Only threads whose name contains this"},
+                lambda v: isinstance(v, str),
+                "'name_contains' must be a string",
+                nullable=True,
+            ),
+            _int_param("max_frames", DEFAULT_MAX_FRAMES, minimum=0),
+            *_page_params(limit_description="Maximum threads per page"),
+        ),
+        handler=_list_threads,
+        required=("path",),
+        paged=True,
+    ),
+    ToolSpec(
+        name="aggregate_call_tree",
+        description=(
+            "Merges the stacks of all threads in one or more JVM thread dumps into a call tree with "
+            "sample counts (a poor man's profiler over periodic jstack snapshots), as a pruned JSON "
+            "tree and/or collapsed 'folded' stacks for flame graph tools."
+        ),
+        params=(
+            _MAX_THREADS,
+            _int_param("max_bytes", DEFAULT_MAX_BYTES),
+            _states_param("states", description="Only count threads in these states, e.g. [\"RUNNABLE\"] for CPU"),
+            _enum_param("format", TREE_FORMATS, "tree"),
+            _int_param("max_nodes", DEFAULT_MAX_NODES, description="Keep at most this many tree nodes, heaviest first"),
+            Param("paths", {"type": "array", "items": {"type": "string"}, "description": "Thread dump files"}),
+            Param("glob", {"type": "string", "description": "Glob pattern for the dumps"}),
+            _CAPTURE_SESSION,
+        ),
+        handler=_aggregate_call_tree,
+    ),
+    ToolSpec(
+        name="capture_thread_dumps",
+        description=(
+            "Captures thread dumps from a running JVM on the server's host with jcmd (or jstack), 'count' "
+            "times 'interval_s' apart, in the background. Returns a capture session at once (or when done, "
+            "with 'wait'). Its snapshots can be passed as 'capture:<session>/<seq>' (or 'capture:<session>' "
+            "for the latest) to analyze_thread_dump, compare_thread_dumps, cluster_thread_stacks and "
+            "list_threads, and as 'capture' to analyze_thread_dump_series and aggregate_call_tree."
+        ),
+        params=(
+            Param(
+                "pid",
+                {"type": "integer", "minimum": 1, "description": "Process id of the JVM"},
+                lambda v: isinstance(v, int) and v >= 1,
+                "'pid' must be a positive integer",
+            ),
+            Param(
+                "count",
+                {"type": "integer", "minimum": 1, "maximum": MAX_CAPTURE_COUNT, "default": 1},
+                lambda v: isinstance(v, int) and 1 <= v <= MAX_CAPTURE_COUNT,
+                f"'count' must be an integer from 1 to {MAX_CAPTURE_COUNT}",
+                1,
+            ),
+            Param(
+                "interval_s",
+                {"type": "number", "minimum": 0, "default": DEFAULT_CAPTURE_INTERVAL_S,
+                 "description": "Seconds between the starts of consecutive captures"},
+                lambda v: isinstance(v, (int, float)) and not isinstance(v, bool) and v >= 0,
+                "'interval_s' must be a non-negative number",
+                DEFAULT_CAPTURE_INTERVAL_S,
+            ),
+            _enum_param("tool", CAPTURE_TOOLS, "jcmd"),
+            _MAX_THREADS,
+            _int_param("max_bytes", DEFAULT_MAX_BYTES, description="Stop reading a capture after this many bytes"),
+            Param(
+                "wait",
+                {"type": "boolean", "default": False, "description": "Return once all captures are done"},
+                lambda v: isinstance(v, bool),
+                "'wait' must be a boolean",
+                False,
+            ),
+        ),
+        handler=_capture_thread_dumps,
+        cost=COST_CAPTURE,
+        required=("pid",),
+    ),
+    ToolSpec(
+        name="list_capture_sessions",
+        description=(
+            "Lists capture sessions, or shows one session with its retained snapshots (thread counts per "
+            "state, deadlocks, references for the other tools). 'stop' ends a running session."
+        ),
+        params=(
+            Param(
+                "session",
+                {"type": "string", "description": "Capture session id, e.g. c1"},
+                lambda v: isinstance(v, str) and bool(v),
+                "'session' must be a capture session id",
+                nullable=True,
+            ),
+            Param(
+                "stop",
+                {"type": "boolean", "default": False, "description": "Stop the session's remaining captures"},
+                lambda v: isinstance(v, bool),
+                "'stop' must be a boolean",
+                False,
+            ),
+        ),
+        handler=_list_capture_sessions,
+        cost=COST_STATE,
+    ),
+    ToolSpec(
+        name="server_stats",
+        description=(
+            "Returns the server's performance telemetry: calls, errors and latency percentiles per tool, "
+            "time per stage (digest, parse, analyze, serialize) and bytes/threads processed when telemetry "
+            "is on, and parse cache hit rates. 'profile_next' arms a cProfile and tracemalloc snapshot of "
+            "the next call to that tool."
+        ),
+        params=(
+            Param(
+                "profile_next",
+                {"type": "string", "description": "Tool whose next call is profiled; files go to the profile dir"},
+                lambda v: isinstance(v, str) and bool(v),
+                "'profile_next' must be a tool name",
+                nullable=True,
+            ),
+        ),
+        handler=_server_stats,
+        cost=COST_STATE,
+    ),
+)
+
+
+Prepared = Tuple[ToolSpec, Args, Optional[str]]
+_Row = Tuple[str, Any, Optional[Callable[[Any], bool]], str, bool]
+
+
+class Engine:
+    """Validates and runs tool calls against one shared parse pool and cache.
+
+    A pool, cache or capture manager that is not given is built from the
+    environment on first use, so an engine is cheap to create.
+    """
+
+    def __init__(
+        self,
+        pool: Optional["ParsePool"] = None,
+        cache: Optional["ParseCache"] = None,
+        tools: Sequence[ToolSpec] = TOOLS,
+        telemetry: Optional[Telemetry] = None,
+        captures: Optional["CaptureManager"] = None,
+    ) -> None:
+        self._pool = pool
+        self._cache = cache
+        self._captures = captures
+        self._lazy_lock = threading.RLock()
+        self.telemetry = telemetry if telemetry is not None else Telemetry()
+        self.specs: Tuple[ToolSpec, ...] = tuple(tools)
+        self._dispatch: Dict[str, Tuple[ToolSpec, Tuple[_Row, ...]]] = {
+            spec.name: (spec, tuple((p.name, p.default, p.check, p.message, p.nullable) for p in spec.params))
+            for spec in self.specs
+        }
+
+    @classmethod
+    def from_env(cls) -> "Engine":
+        return cls(telemetry=Telemetry.from_env())
+
+    @property
+    def pool(self) -> "ParsePool":
+        if self._pool is None:
+            with self._lazy_lock:
+                if self._pool is None:
+                    from .parallel import ParsePool
+
+                    self._pool = ParsePool.from_env()
+        return self._pool
+
+    @property
+    def cache(self) -> "ParseCache":
+        if self._cache is None:
+            with self._lazy_lock:
+                if self._cache is None:
+                    from .cache import ParseCache
+
+                    self._cache = ParseCache.from_env(parser=self.pool.parse_file)
+        return self._cache
+
+    @property
+    def captures(self) -> "CaptureManager":
+        if self._captures is None:
+            with self._lazy_lock:
+                if self._captures is None:
+                    from .capture import CaptureManager
+
+                    self._captures = CaptureManager.from_env()
+        return self._captures
+
+    def spec(self, name: str) -> Optional[ToolSpec]:
+        entry = self._dispatch.get(name)
+        return entry[0] if entry is not None else None
+
+    def prepare(self, name: str, arguments: Optional[Dict[str, Any]]) -> Prepared:
+        """Checks a call without touching the file system; raises ToolError if it is invalid."""
+        entry = self._dispatch.get(name)
+        if entry is None:
+            raise ToolError(f"Unknown tool: {name}")
+        spec, rows = entry
+        arguments = arguments or {}
+        cursor_digest = None
+        if spec.paged:
+            try:
+                arguments, cursor_digest = apply_cursor(arguments, name)
+            except CursorError as e:
+                raise ToolError(str(e)) from None
+        args: Dict[str, Any] = {}
+        for key, default, check, message, nullable in rows:
+            value = arguments.get(key, default)
+            if check is not None and not (nullable and value is None) and not check(value):
+                raise ToolError(message)
+            args[key] = value
+        return spec, args, cursor_digest
+
+    def execute(self, prepared: Prepared, cancel: Cancel = None) -> Result:
+        spec, args, cursor_digest = prepared
+        with self.telemetry.request(spec.name) as request:
+            result = self._run(spec, args, cancel, cursor_digest, request.stats)
+            request.ok = result.ok
+        return result
+
+    def _run(self, spec: ToolSpec, args: Args, cancel: Cancel, cursor_digest: Digest, stats: Optional[RequestStats]) -> Result:
+        try:
+            with stage("handler"):
+                payload = spec.handler(self, args, cancel, cursor_digest)
+            if stats is not None and self.telemetry.attach:
+                payload["telemetry"] = stats.to_dict()
+            with stage("serialize"):
+                result = Result.ok_text(payload)
+            count("response_bytes", len(result.text or ""))
+            return result
+        except ToolError as e:
+            return Result.err(e.code, e.message)
+        except (UnsupportedCompression, DumpFormatError) as e:
+            return Result.err("INVALID_PARAMS", str(e))
+        except Exception as e:
+            return Result.err("INTERNAL_ERROR", f"Exception: {e}")
+
+    def call(self, name: str, arguments: Optional[Dict[str, Any]], cancel: Cancel = None) -> Result:
+        try:
+            prepared = self.prepare(name, arguments)
+        except ToolError as e:
+            return Result.err(e.code, e.message)
+        return self.execute(prepared, cancel)
+
+    def shutdown(self) -> None:
+        if self._captures is not None:
+            self._captures.shutdown()
+        if self._pool is not None:
+            self._pool.shutdown()
@@ -0,0 +1,140 @@
+import os
+import re
+import threading
+from typing import Callable, Dict, NamedTuple, Optional, Union
+
+from .compressed import open_input
+from .model import InternTable
+from .parser import (
+    DEFAULT_MAX_BYTES,
+    DEFAULT_MAX_THREADS,
+    DumpParser,
+    ThreadDumpAnalysis,
+    ThreadDumpParser,
+    parse_stream,
+)
+
+# Thread dump formats and the front end that picks a parser for each input.
+#
+# Besides HotSpot text (jstack, jcmd Thread.print) the tools read:
+#
+# - "json": jcmd Thread.dump_to_file -format=json (JDK 21+), which is the only
+#   dump that lists virtual threads;
+# - "javacore": OpenJ9 / IBM javacore files (kill -3, com.ibm.jvm.Dump);
+# - "log": HotSpot dumps captured inside application logs, every line carrying
+#   a logger or timestamp prefix.
+#
+# The format is sniffed from the first SNIFF_BYTES of the (decompressed) input, so
+# file names and extensions do not matter. Each format has a streaming parser with
+# the DumpParser interface of parser.py; all of them produce the same
+# ThreadDumpAnalysis, so every tool works on every format. Parser modules are
+# imported when the first file in their format is read. Pipes are not sniffed,
+# since reading their head would consume it: they are read as HotSpot text.
+
+FORMAT_HOTSPOT = "hotspot"
+FORMAT_JSON = "json"
+FORMAT_JAVACORE = "javacore"
+FORMAT_LOG = "log"
+SNIFF_BYTES = 8192
+
+_JSON_RE = re.compile(r'\A\s*\{\s*"threadDump"\s*:')
+_JAVACORE_RE = re.compile(r"^(?:0SECTION|1TISIGINFO|1TIDATETIME|3XMTHREADINFO)\s", re.MULTILINE)
+# A HotSpot dump has its banner or a thread header at the start of a line.
+_HOTSPOT_RE = re.compile(
+    r'^(?:Full thread dump |"(?:[^"\r\n]|"(?![ \t]))+"[ \t]+(?:#\d+|daemon |prio=|tid=))', re.MULTILINE
+)
+
+
+def _hotspot_parser(max_threads: int, strings: Optional[InternTable]) -> DumpParser:
+    return ThreadDumpParser(max_threads=max_threads, strings=strings)
+
+
+def _json_parser(max_threads: int, strings: Optional[InternTable]) -> DumpParser:
+    from .jsondump import JsonDumpParser
+
+    return JsonDumpParser(max_threads=max_threads, strings=strings)
+
+
+def _javacore_parser(max_threads: int, strings: Optional[InternTable]) -> DumpParser:
+    from .javacore import JavacoreParser
+
+    return JavacoreParser(max_threads=max_threads, strings=strings)
+
+
+def _log_parser(max_threads: int, strings: Optional[InternTable]) -> DumpParser:
+    from .logdump import LogDumpParser
+
+    return LogDumpParser(max_threads=max_threads, strings=strings)
+
+
+class DumpFormat(NamedTuple):
+    name: str
+    # Whether the decoded head of an input is in this format.
+    sniff: Callable[[str], bool]
+    new_parser: Callable[[int, Optional[InternTable]], DumpParser]
+
+
+# Sniffed in registration order; the first match wins. Text that matches none of
+# them (no dump marker at the start of any line) is read as a log.
+FORMATS: Dict[str, DumpFormat] = {}
+
+
+def register_format(fmt: DumpFormat) -> None:
+    FORMATS[fmt.name] = fmt
+
+
+register_format(DumpFormat(FORMAT_JSON, lambda head: _JSON_RE.match(head) is not None, _json_parser))
+register_format(DumpFormat(FORMAT_JAVACORE, lambda head: _JAVACORE_RE.search(head) is not None, _javacore_parser))
+register_format(DumpFormat(
+    FORMAT_HOTSPOT, lambda head: not head.strip() or _HOTSPOT_RE.search(head) is not None, _hotspot_parser,
+))
+register_format(DumpFormat(FORMAT_LOG, lambda head: False, _log_parser))
+DUMP_FORMATS = tuple(FORMATS)
+
+
+def sniff_format(head: Union[str, bytes]) -> str:
+    """The format of an input that starts with ``head``."""
+    if isinstance(head, bytes):
+        head = head[:SNIFF_BYTES].decode("utf-8", errors="replace")
+    head = head[:SNIFF_BYTES].lstrip("\ufeff")
+    for fmt in FORMATS.values():
+        if fmt.sniff(head):
+            return fmt.name
+    return FORMAT_LOG
+
+
+def sniff_file_format(path: str) -> str:
+    """The format of the file at ``path``; pipes and devices are taken to be HotSpot text."""
+    if not os.path.isfile(path):
+        return FORMAT_HOTSPOT
+    with open_input(path, limit=SNIFF_BYTES) as f:
+        return sniff_format(f.read(SNIFF_BYTES))
+
+
+def new_parser(
+    fmt: str,
+    max_threads: int = DEFAULT_MAX_THREADS,
+    strings: Optional[InternTable] = None,
+) -> DumpParser:
+    try:
+        entry = FORMATS[fmt]
+    except KeyError:
+        raise ValueError(f"Unknown dump format: {fmt}") from None
+    return entry.new_parser(max_threads, strings)
+
+
+def parse_dump_file(
+    path: str,
+    max_threads: int = DEFAULT_MAX_THREADS,
+    max_bytes: int = DEFAULT_MAX_BYTES,
+    cancel: Optional[threading.Event] = None,
+    fmt: Optional[str] = None,
+) -> ThreadDumpAnalysis:
+    """Parses the dump at ``path`` with the parser for its format (sniffed unless given)."""
+    if fmt is None:
+        fmt = sniff_file_format(path)
+    parser = new_parser(fmt, max_threads=max_threads)
+    with open_input(path, limit=max_bytes + 1) as f:
+        analysis = parse_stream(parser, f, max_bytes, cancel=cancel)
+    analysis.format = fmt
+    return analysis
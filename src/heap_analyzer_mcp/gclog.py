@@ -0,0 +1,667 @@
+import math
+import os
+import re
+import threading
+from array import array
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .compressed import open_input
+from .defaults import DEFAULT_MAX_PAUSES, DEFAULT_TREND_BUCKETS
+from .parser import DEFAULT_MAX_BYTES, ParseCancelled
+
+# Streaming GC log parser and pause / allocation / heap-trend analytics.
+#
+# Both log styles are read line by line in one pass:
+#
+#   unified (JDK 9+, -Xlog:gc*)
+#     [12.345s][info][gc] GC(12) Pause Young (Normal) (G1 Evacuation Pause) 512M->128M(1024M) 12.345ms
+#   legacy (JDK 8, -XX:+PrintGCDetails)
+#     12.345: [GC (Allocation Failure) [PSYoungGen: 65536K->10748K(76288K)] 65536K->10756K(251392K), 0.0123 secs]
+#
+# Most lines of a detailed log (phases, worker counts, metaspace) are rejected by
+# a substring test before any regex runs. Each collection becomes one row of a
+# columnar event table (typed arrays: time, pause, heap before/after/capacity,
+# young generation before/after), and every statistic is then an aggregate over
+# whole columns: percentiles from one sort of the pause column, rates from
+# differences of adjacent rows, the heap trend from one bucketing pass and a
+# least-squares fit. Per-generation lines (gc,heap in unified logs) are matched to
+# their collection by GC id. Files may be gzip, xz or zstd compressed; they are
+# decompressed as they are read.
+#
+# A leak shows up as a rising post-GC baseline: what survives collection keeps
+# growing. The baseline is the heap after each full GC when there are enough of
+# them (a full GC leaves only live data), otherwise the lowest heap-after-GC in
+# each time bucket.
+
+PAUSE_PERCENTILES = (50, 90, 95, 99, 99.9)
+LEAK_MIN_POINTS = 4
+LEAK_MIN_R2 = 0.5
+LEAK_MIN_GROWTH = 0.05  # rise over the log, as a fraction of the heap capacity
+YOUNG_GENERATIONS = frozenset({"PSYoungGen", "DefNew", "ParNew", "ASParNew", "Young"})
+_CANCEL_EVERY = 1 << 16
+_UNITS = {"B": 1, "K": 1 << 10, "M": 1 << 20, "G": 1 << 30, "T": 1 << 40}
+_G1_YOUNG_TYPES = frozenset({"Normal", "Concurrent Start", "Prepare Mixed", "Mixed"})
+
+_SIZE = r"(\d+(?:\.\d+)?)([BKMGT])"
+_HEAP = _SIZE + "->" + _SIZE + r"\(" + _SIZE + r"\)"
+_U_PAUSE = re.compile(r"GC\((\d+)\) (Pause\b.*?)(?: " + _HEAP + r")? (\d+(?:\.\d+)?)ms\s*$")
+_U_CONCURRENT = re.compile(r"GC\((\d+)\) (Concurrent\b.*?)(?: " + _HEAP + r")? (\d+(?:\.\d+)?)ms\s*$")
+_U_ZGC = re.compile(r"GC\((\d+)\) ((?:Garbage|Major|Minor) Collection) \(([^)]*)\) " + _SIZE + r"\(\d+%\)->" + _SIZE + r"\(\d+%\)")
+_U_REGIONS = re.compile(r"GC\((\d+)\) (Eden|Survivor) regions: (\d+)->(\d+)")
+_U_GENERATION = re.compile(r"GC\((\d+)\) (\w+): " + _HEAP)
+_U_COLLECTOR = re.compile(r"Using (?:The )?(.+?)(?: Garbage Collector)?\s*$")
+_U_REGION_SIZE = re.compile(r"Heap [Rr]egion [Ss]ize: " + _SIZE)
+_LEGACY = re.compile(r"(?:(\d{4}-\d\d-\d\dT[\d:.]+[+-]\d{4}): )?(?:(\d+\.\d+): )?\[(Full GC|GC)\b([^\[\],]*)")
+_LEGACY_TRIPLE = re.compile(r"(?:([A-Za-z][\w -]*): )?" + _HEAP)
+_LEGACY_SECS = re.compile(r", (\d+(?:\.\d+)?) secs\]")
+_LEGACY_G1_HEAP = re.compile(
+    r"\[Eden: " + _SIZE + r"\(" + _SIZE + r"\)->" + _SIZE + r"\(" + _SIZE + r"\) Survivors: " + _SIZE + "->" + _SIZE
+    + r" Heap: " + _SIZE + r"\(" + _SIZE + r"\)->" + _SIZE + r"\(" + _SIZE + r"\)"
+)
+_TITLE_END = re.compile(r"\s\d")
+
+
+def _bytes(number: str, unit: str) -> int:
+    return int(float(number) * _UNITS[unit])
+
+
+def _wall_clock(stamp: str) -> float:
+    return datetime.strptime(stamp, "%Y-%m-%dT%H:%M:%S.%f%z").timestamp()
+
+
+class GcEvents:
+    """Columnar table of collections; -1 / NaN mark values the log did not give."""
+
+    def __init__(self) -> None:
+        self.uptime = array("d")
+        self.wall = array("d")
+        self.gc_id = array("q")
+        self.kind = array("I")  # index into kinds
+        self.cause = array("I")  # index into causes; 0 = none
+        self.pause_ms = array("d")
+        self.before = array("q")
+        self.after = array("q")
+        self.capacity = array("q")
+        self.young_before = array("q")
+        self.young_after = array("q")
+        self.kinds: List[str] = []
+        self.causes: List[str] = [""]
+        self._kind_no: Dict[str, int] = {}
+        self._cause_no: Dict[str, int] = {"": 0}
+
+    def __len__(self) -> int:
+        return len(self.pause_ms)
+
+    def add(
+        self,
+        uptime: float,
+        wall: float,
+        gc_id: int,
+        kind: str,
+        cause: str,
+        pause_ms: float,
+        heap: Tuple[int, int, int] = (-1, -1, -1),
+        young: Tuple[int, int] = (-1, -1),
+    ) -> int:
+        kind_no = self._kind_no.get(kind)
+        if kind_no is None:
+            kind_no = self._kind_no[kind] = len(self.kinds)
+            self.kinds.append(kind)
+        cause_no = self._cause_no.get(cause)
+        if cause_no is None:
+            cause_no = self._cause_no[cause] = len(self.causes)
+            self.causes.append(cause)
+        self.uptime.append(uptime)
+        self.wall.append(wall)
+        self.gc_id.append(gc_id)
+        self.kind.append(kind_no)
+        self.cause.append(cause_no)
+        self.pause_ms.append(pause_ms)
+        self.before.append(heap[0])
+        self.after.append(heap[1])
+        self.capacity.append(heap[2])
+        self.young_before.append(young[0])
+        self.young_after.append(young[1])
+        return len(self.pause_ms) - 1
+
+    def set_heap(self, row: int, heap: Tuple[int, int, int], young: Tuple[int, int]) -> None:
+        self.before[row], self.after[row], self.capacity[row] = heap
+        self.young_before[row], self.young_after[row] = young
+
+    def columns(self) -> Tuple[array, ...]:
+        return (
+            self.uptime, self.wall, self.gc_id, self.kind, self.cause, self.pause_ms,
+            self.before, self.after, self.capacity, self.young_before, self.young_after,
+        )
+
+    def reorder(self, order: Sequence[int]) -> None:
+        for col in self.columns():
+            col[:] = array(col.typecode, (col[i] for i in order))
+
+
+class GcLog:
+    def __init__(self) -> None:
+        self.events = GcEvents()
+        self.files: List[str] = []
+        self.formats: Dict[str, int] = {}
+        self.collector: Optional[str] = None
+        self.region_size = 0
+        self.concurrent: Dict[str, List[float]] = {}  # name -> [count, total ms, max ms]
+        self.lines = 0
+        self.bytes_read = 0
+        self.truncated = False
+        self.time_base = "uptime"
+        self.times = array("d")  # seconds on the chosen time base, per event
+        self.untimed = 0  # collections without a time on that base, left out
+        self.file_rows: List[Tuple[int, int]] = []  # event rows read from each file, in read order
+        self.skipped_files: List[str] = []  # not read: the byte budget ran out first
+        self.restarts = 0  # files whose uptime starts again: logs of a later JVM run
+
+
+class _Reader:
+    """Parses lines of one file into a GcLog, keeping per-GC state between lines."""
+
+    def __init__(self, log: GcLog) -> None:
+        self.log = log
+        self.young: Dict[int, List[int]] = {}  # gc id -> generation sizes seen before its summary line
+        self.awaiting_heap = -1  # legacy G1 row whose [Eden: ...] line follows
+
+    def line(self, line: str) -> None:
+        if line.startswith("[") and not line.startswith(("[GC", "[Full GC")):
+            self.unified(line)
+        elif "[GC" in line or "[Full GC" in line:
+            self.legacy(line)
+        elif self.awaiting_heap >= 0 and "[Eden:" in line:
+            self.legacy_g1_heap(line)
+
+    def _count(self, fmt: str) -> None:
+        self.log.formats[fmt] = self.log.formats.get(fmt, 0) + 1
+
+    def unified(self, line: str) -> None:
+        uptime = wall = math.nan
+        pos = 0
+        while line.startswith("[", pos):
+            end = line.find("]", pos)
+            if end < 0:
+                return
+            deco = line[pos + 1 : end].strip()
+            if deco.endswith("ms") and deco[:-2].isdigit():
+                uptime = int(deco[:-2]) / 1000.0
+            elif deco.endswith("ns") and deco[:-2].isdigit():
+                uptime = int(deco[:-2]) / 1e9
+            elif deco.endswith("s") and deco[:-1].replace(".", "", 1).isdigit():
+                uptime = float(deco[:-1])
+            elif len(deco) > 20 and deco[4] == "-" and deco[10] == "T":
+                try:
+                    wall = _wall_clock(deco)
+                except ValueError:
+                    pass
+            pos = end + 1
+        msg = line[pos:].strip()
+        log = self.log
+
+        if not msg.startswith("GC("):
+            if log.collector is None and msg.startswith("Using "):
+                m = _U_COLLECTOR.match(msg)
+                if m and "workers" not in msg:
+                    log.collector = m.group(1)
+            elif not log.region_size and "egion" in msg:
+                m = _U_REGION_SIZE.search(msg)
+                if m:
+                    log.region_size = _bytes(m.group(1), m.group(2))
+            return
+
+        if "Pause" in msg:
+            m = _U_PAUSE.match(msg)
+            if m is None:
+                return
+            gc_id = int(m.group(1))
+            kind, cause = _unified_kind(m.group(2).strip())
+            heap = (-1, -1, -1)
+            if m.group(3) is not None:
+                g = m.groups()
+                heap = (_bytes(g[2], g[3]), _bytes(g[4], g[5]), _bytes(g[6], g[7]))
+            self._count("unified")
+            log.events.add(uptime, wall, gc_id, kind, cause, float(m.group(9)), heap, self._young(gc_id))
+        elif "regions:" in msg:
+            m = _U_REGIONS.match(msg)
+            if m is not None and log.region_size:
+                sizes = self.young.setdefault(int(m.group(1)), [0, 0])
+                sizes[0] += int(m.group(3)) * log.region_size
+                sizes[1] += int(m.group(4)) * log.region_size
+        elif "Collection (" in msg:
+            m = _U_ZGC.match(msg)
+            if m is not None:
+                g = m.groups()
+                heap = (_bytes(g[3], g[4]), _bytes(g[5], g[6]), -1)
+                self._count("unified")
+                log.events.add(uptime, wall, int(g[0]), g[1], g[2], math.nan, heap)
+        elif "Concurrent" in msg:
+            m = _U_CONCURRENT.match(msg)
+            if m is not None:
+                stats = log.concurrent.setdefault(m.group(2).strip(), [0, 0.0, 0.0])
+                ms = float(m.group(9))
+                stats[0] += 1
+                stats[1] += ms
+                stats[2] = max(stats[2], ms)
+        else:
+            m = _U_GENERATION.match(msg)
+            if m is not None and m.group(2) in YOUNG_GENERATIONS:
+                g = m.groups()
+                self.young[int(g[0])] = [_bytes(g[2], g[3]), _bytes(g[4], g[5])]
+        if len(self.young) > 1024:
+            self.young.clear()  # per-generation lines whose summary never came
+
+    def _young(self, gc_id: int) -> Tuple[int, int]:
+        sizes = self.young.pop(gc_id, None)
+        return (sizes[0], sizes[1]) if sizes else (-1, -1)
+
+    def legacy(self, line: str) -> None:
+        m = _LEGACY.search(line)
+        if m is None:
+            return
+        stamp, uptime_text, name, rest = m.groups()
+        cut = _TITLE_END.search(rest)
+        if cut is not None:
+            rest = rest[: cut.start()]
+        title_end = m.start(4) + len(rest)
+        if rest.strip().startswith("concurrent"):
+            return  # G1 concurrent phase markers, not pauses
+        secs = _LEGACY_SECS.findall(line)
+        if not secs:
+            return
+        plain, groups = _split_parens(rest)
+        plain = plain.split()
+        cause = groups[0] if groups else ""
+        kind = " ".join([name] + plain + [f"({g})" for g in groups[1:]])
+
+        heap = (-1, -1, -1)
+        young = (-1, -1)
+        for t in _LEGACY_TRIPLE.finditer(line, title_end):
+            g = t.groups()
+            sizes = (_bytes(g[1], g[2]), _bytes(g[3], g[4]), _bytes(g[5], g[6]))
+            gen = g[0]
+            if gen is None:
+                if heap[0] < 0:
+                    heap = sizes
+            elif gen.strip() in YOUNG_GENERATIONS:
+                young = (sizes[0], sizes[1])
+
+        uptime = float(uptime_text) if uptime_text else math.nan
+        wall = math.nan
+        if stamp:
+            try:
+                wall = _wall_clock(stamp)
+            except ValueError:
+                pass
+        self._count("legacy")
+        row = self.log.events.add(uptime, wall, -1, kind, cause, float(secs[-1]) * 1000.0, heap, young)
+        self.awaiting_heap = row if heap[0] < 0 else -1
+
+    def legacy_g1_heap(self, line: str) -> None:
+        m = _LEGACY_G1_HEAP.search(line)
+        if m is None:
+            return
+        g = m.groups()
+        eden_before, eden_after = _bytes(g[0], g[1]), _bytes(g[4], g[5])
+        survivors_before, survivors_after = _bytes(g[8], g[9]), _bytes(g[10], g[11])
+        heap = (_bytes(g[12], g[13]), _bytes(g[16], g[17]), _bytes(g[18], g[19]))
+        self.log.events.set_heap(self.awaiting_heap, heap, (eden_before + survivors_before, eden_after + survivors_after))
+        self.awaiting_heap = -1
+
+
+def _unified_kind(name: str) -> Tuple[str, str]:
+    """``Pause Young (Normal) (G1 Evacuation Pause)`` -> (``Pause Young (Normal)``, ``G1 Evacuation Pause``)."""
+    groups = _split_parens(name)[1]
+    if not groups or (len(groups) == 1 and groups[0] in _G1_YOUNG_TYPES):
+        return name, ""
+    cut = name.rfind("(" + groups[-1] + ")")
+    return name[:cut].rstrip(), groups[-1]
+
+
+def _split_parens(text: str) -> Tuple[str, List[str]]:
+    """Text outside top-level parentheses, and their contents: causes such as ``System.gc()`` nest."""
+    plain: List[str] = []
+    groups: List[str] = []
+    depth = start = 0
+    for i, ch in enumerate(text):
+        if ch == "(":
+            if depth == 0:
+                start = i + 1
+            depth += 1
+        elif ch == ")" and depth:
+            depth -= 1
+            if depth == 0:
+                groups.append(text[start:i])
+        elif depth == 0:
+            plain.append(ch)
+    return "".join(plain), groups
+
+
+def rotated_gc_logs(path: str) -> List[str]:
+    """``path`` plus its rotated siblings (gc.log.0, gc.log.1.gz, gc.log.2.current, ...).
+
+    Files come in rotation order: by their numeric index (gc.log.2 before
+    gc.log.10), then the file without one, which is the one the JVM writes to.
+    """
+    directory = os.path.dirname(path) or "."
+    base = os.path.basename(path)
+    pattern = re.compile(re.escape(base) + r"(?:\.(\d+))?(?:\.current)?(?:\.(?:gz|xz|zst))?$")
+    found: List[Tuple[Tuple[int, int, str], str]] = []
+    for name in os.listdir(directory):
+        m = pattern.match(name)
+        full = os.path.join(directory, name)
+        if m is not None and os.path.isfile(full):
+            key = (0, int(m.group(1)), name) if m.group(1) is not None else (1, 0, name)
+            found.append((key, full))
+    if os.path.isfile(path) and path not in [full for _, full in found]:
+        found.append(((1, 0, base), path))
+    return [full for _, full in sorted(found)]
+
+
+def parse_gc_lines(lines: Iterable[str], log: Optional[GcLog] = None) -> GcLog:
+    log = log if log is not None else GcLog()
+    reader = _Reader(log)
+    for line in lines:
+        log.lines += 1
+        log.bytes_read += len(line)
+        reader.line(line)
+    _finish(log)
+    return log
+
+
+def parse_gc_log_files(
+    paths: Sequence[str],
+    max_bytes: int = DEFAULT_MAX_BYTES,
+    cancel: Optional[threading.Event] = None,
+) -> GcLog:
+    """Parses one JVM's GC log files, oldest first, into one event table."""
+    log = GcLog()
+    budget = max_bytes
+    for n, path in enumerate(paths):
+        if log.truncated:
+            log.skipped_files = list(paths[n:])
+            break
+        log.files.append(path)
+        first_row = len(log.events)
+        reader = _Reader(log)
+        with open_input(path, limit=budget + 1) as f:
+            for raw in f:
+                budget -= len(raw)
+                if budget < 0:
+                    log.truncated = True
+                    break
+                log.lines += 1
+                log.bytes_read += len(raw)
+                reader.line(raw.decode("utf-8", errors="replace"))
+                if not log.lines % _CANCEL_EVERY and cancel is not None and cancel.is_set():
+                    raise ParseCancelled()
+        log.file_rows.append((first_row, len(log.events)))
+    _finish(log)
+    return log
+
+
+def _separate_runs(log: GcLog) -> None:
+    """Moves the uptimes of each later JVM run past the end of the earlier ones.
+
+    Uptime restarts near 0 with every JVM start, so the files of two runs would
+    interleave when sorted. A file whose uptime range overlaps one read before it
+    belongs to a later run and is shifted to start where the earlier files end;
+    files of the same run never overlap, so they keep their times (and a
+    rotation that wrapped around still sorts by time).
+    """
+    uptime = log.events.uptime
+    placed: List[Tuple[float, float]] = []
+    end = -math.inf
+    for first, last in log.file_rows:
+        times = [uptime[i] for i in range(first, last) if not math.isnan(uptime[i])]
+        if not times:
+            continue
+        lo, hi = min(times), max(times)
+        if any(lo < p_hi and hi > p_lo for p_lo, p_hi in placed):
+            shift = end - lo
+            for i in range(first, last):
+                uptime[i] += shift
+            lo, hi = lo + shift, hi + shift
+            log.restarts += 1
+        placed.append((lo, hi))
+        end = max(end, hi)
+
+
+def _finish(log: GcLog) -> None:
+    """Picks the time base and puts the events in time order."""
+    events = log.events
+    timed_uptime = sum(1 for t in events.uptime if not math.isnan(t))
+    timed_wall = sum(1 for t in events.wall if not math.isnan(t))
+    if timed_wall > timed_uptime:
+        log.time_base = "wall_clock"
+        times = events.wall
+    else:
+        log.time_base = "uptime"
+        _separate_runs(log)
+        times = events.uptime
+    # Rows without a time on the chosen base are dropped.
+    order = sorted((i for i in range(len(times)) if not math.isnan(times[i])), key=times.__getitem__)
+    log.untimed = len(times) - len(order)
+    if len(order) != len(times) or any(order[i] > order[i + 1] for i in range(len(order) - 1)):
+        events.reorder(order)
+    log.times = array("d", events.wall if log.time_base == "wall_clock" else events.uptime)
+
+
+def _percentile(sorted_values: Sequence[float], pct: float) -> float:
+    # Nearest rank.
+    rank = max(1, math.ceil(pct / 100.0 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def _fit(points: Sequence[Tuple[float, float]]) -> Tuple[float, float, float]:
+    """Least-squares line through ``points``: (slope, intercept, r squared)."""
+    n = len(points)
+    sx = sum(x for x, _ in points)
+    sy = sum(y for _, y in points)
+    sxx = sum(x * x for x, _ in points)
+    sxy = sum(x * y for x, y in points)
+    syy = sum(y * y for _, y in points)
+    den = n * sxx - sx * sx
+    if n < 2 or den == 0:
+        return 0.0, (sy / n if n else 0.0), 0.0
+    slope = (n * sxy - sx * sy) / den
+    intercept = (sy - slope * sx) / n
+    var_y = n * syy - sy * sy
+    r2 = (n * sxy - sx * sy) ** 2 / (den * var_y) if var_y > 0 else 0.0
+    return slope, intercept, r2
+
+
+def _mb(value: float) -> float:
+    return round(value / (1 << 20), 1)
+
+
+def _known(value: int) -> Optional[int]:
+    return value if value >= 0 else None
+
+
+def summarize_gc_log(
+    log: GcLog,
+    max_pauses: int = DEFAULT_MAX_PAUSES,
+    buckets: int = DEFAULT_TREND_BUCKETS,
+) -> Dict[str, object]:
+    ev = log.events
+    times = log.times
+    n = len(ev)
+    start = times[0] if n else 0.0
+    span = times[-1] - start if n else 0.0
+    kinds = ev.kinds
+    pause_ms = ev.pause_ms
+    before, after, capacity = ev.before, ev.after, ev.capacity
+    is_full = [("Full" in k) for k in kinds]
+
+    # Pauses.
+    pauses = sorted(p for p in pause_ms if not math.isnan(p))
+    total_pause = sum(pauses)
+    pause_stats: Dict[str, object] = {"count": len(pauses), "total_ms": round(total_pause, 3)}
+    if pauses:
+        pause_stats["mean_ms"] = round(total_pause / len(pauses), 3)
+        pause_stats["max_ms"] = pauses[-1]
+        for pct in PAUSE_PERCENTILES:
+            pause_stats[f"p{pct:g}_ms".replace(".", "_")] = _percentile(pauses, pct)
+    by_kind: Dict[str, Dict[str, float]] = {}
+    for i in range(n):
+        row = by_kind.setdefault(kinds[ev.kind[i]], {"count": 0, "pauses": 0, "total_ms": 0.0, "max_ms": 0.0})
+        row["count"] += 1
+        p = pause_ms[i]
+        if not math.isnan(p):
+            row["pauses"] += 1
+            row["total_ms"] = round(row["total_ms"] + p, 3)
+            row["max_ms"] = max(row["max_ms"], p)
+    causes: Dict[str, int] = {}
+    for c in ev.cause:
+        if c:
+            causes[ev.causes[c]] = causes.get(ev.causes[c], 0) + 1
+    longest = sorted((i for i in range(n) if not math.isnan(pause_ms[i])), key=lambda i: -pause_ms[i])[:max_pauses]
+
+    # Allocation: growth of the heap between one collection's end and the next
+    # one's start. Promotion: what left the young generation but not the heap.
+    allocated = 0
+    alloc_rates: List[float] = []
+    prev = -1
+    for i in range(n):
+        if before[i] < 0:
+            continue
+        if prev >= 0 and before[i] >= after[prev]:
+            grown = before[i] - after[prev]
+            allocated += grown
+            dt = times[i] - times[prev]
+            if dt > 0:
+                alloc_rates.append(grown / dt)
+        prev = i
+    promoted = 0
+    promotions = 0
+    for i in range(n):
+        if ev.young_before[i] >= 0 and before[i] >= 0 and not is_full[ev.kind[i]]:
+            moved = (ev.young_before[i] - ev.young_after[i]) - (before[i] - after[i])
+            promoted += max(moved, 0)
+            promotions += 1
+    alloc_rates.sort()
+
+    # Heap after GC, bucketed over time.
+    with_heap = [i for i in range(n) if after[i] >= 0]
+    max_capacity = max((capacity[i] for i in with_heap), default=-1)
+    trend: List[Dict[str, object]] = []
+    minima: List[Tuple[float, float]] = []
+    if with_heap and buckets > 0:
+        width = span / buckets if span > 0 else 1.0
+        slots: List[List[int]] = [[] for _ in range(buckets)]
+        for i in with_heap:
+            slots[min(int((times[i] - start) / width), buckets - 1)].append(i)
+        for b, rows in enumerate(slots):
+            if not rows:
+                continue
+            values = [after[i] for i in rows]
+            trend.append(
+                {
+                    "start_s": round(start + b * width, 3),
+                    "end_s": round(start + (b + 1) * width, 3),
+                    "collections": len(rows),
+                    "min_after": min(values),
+                    "mean_after": sum(values) // len(values),
+                    "max_after": max(values),
+                }
+            )
+            minima.append((start + (b + 0.5) * width, float(min(values))))
+
+    # Leak check on the post-GC baseline.
+    fulls = [(times[i], float(after[i])) for i in with_heap if is_full[ev.kind[i]]]
+    source, points = ("full_gc", fulls) if len(fulls) >= LEAK_MIN_POINTS else ("bucket_min", minima)
+    leak: Dict[str, object] = {"suspected": False, "baseline": source, "points": len(points)}
+    if len(points) >= LEAK_MIN_POINTS:
+        slope, intercept, r2 = _fit(points)
+        first_fit = intercept + slope * points[0][0]
+        last_fit = intercept + slope * points[-1][0]
+        growth = last_fit - first_fit
+        reference = max_capacity if max_capacity > 0 else max(first_fit, 1.0) * 2
+        suspected = slope > 0 and r2 >= LEAK_MIN_R2 and growth >= LEAK_MIN_GROWTH * reference
+        leak.update(
+            {
+                "suspected": suspected,
+                "slope_bytes_per_hour": round(slope * 3600),
+                "r2": round(r2, 3),
+                "baseline_start": round(first_fit),
+                "baseline_end": round(last_fit),
+            }
+        )
+        if suspected and max_capacity > 0 and last_fit < max_capacity:
+            leak["hours_to_capacity"] = round((max_capacity - last_fit) / slope / 3600, 2)
+
+    full_count = sum(1 for i in range(n) if is_full[ev.kind[i]])
+    overhead = 100.0 * total_pause / 1000.0 / span if span > 0 else 0.0
+    alloc_rate = allocated / span if span > 0 else 0.0
+    parts = [
+        f"{n} collections ({len(pauses)} pauses, {full_count} full) over {span / 60:.1f} min",
+    ]
+    if pauses:
+        parts.append(
+            f"p99 pause {_percentile(pauses, 99):.1f} ms, max {pauses[-1]:.1f} ms, {overhead:.2f}% of time paused"
+        )
+    if alloc_rates:
+        parts.append(f"allocating {_mb(alloc_rate)} MB/s")
+    if leak["suspected"]:
+        parts.append(
+            f"post-GC baseline rising {_mb(leak['slope_bytes_per_hour'])} MB/h "  # type: ignore[arg-type]
+            f"({_mb(leak['baseline_start'])} -> {_mb(leak['baseline_end'])} MB): possible leak"  # type: ignore[arg-type]
+        )
+    if log.restarts:
+        parts.append(f"{log.restarts + 1} JVM runs, placed one after another")
+    if log.skipped_files:
+        parts.append(f"byte budget reached: {len(log.skipped_files)} newer files not read")
+    return {
+        "summary": "; ".join(parts),
+        "collector": log.collector,
+        "formats": log.formats,
+        "files": log.files,
+        "skipped_files": log.skipped_files,
+        "jvm_restarts": log.restarts,
+        "time_base": log.time_base,
+        "start_s": round(start, 3),
+        "duration_s": round(span, 3),
+        "collections": n,
+        "untimed_collections": log.untimed,
+        "full_gcs": full_count,
+        "pauses": pause_stats,
+        "pause_time_percent": round(overhead, 3),
+        "by_kind": by_kind,
+        "causes": dict(sorted(causes.items(), key=lambda kv: -kv[1])),
+        "longest_pauses": [
+            {
+                "time_s": round(times[i], 3),
+                "gc_id": _known(ev.gc_id[i]),
+                "kind": kinds[ev.kind[i]],
+                "cause": ev.causes[ev.cause[i]] or None,
+                "pause_ms": pause_ms[i],
+                "heap_before": _known(before[i]),
+                "heap_after": _known(after[i]),
+                "heap_capacity": _known(capacity[i]),
+            }
+            for i in longest
+        ],
+        "allocation": {
+            "total_bytes": allocated,
+            "mean_bytes_per_s": round(alloc_rate),
+            "p95_bytes_per_s": round(_percentile(alloc_rates, 95)) if alloc_rates else None,
+            "max_bytes_per_s": round(alloc_rates[-1]) if alloc_rates else None,
+        },
+        "promotion": {
+            "collections": promotions,
+            "total_bytes": promoted,
+            "mean_bytes_per_s": round(promoted / span) if promotions and span > 0 else None,
+        },
+        "concurrent": {
+            name: {"count": int(c), "total_ms": round(t, 3), "max_ms": m} for name, (c, t, m) in log.concurrent.items()
+        },
+        "heap_capacity": _known(max_capacity),
+        "heap_after_gc": trend,
+        "leak": leak,
+        "truncated": log.truncated,
+        "lines": log.lines,
+        "bytes_read": log.bytes_read,
+    }
@@ -0,0 +1,617 @@
+import heapq
+import mmap
+import os
+import struct
+import sys
+import tempfile
+import threading
+from array import array
+from bisect import bisect_left
+from typing import Dict, List, Optional, Tuple, Union
+
+from .defaults import DEFAULT_MAX_GRAPH_OBJECTS
+from .hprof import (
+    RECORD_HEADER,
+    PRIMITIVE_NAMES,
+    PRIMITIVE_SIZES,
+    SUB_CLASS_DUMP,
+    SUB_INSTANCE_DUMP,
+    SUB_OBJ_ARRAY_DUMP,
+    SUB_PRIM_ARRAY_DUMP,
+    TAG_HEAP_DUMP,
+    TAG_HEAP_DUMP_SEGMENT,
+    TAG_LOAD_CLASS,
+    TYPE_OBJECT,
+    HprofFormatError,
+    check_uncompressed,
+    fixed_sub_record_sizes,
+    ident_format,
+    java_class_name,
+    object_header_size,
+    read_header,
+    read_strings,
+    release_pages,
+    value_size,
+)
+from .parser import ParseCancelled
+
+# Object graph of an HPROF heap dump in compressed sparse row (CSR) form.
+#
+# Every object (instances, arrays and class objects) gets a dense node number in
+# file order; node 0 is a synthetic super root whose edges are the GC roots. Per
+# node data lives in flat typed arrays (object id, class number, shallow size,
+# first outgoing edge) and the edges are one array of target node numbers, so the
+# graph costs a few bytes per object and per reference instead of a Python object
+# each. Graphs with many objects keep their edge arrays in temporary files mapped
+# back into memory, leaving the page cache to decide what stays resident.
+#
+# The dump is read twice: the first pass numbers the objects and records class
+# layouts, the second decodes references (which may point forward) and resolves
+# each object id to its node by binary search over the sorted ids.
+#
+# Building the graph and its dominator tree runs at roughly 50K objects per
+# second on one core (1M objects in 16-20s), so the tool call timeout is the
+# real size limit. Dumps with more than DEFAULT_MAX_OBJECTS objects (about 80s
+# of work) are rejected right after the first pass, before any edge is decoded,
+# instead of being cancelled at the timeout with nothing to show for it. The
+# spill threshold sits below that limit, so the largest graphs that are built
+# keep their edges on disk; graph_options_from_env keeps it there when either
+# is configured.
+
+DEFAULT_SPILL_OBJECTS = 1_000_000
+DEFAULT_MAX_OBJECTS = DEFAULT_MAX_GRAPH_OBJECTS
+# Class objects are nodes too; their "class" is named after the class they describe.
+CLASS_OBJECT_PREFIX = "class "
+ROOT_KINDS = {
+    0xFF: "unknown",
+    0x01: "JNI global",
+    0x02: "JNI local",
+    0x03: "Java frame",
+    0x04: "native stack",
+    0x05: "sticky class",
+    0x06: "thread block",
+    0x07: "monitor used",
+    0x08: "thread object",
+    0x89: "interned string",
+    0x8A: "finalizing",
+    0x8B: "debugger",
+    0x8C: "reference cleanup",
+    0x8D: "VM internal",
+    0x8E: "JNI monitor",
+}
+
+_CANCEL_EVERY = 1 << 16
+_FLUSH_EDGES = 1 << 20
+_NATIVE_LITTLE_ENDIAN = sys.byteorder == "little"
+
+IntColumn = Union[array, memoryview]
+
+
+class _Storage:
+    """Allocates the large integer columns, optionally backed by temporary files."""
+
+    def __init__(self, spill: bool, directory: Optional[str] = None) -> None:
+        self.spill = spill
+        self.directory = directory
+        self._open: List[Tuple[object, mmap.mmap, memoryview]] = []
+
+    def new_file(self):
+        return tempfile.TemporaryFile(dir=self.directory)
+
+    def map(self, f, typecode: str, length: int, writable: bool = False) -> IntColumn:
+        if length == 0:
+            f.close()
+            return array(typecode)
+        if writable:
+            f.truncate(length * array(typecode).itemsize)
+        f.flush()
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ)
+        view = memoryview(mm).cast(typecode)
+        self._open.append((f, mm, view))
+        return view
+
+    def zeros(self, typecode: str, length: int) -> IntColumn:
+        if not self.spill:
+            return array(typecode, bytes(length * array(typecode).itemsize))
+        return self.map(self.new_file(), typecode, length, writable=True)
+
+    def close(self) -> None:
+        for f, mm, view in self._open:
+            view.release()
+            mm.close()
+            f.close()  # type: ignore[attr-defined]
+        self._open = []
+
+
+class _EdgeWriter:
+    """Appends edge targets to memory, or to a temporary file in large chunks."""
+
+    def __init__(self, storage: _Storage) -> None:
+        self.storage = storage
+        self.buf = array("I")
+        self.file = storage.new_file() if storage.spill else None
+        self.flushed = 0
+
+    def maybe_flush(self) -> None:
+        if self.file is not None and len(self.buf) >= _FLUSH_EDGES:
+            self.buf.tofile(self.file)
+            self.flushed += len(self.buf)
+            del self.buf[:]
+
+    def finish(self) -> IntColumn:
+        if self.file is None:
+            return self.buf
+        self.buf.tofile(self.file)
+        length = self.flushed + len(self.buf)
+        self.buf = array("I")
+        return self.storage.map(self.file, "I", length)
+
+
+class HeapGraph:
+    def __init__(self, id_size: int, storage: _Storage) -> None:
+        self.id_size = id_size
+        self.storage = storage
+        self.format = ""
+        self.timestamp_ms = 0
+        # Per node; index 0 is the super root.
+        self.object_ids = array("Q", [0])
+        self.class_of = array("I", [0])
+        self.shallow = array("Q", [0])
+        self.record_offsets: Optional[array] = None  # file offset of each object's sub-record
+        self.offsets = array("Q")
+        self.targets: IntColumn = array("I")
+        self.class_names: List[str] = ["<GC roots>"]
+        self.classes_loaded = 0
+        self.root_kinds: Dict[int, str] = {}
+        self.truncated = False
+        self.bytes_read = 0
+
+    @property
+    def node_count(self) -> int:
+        return len(self.object_ids)
+
+    @property
+    def edge_count(self) -> int:
+        return len(self.targets)
+
+    def successors(self, node: int) -> IntColumn:
+        return self.targets[self.offsets[node] : self.offsets[node + 1]]
+
+    def predecessors(self) -> Tuple[array, IntColumn]:
+        """Builds the reverse CSR (start offsets, source nodes) by counting sort."""
+        n = self.node_count
+        offsets = self.offsets
+        targets = self.targets
+        starts = array("Q", bytes(8 * (n + 1)))
+        for w in targets:
+            starts[w + 1] += 1
+        for i in range(n):
+            starts[i + 1] += starts[i]
+        # Filled back to front per target, so each starts[w] ends on its first slot.
+        ends = array("Q", starts[1:])
+        sources = self.storage.zeros("I", len(targets))
+        for v in range(n):
+            for i in range(offsets[v], offsets[v + 1]):
+                w = targets[i]
+                ends[w] -= 1
+                sources[ends[w]] = v
+        return starts, sources
+
+    def describe(self, node: int) -> Dict[str, object]:
+        return {"object": f"0x{self.object_ids[node]:x}", "class": self.class_names[self.class_of[node]]}
+
+    def close(self) -> None:
+        self.targets = array("I")
+        self.storage.close()
+
+    def __enter__(self) -> "HeapGraph":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class _ClassDump:
+    __slots__ = ("end", "class_id", "super_id", "loader_id", "static_refs", "static_bytes", "field_types")
+
+    def __init__(self, buf, pos: int, id_size: int) -> None:
+        """Decodes the CLASS DUMP body starting at ``pos`` (after the tag)."""
+        ident = struct.Struct(">" + ident_format(id_size)).unpack_from
+        u2 = struct.Struct(">H").unpack_from
+        (self.class_id,) = ident(buf, pos)
+        (self.super_id,) = ident(buf, pos + id_size + 4)
+        (self.loader_id,) = ident(buf, pos + 2 * id_size + 4)
+        pos += 7 * id_size + 8
+        (count,) = u2(buf, pos)
+        pos += 2
+        for _ in range(count):
+            pos += 3 + value_size(buf[pos + 2], id_size)
+        (count,) = u2(buf, pos)
+        pos += 2
+        self.static_refs: List[int] = []
+        self.static_bytes = 0
+        for _ in range(count):
+            type_code = buf[pos + id_size]
+            pos += id_size + 1
+            size = value_size(type_code, id_size)
+            if type_code == TYPE_OBJECT:
+                self.static_refs.append(ident(buf, pos)[0])
+            self.static_bytes += size
+            pos += size
+        (count,) = u2(buf, pos)
+        pos += 2
+        self.field_types = [buf[pos + i * (id_size + 1) + id_size] for i in range(count)]
+        self.end = pos + count * (id_size + 1)
+
+
+def _segments(buf, first: int, id_size: int, class_names: Optional[Dict[int, int]] = None):
+    """Yields (start, declared end) of each heap dump segment, which may run past
+    the end of ``buf`` if the dump was cut short, and collects LOAD CLASS names."""
+    header = RECORD_HEADER.unpack_from
+    ident = ident_format(id_size)
+    load_class = struct.Struct(f">I{ident}I{ident}").unpack_from
+    size = len(buf)
+    pos = first
+    while pos + 9 <= size:
+        tag, _, length = header(buf, pos)
+        body = pos + 9
+        end = body + length
+        if tag in (TAG_HEAP_DUMP, TAG_HEAP_DUMP_SEGMENT):
+            yield body, end
+        elif tag == TAG_LOAD_CLASS and class_names is not None and end <= size:
+            _, class_id, _, name_id = load_class(buf, body)
+            class_names[class_id] = name_id
+        pos = end
+
+
+class _Builder:
+    def __init__(self, buf, id_size: int, cancel: Optional[threading.Event]) -> None:
+        self.buf = buf
+        self.id_size = id_size
+        self.cancel = cancel
+        ident = ident_format(id_size)
+        self.ident = ident
+        self.fixed = fixed_sub_record_sizes(id_size)
+        self.header_size = object_header_size(id_size)
+        self.instance = struct.Struct(f">{id_size + 4}x{ident}I")
+        self.obj_array = struct.Struct(f">{id_size + 4}xI{ident}")
+        self.prim_array = struct.Struct(f">{id_size + 4}xIB")
+        self.object_id = struct.Struct(">" + ident).unpack_from
+        self.class_keys: Dict[object, int] = {}
+        self.layouts: Dict[int, Tuple[int, List[int]]] = {}
+        self.ref_structs: Dict[int, Tuple[Optional[struct.Struct], int]] = {}
+        self.roots: List[Tuple[int, int]] = []
+        self.released = 0
+
+    def class_no(self, key: object) -> int:
+        no = self.class_keys.get(key)
+        if no is None:
+            no = self.class_keys[key] = len(self.class_keys) + 1
+        return no
+
+    def check(self, pos: int) -> None:
+        if self.cancel is not None and self.cancel.is_set():
+            raise ParseCancelled()
+        self.released = release_pages(self.buf, self.released, pos)
+
+    def collect_nodes(self, graph: HeapGraph, start: int, end: int) -> int:
+        """First pass over one segment: numbers objects; returns where it stopped."""
+        buf = self.buf
+        id_size = self.id_size
+        header = self.header_size
+        object_id = self.object_id
+        instance = self.instance.unpack_from
+        instance_len = 1 + self.instance.size
+        obj_array = self.obj_array.unpack_from
+        obj_array_len = 1 + self.obj_array.size
+        prim_array = self.prim_array.unpack_from
+        prim_array_len = 1 + self.prim_array.size
+        ids = graph.object_ids
+        class_of = graph.class_of
+        shallow = graph.shallow
+        records = graph.record_offsets
+        class_no = self.class_no
+        fixed = self.fixed
+        pos = start
+        try:
+            while pos < end:
+                tag = buf[pos]
+                if tag == SUB_INSTANCE_DUMP:
+                    class_id, nbytes = instance(buf, pos + 1)
+                    nxt = pos + instance_len + nbytes
+                    key: object = class_id
+                    size = header + nbytes
+                elif tag == SUB_OBJ_ARRAY_DUMP:
+                    length, class_id = obj_array(buf, pos + 1)
+                    nxt = pos + obj_array_len + length * id_size
+                    key = class_id
+                    size = header + 4 + length * id_size
+                elif tag == SUB_PRIM_ARRAY_DUMP:
+                    length, type_code = prim_array(buf, pos + 1)
+                    data = length * PRIMITIVE_SIZES[type_code]
+                    nxt = pos + prim_array_len + data
+                    key = ("prim", type_code)
+                    size = header + 4 + data
+                elif tag == SUB_CLASS_DUMP:
+                    dump = _ClassDump(buf, pos + 1, id_size)
+                    nxt = dump.end
+                    self.layouts[dump.class_id] = (dump.super_id, dump.field_types)
+                    key = ("class", dump.class_id)
+                    size = header + dump.static_bytes
+                else:
+                    body = fixed.get(tag)
+                    if body is None:
+                        raise HprofFormatError(f"Unknown heap dump sub-record 0x{tag:02x} at offset {pos}")
+                    if pos + 1 + body > end:
+                        break
+                    if tag in ROOT_KINDS:
+                        self.roots.append((object_id(buf, pos + 1)[0], tag))
+                    pos += 1 + body
+                    continue
+                if nxt > end:
+                    break
+                ids.append(object_id(buf, pos + 1)[0])
+                class_of.append(class_no(key))
+                shallow.append(size)
+                if records is not None:
+                    records.append(pos)
+                pos = nxt
+                if not len(ids) % _CANCEL_EVERY:
+                    self.check(pos)
+        except (struct.error, IndexError):
+            pass
+        except KeyError as e:
+            raise HprofFormatError(f"Unknown basic type {e.args[0]} at offset {pos}") from None
+        return pos
+
+    def ref_struct(self, class_id: int) -> Tuple[Optional[struct.Struct], int]:
+        """Struct decoding the reference fields of an instance, and the data size.
+
+        Instance data holds the class's own fields, then its superclass's, and so on.
+        """
+        cached = self.ref_structs.get(class_id)
+        if cached is not None:
+            return cached
+        parts: List[str] = []
+        size = 0
+        pad = 0
+        refs = 0
+        cid = class_id
+        seen = set()
+        while cid and cid in self.layouts and cid not in seen:
+            seen.add(cid)
+            super_id, types = self.layouts[cid]
+            for t in types:
+                width = value_size(t, self.id_size)
+                size += width
+                if t == TYPE_OBJECT:
+                    if pad:
+                        parts.append(f"{pad}x")
+                        pad = 0
+                    parts.append(self.ident)
+                    refs += 1
+                else:
+                    pad += width
+            cid = super_id
+        known = not cid or cid in seen
+        result = (struct.Struct(">" + "".join(parts)) if refs and known else None, size if known else -1)
+        self.ref_structs[class_id] = result
+        return result
+
+    def collect_edges(self, graph: HeapGraph, writer: _EdgeWriter, find, start: int, end: int, node: int) -> int:
+        """Second pass over one segment; returns the number of the next node."""
+        buf = self.buf
+        id_size = self.id_size
+        instance = self.instance.unpack_from
+        instance_len = 1 + self.instance.size
+        obj_array = self.obj_array.unpack_from
+        obj_array_len = 1 + self.obj_array.size
+        prim_array = self.prim_array.unpack_from
+        prim_array_len = 1 + self.prim_array.size
+        fixed = self.fixed
+        offsets = graph.offsets
+        last = graph.node_count
+        out = writer.buf
+        append = out.append
+        ref_struct = self.ref_struct
+        pos = start
+        while pos < end and node < last:
+            tag = buf[pos]
+            if tag == SUB_INSTANCE_DUMP:
+                class_id, nbytes = instance(buf, pos + 1)
+                data = pos + instance_len
+                refs, size = ref_struct(class_id)
+                if refs is not None and size == nbytes:
+                    for rid in refs.unpack_from(buf, data):
+                        if rid:
+                            target = find(rid)
+                            if target:
+                                append(target)
+                pos = data + nbytes
+            elif tag == SUB_OBJ_ARRAY_DUMP:
+                length, _ = obj_array(buf, pos + 1)
+                data = pos + obj_array_len
+                pos = data + length * id_size
+                elements = array(self.ident)
+                elements.frombytes(buf[data:pos])
+                if _NATIVE_LITTLE_ENDIAN:
+                    elements.byteswap()
+                for rid in elements:
+                    if rid:
+                        target = find(rid)
+                        if target:
+                            append(target)
+            elif tag == SUB_PRIM_ARRAY_DUMP:
+                length, type_code = prim_array(buf, pos + 1)
+                pos += prim_array_len + length * PRIMITIVE_SIZES[type_code]
+            elif tag == SUB_CLASS_DUMP:
+                dump = _ClassDump(buf, pos + 1, id_size)
+                for rid in [dump.super_id, dump.loader_id] + dump.static_refs:
+                    if rid:
+                        target = find(rid)
+                        if target:
+                            append(target)
+                pos = dump.end
+            else:
+                pos += 1 + fixed[tag]
+                continue
+            node += 1
+            offsets.append(writer.flushed + len(out))
+            if not node % _CANCEL_EVERY:
+                self.check(pos)
+                writer.maybe_flush()
+        return node
+
+
+def _id_lookup(ids: array):
+    """Returns find(object_id) -> node number, or 0 if the id is not in the dump."""
+    n = len(ids)
+    breaks = [i for i in range(2, n) if ids[i] <= ids[i - 1]]
+    if not breaks:
+        # Dumps list objects in address order, so usually nothing needs sorting.
+        def find(rid: int) -> int:
+            j = bisect_left(ids, rid, 1)
+            return j if j < n and ids[j] == rid else 0
+
+        return find
+
+    # Otherwise merge the ascending runs (one per heap region or generation)
+    # into one sorted id column plus the node number of each entry.
+    bounds = [1] + breaks + [n]
+    view = memoryview(ids)
+    sorted_ids = array("Q")
+    nodes = array("I")
+    for rid, node in heapq.merge(*(zip(view[a:b], range(a, b)) for a, b in zip(bounds, bounds[1:]))):
+        sorted_ids.append(rid)
+        nodes.append(node)
+    view.release()
+    m = len(sorted_ids)
+
+    def find_sorted(rid: int) -> int:
+        j = bisect_left(sorted_ids, rid)
+        return nodes[j] if j < m and sorted_ids[j] == rid else 0
+
+    return find_sorted
+
+
+def _collect_nodes(buf, cancel: Optional[threading.Event], record_offsets: bool) -> Tuple[HeapGraph, _Builder, int]:
+    """First pass: numbers the objects and names their classes; no edges yet."""
+    fmt, id_size, timestamp, first = read_header(buf)
+    size = len(buf)
+    builder = _Builder(buf, id_size, cancel)
+    name_ids: Dict[int, int] = {}
+    graph = HeapGraph(id_size, _Storage(False))
+    graph.format = fmt
+    graph.timestamp_ms = timestamp
+    if record_offsets:
+        graph.record_offsets = array("Q", [0])
+
+    graph.bytes_read = size
+    for start, end in _segments(buf, first, id_size, name_ids):
+        stop = builder.collect_nodes(graph, start, min(end, size))
+        if stop < end:
+            graph.truncated = True
+            graph.bytes_read = stop
+            break
+
+    names = read_strings(buf, first, size, id_size, set(name_ids.values()))
+    for key in builder.class_keys:
+        if isinstance(key, int):
+            name_id = name_ids.get(key)
+            name = java_class_name(names[name_id]) if name_id in names else f"<unknown class 0x{key:x}>"
+        elif key[0] == "prim":  # type: ignore[index]
+            name = PRIMITIVE_NAMES[key[1]] + "[]"  # type: ignore[index]
+        else:
+            name_id = name_ids.get(key[1])  # type: ignore[index]
+            described = java_class_name(names[name_id]) if name_id in names else f"0x{key[1]:x}"  # type: ignore[index]
+            name = CLASS_OBJECT_PREFIX + described
+        graph.class_names.append(name)
+    graph.classes_loaded = max(len(name_ids), len(builder.layouts))
+    return graph, builder, first
+
+
+def build_heap_nodes(buf, cancel: Optional[threading.Event] = None, record_offsets: bool = False) -> HeapGraph:
+    """Runs only the first pass: per-object columns and class names, without edges."""
+    graph, _, _ = _collect_nodes(buf, cancel, record_offsets)
+    return graph
+
+
+def check_graph_size(objects: int, max_objects: int) -> None:
+    """Rejects a dump with more objects than the graph build can handle (0: no limit)."""
+    if max_objects and objects > max_objects:
+        raise HprofFormatError(
+            f"Heap dump has {objects} objects; the dominator tree is only built for up to {max_objects} "
+            "(HEAP_ANALYZER_GRAPH_MAX_OBJECTS)"
+        )
+
+
+def build_heap_graph(
+    buf,
+    cancel: Optional[threading.Event] = None,
+    spill_objects: int = DEFAULT_SPILL_OBJECTS,
+    spill_dir: Optional[str] = None,
+    record_offsets: bool = False,
+    max_objects: int = DEFAULT_MAX_OBJECTS,
+) -> HeapGraph:
+    """Builds the object graph of the HPROF data in ``buf`` (an mmap or bytes).
+
+    Edge arrays are file-backed once the dump has at least ``spill_objects`` objects.
+    Raises HprofFormatError for a dump with more than ``max_objects`` objects.
+    """
+    graph, builder, first = _collect_nodes(buf, cancel, record_offsets)
+    check_graph_size(graph.node_count - 1, max_objects)
+    size = len(buf)
+    graph.storage = _Storage(graph.node_count > spill_objects, spill_dir)
+
+    find = _id_lookup(graph.object_ids)
+    writer = _EdgeWriter(graph.storage)
+    seen_roots = set()
+    for rid, tag in builder.roots:
+        target = find(rid)
+        if target and target not in seen_roots:
+            seen_roots.add(target)
+            writer.buf.append(target)
+            graph.root_kinds[target] = ROOT_KINDS[tag]
+    graph.offsets.append(0)
+    graph.offsets.append(len(writer.buf))
+
+    node = 1
+    builder.released = 0
+    for start, end in _segments(buf, first, builder.id_size):
+        if node >= graph.node_count:
+            break
+        node = builder.collect_edges(graph, writer, find, start, min(end, size), node)
+    graph.targets = writer.finish()
+    return graph
+
+
+def graph_options_from_env() -> Dict[str, object]:
+    spill = os.environ.get("HEAP_ANALYZER_GRAPH_SPILL_OBJECTS")
+    limit = os.environ.get("HEAP_ANALYZER_GRAPH_MAX_OBJECTS")
+    spill_objects = int(spill) if spill else DEFAULT_SPILL_OBJECTS
+    max_objects = int(limit) if limit else DEFAULT_MAX_OBJECTS
+    if max_objects:
+        # A graph at the size limit is always one that spills.
+        spill_objects = min(spill_objects, max_objects // 2)
+    return {
+        "spill_objects": spill_objects,
+        "spill_dir": os.environ.get("HEAP_ANALYZER_GRAPH_DIR") or None,
+        "max_objects": max_objects,
+    }
+
+
+def parse_heap_graph(
+    path: str,
+    cancel: Optional[threading.Event] = None,
+    spill_objects: int = DEFAULT_SPILL_OBJECTS,
+    spill_dir: Optional[str] = None,
+    max_objects: int = DEFAULT_MAX_OBJECTS,
+) -> HeapGraph:
+    check_uncompressed(path)
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            raise HprofFormatError("Not an HPROF file (empty)")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return build_heap_graph(
+                mm, cancel=cancel, spill_objects=spill_objects, spill_dir=spill_dir, max_objects=max_objects
+            )
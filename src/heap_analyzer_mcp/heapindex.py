@@ -0,0 +1,533 @@
+import hashlib
+import json
+import mmap
+import os
+import sys
+import threading
+from array import array
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from .cache import file_digest
+from .dominators import Retention, compute_retention
+from .heapgraph import (
+    CLASS_OBJECT_PREFIX,
+    DEFAULT_MAX_OBJECTS,
+    DEFAULT_SPILL_OBJECTS,
+    HeapGraph,
+    IntColumn,
+    build_heap_graph,
+    build_heap_nodes,
+    check_graph_size,
+)
+from .hprof import ClassStats, HeapHistogram, HprofFormatError, check_uncompressed
+from .pagination import DEFAULT_MAX_RESPONSE_BYTES, DEFAULT_PAGE_LIMIT, paginate
+from .parser import ParseCancelled
+
+# Persistent sidecar index of an HPROF heap dump.
+#
+# The first query against a dump writes ``<dump>.index/`` next to it (or under
+# HEAP_ANALYZER_INDEX_DIR): a meta.json plus one raw native-endian file per
+# column, each memory-mapped on first use, so a later call starts by reading a
+# few KB of JSON and only touches the pages of the columns it needs. Columns come
+# in sections that are built on demand, independently of each other:
+#
+#   nodes      object ids, class numbers, shallow sizes, the file offset of each
+#              object's record, and the objects grouped by class with per-class
+#              totals (one pass over the dump)
+#   retention  retained size, immediate dominator and shortest-path parent per
+#              object, and the largest retainers in order (needs the full graph)
+#
+# so a histogram never pays for the dominator tree, and a later retainer query
+# adds its section next to the existing one.
+#
+# The index is tied to the dump by size and mtime. If only the mtime differs (the
+# dump was copied or touched), the content digest decides: an unchanged dump
+# keeps its index and just meta.json is rewritten. A changed dump drops every
+# section, since node numbers are positions in the file. Column files are
+# replaced atomically and meta.json is written last, so neither a concurrent
+# reader nor an interrupted build sees a section with incomplete columns.
+
+INDEX_VERSION = 1
+INDEX_SUFFIX = ".index"
+SECTION_NODES = "nodes"
+SECTION_RETENTION = "retention"
+_META = "meta.json"
+_COLUMNS = {
+    SECTION_NODES: {
+        "object_ids": "Q",
+        "class_of": "I",
+        "shallow": "Q",
+        "record_offsets": "Q",
+        "class_members": "I",  # nodes grouped by class, in file order within a class
+        "class_starts": "Q",  # class number -> first slot in class_members
+        "class_instances": "Q",
+        "class_shallow": "Q",
+    },
+    SECTION_RETENTION: {"retained": "Q", "idom": "I", "previous": "I", "top": "I"},
+}
+_TYPECODES = {name: code for columns in _COLUMNS.values() for name, code in columns.items()}
+
+_MAX_SIMILAR_CLASSES = 10
+
+_build_locks: Dict[str, threading.Lock] = {}
+_build_locks_guard = threading.Lock()
+
+
+def index_location(path: str) -> Optional[str]:
+    """Where the index of ``path`` lives; None if indexes are switched off."""
+    if os.environ.get("HEAP_ANALYZER_INDEX", "").lower() in ("0", "off", "false", "no"):
+        return None
+    directory = os.environ.get("HEAP_ANALYZER_INDEX_DIR")
+    if not directory:
+        return path + INDEX_SUFFIX
+    # Dumps from different directories often share a name (java_pid1.hprof).
+    key = hashlib.blake2b(os.path.abspath(path).encode("utf-8"), digest_size=8).hexdigest()
+    return os.path.join(directory, f"{os.path.basename(path)}-{key}{INDEX_SUFFIX}")
+
+
+@contextmanager
+def _mapped_dump(path: str) -> Iterator[mmap.mmap]:
+    check_uncompressed(path)
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            raise HprofFormatError("Not an HPROF file (empty)")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            yield mm
+
+
+def _read_meta(location: Optional[str]) -> Optional[dict]:
+    if location is None:
+        return None
+    try:
+        with open(os.path.join(location, _META), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(meta, dict) or meta.get("version") != INDEX_VERSION or meta.get("byteorder") != sys.byteorder:
+        return None
+    return meta
+
+
+def _write_atomic(path: str, write) -> None:
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp, "wb") as f:
+            write(f)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+class _Members:
+    """The nodes of several classes as one sequence, for paging."""
+
+    def __init__(self, members: IntColumn, ranges: List[Tuple[int, int]]) -> None:
+        self.members = members
+        self.ranges = ranges
+
+    def __len__(self) -> int:
+        return sum(end - start for start, end in self.ranges)
+
+    def __getitem__(self, i: int) -> int:
+        for start, end in self.ranges:
+            if i < end - start:
+                return self.members[start + i]
+            i -= end - start
+        raise IndexError(i)
+
+
+class HeapIndex:
+    def __init__(self, dump_path: str, location: Optional[str], meta: dict) -> None:
+        self.dump_path = dump_path
+        self.location = location
+        self.persistent = location is not None  # False once the location turned out read-only
+        self.meta = meta
+        self.built: List[str] = []  # sections built by this instance
+        self._columns: Dict[str, IntColumn] = {}
+        self._maps: List[Tuple[mmap.mmap, memoryview]] = []
+
+    # -- per-node columns, as on HeapGraph ------------------------------------
+
+    @property
+    def _nodes(self) -> dict:
+        return self.meta["sections"][SECTION_NODES]
+
+    @property
+    def node_count(self) -> int:
+        return self._nodes["objects"] + 1
+
+    @property
+    def object_ids(self) -> IntColumn:
+        return self.column("object_ids")
+
+    @property
+    def class_of(self) -> IntColumn:
+        return self.column("class_of")
+
+    @property
+    def shallow(self) -> IntColumn:
+        return self.column("shallow")
+
+    @property
+    def record_offsets(self) -> IntColumn:
+        return self.column("record_offsets")
+
+    @property
+    def class_names(self) -> List[str]:
+        return self._nodes["class_names"]
+
+    @property
+    def truncated(self) -> bool:
+        return self._nodes["truncated"]
+
+    @property
+    def bytes_read(self) -> int:
+        return self._nodes["bytes_read"]
+
+    @property
+    def digest(self) -> str:
+        return self.meta["dump"]["digest"]
+
+    def describe(self, node: int) -> Dict[str, object]:
+        return {"object": f"0x{self.object_ids[node]:x}", "class": self.class_names[self.class_of[node]]}
+
+    # -- columns and sections -------------------------------------------------
+
+    def column(self, name: str) -> IntColumn:
+        col = self._columns.get(name)
+        if col is None:
+            col = self._columns[name] = self._map(name)
+        return col
+
+    def _map(self, name: str) -> IntColumn:
+        typecode = _TYPECODES[name]
+        with open(os.path.join(self.location, name + ".bin"), "rb") as f:  # type: ignore[arg-type]
+            if os.fstat(f.fileno()).st_size == 0:
+                return array(typecode)
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(mm).cast(typecode)
+        self._maps.append((mm, view))
+        return view
+
+    def has(self, section: str) -> bool:
+        info = self.meta["sections"].get(section)
+        if info is None:
+            return False
+        if all(name in self._columns for name in info["columns"]):
+            return True
+        # A column file that is missing or of the wrong length (disk full, manual
+        # cleanup) only costs that section a rebuild.
+        for name, length in info["columns"].items():
+            if name in self._columns:
+                continue
+            try:
+                size = os.path.getsize(os.path.join(self.location, name + ".bin"))  # type: ignore[arg-type]
+            except (OSError, TypeError):
+                size = -1
+            if size != length * array(_TYPECODES[name]).itemsize:
+                del self.meta["sections"][section]
+                return False
+        return True
+
+    def _store(self, section: str, info: dict, columns: Dict[str, array]) -> None:
+        info["columns"] = {name: len(col) for name, col in columns.items()}
+        self._release(columns)
+        if self.persistent:
+            try:
+                os.makedirs(self.location, exist_ok=True)  # type: ignore[arg-type]
+                for name, col in columns.items():
+                    _write_atomic(os.path.join(self.location, name + ".bin"), col.tofile)  # type: ignore[arg-type]
+                self.meta["sections"][section] = info
+                self._save_meta()
+                self.built.append(section)
+                return
+            except OSError:
+                # Read-only dump directory and no HEAP_ANALYZER_INDEX_DIR: answer
+                # from memory this time.
+                self.persistent = False
+        self.meta["sections"][section] = info
+        self._columns.update(columns)
+        self.built.append(section)
+
+    def _save_meta(self) -> None:
+        raw = json.dumps(self.meta, separators=(",", ":")).encode("utf-8")
+        _write_atomic(os.path.join(self.location, _META), lambda f: f.write(raw))  # type: ignore[arg-type]
+
+    def _release(self, names) -> None:
+        for name in names:
+            self._columns.pop(name, None)
+
+    @contextmanager
+    def _building(self) -> Iterator[None]:
+        """Serialises builds of one index within this process and picks up
+        sections another caller finished while this one waited."""
+        key = self.location or self.dump_path
+        with _build_locks_guard:
+            lock = _build_locks.setdefault(key, threading.Lock())
+        with lock:
+            if self.persistent:
+                meta = _read_meta(self.location)
+                stamp = ("size", "mtime_ns")
+                if meta is not None and all(meta["dump"].get(k) == self.meta["dump"][k] for k in stamp):
+                    for section, info in meta["sections"].items():
+                        self.meta["sections"].setdefault(section, info)
+            yield
+
+    def _ensure_digest(self, cancel: Optional[threading.Event]) -> None:
+        if not self.meta["dump"].get("digest"):
+            self.meta["dump"]["digest"] = file_digest(self.dump_path, cancel)
+
+    def ensure_nodes(self, cancel: Optional[threading.Event] = None) -> None:
+        if self.has(SECTION_NODES):
+            return
+        with self._building():
+            if self.has(SECTION_NODES):
+                return
+            self._ensure_digest(cancel)
+            with _mapped_dump(self.dump_path) as buf:
+                graph = build_heap_nodes(buf, cancel=cancel, record_offsets=True)
+            self._store_nodes(graph, cancel)
+
+    def ensure_retention(
+        self,
+        cancel: Optional[threading.Event] = None,
+        spill_objects: int = DEFAULT_SPILL_OBJECTS,
+        spill_dir: Optional[str] = None,
+        max_objects: int = DEFAULT_MAX_OBJECTS,
+    ) -> None:
+        if self.has(SECTION_RETENTION) and self.has(SECTION_NODES):
+            return
+        with self._building():
+            if self.has(SECTION_RETENTION) and self.has(SECTION_NODES):
+                return
+            if self.has(SECTION_NODES):
+                # Known from an earlier histogram: no need to read the dump to refuse it.
+                check_graph_size(self.node_count - 1, max_objects)
+            self._ensure_digest(cancel)
+            with _mapped_dump(self.dump_path) as buf:
+                graph = build_heap_graph(
+                    buf,
+                    cancel=cancel,
+                    spill_objects=spill_objects,
+                    spill_dir=spill_dir,
+                    record_offsets=True,
+                    max_objects=max_objects,
+                )
+            with graph:
+                if not self.has(SECTION_NODES) or self.node_count != graph.node_count:
+                    self._store_nodes(graph, cancel)
+                retention = compute_retention(graph, cancel=cancel)
+                info = {
+                    "reachable": retention.reachable,
+                    "references": retention.references,
+                    "unreachable_size": retention.unreachable_size,
+                    "root_kinds": sorted(retention.root_kinds.items()),
+                }
+                columns = {
+                    "retained": retention.retained,
+                    "idom": retention.idom,
+                    "previous": retention.previous,
+                    "top": retention.top,
+                }
+                self._store(SECTION_RETENTION, info, columns)  # type: ignore[arg-type]
+
+    def _store_nodes(self, graph: HeapGraph, cancel: Optional[threading.Event]) -> None:
+        n = graph.node_count
+        classes = len(graph.class_names)
+        class_of = graph.class_of
+        shallow = graph.shallow
+        # Counting sort of the nodes by class number.
+        instances = array("Q", bytes(8 * classes))
+        sizes = array("Q", bytes(8 * classes))
+        for node in range(1, n):
+            c = class_of[node]
+            instances[c] += 1
+            sizes[c] += shallow[node]
+        starts = array("Q", bytes(8 * (classes + 1)))
+        for c in range(classes):
+            starts[c + 1] = starts[c] + instances[c]
+        fill = starts[:-1]
+        members = array("I", bytes(4 * (n - 1)))
+        for node in range(1, n):
+            c = class_of[node]
+            members[fill[c]] = node
+            fill[c] += 1
+        if cancel is not None and cancel.is_set():
+            raise ParseCancelled()
+        info = {
+            "objects": n - 1,
+            "format": graph.format,
+            "id_size": graph.id_size,
+            "timestamp_ms": graph.timestamp_ms,
+            "classes_loaded": graph.classes_loaded,
+            "truncated": graph.truncated,
+            "bytes_read": graph.bytes_read,
+            "class_names": graph.class_names,
+        }
+        columns = {
+            "object_ids": graph.object_ids,
+            "class_of": class_of,
+            "shallow": shallow,
+            "record_offsets": graph.record_offsets,
+            "class_members": members,
+            "class_starts": starts,
+            "class_instances": instances,
+            "class_shallow": sizes,
+        }
+        self._store(SECTION_NODES, info, columns)  # type: ignore[arg-type]
+
+    # -- queries ----------------------------------------------------------------
+
+    def histogram(self, cancel: Optional[threading.Event] = None) -> HeapHistogram:
+        """The class histogram, from the per-class totals of the nodes section."""
+        self.ensure_nodes(cancel)
+        instances = self.column("class_instances")
+        sizes = self.column("class_shallow")
+        classes = [
+            ClassStats(name, instances[c], sizes[c])
+            for c, name in enumerate(self.class_names)
+            if c and instances[c] and not name.startswith(CLASS_OBJECT_PREFIX)
+        ]
+        classes.sort(key=lambda c: (-c.shallow_size, c.name))
+        nodes = self._nodes
+        return HeapHistogram(
+            format=nodes["format"],
+            id_size=nodes["id_size"],
+            timestamp_ms=nodes["timestamp_ms"],
+            classes=classes,
+            classes_loaded=nodes["classes_loaded"],
+            truncated=nodes["truncated"],
+            bytes_read=nodes["bytes_read"],
+        )
+
+    def retention(
+        self,
+        cancel: Optional[threading.Event] = None,
+        spill_objects: int = DEFAULT_SPILL_OBJECTS,
+        spill_dir: Optional[str] = None,
+        max_objects: int = DEFAULT_MAX_OBJECTS,
+    ) -> Retention:
+        self.ensure_retention(cancel, spill_objects=spill_objects, spill_dir=spill_dir, max_objects=max_objects)
+        info = self.meta["sections"][SECTION_RETENTION]
+        return Retention(
+            self.column("retained"),
+            self.column("idom"),
+            self.column("previous"),
+            self.column("top"),
+            info["reachable"],
+            info["references"],
+            info["unreachable_size"],
+            {node: kind for node, kind in info["root_kinds"]},
+        )
+
+    def class_numbers(self, class_name: str) -> List[int]:
+        # Several classes can share a name when loaded by different class loaders.
+        return [c for c, name in enumerate(self.class_names) if c and name == class_name]
+
+    def instances(self, class_name: str, cancel: Optional[threading.Event] = None) -> Sequence[int]:
+        """Nodes of every class named ``class_name``, in file order per class."""
+        self.ensure_nodes(cancel)
+        starts = self.column("class_starts")
+        ranges = [(starts[c], starts[c + 1]) for c in self.class_numbers(class_name)]
+        return _Members(self.column("class_members"), ranges)
+
+    def info(self) -> Dict[str, object]:
+        return {
+            "location": self.location if self.persistent else None,
+            "sections": sorted(self.meta["sections"]),
+            "built": list(self.built),
+        }
+
+    def close(self) -> None:
+        self._columns = {}
+        for mm, view in self._maps:
+            view.release()
+            mm.close()
+        self._maps = []
+
+    def __enter__(self) -> "HeapIndex":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def open_heap_index(path: str, cancel: Optional[threading.Event] = None) -> HeapIndex:
+    """Opens the index of the dump at ``path`` without building anything yet.
+
+    Sections are built by the first query that needs them.
+    """
+    st = os.stat(path)
+    location = index_location(path)
+    meta = _read_meta(location)
+    if meta is not None:
+        dump = meta.get("dump") or {}
+        if (dump.get("size"), dump.get("mtime_ns")) != (st.st_size, st.st_mtime_ns):
+            if dump.get("size") == st.st_size and dump.get("digest") and dump["digest"] == file_digest(path, cancel):
+                dump["mtime_ns"] = st.st_mtime_ns
+                index = HeapIndex(path, location, meta)
+                try:
+                    index._save_meta()
+                except OSError:
+                    index.persistent = False
+                return index
+            meta = None
+    if meta is None:
+        meta = {
+            "version": INDEX_VERSION,
+            "byteorder": sys.byteorder,
+            "dump": {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "digest": None},
+            "sections": {},
+        }
+    return HeapIndex(path, location, meta)
+
+
+
+def summarize_instances(
+    index: HeapIndex,
+    class_name: str,
+    offset: int = 0,
+    limit: int = DEFAULT_PAGE_LIMIT,
+    max_response_bytes: int = DEFAULT_MAX_RESPONSE_BYTES,
+    cancel: Optional[threading.Event] = None,
+) -> Dict[str, object]:
+    members = index.instances(class_name, cancel)
+    retention = index.retention() if index.has(SECTION_RETENTION) else None
+    shallow = index.shallow
+    records = index.record_offsets
+
+    def render(node: int) -> Dict[str, object]:
+        row = index.describe(node)
+        row["shallow_size"] = shallow[node]
+        if retention is not None:
+            row["retained_size"] = retention.retained[node]
+        row["record_offset"] = records[node]
+        return row
+
+    rows, page = paginate(members, offset, limit, max_response_bytes, render=render)
+    numbers = index.class_numbers(class_name)
+    sizes = index.column("class_shallow")
+    payload: Dict[str, object] = {
+        "summary": (
+            f"{len(members)} instances of {class_name} in {len(numbers)} loaded classes; "
+            f"returning {len(rows)} from offset {offset}"
+        ),
+        "class": class_name,
+        "classes_matched": len(numbers),
+        "instances": len(members),
+        "shallow_size": sum(sizes[c] for c in numbers),
+        "objects": rows,
+        "page": page,
+    }
+    if not numbers:
+        needle = class_name.lower()
+        similar = {
+            name for name in index.class_names[1:] if needle in name.lower() and not name.startswith(CLASS_OBJECT_PREFIX)
+        }
+        payload["similar_classes"] = sorted(similar)[:_MAX_SIMILAR_CLASSES]
+    return payload
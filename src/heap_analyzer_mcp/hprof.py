@@ -0,0 +1,395 @@
+import mmap
+import os
+import struct
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set, Tuple
+
+from .compressed import sniff_compression
+from .defaults import DEFAULT_MAX_CLASSES
+from .parser import ParseCancelled
+
+# Streaming reader for HPROF binary heap dumps (as written by jmap, jcmd GC.heap_dump
+# and -XX:+HeapDumpOnOutOfMemoryError).
+#
+# The file is memory-mapped and walked record by record; every fixed-layout header
+# is decoded with a precompiled struct.Struct straight from the mapping, and the
+# object payloads (field values, array elements) are never copied, only skipped.
+# The class histogram is built in one pass over the heap dump segments and holds
+# one entry per class, so memory follows the number of classes, not objects.
+# Class names live in STRING records that precede the heap; they are resolved in
+# a second walk over the top-level records only, which skips each heap segment by
+# its length.
+
+HPROF_MAGIC_PREFIX = b"JAVA PROFILE "
+
+# Top-level record tags.
+TAG_STRING = 0x01
+TAG_LOAD_CLASS = 0x02
+TAG_HEAP_DUMP = 0x0C
+TAG_HEAP_DUMP_SEGMENT = 0x1C
+TAG_HEAP_DUMP_END = 0x2C
+
+# Heap dump sub-record tags.
+SUB_CLASS_DUMP = 0x20
+SUB_INSTANCE_DUMP = 0x21
+SUB_OBJ_ARRAY_DUMP = 0x22
+SUB_PRIM_ARRAY_DUMP = 0x23
+
+# Basic types used in CLASS DUMP fields and PRIMITIVE ARRAY DUMP elements; the
+# object type (2) is one identifier wide.
+TYPE_OBJECT = 2
+PRIMITIVE_SIZES = {4: 1, 5: 2, 6: 4, 7: 8, 8: 1, 9: 2, 10: 4, 11: 8}
+PRIMITIVE_NAMES = {4: "boolean", 5: "char", 6: "float", 7: "double", 8: "byte", 9: "short", 10: "int", 11: "long"}
+_DESCRIPTOR_NAMES = {"Z": "boolean", "C": "char", "F": "float", "D": "double", "B": "byte", "S": "short", "I": "int", "J": "long"}
+
+RECORD_HEADER = struct.Struct(">BII")
+_CANCEL_EVERY = 1 << 16
+_RELEASE_BYTES = 16 * 1024 * 1024
+
+
+class HprofFormatError(ValueError):
+    pass
+
+
+@dataclass
+class ClassStats:
+    name: str
+    instances: int = 0
+    shallow_size: int = 0
+
+    def to_dict(self) -> Dict[str, object]:
+        return {"class": self.name, "instances": self.instances, "shallow_size": self.shallow_size}
+
+
+@dataclass
+class HeapHistogram:
+    format: str
+    id_size: int
+    timestamp_ms: int
+    classes: List[ClassStats] = field(default_factory=list)
+    classes_loaded: int = 0
+    truncated: bool = False
+    bytes_read: int = 0
+
+    @property
+    def total_instances(self) -> int:
+        return sum(c.instances for c in self.classes)
+
+    @property
+    def total_shallow_size(self) -> int:
+        return sum(c.shallow_size for c in self.classes)
+
+
+def read_header(buf) -> Tuple[str, int, int, int]:
+    """Returns (format, identifier size, timestamp in ms, offset of the first record)."""
+    if buf[: len(HPROF_MAGIC_PREFIX)] != HPROF_MAGIC_PREFIX:
+        raise HprofFormatError("Not an HPROF file (missing 'JAVA PROFILE' header)")
+    nul = buf.find(b"\0", 0, 64)
+    if nul == -1 or len(buf) < nul + 13:
+        raise HprofFormatError("Truncated HPROF header")
+    fmt = bytes(buf[:nul]).decode("ascii", errors="replace")
+    id_size, hi, lo = struct.unpack_from(">III", buf, nul + 1)
+    if id_size not in (4, 8):
+        raise HprofFormatError(f"Unsupported identifier size: {id_size}")
+    return fmt, id_size, (hi << 32) | lo, nul + 13
+
+
+def java_class_name(name: str) -> str:
+    """``java/lang/String`` -> ``java.lang.String``, ``[[I`` -> ``int[][]``."""
+    dims = len(name) - len(name.lstrip("["))
+    if not dims:
+        return name.replace("/", ".")
+    element = name[dims:]
+    if element.startswith("L") and element.endswith(";"):
+        element = element[1:-1].replace("/", ".")
+    else:
+        element = _DESCRIPTOR_NAMES.get(element, element.replace("/", "."))
+    return element + "[]" * dims
+
+
+def ident_format(id_size: int) -> str:
+    return "I" if id_size == 4 else "Q"
+
+
+def object_header_size(id_size: int) -> int:
+    # Object layout is not recorded in HPROF; shallow sizes assume a two-word
+    # object header (mark word and class pointer), plus a 4-byte length for
+    # arrays, without alignment padding.
+    return 2 * id_size
+
+
+def fixed_sub_record_sizes(id_size: int) -> Dict[int, int]:
+    # Size of each fixed-layout sub-record after its tag byte: the GC roots, plus
+    # the Android extensions so dumps converted with hprof-conv are not rejected.
+    return {
+        0xFF: id_size,  # ROOT UNKNOWN
+        0x01: 2 * id_size,  # ROOT JNI GLOBAL
+        0x02: id_size + 8,  # ROOT JNI LOCAL
+        0x03: id_size + 8,  # ROOT JAVA FRAME
+        0x04: id_size + 4,  # ROOT NATIVE STACK
+        0x05: id_size,  # ROOT STICKY CLASS
+        0x06: id_size + 4,  # ROOT THREAD BLOCK
+        0x07: id_size,  # ROOT MONITOR USED
+        0x08: id_size + 8,  # ROOT THREAD OBJECT
+        0x89: id_size,  # ROOT INTERNED STRING
+        0x8A: id_size,  # ROOT FINALIZING
+        0x8B: id_size,  # ROOT DEBUGGER
+        0x8C: id_size,  # ROOT REFERENCE CLEANUP
+        0x8D: id_size,  # ROOT VM INTERNAL
+        0x8E: id_size + 8,  # ROOT JNI MONITOR
+        0x90: id_size,  # UNREACHABLE
+        0xC3: id_size + 9,  # PRIMITIVE ARRAY NODATA
+        0xFE: 4 + id_size,  # HEAP DUMP INFO
+    }
+
+
+def class_dump_end(buf, pos: int, id_size: int) -> int:
+    """Returns the end of the CLASS DUMP body starting at ``pos`` (after the tag)."""
+    u2 = struct.Struct(">H").unpack_from
+    pos += 7 * id_size + 8  # class, stack serial, super, loader, signers, domain, 2 reserved, instance size
+    (count,) = u2(buf, pos)
+    pos += 2
+    for _ in range(count):  # constant pool: u2 index, u1 type, value
+        pos += 3 + value_size(buf[pos + 2], id_size)
+    (count,) = u2(buf, pos)
+    pos += 2
+    for _ in range(count):  # static fields: id name, u1 type, value
+        pos += id_size + 1 + value_size(buf[pos + id_size], id_size)
+    (count,) = u2(buf, pos)
+    return pos + 2 + count * (id_size + 1)  # instance fields: id name, u1 type
+
+
+def value_size(type_code: int, id_size: int) -> int:
+    if type_code == TYPE_OBJECT:
+        return id_size
+    size = PRIMITIVE_SIZES.get(type_code)
+    if size is None:
+        raise HprofFormatError(f"Unknown basic type {type_code}")
+    return size
+
+
+class _HeapScanner:
+    """Accumulates per-class counts over the sub-records of heap dump segments."""
+
+    def __init__(self, id_size: int, cancel: Optional[threading.Event]) -> None:
+        ident = ident_format(id_size)
+        self.id_size = id_size
+        self.cancel = cancel
+        self.fixed = fixed_sub_record_sizes(id_size)
+        self.header = object_header_size(id_size)
+        # Only the fields the histogram needs are decoded; the leading object id
+        # and stack trace serial are skipped as pad bytes.
+        self.instance = struct.Struct(f">{id_size + 4}x{ident}I")
+        self.obj_array = struct.Struct(f">{id_size + 4}xI{ident}")
+        self.prim_array = struct.Struct(f">{id_size + 4}xIB")
+        self.by_class: Dict[int, List[int]] = {}
+        self.by_primitive: Dict[int, List[int]] = {}
+        self.class_dumps = 0
+        self.records = 0
+        self.released = 0
+
+    def scan(self, buf, pos: int, end: int) -> int:
+        """Scans sub-records in ``buf[pos:end]``; returns where the last whole one ended."""
+        id_size = self.id_size
+        fixed = self.fixed
+        instance = self.instance.unpack_from
+        obj_array = self.obj_array.unpack_from
+        prim_array = self.prim_array.unpack_from
+        instance_len = 1 + self.instance.size
+        obj_array_len = 1 + self.obj_array.size
+        prim_array_len = 1 + self.prim_array.size
+        by_class = self.by_class
+        by_class_get = by_class.get
+        by_primitive = self.by_primitive
+        header = self.header
+        cancel = self.cancel
+        records = self.records
+        try:
+            while pos < end:
+                tag = buf[pos]
+                if tag == SUB_INSTANCE_DUMP:
+                    class_id, size = instance(buf, pos + 1)
+                    nxt = pos + instance_len + size
+                    size += header
+                elif tag == SUB_PRIM_ARRAY_DUMP:
+                    length, type_code = prim_array(buf, pos + 1)
+                    size = length * PRIMITIVE_SIZES[type_code]
+                    nxt = pos + prim_array_len + size
+                    if nxt > end:
+                        break
+                    stats = by_primitive.get(type_code)
+                    if stats is None:
+                        stats = by_primitive[type_code] = [0, 0]
+                    stats[0] += 1
+                    stats[1] += header + 4 + size
+                    pos = nxt
+                    records += 1
+                    continue
+                elif tag == SUB_OBJ_ARRAY_DUMP:
+                    length, class_id = obj_array(buf, pos + 1)
+                    size = length * id_size
+                    nxt = pos + obj_array_len + size
+                    size += header + 4
+                elif tag == SUB_CLASS_DUMP:
+                    nxt = class_dump_end(buf, pos + 1, id_size)
+                    if nxt > end:
+                        break
+                    self.class_dumps += 1
+                    pos = nxt
+                    continue
+                else:
+                    body = fixed.get(tag)
+                    if body is None:
+                        raise HprofFormatError(f"Unknown heap dump sub-record 0x{tag:02x} at offset {pos}")
+                    pos += 1 + body
+                    continue
+                if nxt > end:
+                    break
+                stats = by_class_get(class_id)
+                if stats is None:
+                    stats = by_class[class_id] = [0, 0]
+                stats[0] += 1
+                stats[1] += size
+                pos = nxt
+                records += 1
+                if not records % _CANCEL_EVERY:
+                    if cancel is not None and cancel.is_set():
+                        raise ParseCancelled()
+                    self.released = release_pages(buf, self.released, pos)
+        except (struct.error, IndexError):
+            # A sub-record header runs past the mapped data: the dump was cut short.
+            pass
+        except KeyError as e:
+            raise HprofFormatError(f"Unknown basic type {e.args[0]} at offset {pos}") from None
+        self.records = records
+        return min(pos, end)
+
+
+def release_pages(buf, released: int, pos: int) -> int:
+    if pos - released < _RELEASE_BYTES or not hasattr(mmap, "MADV_DONTNEED") or not hasattr(buf, "madvise"):
+        return released
+    upto = pos - pos % mmap.PAGESIZE
+    buf.madvise(mmap.MADV_DONTNEED, released, upto - released)
+    return upto
+
+
+def read_strings(buf, pos: int, size: int, id_size: int, wanted: Set[int]) -> Dict[int, str]:
+    ident = struct.Struct(">" + ident_format(id_size)).unpack_from
+    header = RECORD_HEADER.unpack_from
+    found: Dict[int, str] = {}
+    while pos + 9 <= size and len(found) < len(wanted):
+        tag, _, length = header(buf, pos)
+        body = pos + 9
+        if tag == TAG_STRING and body + length <= size:
+            (sid,) = ident(buf, body)
+            if sid in wanted:
+                found[sid] = bytes(buf[body + id_size : body + length]).decode("utf-8", errors="replace")
+        pos = body + length
+    return found
+
+
+def class_histogram(buf, cancel: Optional[threading.Event] = None) -> HeapHistogram:
+    """Builds the class histogram of the HPROF data in ``buf`` (an mmap or bytes)."""
+    fmt, id_size, timestamp, first = read_header(buf)
+    size = len(buf)
+    ident = ident_format(id_size)
+    load_class = struct.Struct(f">I{ident}I{ident}").unpack_from
+    header = RECORD_HEADER.unpack_from
+    scanner = _HeapScanner(id_size, cancel)
+    class_names: Dict[int, int] = {}  # class object id -> name string id
+    truncated = False
+
+    pos = first
+    while pos < size:
+        if pos + 9 > size:
+            truncated = True
+            break
+        tag, _, length = header(buf, pos)
+        body = pos + 9
+        end = body + length
+        if tag in (TAG_HEAP_DUMP, TAG_HEAP_DUMP_SEGMENT):
+            # jmap writes one segment per ~1GB; a dump cut short (disk full, killed
+            # JVM) leaves the last one incomplete, so scan what is there.
+            stop = scanner.scan(buf, body, min(end, size))
+            if end > size or stop < end:
+                truncated = True
+                pos = stop
+                break
+            scanner.released = release_pages(buf, scanner.released, end)
+        elif end > size:
+            truncated = True
+            break
+        elif tag == TAG_LOAD_CLASS:
+            _, class_id, _, name_id = load_class(buf, body)
+            class_names[class_id] = name_id
+        pos = end
+        if cancel is not None and cancel.is_set():
+            raise ParseCancelled()
+
+    names = read_strings(buf, first, size, id_size, set(class_names.values()))
+    classes: List[ClassStats] = []
+    for class_id, (count, shallow) in scanner.by_class.items():
+        name_id = class_names.get(class_id)
+        name = java_class_name(names[name_id]) if name_id in names else f"<unknown class 0x{class_id:x}>"
+        classes.append(ClassStats(name, count, shallow))
+    for type_code, (count, shallow) in scanner.by_primitive.items():
+        classes.append(ClassStats(PRIMITIVE_NAMES[type_code] + "[]", count, shallow))
+    classes.sort(key=lambda c: (-c.shallow_size, c.name))
+    return HeapHistogram(
+        format=fmt,
+        id_size=id_size,
+        timestamp_ms=timestamp,
+        classes=classes,
+        classes_loaded=max(len(class_names), scanner.class_dumps),
+        truncated=truncated,
+        bytes_read=min(pos, size),
+    )
+
+
+def check_uncompressed(path: str) -> None:
+    """Heap dumps are read through a memory mapping with random access, which a
+    compressed stream cannot offer."""
+    fmt = sniff_compression(path)
+    if fmt is not None:
+        raise HprofFormatError(f"Heap dump is {fmt}-compressed; decompress it before analysis")
+
+
+def parse_hprof_file(path: str, cancel: Optional[threading.Event] = None) -> HeapHistogram:
+    check_uncompressed(path)
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            raise HprofFormatError("Not an HPROF file (empty)")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if hasattr(mmap, "MADV_SEQUENTIAL"):
+                mm.madvise(mmap.MADV_SEQUENTIAL)
+            return class_histogram(mm, cancel=cancel)
+
+
+def summarize_histogram(
+    histogram: HeapHistogram,
+    max_classes: int = DEFAULT_MAX_CLASSES,
+    sort_by: str = "shallow_size",
+) -> Dict[str, object]:
+    classes = histogram.classes
+    if sort_by == "instances":
+        classes = sorted(classes, key=lambda c: (-c.instances, c.name))
+    shown = classes[:max_classes]
+    total_instances = histogram.total_instances
+    total_size = histogram.total_shallow_size
+    return {
+        "summary": (
+            f"{total_instances} objects in {len(classes)} classes, {total_size} bytes shallow; "
+            f"top {len(shown)} by {sort_by}"
+        ),
+        "format": histogram.format,
+        "id_size": histogram.id_size,
+        "timestamp_ms": histogram.timestamp_ms,
+        "total_instances": total_instances,
+        "total_shallow_size": total_size,
+        "classes_loaded": histogram.classes_loaded,
+        "histogram": [c.to_dict() for c in shown],
+        "omitted_classes": len(classes) - len(shown),
+        "truncated": histogram.truncated,
+        "bytes_read": histogram.bytes_read,
+    }
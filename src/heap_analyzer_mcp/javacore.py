@@ -0,0 +1,216 @@
+import re
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+from .model import (
+    LOCK_LOCKED,
+    LOCK_OWNS,
+    LOCK_PARKING,
+    LOCK_WAITING_ON,
+    LOCK_WAITING_TO_LOCK,
+    InternTable,
+    LockInfo,
+    ThreadInfo,
+)
+from .parser import DEFAULT_MAX_THREADS, THREAD_STATES, ThreadDumpAnalysis, summarize_counts
+
+# OpenJ9 / IBM javacore files.
+#
+# Every javacore line starts with a tag naming its record ("3XMTHREADINFO" for a
+# thread header, "4XESTACKTRACE" for a Java frame, ...), so the parser dispatches
+# on the tag and never has to guess from indentation. Only the sections the
+# analyses use are read: the THREADS section (threads, states, stacks, what each
+# thread is blocked on and which monitors it entered) and the deadlock report of
+# the LOCKS section. The current thread is printed twice, before "Thread Details"
+# and again among them; the first copy is skipped.
+#
+# J9 thread states map to java.lang.Thread.State: R -> RUNNABLE, B -> BLOCKED,
+# CW/W/P -> WAITING, Z -> TERMINATED. Javacores do not tell timed waits from
+# untimed ones; S (suspended) and other codes leave the state unknown. Class names
+# are printed with slashes (java/lang/Object) and converted to dotted names, so
+# frames and locks read as they do in HotSpot dumps. The owner a blocked thread
+# names in its 3XMTHREADBLOCK line is recorded as owning that monitor, since
+# flat-locked monitors do not always show up as "entered lock" on the owner's stack.
+
+_THREAD_RE = re.compile(
+    r'"(?P<name>.*)"\s+J9VMThread:(?P<tid>0x[0-9a-fA-F]+),.*?state:(?P<state>\w+)(?:,\s*prio=(?P<prio>\d+))?'
+)
+_JAVA_THREAD_RE = re.compile(r"getId:(?P<id>0x[0-9a-fA-F]+|\d+)(?:,\s*isDaemon:(?P<daemon>\w+))?")
+_NATIVE_ID_RE = re.compile(r"native thread ID:(?P<nid>0x[0-9a-fA-F]+)")
+_BLOCK_RE = re.compile(
+    r"(?P<kind>Blocked on|Waiting on|Parked on):\s+(?P<cls>[^@\s]+)@(?P<addr>0x[0-9a-fA-F]+)"
+    r'(?:\s+Owned by:\s+"(?P<owner>.*)"\s+\(J9VMThread:(?P<owner_tid>0x[0-9a-fA-F]+))?'
+)
+_ENTERED_RE = re.compile(r"entered lock:\s+(?P<cls>[^@\s]+)@(?P<addr>0x[0-9a-fA-F]+)")
+_DEADLOCK_THREAD_RE = re.compile(r'Thread\s+"(?P<name>.*)"')
+
+_STATES = {"R": "RUNNABLE", "B": "BLOCKED", "CW": "WAITING", "W": "WAITING", "P": "WAITING", "Z": "TERMINATED"}
+_BLOCK_KINDS = {"Blocked on": LOCK_WAITING_TO_LOCK, "Waiting on": LOCK_WAITING_ON, "Parked on": LOCK_PARKING}
+
+
+def _dotted(name: str) -> str:
+    """java/lang/Object -> java.lang.Object; a frame keeps its source part as is."""
+    paren = name.find("(")
+    if paren == -1:
+        return name.replace("/", ".")
+    return name[:paren].replace("/", ".") + name[paren:]
+
+
+class JavacoreParser:
+    """Incremental parser for javacore text with the DumpParser interface."""
+
+    def __init__(self, max_threads: int = DEFAULT_MAX_THREADS, strings: Optional[InternTable] = None) -> None:
+        self.max_threads = max_threads
+        self.strings = strings if strings is not None else InternTable()
+        self.threads: List[ThreadInfo] = []
+        self.counts: Dict[str, int] = {s: 0 for s in THREAD_STATES}
+        self.deadlocks: List[Dict[str, object]] = []
+        self.done = False
+        self.stopped_early = False
+
+        self._current: Optional[ThreadInfo] = None
+        self._frames: List[str] = []
+        self._locks: List[LockInfo] = []
+        # Inside the "Current thread" block, whose thread is listed again later.
+        self._skip_current = False
+        # Open deadlock report: participants so far and the first monitor.
+        self._dl_threads: Optional[List[str]] = None
+        self._dl_monitor: Optional[str] = None
+        # Owners named by blocked threads: (owner J9VMThread, lock address, class name).
+        self._named_owners: List[Tuple[str, str, str]] = []
+
+    def feed_lines(self, lines: Iterable[Union[str, bytes]]) -> None:
+        if self.done:
+            return
+        intern = self.strings.string
+        for line in lines:
+            if line.__class__ is not str:
+                line = line.decode("utf-8", errors="replace")  # type: ignore[union-attr]
+            tag, _, rest = line.strip().partition(" ")  # type: ignore[union-attr]
+            if not tag:
+                continue
+            if tag == "4XESTACKTRACE":
+                if self._current is not None:
+                    rest = rest.lstrip()
+                    if rest.startswith("at "):
+                        self._frames.append(intern(_dotted(rest[3:])))
+                continue
+            if self._dl_threads is not None and "LKDEADLOCK" not in tag and tag != "NULL":
+                self._close_deadlock()
+            if tag[:1] in ("0", "1"):
+                # A new section or top-level record ends the thread.
+                self._close_thread()
+            if tag == "3XMTHREADINFO":
+                self._close_thread()
+                if self._skip_current:
+                    continue
+                if len(self.threads) >= self.max_threads:
+                    self.done = True
+                    self.stopped_early = True
+                    return
+                self._on_thread(rest)
+            elif self._current is None:
+                if tag == "1XMCURTHDINFO":
+                    self._skip_current = True
+                elif tag == "1XMTHDINFO":
+                    self._skip_current = False
+                elif tag == "1LKDEADLOCK":
+                    self._close_deadlock()
+                    self._dl_threads = []
+                elif tag == "2LKDEADLOCKTHR" and self._dl_threads is not None:
+                    self._on_deadlock_thread(rest)
+                elif tag == "4LKDEADLOCKOBJ" and self._dl_threads is not None and self._dl_monitor is None:
+                    self._dl_monitor = rest.strip()
+            elif tag == "5XESTACKTRACE":
+                m = _ENTERED_RE.search(rest)
+                if m is not None:
+                    self._locks.append(LockInfo(
+                        LOCK_LOCKED, m.group("addr"), intern(_dotted(m.group("cls"))), len(self._frames) - 1,
+                    ))
+            elif tag == "3XMJAVALTHREAD":
+                m = _JAVA_THREAD_RE.search(rest)
+                if m is not None:
+                    self._current.number = int(m.group("id"), 0)
+                    self._current.daemon = m.group("daemon") == "true"
+            elif tag == "3XMTHREADINFO1":
+                m = _NATIVE_ID_RE.search(rest)
+                if m is not None:
+                    self._current.nid = m.group("nid")
+            elif tag == "3XMTHREADBLOCK":
+                self._on_block(rest)
+
+    def finish(self) -> ThreadDumpAnalysis:
+        self._close_thread()
+        self._close_deadlock()
+        self._add_named_owners()
+        return ThreadDumpAnalysis(
+            summary=summarize_counts(self.counts, self.max_threads),
+            counts=self.counts,
+            deadlocks=self.deadlocks,
+            truncated=self.stopped_early,
+            threads=self.threads,
+            format="javacore",
+        )
+
+    def _on_thread(self, rest: str) -> None:
+        m = _THREAD_RE.search(rest)
+        if m is None:
+            # "Anonymous native thread": attached to the VM, no Java thread.
+            return
+        info = ThreadInfo(m.group("name"))
+        info.tid = m.group("tid")
+        info.prio = int(m.group("prio")) if m.group("prio") else None
+        state = _STATES.get(m.group("state"))
+        if state is not None:
+            info.state = state
+            self.counts[state] += 1
+        self._current = info
+
+    def _on_block(self, rest: str) -> None:
+        m = _BLOCK_RE.search(rest)
+        if m is None:
+            return
+        cls = self.strings.string(_dotted(m.group("cls")))
+        kind = _BLOCK_KINDS[m.group("kind")]
+        self._locks.append(LockInfo(kind, m.group("addr"), cls, 0))
+        if m.group("owner_tid") is not None and kind != LOCK_WAITING_ON:
+            self._named_owners.append((m.group("owner_tid"), m.group("addr"), cls))
+
+    def _close_thread(self) -> None:
+        current = self._current
+        if current is None:
+            return
+        if self._frames:
+            current.frames = self.strings.stack(self._frames)
+            self._frames = []
+        if self._locks:
+            current.locks = tuple(self._locks)
+            self._locks = []
+        self.threads.append(current)
+        self._current = None
+
+    def _on_deadlock_thread(self, rest: str) -> None:
+        m = _DEADLOCK_THREAD_RE.search(rest)
+        if m is None:
+            return
+        if m.group("name") in self._dl_threads:  # type: ignore[operator]
+            # The cycle is printed back to its first thread; another may follow.
+            self._close_deadlock()
+            self._dl_threads = []
+        else:
+            self._dl_threads.append(m.group("name"))  # type: ignore[union-attr]
+
+    def _close_deadlock(self) -> None:
+        if self._dl_threads:
+            self.deadlocks.append({"threads": self._dl_threads, "monitor": self._dl_monitor or "unknown"})
+        self._dl_threads = None
+        self._dl_monitor = None
+
+    def _add_named_owners(self) -> None:
+        if not self._named_owners:
+            return
+        by_tid = {t.tid: t for t in self.threads}
+        for owner_tid, address, cls in self._named_owners:
+            owner = by_tid.get(owner_tid)
+            if owner is None or any(lock.address == address for lock in owner.locks):
+                continue
+            owner.locks = owner.locks + (LockInfo(LOCK_OWNS, address, cls, -1),)
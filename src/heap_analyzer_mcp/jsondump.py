@@ -0,0 +1,304 @@
+import json
+import re
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+from .model import (
+    LOCK_LOCKED,
+    LOCK_OWNS,
+    LOCK_PARKING,
+    LOCK_WAITING_ON,
+    LOCK_WAITING_TO_LOCK,
+    InternTable,
+    LockInfo,
+    ThreadInfo,
+)
+from .parser import DEFAULT_MAX_THREADS, THREAD_STATES, DumpFormatError, ThreadDumpAnalysis, summarize_counts
+
+# jcmd Thread.dump_to_file -format=json (JDK 21+).
+#
+#   {"threadDump": {"processId": ..., "threadContainers": [
+#       {"container": "<root>", "threads": [{"tid": "1", "name": "main", "stack": [...]}, ...]},
+#       {"container": "java.util.concurrent.ThreadPerTaskExecutor@..", "threads": [...]}, ...]}}
+#
+# With a million virtual threads the document runs to gigabytes, so it is never
+# loaded whole. feed_file hands the parser fixed-size pieces of text (feed_text),
+# cut anywhere, so a minified dump on a single line streams like an indented one.
+# The parser walks the outer objects and arrays itself, one token at a time, and
+# hands only single values (a thread, or a member it does not use) to json's
+# raw_decode. Consumed text is dropped from the buffer, so memory is bounded by
+# the largest such value plus one piece of input. A value cut off at the end of a
+# piece is retried once the unparsed text has doubled, which keeps a value spread
+# over many pieces linear to decode; a document cut off at the end of the input
+# is reported as truncated, not as an error.
+#
+# JDK 21 records no thread state. It is inferred from the top frames: sleeping or
+# a timed park is TIMED_WAITING, a park or Object.wait() is WAITING, and anything
+# else with a stack is RUNNABLE (a thread blocked entering a monitor cannot be
+# told apart). Newer JDKs write "state" and the lock fields (parkBlocker,
+# blockedOn, waitingOn, monitorsOwned), which are read when present. Lock objects
+# are written as "Class@identityHash"; the hash stands in for the address.
+
+# How far down the stack state inference looks for a park or sleep call.
+_INFER_DEPTH = 6
+_THREAD_CLASSES = ("java.lang.Thread", "java.lang.VirtualThread")
+
+# Roles of the objects and arrays the parser walks itself. The value of any
+# other member is decoded whole and dropped.
+_ROOT = "root"
+_DUMP = "dump"
+_CONTAINERS = "containers"
+_CONTAINER = "container"
+_THREADS = "threads"
+_THREAD = "thread"
+_MEMBER_ROLES = {
+    (_ROOT, "threadDump"): _DUMP,
+    (_DUMP, "threadContainers"): _CONTAINERS,
+    (_CONTAINER, "threads"): _THREADS,
+}
+_ELEMENT_ROLES = {_CONTAINERS: _CONTAINER, _THREADS: _THREAD}
+
+_WHITESPACE_RE = re.compile(r"[ \t\n\r]*")
+# A decode error this close to the end of the buffer may be a number, literal or
+# escape cut short, so it is retried with more input before it is reported.
+_MAX_CUT = 16
+
+
+def infer_state(frames: Tuple[str, ...]) -> Optional[str]:
+    """The thread state implied by the top of ``frames``, None for an empty stack."""
+    if not frames:
+        return None
+    parked = False
+    for frame in frames[:_INFER_DEPTH]:
+        cls, _, method = frame.split("(", 1)[0].rpartition("/")[2].rpartition(".")
+        if method == "parkNanos" or method == "parkUntil":
+            return "TIMED_WAITING"
+        if method.startswith("sleep") and cls in _THREAD_CLASSES:
+            return "TIMED_WAITING"
+        if method == "park":
+            parked = True
+        elif cls == "java.lang.Object" and method.startswith("wait"):
+            return "WAITING"
+    return "WAITING" if parked else "RUNNABLE"
+
+
+def _lock_object(value: object) -> Optional[Tuple[str, str]]:
+    """(address, class name) of a "Class@hash" lock object."""
+    if not isinstance(value, str):
+        return None
+    cls, sep, ident = value.rpartition("@")
+    if not sep or not cls:
+        return None
+    return "0x" + ident, cls
+
+
+class JsonDumpParser:
+    """Incremental parser for JSON thread dumps with the DumpParser interface."""
+
+    def __init__(self, max_threads: int = DEFAULT_MAX_THREADS, strings: Optional[InternTable] = None) -> None:
+        self.max_threads = max_threads
+        self.strings = strings if strings is not None else InternTable()
+        self.threads: List[ThreadInfo] = []
+        self.counts: Dict[str, int] = {s: 0 for s in THREAD_STATES}
+        self.done = False
+        self.stopped_early = False
+
+        self._decoder = json.JSONDecoder()
+        self._buf = ""
+        self._pos = 0
+        # Characters dropped from the front of the buffer, for error offsets.
+        self._dropped = 0
+        # Unparsed characters needed before the next attempt at a cut-off value.
+        self._wait = 0
+        # Open objects and arrays: [role, is_object, state, role of the pending
+        # member's value]. States: "first" right after the opening bracket,
+        # "member"/"element" after a comma, "value" after a member name and
+        # "next" after a value.
+        self._stack: List[list] = []
+        self._started = False
+        self._complete = False
+        # Owners named by park blockers: (owner tid, lock address, class name).
+        self._named_owners: List[Tuple[str, str, str]] = []
+
+    def feed_lines(self, lines: Iterable[Union[str, bytes]]) -> None:
+        self.feed_text("".join(
+            (line if line.__class__ is str else line.decode("utf-8", errors="replace")) + "\n"  # type: ignore[operator]
+            for line in lines
+        ))
+
+    def feed_text(self, text: str) -> None:
+        if self.done:
+            return
+        self._dropped += self._pos
+        self._buf = self._buf[self._pos:] + text
+        self._pos = 0
+        if len(self._buf) >= self._wait:
+            self._run()
+
+    def finish(self) -> ThreadDumpAnalysis:
+        if not self.done and self._wait:
+            # The last pieces did not reach the retry threshold.
+            self._run()
+        self._add_named_owners()
+        return ThreadDumpAnalysis(
+            summary=summarize_counts(self.counts, self.max_threads),
+            counts=self.counts,
+            deadlocks=[],
+            truncated=self.stopped_early or (self._started and not self._complete),
+            threads=self.threads,
+            format="json",
+        )
+
+    def _error(self, message: str, pos: int) -> DumpFormatError:
+        return DumpFormatError(f"Invalid JSON thread dump at offset {self._dropped + pos}: {message}")
+
+    def _skip_ws(self) -> Optional[str]:
+        pos = self._pos = _WHITESPACE_RE.match(self._buf, self._pos).end()  # type: ignore[union-attr]
+        return self._buf[pos] if pos < len(self._buf) else None
+
+    def _decode(self) -> Tuple[bool, object]:
+        """Decodes the value at the current position: (False, None) if it is not complete yet."""
+        buf = self._buf
+        try:
+            value, end = self._decoder.raw_decode(buf, self._pos)
+        except json.JSONDecodeError as err:
+            if len(buf) - err.pos > _MAX_CUT and buf[err.pos:].strip() and not err.msg.startswith("Unterminated"):
+                raise self._error(err.msg, err.pos) from None
+            self._wait = 2 * (len(buf) - self._pos)
+            return False, None
+        if end == len(buf) and not isinstance(value, (dict, list, str)):
+            # A number at the very end may go on in the next piece.
+            self._wait = len(buf) - self._pos + 1
+            return False, None
+        self._pos = end
+        return True, value
+
+    def _run(self) -> None:
+        self._wait = 0
+        stack = self._stack
+        while not self._complete:
+            c = self._skip_ws()
+            if c is None:
+                return
+            if not self._started:
+                if c == "\ufeff":
+                    self._pos += 1
+                    continue
+                if c != "{":
+                    raise self._error("expected a JSON object", self._pos)
+                self._started = True
+                self._pos += 1
+                stack.append([_ROOT, True, "first", None])
+                continue
+            frame = stack[-1]
+            role, is_object, state = frame[0], frame[1], frame[2]
+            if state == "next" or (state == "first" and c in "}]"):
+                if c == ",":
+                    self._pos += 1
+                    frame[2] = "member" if is_object else "element"
+                    continue
+                if c == ("}" if is_object else "]"):
+                    self._pos += 1
+                    stack.pop()
+                    if not stack:
+                        self._complete = True
+                    else:
+                        stack[-1][2] = "next"
+                    continue
+                raise self._error(f"unexpected {c!r}", self._pos)
+            if is_object and state in ("first", "member"):
+                if c != '"':
+                    raise self._error("expected a member name", self._pos)
+                start = self._pos
+                ok, name = self._decode()
+                if not ok:
+                    return
+                if self._skip_ws() != ":":
+                    if self._pos >= len(self._buf):
+                        # Retry the name once its colon has arrived.
+                        self._pos = start
+                        return
+                    raise self._error("expected ':'", self._pos)
+                self._pos += 1
+                frame[2] = "value"
+                frame[3] = _MEMBER_ROLES.get((role, name))  # type: ignore[arg-type]
+                continue
+            # A value: a member's (state "value") or an array element.
+            child = frame[3] if is_object else _ELEMENT_ROLES.get(role)
+            if child == _THREAD and c == "{":
+                if len(self.threads) >= self.max_threads:
+                    self.done = True
+                    self.stopped_early = True
+                    return
+                ok, value = self._decode()
+                if not ok:
+                    return
+                self._on_thread(value)  # type: ignore[arg-type]
+            elif child is not None and child != _THREAD and c in "{[":
+                self._pos += 1
+                frame[2] = "next"
+                stack.append([child, c == "{", "first", None])
+                continue
+            else:
+                ok, _ = self._decode()
+                if not ok:
+                    return
+            frame[2] = "next"
+
+    def _on_thread(self, obj: Dict[str, object]) -> None:
+        intern = self.strings.string
+        info = ThreadInfo(str(obj.get("name") or ""))
+        tid = obj.get("tid")
+        if tid is not None:
+            info.tid = str(tid)
+            try:
+                info.number = int(tid)  # type: ignore[arg-type]
+            except (TypeError, ValueError):
+                pass
+        stack = obj.get("stack")
+        if isinstance(stack, list) and stack:
+            info.frames = self.strings.stack([intern(str(f)) for f in stack])
+        state = obj.get("state")
+        info.state = intern(state) if isinstance(state, str) and state in self.counts else infer_state(info.frames)
+        if info.state is not None:
+            self.counts[info.state] += 1
+        info.virtual = obj.get("virtual") is True
+        info.locks = self._locks(obj)
+        self.threads.append(info)
+
+    def _locks(self, obj: Dict[str, object]) -> Tuple[LockInfo, ...]:
+        intern = self.strings.string
+        locks = []
+        for key, kind in (("blockedOn", LOCK_WAITING_TO_LOCK), ("waitingOn", LOCK_WAITING_ON)):
+            lock = _lock_object(obj.get(key))
+            if lock is not None:
+                locks.append(LockInfo(kind, lock[0], intern(lock[1]), 0))
+        blocker = obj.get("parkBlocker")
+        if isinstance(blocker, dict):
+            lock = _lock_object(blocker.get("object"))
+            if lock is not None:
+                locks.append(LockInfo(LOCK_PARKING, lock[0], intern(lock[1]), 0))
+                if blocker.get("owner") is not None:
+                    self._named_owners.append((str(blocker["owner"]), lock[0], lock[1]))
+        owned = obj.get("monitorsOwned")
+        if isinstance(owned, list):
+            for entry in owned:
+                if not isinstance(entry, dict) or not isinstance(entry.get("locks"), list):
+                    continue
+                depth = entry.get("depth")
+                for value in entry["locks"]:
+                    lock = _lock_object(value)
+                    if lock is not None:
+                        index = depth if isinstance(depth, int) else 0
+                        locks.append(LockInfo(LOCK_LOCKED, lock[0], intern(lock[1]), index))
+        return tuple(locks)
+
+    def _add_named_owners(self) -> None:
+        if not self._named_owners:
+            return
+        by_tid = {t.tid: t for t in self.threads}
+        for owner_tid, address, cls in self._named_owners:
+            owner = by_tid.get(owner_tid)
+            if owner is None or any(lock.address == address for lock in owner.locks):
+                continue
+            owner.locks = owner.locks + (LockInfo(LOCK_OWNS, address, cls, -1),)
+        self._named_owners = []
@@ -0,0 +1,270 @@
+from typing import Dict, List, Optional, Sequence, Set
+
+from .model import (
+    LOCK_LOCKED,
+    LOCK_OWNS,
+    LOCK_PARKING,
+    LOCK_WAITING_ON,
+    LOCK_WAITING_TO_LOCK,
+    LOCK_WAITING_TO_RELOCK,
+    ThreadInfo,
+)
+from .parser import ThreadDumpAnalysis
+
+# Lock analysis built from the per-thread lock lines.
+#
+# A thread waits for at most one lock ("waiting to lock" a monitor, "parking to
+# wait for" a synchronizer) and a lock has at most one owner ("locked", or listed
+# under "Locked ownable synchronizers"), so the wait-for graph has at most one
+# edge out of each thread. Deadlocks are its cycles, found with Tarjan's SCC
+# algorithm; hot locks and holder chains come from the same edges. Everything is
+# linear in threads + lock lines.
+
+DEFAULT_MAX_HOT_LOCKS = 10
+DEFAULT_MAX_CHAINS = 10
+_MAX_WAITER_NAMES = 5
+
+_WAIT_KINDS = frozenset((LOCK_WAITING_TO_LOCK, LOCK_WAITING_TO_RELOCK, LOCK_PARKING))
+_HOLD_KINDS = frozenset((LOCK_LOCKED, LOCK_OWNS))
+# A thread in Object.wait() prints the monitor it released as "locked" too.
+_RELEASED_KINDS = frozenset((LOCK_WAITING_ON, LOCK_WAITING_TO_RELOCK))
+
+
+class LockGraph:
+    __slots__ = ("threads", "owners", "waiting_for", "edges", "class_names")
+
+    def __init__(self, threads: Sequence[ThreadInfo]) -> None:
+        self.threads = threads
+        # Lock address -> index of the owning thread.
+        self.owners: Dict[str, int] = {}
+        # Per thread: address it waits for, and the index of that lock's owner (-1 if none).
+        self.waiting_for: List[Optional[str]] = [None] * len(threads)
+        self.edges: List[int] = [-1] * len(threads)
+        self.class_names: Dict[str, Optional[str]] = {}
+
+    def waiters(self) -> Dict[str, List[int]]:
+        by_lock: Dict[str, List[int]] = {}
+        for i, addr in enumerate(self.waiting_for):
+            if addr is not None:
+                by_lock.setdefault(addr, []).append(i)
+        return by_lock
+
+
+def build_lock_graph(threads: Sequence[ThreadInfo]) -> LockGraph:
+    graph = LockGraph(threads)
+    owners = graph.owners
+    class_names = graph.class_names
+    for i, t in enumerate(threads):
+        if not t.locks:
+            continue
+        released: Optional[Set[str]] = None
+        for lock in t.locks:
+            kind = lock.kind
+            if lock.class_name is not None:
+                class_names.setdefault(lock.address, lock.class_name)
+            if kind in _WAIT_KINDS and graph.waiting_for[i] is None:
+                graph.waiting_for[i] = lock.address
+            if kind in _RELEASED_KINDS:
+                if released is None:
+                    released = set()
+                released.add(lock.address)
+        for lock in t.locks:
+            if lock.kind in _HOLD_KINDS and (released is None or lock.address not in released):
+                owners.setdefault(lock.address, i)
+    for i, addr in enumerate(graph.waiting_for):
+        if addr is not None:
+            owner = owners.get(addr, -1)
+            if owner != i:
+                graph.edges[i] = owner
+    return graph
+
+
+def find_cycles(edges: Sequence[int]) -> List[List[int]]:
+    """Tarjan's SCC algorithm for a graph with at most one successor per node
+    (``edges[v]``, -1 for none). Returns the components that contain a cycle."""
+    n = len(edges)
+    index = [-1] * n
+    low = [0] * n
+    on_stack = [False] * n
+    stack: List[int] = []
+    cycles: List[List[int]] = []
+    counter = 0
+    for root in range(n):
+        if index[root] != -1 or edges[root] < 0:
+            continue
+        # Iterative DFS: with one successor per node the DFS path is a simple list.
+        path: List[int] = []
+        v = root
+        while True:
+            index[v] = low[v] = counter
+            counter += 1
+            stack.append(v)
+            on_stack[v] = True
+            path.append(v)
+            w = edges[v]
+            if w >= 0 and index[w] == -1:
+                v = w
+                continue
+            if w >= 0 and on_stack[w]:
+                low[v] = min(low[v], index[w])
+            break
+        while path:
+            v = path.pop()
+            if low[v] == index[v]:
+                component: List[int] = []
+                while True:
+                    w = stack.pop()
+                    on_stack[w] = False
+                    component.append(w)
+                    if w == v:
+                        break
+                if len(component) > 1 or edges[v] == v:
+                    cycles.append(component)
+            if path:
+                u = path[-1]
+                low[u] = min(low[u], low[v])
+    return cycles
+
+
+def _describe_lock(graph: LockGraph, addr: str) -> str:
+    cls = graph.class_names.get(addr)
+    return f"<{addr}> (a {cls})" if cls else f"<{addr}>"
+
+
+def _cycle_deadlock(graph: LockGraph, component: List[int]) -> Dict[str, object]:
+    # Report the cycle in wait order, starting from its first thread in the dump.
+    members = set(component)
+    start = min(component)
+    order = [start]
+    v = graph.edges[start]
+    while v != start and v in members:
+        order.append(v)
+        v = graph.edges[v]
+    threads = graph.threads
+    locks = []
+    for i in order:
+        addr = graph.waiting_for[i]
+        locks.append({
+            "thread": threads[i].name,
+            "waiting_for": addr,
+            "class_name": graph.class_names.get(addr),  # type: ignore[arg-type]
+            "held_by": threads[graph.edges[i]].name,
+        })
+    return {
+        "threads": [threads[i].name for i in order],
+        "monitor": _describe_lock(graph, graph.waiting_for[order[0]]),  # type: ignore[arg-type]
+        "locks": locks,
+        "source": "lock_graph",
+    }
+
+
+def _hot_locks(graph: LockGraph, max_hot_locks: int) -> List[Dict[str, object]]:
+    threads = graph.threads
+    ranked = sorted(graph.waiters().items(), key=lambda item: (-len(item[1]), item[0]))
+    hot = []
+    for addr, waiters in ranked[:max_hot_locks]:
+        owner = graph.owners.get(addr)
+        hot.append({
+            "address": addr,
+            "class_name": graph.class_names.get(addr),
+            "waiters": len(waiters),
+            "waiter_names": [threads[i].name for i in waiters[:_MAX_WAITER_NAMES]],
+            "owner": threads[owner].name if owner is not None else None,
+            "owner_state": threads[owner].state if owner is not None else None,
+            "owner_top_frame": threads[owner].top_frame if owner is not None else None,
+        })
+    return hot
+
+
+def _holder_chains(graph: LockGraph, deadlocked: Set[int], max_chains: int) -> List[Dict[str, object]]:
+    # Follow each waiter to the first thread that is not itself waiting for an
+    # owned lock (the root holder). Roots and depths are memoised, so every
+    # thread is walked once.
+    edges = graph.edges
+    n = len(edges)
+    root = [-1] * n
+    depth = [0] * n
+    for i in range(n):
+        if edges[i] < 0 or root[i] != -1 or i in deadlocked:
+            continue
+        path = []
+        v = i
+        while edges[v] >= 0 and root[v] == -1 and v not in deadlocked:
+            path.append(v)
+            v = edges[v]
+        if v in deadlocked:
+            # Waiting behind a deadlock; reported with the deadlock instead.
+            for u in path:
+                root[u] = -2
+            continue
+        if edges[v] < 0:
+            base_root, base_depth = v, 0
+        else:
+            base_root, base_depth = root[v], depth[v]
+        for k, u in enumerate(reversed(path)):
+            root[u] = base_root
+            depth[u] = base_depth + k + 1
+
+    blocked: Dict[int, int] = {}
+    deepest: Dict[int, int] = {}
+    for i in range(n):
+        r = root[i]
+        if r < 0:
+            continue
+        blocked[r] = blocked.get(r, 0) + 1
+        d = deepest.get(r)
+        if d is None or depth[i] > depth[d]:
+            deepest[r] = i
+
+    threads = graph.threads
+    chains = []
+    for r in sorted(blocked, key=lambda r: (-blocked[r], r))[:max_chains]:
+        chain = []
+        v = deepest[r]
+        while v != r:
+            chain.append(threads[v].name)
+            v = edges[v]
+        chain.append(threads[r].name)
+        chains.append({
+            "holder": threads[r].name,
+            "holder_state": threads[r].state,
+            "holder_top_frame": threads[r].top_frame,
+            "blocked_threads": blocked[r],
+            "max_depth": depth[deepest[r]],
+            "longest_chain": chain,
+        })
+    return chains
+
+
+def _deadlocks(graph: LockGraph, cycles: List[List[int]], analysis: ThreadDumpAnalysis) -> List[Dict[str, object]]:
+    deadlocks = [_cycle_deadlock(graph, c) for c in cycles]
+    deadlocks.sort(key=lambda d: d["threads"])  # type: ignore[arg-type, return-value]
+    # The JVM's own banner still counts when the lock lines do not show the
+    # cycle, e.g. for a dump truncated before the deadlocked threads.
+    deadlocked = {name for d in deadlocks for name in d["threads"]}  # type: ignore[attr-defined]
+    for banner in analysis.deadlocks:
+        if not deadlocked.issuperset(banner["threads"]):  # type: ignore[arg-type]
+            deadlocks.append(dict(banner, source="banner"))
+    return deadlocks
+
+
+def analyze_locks(
+    analysis: ThreadDumpAnalysis,
+    max_hot_locks: int = DEFAULT_MAX_HOT_LOCKS,
+    max_chains: int = DEFAULT_MAX_CHAINS,
+) -> Dict[str, object]:
+    graph = build_lock_graph(analysis.threads)
+    cycles = find_cycles(graph.edges)
+    deadlocked = {i for c in cycles for i in c}
+    return {
+        "deadlocks": _deadlocks(graph, cycles, analysis),
+        "hot_locks": _hot_locks(graph, max_hot_locks),
+        "holder_chains": _holder_chains(graph, deadlocked, max_chains),
+        "waiting_threads": sum(1 for addr in graph.waiting_for if addr is not None),
+        "owned_locks": len(graph.owners),
+    }
+
+
+def find_deadlocks(analysis: ThreadDumpAnalysis) -> List[Dict[str, object]]:
+    graph = build_lock_graph(analysis.threads)
+    return _deadlocks(graph, find_cycles(graph.edges), analysis)
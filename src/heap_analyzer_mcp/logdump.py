@@ -0,0 +1,93 @@
+import re
+from typing import Iterable, List, Optional, Pattern, Union
+
+from .model import InternTable
+from .parser import (
+    DEFAULT_MAX_THREADS,
+    LINE_OTHER,
+    ThreadDumpAnalysis,
+    ThreadDumpParser,
+    classify_line,
+)
+
+# HotSpot thread dumps embedded in application logs.
+#
+# A dump printed to stdout and captured by a logging pipeline (log4j/logback
+# wrapping System.out, container runtimes, journald) carries a prefix on every
+# line: a timestamp, a level, a logger or stream name. Lines are skipped until the
+# first dump marker (the "Full thread dump" banner or a thread header) and the
+# text before it is learned as the prefix: runs of digits become \d+, everything
+# else must match literally, so the timestamps may change from line to line. From
+# then on the prefix is cut off and the rest goes to the HotSpot parser.
+#
+# A line without the prefix is passed on as it is when it looks like dump content
+# (blank, indented, a header, a state line or a deadlock banner): loggers that
+# write a whole dump as one multi-line message prefix only its first line. Other
+# lines are log records from elsewhere, interleaved with the dump, and are dropped.
+# A prefix that is empty (the marker starts its line) passes every line through.
+
+_MARKER_RE = re.compile(r'Full thread dump |"(?:[^"\r\n]|"(?![ \t]))+"[ \t]+(?:#\d+|daemon |prio=|tid=)')
+_DIGITS_RE = re.compile(r"\d+")
+
+
+def prefix_pattern(prefix: str) -> Pattern[str]:
+    """Matches ``prefix`` with any digits in place of its digit runs.
+
+    The separator between prefix and dump text may be missing, as loggers trim
+    trailing whitespace from the records of blank dump lines.
+    """
+    core = prefix.rstrip()
+    separator = prefix[len(core):]
+    parts = []
+    last = 0
+    for m in _DIGITS_RE.finditer(core):
+        parts.append(re.escape(core[last:m.start()]))
+        parts.append(r"\d+")
+        last = m.end()
+    parts.append(re.escape(core[last:]))
+    return re.compile("".join(parts) + "(?:" + re.escape(separator) + r"|[ \t]*$)")
+
+
+class LogDumpParser:
+    """Incremental parser for HotSpot dumps inside log files; see the module comment."""
+
+    def __init__(self, max_threads: int = DEFAULT_MAX_THREADS, strings: Optional[InternTable] = None) -> None:
+        self._inner = ThreadDumpParser(max_threads=max_threads, strings=strings)
+        # The learned prefix; None until the first marker has been seen.
+        self.prefix: Optional[str] = None
+        self._pattern: Optional[Pattern[str]] = None
+
+    @property
+    def done(self) -> bool:
+        return self._inner.done
+
+    def feed_lines(self, lines: Iterable[Union[str, bytes]]) -> None:
+        out: List[str] = []
+        pattern = self._pattern
+        for line in lines:
+            if line.__class__ is not str:
+                line = line.decode("utf-8", errors="replace")  # type: ignore[union-attr]
+            line = line.rstrip("\r\n")  # type: ignore[union-attr]
+            if self.prefix is None:
+                m = _MARKER_RE.search(line)
+                if m is None:
+                    continue
+                self.prefix = line[:m.start()]
+                pattern = self._pattern = prefix_pattern(self.prefix) if self.prefix else None
+                out.append(line[m.start():])
+                continue
+            if pattern is None:
+                out.append(line)
+                continue
+            m = pattern.match(line)
+            if m is not None:
+                out.append(line[m.end():])
+            elif not line or line[0] in " \t" or classify_line(line) is not LINE_OTHER:
+                out.append(line)
+        if out:
+            self._inner.feed_lines(out)
+
+    def finish(self) -> ThreadDumpAnalysis:
+        analysis = self._inner.finish()
+        analysis.format = "log"
+        return analysis
@@ -0,0 +1,186 @@
+import re
+from typing import Dict, List, Optional, Tuple
+
+# Structured per-thread model built by the parser. Records use __slots__ and all
+# repeated strings (frames, lock class names, whole stacks) go through an
+# InternTable, so thousands of pool workers parked on the same stack share one
+# tuple of frame strings instead of each holding its own copy.
+
+# Standard HotSpot header layouts (JDK 8 through 21); anything else falls back to a
+# generic key=value scan. The pattern is ASCII so the bytes scanner compiles it too.
+HEADER_PATTERN = (
+    r'"(?P<name>.+?)"\s+'
+    r'(?:#(?P<number>\d+)\s+)?(?:\[\d+\]\s+)?(?P<daemon>daemon\s+)?'
+    r'(?:prio=(?P<prio>-?\d+)\s+)?(?:os_prio=(?P<os_prio>-?\d+)\s+)?'
+    r'(?:cpu=\S+\s+)?(?:elapsed=\S+\s+)?(?:allocated=\S+\s+)?(?:defined_classes=\S+\s+)?'
+    r'tid=(?P<tid>\S+)\s+nid=(?P<nid>\S+)\s*'
+    r'(?P<native>.*?)\s*(?:\[0x[0-9a-fA-F]+\])?\s*$'
+)
+_HEADER_RE = re.compile(HEADER_PATTERN)
+_HEADER_KV_RE = re.compile(r"(\w+)=(\S+)")
+_LOCK_RE = re.compile(r"^-\s+(?P<kind>[^<]*?)\s*<(?P<addr>0x[0-9a-fA-F]+)>(?:\s*\(a\s+(?P<cls>[^)]+)\))?")
+
+LOCK_LOCKED = "locked"
+LOCK_WAITING_TO_LOCK = "waiting to lock"
+LOCK_WAITING_ON = "waiting on"
+LOCK_WAITING_TO_RELOCK = "waiting to re-lock in wait()"
+LOCK_PARKING = "parking to wait for"
+LOCK_OWNS = "owns"
+
+
+class InternTable:
+    __slots__ = ("_strings", "_stacks")
+
+    def __init__(self) -> None:
+        self._strings: Dict[str, str] = {}
+        self._stacks: Dict[Tuple[str, ...], Tuple[str, ...]] = {}
+
+    def string(self, value: str) -> str:
+        return self._strings.setdefault(value, value)
+
+    def stack(self, frames: List[str]) -> Tuple[str, ...]:
+        key = tuple(frames)
+        return self._stacks.setdefault(key, key)
+
+    @property
+    def distinct_strings(self) -> int:
+        return len(self._strings)
+
+    @property
+    def distinct_stacks(self) -> int:
+        return len(self._stacks)
+
+
+class LockInfo:
+    __slots__ = ("kind", "address", "class_name", "frame_index")
+
+    def __init__(self, kind: str, address: str, class_name: Optional[str], frame_index: int) -> None:
+        self.kind = kind
+        self.address = address
+        self.class_name = class_name
+        # Index of the stack frame the lock line follows, -1 for ownable synchronizers.
+        self.frame_index = frame_index
+
+    def to_dict(self) -> Dict[str, object]:
+        return {
+            "kind": self.kind,
+            "address": self.address,
+            "class_name": self.class_name,
+            "frame_index": self.frame_index,
+        }
+
+
+class ThreadInfo:
+    __slots__ = (
+        "name", "number", "daemon", "virtual", "prio", "os_prio", "tid", "nid",
+        "native_state", "state", "frames", "locks",
+    )
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.number: Optional[int] = None
+        self.daemon = False
+        self.virtual = False
+        self.prio: Optional[int] = None
+        self.os_prio: Optional[int] = None
+        self.tid: Optional[str] = None
+        self.nid: Optional[str] = None
+        self.native_state: Optional[str] = None
+        self.state: Optional[str] = None
+        self.frames: Tuple[str, ...] = ()
+        self.locks: Tuple[LockInfo, ...] = ()
+
+    @property
+    def top_frame(self) -> Optional[str]:
+        return self.frames[0] if self.frames else None
+
+    def to_dict(self, max_frames: Optional[int] = None) -> Dict[str, object]:
+        frames = self.frames if max_frames is None else self.frames[:max_frames]
+        return {
+            "name": self.name,
+            "number": self.number,
+            "daemon": self.daemon,
+            "virtual": self.virtual,
+            "prio": self.prio,
+            "os_prio": self.os_prio,
+            "tid": self.tid,
+            "nid": self.nid,
+            "native_state": self.native_state,
+            "state": self.state,
+            "frames": list(frames),
+            "locks": [lock.to_dict() for lock in self.locks],
+        }
+
+
+def parse_thread_header(line: str, strings: InternTable) -> Optional[ThreadInfo]:
+    """Parses '"name" #N daemon prio=5 os_prio=0 tid=0x.. nid=0x.. state [0x..]'."""
+    m = _HEADER_RE.match(line)
+    if m is not None:
+        info = ThreadInfo(m.group("name"))
+        number, prio, os_prio, native = m.group("number", "prio", "os_prio", "native")
+        info.number = int(number) if number else None
+        info.daemon = m.group("daemon") is not None
+        info.prio = int(prio) if prio else None
+        info.os_prio = int(os_prio) if os_prio else None
+        info.tid, info.nid = m.group("tid", "nid")
+        if native:
+            info.native_state = strings.string(native)
+        return info
+
+    end = line.find('" ', 1)
+    tab_end = line.find('"\t', 1)
+    if end == -1 or (tab_end != -1 and tab_end < end):
+        end = tab_end
+    if end <= 1:
+        return None
+    info = ThreadInfo(line[1:end])
+    rest = line[end + 1:]
+
+    # Everything after the last key=value pair (minus a trailing "[0x...]") is the
+    # native thread state, e.g. "waiting on condition" or "runnable".
+    native_start = 0
+    for m in _HEADER_KV_RE.finditer(rest):
+        key, value = m.group(1), m.group(2)
+        if key == "prio":
+            info.prio = _to_int(value)
+        elif key == "os_prio":
+            info.os_prio = _to_int(value)
+        elif key == "tid":
+            info.tid = value
+        elif key == "nid":
+            info.nid = value
+        native_start = m.end()
+    for token in rest[:native_start].split():
+        if token == "daemon":
+            info.daemon = True
+        elif token.startswith("#") and info.number is None:
+            info.number = _to_int(token[1:])
+
+    native = rest[native_start:].strip()
+    bracket = native.rfind(" [")
+    if native.endswith("]") and (bracket != -1 or native.startswith("[")):
+        native = native[:bracket].strip() if bracket != -1 else ""
+    if native:
+        info.native_state = strings.string(native)
+    return info
+
+
+def parse_lock_line(stripped: str, frame_index: int, strings: InternTable) -> Optional[LockInfo]:
+    m = _LOCK_RE.match(stripped)
+    if m is None:
+        return None
+    kind = m.group("kind") or LOCK_OWNS
+    cls = m.group("cls")
+    return LockInfo(
+        strings.string(kind),
+        m.group("addr"),
+        strings.string(cls) if cls else None,
+        frame_index if kind != LOCK_OWNS else -1,
+    )
+
+
+def _to_int(value: str) -> Optional[int]:
+    try:
+        return int(value)
+    except ValueError:
+        return None
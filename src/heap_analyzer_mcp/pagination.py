@@ -0,0 +1,108 @@
+import base64
+import binascii
+import json
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+# Pagination of list results (threads, clusters, deadlocks).
+#
+# A page holds at most ``limit`` items and at most ``max_response_bytes`` of
+# serialized items, whichever is hit first; the cut is deterministic for a given
+# model and budget, and the response says how many items were left out and why.
+# The cursor for the next page is opaque to clients: it carries the original
+# query, the next offset and the digest of the parsed file, so a follow-up page
+# repeats the query against the cached model (the parse cache is keyed by that
+# digest) and a file that changed in between is reported instead of mixing pages
+# from two versions.
+
+DEFAULT_PAGE_LIMIT = 100
+DEFAULT_MAX_RESPONSE_BYTES = 256 * 1024
+_CURSOR_VERSION = 1
+
+
+class CursorError(ValueError):
+    pass
+
+
+def encode_cursor(tool: str, query: Dict[str, Any], offset: int, digest: str) -> str:
+    state = {"v": _CURSOR_VERSION, "tool": tool, "query": query, "offset": offset, "digest": digest}
+    raw = json.dumps(state, sort_keys=True, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: Any, tool: str) -> Dict[str, Any]:
+    if not isinstance(cursor, str) or not cursor:
+        raise CursorError("'cursor' must be a non-empty string")
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        state = json.loads(raw.decode("utf-8"))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise CursorError("Invalid cursor") from None
+    if (
+        not isinstance(state, dict)
+        or state.get("v") != _CURSOR_VERSION
+        or state.get("tool") != tool
+        or not isinstance(state.get("query"), dict)
+        or not isinstance(state.get("offset"), int)
+        or not isinstance(state.get("digest"), str)
+    ):
+        raise CursorError(f"Invalid cursor for {tool}")
+    return state
+
+
+def apply_cursor(arguments: Dict[str, Any], tool: str) -> Tuple[Dict[str, Any], Optional[str]]:
+    """Restores the query stored in ``arguments["cursor"]``, if any.
+
+    Returns the effective arguments and the digest the cursor was issued for.
+    Only ``limit`` (or the tool's page size) and ``max_response_bytes`` may be
+    changed between pages; everything else comes from the cursor.
+    """
+    if "cursor" not in arguments:
+        return arguments, None
+    state = decode_cursor(arguments["cursor"], tool)
+    merged = {k: v for k, v in arguments.items() if k != "cursor"}
+    merged.update(state["query"])
+    merged["offset"] = state["offset"]
+    return merged, state["digest"]
+
+
+def paginate(
+    items: Sequence[Any],
+    offset: int,
+    limit: int,
+    max_response_bytes: int,
+    render: Callable[[Any], Any] = lambda item: item,
+) -> Tuple[List[Any], Dict[str, Any]]:
+    # At least one item is returned per page so a client always makes progress,
+    # even if that item alone is over the byte budget.
+    total = len(items)
+    end = min(total, offset + limit)
+    page: List[Any] = []
+    used = 0
+    i = offset
+    reason = None
+    while i < end:
+        item = render(items[i])
+        size = len(json.dumps(item)) + 2
+        if page and used + size > max_response_bytes:
+            reason = "max_response_bytes"
+            break
+        page.append(item)
+        used += size
+        i += 1
+    if reason is None and i < total:
+        reason = "limit"
+    info: Dict[str, Any] = {
+        "offset": offset,
+        "returned": len(page),
+        "total": total,
+        "omitted": max(total - i, 0),
+        "truncated_by": reason,
+        "next_offset": i if i < total else None,
+    }
+    return page, info
+
+
+def finish_page(info: Dict[str, Any], tool: str, query: Dict[str, Any], digest: str) -> Dict[str, Any]:
+    next_offset = info.pop("next_offset")
+    info["next_cursor"] = encode_cursor(tool, query, next_offset, digest) if next_offset is not None else None
+    return info
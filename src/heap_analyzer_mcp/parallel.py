@@ -0,0 +1,256 @@
+import contextvars
+import functools
+import multiprocessing
+import os
+import re
+import threading
+from concurrent.futures import FIRST_EXCEPTION, Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from typing import Callable, List, Optional, Sequence, Tuple, TypeVar
+
+from .bytescan import parse_thread_dump_mmap
+from .compressed import sniff_compression
+from .formats import FORMAT_HOTSPOT, parse_dump_file, sniff_file_format
+from .model import InternTable
+from .parser import (
+    DEFAULT_MAX_BYTES,
+    DEFAULT_MAX_THREADS,
+    THREAD_STATES,
+    ParseCancelled,
+    ThreadDumpAnalysis,
+    ThreadDumpParser,
+    feed_file,
+    parse_thread_dump_file,
+    summarize_counts,
+)
+
+# Parallel parsing.
+#
+# Independent files are parsed concurrently, and a single large dump is split
+# into byte ranges at thread-block boundaries (a blank line followed by '"'), each
+# range is parsed by a worker and the partial results are merged in file order.
+#
+# Files are read through the mmap scanner (bytescan) by default; the "lines" reader
+# is the streaming line parser, which also handles pipes, compressed files and other
+# inputs that cannot be mapped. Dumps in other formats (formats.py) are read by
+# their own streaming parser and are never split.
+
+POOL_KINDS = ("process", "thread")
+READERS = ("mmap", "lines")
+DEFAULT_CHUNK_BYTES = 64 * 1024 * 1024
+# Below this size a file is parsed in the calling thread: shipping the result back
+# from a worker process would cost more than the parse itself.
+_INLINE_BYTES = 4 * 1024 * 1024
+_BOUNDARY_RE = re.compile(rb'\n\r?\n"')
+_SCAN_WINDOW = 1 << 20
+# How often a caller waiting on worker futures checks its cancel event.
+_CANCEL_POLL_S = 0.1
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+def find_chunk_ranges(path: str, limit: int, chunks: int) -> List[Tuple[int, int]]:
+    """Splits the first ``limit`` bytes of ``path`` into up to ``chunks`` ranges
+    that each start at the beginning of a thread block."""
+    starts = [0]
+    with open(path, "rb") as f:
+        for k in range(1, chunks):
+            pos = max(limit * k // chunks, starts[-1] + 1)
+            boundary = None
+            while pos < limit and boundary is None:
+                f.seek(pos)
+                window = f.read(min(_SCAN_WINDOW, limit - pos) + 2)
+                m = _BOUNDARY_RE.search(window)
+                if m is not None:
+                    boundary = pos + m.end() - 1
+                else:
+                    # Keep the last two bytes so a boundary across windows is found.
+                    pos += max(len(window) - 2, 1)
+            if boundary is None or boundary >= limit:
+                break
+            starts.append(boundary)
+    ends = starts[1:] + [limit]
+    return list(zip(starts, ends))
+
+
+def parse_range(
+    path: str,
+    start: int,
+    end: int,
+    max_threads: int,
+    cancel: Optional[threading.Event] = None,
+    reader: str = "mmap",
+) -> ThreadDumpAnalysis:
+    if reader == "mmap":
+        return parse_thread_dump_mmap(path, max_threads=max_threads, max_bytes=end - start, cancel=cancel, start=start, end=end)
+    parser = ThreadDumpParser(max_threads=max_threads)
+    with open(path, "rb") as f:
+        f.seek(start)
+        # Reaching the end of the range is expected, so only the thread budget
+        # marks a chunk as truncated.
+        bytes_read, _ = feed_file(parser, f, max_bytes=end - start, cancel=cancel)
+    analysis = parser.finish()
+    analysis.bytes_read = bytes_read
+    return analysis
+
+
+def merge_analyses(parts: Sequence[ThreadDumpAnalysis], max_threads: int) -> ThreadDumpAnalysis:
+    # Re-intern while merging: results coming back from worker processes no
+    # longer share frame strings or stack tuples with each other.
+    strings = InternTable()
+    threads = []
+    deadlocks: List[dict] = []
+    bytes_read = 0
+    truncated = False
+    for part in parts:
+        bytes_read += part.bytes_read
+        room = max_threads - len(threads)
+        for t in part.threads[:room]:
+            if t.frames:
+                t.frames = strings.stack([strings.string(f) for f in t.frames])
+            if t.native_state is not None:
+                t.native_state = strings.string(t.native_state)
+            threads.append(t)
+        if len(part.threads) < room:
+            # A part that used up the budget is where the sequential parse stops,
+            # before the deadlock banner at the end of the dump.
+            deadlocks.extend(part.deadlocks)
+        if len(part.threads) > room or (part.truncated and len(threads) >= max_threads):
+            truncated = True
+            break
+        truncated = truncated or part.truncated
+
+    counts = {s: 0 for s in THREAD_STATES}
+    for t in threads:
+        if t.state in counts:
+            counts[t.state] += 1  # type: ignore[index]
+    return ThreadDumpAnalysis(
+        summary=summarize_counts(counts, max_threads),
+        counts=counts,
+        deadlocks=deadlocks,
+        truncated=truncated,
+        bytes_read=bytes_read,
+        threads=threads,
+    )
+
+
+def wait_all(futures: Sequence[Future], cancel: Optional[threading.Event] = None) -> list:
+    pending = set(futures)
+    while pending:
+        if cancel is not None and cancel.is_set():
+            for f in futures:
+                f.cancel()
+            raise ParseCancelled()
+        _, pending = wait(pending, timeout=_CANCEL_POLL_S, return_when=FIRST_EXCEPTION)
+        for f in futures:
+            if f.done() and not f.cancelled() and f.exception() is not None:
+                for other in futures:
+                    other.cancel()
+                raise f.exception()  # type: ignore[misc]
+    return [f.result() for f in futures]
+
+
+def map_concurrently(fn: Callable[[T], R], items: Sequence[T], max_workers: int = 8) -> List[R]:
+    workers = min(max_workers, len(items))
+    if workers <= 1:
+        return [fn(item) for item in items]
+    # Each item runs in a copy of the caller's context, so per-request state such as
+    # telemetry follows the work into the fan-out threads.
+    with ThreadPoolExecutor(max_workers=workers) as fan_out:
+        futures = [fan_out.submit(contextvars.copy_context().run, fn, item) for item in items]
+        return [f.result() for f in futures]
+
+
+class ParsePool:
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        kind: str = "process",
+        chunk_bytes: int = DEFAULT_CHUNK_BYTES,
+        reader: str = "mmap",
+    ) -> None:
+        if kind not in POOL_KINDS:
+            raise ValueError(f"Unknown pool kind: {kind}")
+        if reader not in READERS:
+            raise ValueError(f"Unknown reader: {reader}")
+        self.workers = max(1, workers if workers is not None else min(os.cpu_count() or 1, 8))
+        self.kind = kind
+        self.chunk_bytes = chunk_bytes
+        self.reader = reader
+        self._parse = parse_thread_dump_mmap if reader == "mmap" else parse_thread_dump_file
+        self._executor: Optional[Executor] = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "ParsePool":
+        workers = os.environ.get("HEAP_ANALYZER_WORKERS")
+        chunk_mb = os.environ.get("HEAP_ANALYZER_CHUNK_MB")
+        return cls(
+            workers=int(workers) if workers else None,
+            kind=os.environ.get("HEAP_ANALYZER_POOL", "process"),
+            chunk_bytes=int(chunk_mb) * 1024 * 1024 if chunk_mb else DEFAULT_CHUNK_BYTES,
+            reader=os.environ.get("HEAP_ANALYZER_READER", "mmap"),
+        )
+
+    def executor(self) -> Executor:
+        with self._lock:
+            if self._executor is None:
+                if self.kind == "process":
+                    # spawn rather than fork: the server process runs other threads.
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+                    )
+                else:
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers)
+            return self._executor
+
+    def parse_file(
+        self,
+        path: str,
+        max_threads: int = DEFAULT_MAX_THREADS,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        cancel: Optional[threading.Event] = None,
+    ) -> ThreadDumpAnalysis:
+        if not os.path.isfile(path):
+            # Pipes and devices cannot be mapped or split.
+            return parse_thread_dump_file(path, max_threads=max_threads, max_bytes=max_bytes, cancel=cancel)
+        size = os.path.getsize(path)
+        limit = min(size, max_bytes)
+        parse = self._parse
+        fmt = sniff_file_format(path)
+        if fmt != FORMAT_HOTSPOT or sniff_compression(path) is not None:
+            # Compressed files can be neither mapped nor split: they are decompressed
+            # as a stream. ``limit`` stays the compressed size for the offload decision.
+            parse = functools.partial(parse_dump_file, fmt=fmt)
+        elif self.workers > 1 and limit >= self.chunk_bytes:
+            ranges = find_chunk_ranges(path, limit, self.workers)
+            if len(ranges) > 1:
+                pool = self.executor()
+                # Only thread workers can observe ``cancel`` directly.
+                worker_cancel = cancel if self.kind == "thread" else None
+                futures = [
+                    pool.submit(parse_range, path, start, end, max_threads, worker_cancel, self.reader)
+                    for start, end in ranges
+                ]
+                analysis = merge_analyses(wait_all(futures, cancel), max_threads)
+                analysis.truncated = analysis.truncated or limit < size
+                return analysis
+        if self.workers > 1 and self.kind == "process" and limit >= _INLINE_BYTES:
+            # Worker processes cannot see ``cancel``; the caller stops waiting instead.
+            return wait_all([self.executor().submit(parse, path, max_threads, max_bytes)], cancel)[0]
+        return parse(path, max_threads=max_threads, max_bytes=max_bytes, cancel=cancel)
+
+    def parse_files(
+        self,
+        paths: Sequence[str],
+        max_threads: int = DEFAULT_MAX_THREADS,
+        max_bytes: int = DEFAULT_MAX_BYTES,
+        cancel: Optional[threading.Event] = None,
+    ) -> List[ThreadDumpAnalysis]:
+        return map_concurrently(lambda p: self.parse_file(p, max_threads, max_bytes, cancel), paths)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
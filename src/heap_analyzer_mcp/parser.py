@@ -1,71 +1,473 @@
-from dataclasses import dataclass
-from typing import Dict, List, Optional
+import codecs
+import threading
+from dataclasses import dataclass, field
+from typing import IO, Any, Callable, Dict, Iterable, Iterator, List, Optional, Protocol, Tuple, Union
+
+from .model import InternTable, LockInfo, ThreadInfo, parse_lock_line, parse_thread_header
 
 # This module intentionally has no external dependencies so it can be used in tests
 # without requiring the MCP runtime libraries.
+#
+# ThreadDumpParser reads HotSpot (jstack / jcmd Thread.print) text. Files in other
+# formats (jcmd JSON, OpenJ9 javacores, dumps inside application logs) go through
+# the front end in formats.py, whose parsers implement the same DumpParser
+# interface and produce the same ThreadDumpAnalysis.
+
+DEFAULT_MAX_THREADS = 5000
+DEFAULT_MAX_BYTES = 512 * 1024 * 1024
+DEFAULT_MAX_FRAMES = 20
+
+THREAD_STATES = ("RUNNABLE", "BLOCKED", "WAITING", "TIMED_WAITING", "NEW", "TERMINATED")
+
+# Line types produced by classify_line(). Every input line is classified exactly once
+# and then dispatched to the handler (and any hooks) registered for its type.
+LINE_BLANK = "blank"
+LINE_HEADER = "header"
+LINE_STATE = "state"
+LINE_FRAME = "frame"
+LINE_LOCK = "lock"
+LINE_DEADLOCK = "deadlock"
+LINE_OTHER = "other"
+LINE_TYPES = (LINE_BLANK, LINE_HEADER, LINE_STATE, LINE_FRAME, LINE_LOCK, LINE_DEADLOCK, LINE_OTHER)
+
+_STATE_PREFIX = "java.lang.Thread.State:"
+_DEADLOCK_PREFIX = "found one java-level deadlock"
+
+# Indented lines are told apart by the first character after the indentation.
+_INDENTED_PREFIXES = {
+    "j": (_STATE_PREFIX, LINE_STATE),
+    "a": ("at ", LINE_FRAME),
+    "-": ("- ", LINE_LOCK),
+}
+
+# How far past a thread header / deadlock banner the parser keeps looking for the
+# state line / the deadlock participants.
+_STATE_WINDOW = 5
+_DEADLOCK_WINDOW = 49
+
+
+def classify_line(line: str) -> str:
+    if not line:
+        return LINE_BLANK
+    first = line[0]
+    if first == "\t" or first == " ":
+        # Stack frames and lock lines dominate real dumps, so check them first.
+        stripped = line.lstrip()
+        if not stripped:
+            return LINE_BLANK
+        entry = _INDENTED_PREFIXES.get(stripped[0])
+        if entry is not None and stripped.startswith(entry[0]):
+            return entry[1]
+        return LINE_OTHER
+    if first == '"':
+        # A header is a quoted name followed by whitespace; deadlock-banner lines
+        # such as '"Thread-1":' are not.
+        end = line.find('"', 1)
+        while end != -1:
+            nxt = line[end + 1:end + 2]
+            if nxt == " " or nxt == "\t":
+                return LINE_HEADER if end > 1 else LINE_OTHER
+            end = line.find('"', end + 1)
+        return LINE_OTHER
+    if first == "j" and line.startswith(_STATE_PREFIX):
+        return LINE_STATE
+    if (first == "F" or first == "f") and line[:len(_DEADLOCK_PREFIX)].lower() == _DEADLOCK_PREFIX:
+        return LINE_DEADLOCK
+    return LINE_OTHER
+
 
 @dataclass
 class ThreadDumpAnalysis:
     summary: str
     counts: Dict[str, int]
     deadlocks: List[Dict[str, object]]
+    truncated: bool = False
+    bytes_read: int = 0
+    threads: List[ThreadInfo] = field(default_factory=list)
+    # Input format, one of formats.DUMP_FORMATS.
+    format: str = "hotspot"
+
+    def threads_in_state(self, state: str) -> List[ThreadInfo]:
+        return [t for t in self.threads if t.state == state]
+
+    def find_thread(self, name: str) -> Optional[ThreadInfo]:
+        for t in self.threads:
+            if t.name == name:
+                return t
+        return None
+
 
+class ParseCancelled(Exception):
+    pass
 
-def parse_thread_dump(text: str, max_threads: int = 5000) -> ThreadDumpAnalysis:
-    import re
-
-    thread_header_re = re.compile(r'^"(?P<name>.+?)"\s')
-    state_re = re.compile(r'^\s*java\.lang\.Thread\.State:\s*(?P<state>[A-Z_]+)')
-
-    counts: Dict[str, int] = {s: 0 for s in [
-        "RUNNABLE", "BLOCKED", "WAITING", "TIMED_WAITING", "NEW", "TERMINATED"
-    ]}
-    total_threads = 0
-
-    deadlocks: List[Dict[str, object]] = []
-
-    lines = text.splitlines()
-    i = 0
-    while i < len(lines) and total_threads < max_threads:
-        line = lines[i]
-        m_header = thread_header_re.match(line)
-        if m_header:
-            total_threads += 1
-            state: Optional[str] = None
-            for j in range(1, 6):
-                if i + j >= len(lines):
-                    break
-                m_state = state_re.match(lines[i + j])
-                if m_state:
-                    state = m_state.group('state')
-                    break
-            if state and state in counts:
-                counts[state] += 1
-            i += 1
-            continue
-        if line.lower().startswith('found one java-level deadlock'):
-            threads: List[str] = []
-            monitor: Optional[str] = None
-            for j in range(1, 50):
-                if i + j >= len(lines):
-                    break
-                l2 = lines[i + j].strip()
-                if not l2:
-                    break
-                if l2.startswith('"'):
-                    t = l2.split('"')
-                    if len(t) >= 3:
-                        threads.append(t[1])
-                if 'monitor' in l2.lower() or 'ownable synchronizer' in l2.lower():
-                    monitor = l2
-            if threads:
-                deadlocks.append({"threads": threads, "monitor": monitor or "unknown"})
-        i += 1
 
+class DumpFormatError(ValueError):
+    """The input is in a recognized format but cannot be read as one."""
+
+
+def summarize_counts(counts: Dict[str, int], max_threads: int) -> str:
     analyzed_threads = sum(counts.values())
-    summary = (
+    return (
         f"Analyzed {analyzed_threads} threads (limit {max_threads}). "
         f"States: " + ", ".join(f"{k}={v}" for k, v in counts.items() if v)
     ) or "No threads parsed."
 
-    return ThreadDumpAnalysis(summary=summary, counts=counts, deadlocks=deadlocks)
+
+def filter_threads(
+    threads: Iterable[ThreadInfo],
+    states: Optional[Iterable[str]] = None,
+    name_contains: Optional[str] = None,
+) -> List[ThreadInfo]:
+    wanted = set(states) if states is not None else None
+    return [
+        t
+        for t in threads
+        if (wanted is None or t.state in wanted) and (not name_contains or name_contains in t.name)
+    ]
+
+
+class _BudgetedLines:
+    """Reads decoded lines from a file object until ``max_bytes`` have been consumed.
+
+    Lines are read and decoded in batches of roughly ``batch_bytes`` so the per-line
+    cost stays in C. Binary streams are budgeted on raw bytes; text streams on
+    characters, which is the closest measure available once a stream is decoded.
+    """
+
+    def __init__(self, stream: Union[IO[bytes], IO[str]], max_bytes: int, batch_bytes: int = 1 << 20) -> None:
+        self._stream = stream
+        self._max_bytes = max_bytes
+        self._batch_bytes = batch_bytes
+        self.bytes_read = 0
+        self.truncated = False
+
+    def batches(self) -> Iterator[List[str]]:
+        while not self.truncated:
+            raw_lines = self._stream.readlines(self._batch_bytes)
+            if not raw_lines:
+                return
+            size = sum(map(len, raw_lines))
+            if self.bytes_read + size > self._max_bytes:
+                self.truncated = True
+                keep = 0
+                for raw in raw_lines:
+                    if self.bytes_read + len(raw) > self._max_bytes:
+                        break
+                    self.bytes_read += len(raw)
+                    keep += 1
+                raw_lines = raw_lines[:keep]
+            else:
+                self.bytes_read += size
+            if not raw_lines:
+                return
+            if isinstance(raw_lines[0], bytes):
+                yield b"".join(raw_lines).decode("utf-8", errors="replace").splitlines()
+            else:
+                yield "".join(raw_lines).splitlines()
+
+    def chunks(self) -> Iterator[str]:
+        """Decoded text in pieces of at most ``batch_bytes``, cut anywhere, even inside a line."""
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        while not self.truncated:
+            raw = self._stream.read(min(self._batch_bytes, self._max_bytes - self.bytes_read + 1))
+            if not raw:
+                break
+            if self.bytes_read + len(raw) > self._max_bytes:
+                self.truncated = True
+                raw = raw[:self._max_bytes - self.bytes_read]
+            self.bytes_read += len(raw)
+            text = decoder.decode(raw) if isinstance(raw, bytes) else raw
+            if text:
+                yield text
+        tail = decoder.decode(b"", final=True)
+        if tail:
+            yield tail
+
+    def __iter__(self) -> Iterator[str]:
+        for batch in self.batches():
+            yield from batch
+
+
+LineHook = Callable[[str], None]
+
+
+class DumpParser(Protocol):
+    """What feed_file drives: lines in, a ThreadDumpAnalysis out.
+
+    ``done`` turns true once the parser needs no more input (its thread budget is
+    used up); ``finish`` is called exactly once, at the end of the input.
+
+    A parser that does not need whole lines can also define ``feed_text(text)``;
+    feed_file then hands it the input in fixed-size pieces instead, so a single
+    very long line (minified JSON) is never read into memory whole.
+    """
+
+    done: bool
+
+    def feed_lines(self, lines: Iterable[Union[str, bytes]]) -> None: ...
+
+    def finish(self) -> ThreadDumpAnalysis: ...
+
+
+class ThreadDumpParser:
+    """Incremental single-pass parser for HotSpot thread dumps.
+
+    Feed lines with ``feed``/``feed_lines`` and call ``finish`` for the result.
+    ``add_hook`` registers extra callbacks for a line type; they run after the
+    built-in handler and receive the line without its line terminator.
+
+    With ``collect_threads`` (the default) every thread is recorded as a
+    ``ThreadInfo`` with its frames and lock lines; pass a shared ``strings`` table
+    to deduplicate frames across several dumps.
+    """
+
+    def __init__(
+        self,
+        max_threads: int = DEFAULT_MAX_THREADS,
+        collect_threads: bool = True,
+        strings: Optional[InternTable] = None,
+    ) -> None:
+        self.max_threads = max_threads
+        self.collect_threads = collect_threads
+        self.strings = strings if strings is not None else InternTable()
+        self.threads: List[ThreadInfo] = []
+        self.counts: Dict[str, int] = {s: 0 for s in THREAD_STATES}
+        self.total_threads = 0
+        self.deadlocks: List[Dict[str, object]] = []
+        self.done = False
+        self.stopped_early = False
+
+        # Lines left in which the current thread's state line may still appear.
+        self._state_window = 0
+        # Open deadlock banner, if any: participants so far, monitor line, lines left.
+        self._dl_threads: Optional[List[str]] = None
+        self._dl_monitor: Optional[str] = None
+        self._dl_window = 0
+        # Thread currently being built and its frames/locks so far.
+        self._current: Optional[ThreadInfo] = None
+        self._frames: List[str] = []
+        self._locks: List[LockInfo] = []
+
+        self._hooks: Dict[str, List[LineHook]] = {}
+        self._handlers: Dict[str, Callable[[str], None]] = {
+            LINE_HEADER: self._on_header,
+            LINE_STATE: self._on_state,
+            LINE_DEADLOCK: self._on_deadlock,
+            LINE_FRAME: self._on_frame,
+            LINE_LOCK: self._on_lock,
+            LINE_OTHER: self._on_other,
+        }
+
+    def add_hook(self, line_type: str, hook: LineHook) -> None:
+        if line_type not in LINE_TYPES:
+            raise ValueError(f"Unknown line type: {line_type}")
+        self._hooks.setdefault(line_type, []).append(hook)
+
+    def feed(self, line: Union[str, bytes]) -> bool:
+        self.feed_lines((line,))
+        return not self.done
+
+    def feed_lines(self, lines: Iterable[Union[str, bytes]]) -> None:
+        if self.done:
+            return
+        handlers = self._handlers
+        hooks = self._hooks
+        classify = classify_line
+        intern = self.strings.string
+        max_threads = self.max_threads
+        for line in lines:
+            if line.__class__ is not str:
+                line = line.decode("utf-8", errors="replace")  # type: ignore[union-attr]
+            line = line.rstrip("\r\n")  # type: ignore[union-attr]
+            first = line[:1]
+            # Fast paths for indented lines (frames, lock info), which make up most
+            # of a dump: record frames of the current thread directly and skip
+            # them entirely when no thread is being built.
+            if (first == "\t" or first == " ") and not self._state_window and self._dl_threads is None and not hooks:
+                if self._current is None:
+                    continue
+                stripped = line.lstrip()
+                if stripped[:3] == "at ":
+                    self._frames.append(intern(stripped[3:]))
+                    continue
+            line_type = classify(line)
+
+            if self._dl_threads is not None:
+                self._in_deadlock(line, line_type)
+            if self._state_window:
+                if line_type is not LINE_STATE:
+                    self._state_window -= 1
+            elif line_type is LINE_HEADER and self.total_threads >= max_threads and self._dl_threads is None:
+                # Stop at the next header, so the last thread keeps its full stack.
+                self.done = True
+                self.stopped_early = True
+                return
+
+            handler = handlers.get(line_type)
+            if handler is not None:
+                handler(line)
+            if hooks:
+                extra = hooks.get(line_type)
+                if extra:
+                    for hook in extra:
+                        hook(line)
+
+    def finish(self) -> ThreadDumpAnalysis:
+        self._close_deadlock()
+        self._close_thread()
+        return ThreadDumpAnalysis(
+            summary=summarize_counts(self.counts, self.max_threads),
+            counts=self.counts,
+            deadlocks=self.deadlocks,
+            truncated=self.stopped_early,
+            threads=self.threads,
+        )
+
+    def _on_header(self, line: str) -> None:
+        self._close_thread()
+        if self.total_threads >= self.max_threads:
+            return
+        self.total_threads += 1
+        self._state_window = _STATE_WINDOW
+        if self.collect_threads:
+            self._current = parse_thread_header(line, self.strings)
+
+    def _on_state(self, line: str) -> None:
+        if not self._state_window:
+            return
+        self._state_window = 0
+        rest = line.lstrip()[len(_STATE_PREFIX):].split(None, 1)
+        if rest and rest[0] in self.counts:
+            self.counts[rest[0]] += 1
+        if rest and self._current is not None:
+            self._current.state = self.strings.string(rest[0])
+
+    def _on_frame(self, line: str) -> None:
+        if self._current is not None:
+            self._frames.append(self.strings.string(line.lstrip()[3:]))
+
+    def _on_lock(self, line: str) -> None:
+        if self._current is not None:
+            lock = parse_lock_line(line.lstrip(), len(self._frames) - 1, self.strings)
+            if lock is not None:
+                self._locks.append(lock)
+
+    def _on_other(self, line: str) -> None:
+        # Indented lines such as "Locked ownable synchronizers:" still belong to the
+        # current thread; anything flush left ends it.
+        if line[:1] not in (" ", "\t"):
+            self._close_thread()
+
+    def _close_thread(self) -> None:
+        current = self._current
+        if current is None:
+            return
+        if self._frames:
+            current.frames = self.strings.stack(self._frames)
+            self._frames = []
+        if self._locks:
+            current.locks = tuple(self._locks)
+            self._locks = []
+        self.threads.append(current)
+        self._current = None
+
+    def _on_deadlock(self, line: str) -> None:
+        self._close_thread()
+        if self._dl_threads is None and self.total_threads < self.max_threads:
+            self._dl_threads = []
+            self._dl_window = _DEADLOCK_WINDOW
+
+    def _in_deadlock(self, line: str, line_type: str) -> None:
+        if line_type is LINE_BLANK:
+            self._close_deadlock()
+            return
+        if line_type is LINE_DEADLOCK:
+            # The banner line itself opens the window; participants follow it.
+            return
+        l2 = line.strip()
+        if l2.startswith('"'):
+            t = l2.split('"')
+            if len(t) >= 3:
+                self._dl_threads.append(t[1])  # type: ignore[union-attr]
+        lowered = l2.lower()
+        if 'monitor' in lowered or 'ownable synchronizer' in lowered:
+            self._dl_monitor = l2
+        self._dl_window -= 1
+        if self._dl_window == 0:
+            self._close_deadlock()
+
+    def _close_deadlock(self) -> None:
+        if self._dl_threads:
+            self.deadlocks.append({"threads": self._dl_threads, "monitor": self._dl_monitor or "unknown"})
+        self._dl_threads = None
+        self._dl_monitor = None
+
+
+def parse_thread_dump_stream(
+    lines: Iterable[Union[str, bytes]],
+    max_threads: int = DEFAULT_MAX_THREADS,
+) -> ThreadDumpAnalysis:
+    parser = ThreadDumpParser(max_threads=max_threads)
+    parser.feed_lines(lines)
+    return parser.finish()
+
+
+def feed_file(
+    parser: DumpParser,
+    stream: Union[IO[bytes], IO[str]],
+    max_bytes: int = DEFAULT_MAX_BYTES,
+    cancel: Optional[threading.Event] = None,
+) -> Tuple[int, bool]:
+    """Feeds ``stream`` to ``parser`` until EOF, the parser is done or ``max_bytes``
+    is used up. Returns (bytes read, whether the byte budget cut the input short).
+
+    ``cancel`` is checked between batches; once set, ``ParseCancelled`` is raised.
+    """
+    reader = _BudgetedLines(stream, max_bytes)
+    feed_text = getattr(parser, "feed_text", None)
+    feed: Callable[[Any], None] = feed_text if feed_text is not None else parser.feed_lines
+    batches: Iterator[Any] = reader.chunks() if feed_text is not None else reader.batches()
+    for batch in batches:
+        if cancel is not None and cancel.is_set():
+            raise ParseCancelled()
+        feed(batch)
+        if parser.done:
+            break
+    return reader.bytes_read, reader.truncated
+
+
+def parse_stream(
+    parser: DumpParser,
+    stream: Union[IO[bytes], IO[str]],
+    max_bytes: int = DEFAULT_MAX_BYTES,
+    cancel: Optional[threading.Event] = None,
+) -> ThreadDumpAnalysis:
+    """Runs ``parser`` over ``stream`` with feed_file and returns its result."""
+    bytes_read, over_budget = feed_file(parser, stream, max_bytes, cancel=cancel)
+    analysis = parser.finish()
+    analysis.truncated = analysis.truncated or over_budget
+    analysis.bytes_read = bytes_read
+    return analysis
+
+
+def parse_thread_dump_file(
+    source: Union[str, IO[bytes], IO[str]],
+    max_threads: int = DEFAULT_MAX_THREADS,
+    max_bytes: int = DEFAULT_MAX_BYTES,
+    cancel: Optional[threading.Event] = None,
+) -> ThreadDumpAnalysis:
+    """Parses a dump file in any supported format, or a HotSpot text stream."""
+    if isinstance(source, str):
+        from .formats import parse_dump_file
+
+        return parse_dump_file(source, max_threads=max_threads, max_bytes=max_bytes, cancel=cancel)
+    return parse_stream(ThreadDumpParser(max_threads=max_threads), source, max_bytes, cancel=cancel)
+
+
+def parse_thread_dump(text: str, max_threads: int = DEFAULT_MAX_THREADS) -> ThreadDumpAnalysis:
+    """Parses dump text in any supported format."""
+    from .formats import new_parser, sniff_format
+
+    parser = new_parser(sniff_format(text), max_threads=max_threads)
+    parser.feed_lines(text.splitlines())
+    return parser.finish()
@@ -0,0 +1,101 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional, TypeVar
+
+# Runs blocking tool work (file I/O, parsing) off the asyncio event loop.
+#
+# Each request gets a cancel event that is set when the request times out or the
+# awaiting task is cancelled (e.g. a client cancel notification); the parser
+# checks it between read batches and aborts with ParseCancelled. A FIFO
+# semaphore caps the number of requests running at once so several agents
+# sharing one server get their turn in arrival order.
+#
+# A timed-out request answers at once, but its worker thread runs on until the
+# work next checks the cancel event (the heap passes check it only every few
+# thousand objects). Its slot is released when the thread actually returns, so
+# the next request waits for the slot, outside its own timeout, instead of
+# waiting for a free executor thread inside it.
+
+DEFAULT_MAX_CONCURRENT = 4
+DEFAULT_TIMEOUT_S = 110.0
+
+T = TypeVar("T")
+
+
+class RequestTimeout(TimeoutError):
+    pass
+
+
+class RequestRunner:
+    def __init__(self, max_concurrent: int = DEFAULT_MAX_CONCURRENT, timeout: float = DEFAULT_TIMEOUT_S) -> None:
+        self.max_concurrent = max_concurrent
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrent, thread_name_prefix="heap-analyzer")
+        # Created on first use so it binds to the running loop (Python < 3.10).
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self.active = 0
+        self.completed = 0
+        self.timeouts = 0
+        self.cancelled = 0
+
+    @classmethod
+    def from_env(cls) -> "RequestRunner":
+        max_concurrent = os.environ.get("HEAP_ANALYZER_MAX_CONCURRENT")
+        timeout = os.environ.get("HEAP_ANALYZER_TIMEOUT_S")
+        return cls(
+            max_concurrent=int(max_concurrent) if max_concurrent else DEFAULT_MAX_CONCURRENT,
+            timeout=float(timeout) if timeout else DEFAULT_TIMEOUT_S,
+        )
+
+    async def run(self, fn: Callable[[threading.Event], T], timeout: Optional[float] = None) -> T:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrent)
+        limit = timeout if timeout is not None else self.timeout
+        cancel = threading.Event()
+        loop = asyncio.get_running_loop()
+        await self._semaphore.acquire()
+        self.active += 1
+        try:
+            future = self._executor.submit(fn, cancel)
+        except BaseException:
+            self._release()
+            raise
+        future.add_done_callback(lambda _: self._release_from_worker(loop))
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), limit)
+        except asyncio.TimeoutError:
+            cancel.set()
+            self.timeouts += 1
+            raise RequestTimeout(f"Request timed out after {limit:g}s") from None
+        except asyncio.CancelledError:
+            cancel.set()
+            self.cancelled += 1
+            raise
+        finally:
+            self.completed += 1
+
+    def _release(self) -> None:
+        self.active -= 1
+        self._semaphore.release()  # type: ignore[union-attr]
+
+    def _release_from_worker(self, loop: asyncio.AbstractEventLoop) -> None:
+        try:
+            loop.call_soon_threadsafe(self._release)
+        except RuntimeError:
+            # The loop is gone (server shutting down); so is its semaphore.
+            pass
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "max_concurrent": self.max_concurrent,
+            "timeout_s": self.timeout,
+            "active": self.active,
+            "completed": self.completed,
+            "timeouts": self.timeouts,
+            "cancelled": self.cancelled,
+        }
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,138 @@
+import glob as globmod
+import os
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from .defaults import DEFAULT_MAX_STUCK, DEFAULT_MIN_SNAPSHOTS, DEFAULT_STUCK_STATES
+from .parallel import map_concurrently
+from .parser import THREAD_STATES, ThreadDumpAnalysis
+
+# Time-series analysis over N thread dumps of the same JVM (e.g. jstack every 5s).
+#
+# Each dump is reduced to a compact snapshot of (state, top frame) per thread as
+# soon as it is parsed, and the series is built in a single pass over those
+# snapshots, so cost is linear in threads x dumps with no pairwise comparisons.
+
+MAX_SERIES_FILES = 500
+
+ThreadKey = Tuple[str, Optional[str]]
+Snapshot = Tuple[Dict[str, int], Dict[ThreadKey, Tuple[Optional[str], Optional[str]]]]
+
+
+def resolve_series_paths(paths: Optional[Sequence[str]] = None, pattern: Optional[str] = None) -> List[str]:
+    resolved: List[str] = []
+    if paths is not None:
+        if not isinstance(paths, (list, tuple)) or not all(isinstance(p, str) and p for p in paths):
+            raise ValueError("'paths' must be a list of non-empty strings")
+        resolved.extend(paths)
+    if pattern is not None:
+        if not isinstance(pattern, str) or not pattern:
+            raise ValueError("'glob' must be a non-empty string")
+        matches = sorted(p for p in globmod.glob(pattern) if os.path.isfile(p))
+        if not matches:
+            raise ValueError(f"No files match: {pattern}")
+        resolved.extend(matches)
+    if not resolved:
+        raise ValueError("Provide 'paths' or 'glob'")
+    if len(resolved) > MAX_SERIES_FILES:
+        raise ValueError(f"Too many files ({len(resolved)} > {MAX_SERIES_FILES})")
+    for p in resolved:
+        if not os.path.exists(p):
+            raise ValueError(f"File not found: {p}")
+        if os.path.isdir(p):
+            raise ValueError(f"Path is a directory: {p}")
+    return resolved
+
+
+def snapshot(analysis: ThreadDumpAnalysis) -> Snapshot:
+    threads = {(t.name, t.tid): (t.state, t.top_frame) for t in analysis.threads}
+    return dict(analysis.counts), threads
+
+
+def parse_snapshots(
+    paths: Sequence[str],
+    parse: Callable[[str], ThreadDumpAnalysis],
+    max_workers: int = 8,
+) -> List[Snapshot]:
+    return map_concurrently(lambda p: snapshot(parse(p)), paths, max_workers=max_workers)
+
+
+def build_series(
+    snapshots: Sequence[Snapshot],
+    min_snapshots: int = DEFAULT_MIN_SNAPSHOTS,
+    stuck_states: Sequence[str] = DEFAULT_STUCK_STATES,
+    timelines: str = "stuck",
+    max_stuck: int = DEFAULT_MAX_STUCK,
+) -> Dict[str, object]:
+    # min_snapshots is not lowered to a short series: with fewer dumps than that,
+    # no thread has been seen long enough to call it stuck.
+    n = len(snapshots)
+    state_series: Dict[str, List[int]] = {s: [0] * n for s in THREAD_STATES}
+
+    # Per thread: state timeline, plus the longest run of an identical
+    # (state, top frame) pair in one of the stuck states and the run currently
+    # in progress.
+    stuck_state_set = set(stuck_states)
+    state_timeline: Dict[ThreadKey, List[Optional[str]]] = {}
+    current_run: Dict[ThreadKey, Tuple[Tuple[Optional[str], Optional[str]], int, int]] = {}
+    best_run: Dict[ThreadKey, Tuple[Tuple[Optional[str], Optional[str]], int, int]] = {}
+
+    for i, (counts, threads) in enumerate(snapshots):
+        for state, count in counts.items():
+            state_series.setdefault(state, [0] * n)[i] = count
+        for key, sig in threads.items():
+            timeline = state_timeline.get(key)
+            if timeline is None:
+                timeline = state_timeline[key] = [None] * n
+            timeline[i] = sig[0]
+
+            run = current_run.get(key)
+            if run is not None and run[0] == sig and run[2] == i - 1:
+                run = (sig, run[1], i)
+            else:
+                run = (sig, i, i)
+            current_run[key] = run
+            if sig[0] not in stuck_state_set or sig[1] is None:
+                continue
+            best = best_run.get(key)
+            if best is None or run[2] - run[1] > best[2] - best[1]:
+                best_run[key] = run
+
+    stuck: List[Dict[str, object]] = []
+    for key, ((state, top), first, last) in best_run.items():
+        length = last - first + 1
+        if length >= min_snapshots:
+            stuck.append({
+                "name": key[0],
+                "tid": key[1],
+                "state": state,
+                "top_frame": top,
+                "snapshots": length,
+                "first_index": first,
+                "last_index": last,
+            })
+    stuck.sort(key=lambda s: (-s["snapshots"], s["name"]))  # type: ignore[operator]
+    stuck_total = len(stuck)
+    stuck = stuck[:max_stuck]
+
+    payload: Dict[str, object] = {
+        "summary": (
+            f"{n} dumps, {len(state_timeline)} distinct threads, "
+            f"{stuck_total} stuck (same state and top frame for >= {min_snapshots} consecutive dumps)"
+            + (f"; {n} dumps are too few to find stuck threads" if n < min_snapshots else "")
+        ),
+        "dumps": n,
+        "state_series": {s: v for s, v in state_series.items() if any(v)},
+        "stuck_threads": stuck,
+        "stuck_total": stuck_total,
+    }
+    if timelines == "all":
+        keys: List[ThreadKey] = list(state_timeline)
+    elif timelines == "stuck":
+        keys = [(s["name"], s["tid"]) for s in stuck]  # type: ignore[misc]
+    else:
+        keys = []
+    if keys:
+        payload["timelines"] = [
+            {"name": k[0], "tid": k[1], "states": state_timeline[k]} for k in keys
+        ]
+    return payload
@@ -0,0 +1,318 @@
+import contextvars
+import os
+import stat
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Callable, Deque, Dict, Iterator, List, Optional, Tuple
+
+if TYPE_CHECKING:
+    import cProfile
+
+# Per-request performance telemetry and on-demand profiling.
+#
+# Every call is counted per tool (calls, errors, latency percentiles over the last
+# _LATENCY_WINDOW calls); that costs two clock reads and a lock. With telemetry on
+# (HEAP_ANALYZER_TELEMETRY=on, or =attach to also add a "telemetry" object to every
+# response) a RequestStats is bound to the request's context and the code below
+# the handler reports into it: stage timings (digest, parse, serialize, ...) via
+# stage() and counters (bytes, lines, threads, cache hits) via count(). Both look
+# up a context variable and return at once when no request is being recorded, so
+# they are safe to leave in hot-ish paths. Stage times of concurrent parses (e.g.
+# compare_thread_dumps) are summed, so stages can add up to more than the total.
+#
+# A tool can be armed to profile its next call: cProfile stats and a tracemalloc
+# snapshot are written to HEAP_ANALYZER_PROFILE_DIR. The files are read back with
+# pstats/tracemalloc, which unpickle, so that directory must be private to the
+# server's user: it is created with mode 0700, and one owned by another user or
+# writable by group or others is refused. Without it, a fresh directory is made
+# with tempfile.mkdtemp() when the first profile is written. cProfile sees the
+# thread that runs the handler; parses offloaded to pool workers show up as
+# waits. The profilers are imported when the first profile is taken.
+
+TELEMETRY_MODES = ("off", "on", "attach")
+PROFILE_DIR_PREFIX = "heap-analyzer-profiles-"
+_LATENCY_WINDOW = 256
+_MAX_PROFILES = 20
+
+_current: "contextvars.ContextVar[Optional[RequestStats]]" = contextvars.ContextVar(
+    "heap_analyzer_request", default=None
+)
+
+
+# Stages timed below the handler; whatever else the handler spends is "analyze".
+_IO_STAGES = ("digest", "cache_load", "parse")
+
+
+def _private_dir(path: str) -> str:
+    """Creates ``path`` with mode 0700 if needed; raises OSError unless only this user can write it."""
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    st = os.stat(path)
+    if not stat.S_ISDIR(st.st_mode) or st.st_mode & (stat.S_IWGRP | stat.S_IWOTH):
+        raise OSError(f"{path} is writable by group or others")
+    if hasattr(os, "getuid") and st.st_uid != os.getuid():
+        raise OSError(f"{path} is owned by another user")
+    return path
+
+
+def _stage_report(stages: Dict[str, float]) -> Dict[str, float]:
+    report = {k: round(v * 1e3, 3) for k, v in stages.items()}
+    handler = stages.get("handler")
+    if handler is not None:
+        report["analyze"] = round(max(0.0, handler - sum(stages.get(k, 0.0) for k in _IO_STAGES)) * 1e3, 3)
+    return report
+
+
+class RequestStats:
+    __slots__ = ("tool", "stages", "counters", "profile", "_start", "_lock")
+
+    def __init__(self, tool: str) -> None:
+        self.tool = tool
+        self.stages: Dict[str, float] = {}
+        self.counters: Dict[str, int] = {}
+        self.profile: Optional[Dict[str, object]] = None
+        self._start = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def add_time(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def add(self, counter: str, n: int = 1) -> None:
+        with self._lock:
+            self.counters[counter] = self.counters.get(counter, 0) + n
+
+    def to_dict(self) -> Dict[str, object]:
+        with self._lock:
+            stages = _stage_report(self.stages)
+            counters = dict(self.counters)
+        out: Dict[str, object] = {
+            "tool": self.tool,
+            "elapsed_ms": round((time.perf_counter() - self._start) * 1e3, 3),
+            "stages_ms": stages,
+            "counters": counters,
+        }
+        if self.profile is not None:
+            out["profile"] = self.profile
+        return out
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    stats = _current.get()
+    if stats is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        stats.add_time(name, time.perf_counter() - start)
+
+
+def count(name: str, n: int = 1) -> None:
+    stats = _current.get()
+    if stats is not None:
+        stats.add(name, n)
+
+
+def _percentile(ordered: List[float], p: float) -> float:
+    return ordered[min(len(ordered) - 1, int(p / 100 * len(ordered)))]
+
+
+class _ToolTotals:
+    __slots__ = ("calls", "errors", "seconds", "max_seconds", "latencies", "stages", "counters")
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.errors = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+        self.latencies: Deque[float] = deque(maxlen=_LATENCY_WINDOW)
+        self.stages: Dict[str, float] = {}
+        self.counters: Dict[str, int] = {}
+
+    def to_dict(self) -> Dict[str, object]:
+        ordered = sorted(self.latencies)
+        out: Dict[str, object] = {
+            "calls": self.calls,
+            "errors": self.errors,
+            "total_s": round(self.seconds, 3),
+            "max_ms": round(self.max_seconds * 1e3, 3),
+        }
+        if ordered:
+            for p in (50, 90, 99):
+                out[f"p{p}_ms"] = round(_percentile(ordered, p) * 1e3, 3)
+        if self.stages:
+            out["stages_ms"] = _stage_report(self.stages)
+        if self.counters:
+            out["counters"] = dict(self.counters)
+        return out
+
+
+class Request:
+    """Handle for one call: ``stats`` is None unless telemetry is on; set ``ok``."""
+
+    __slots__ = ("stats", "ok")
+
+    def __init__(self, stats: Optional[RequestStats]) -> None:
+        self.stats = stats
+        self.ok = False
+
+
+class Telemetry:
+    def __init__(self, mode: str = "off", profile_dir: Optional[str] = None) -> None:
+        if mode not in TELEMETRY_MODES:
+            raise ValueError(f"Unknown telemetry mode: {mode}")
+        self.mode = mode
+        self._profile_dir = profile_dir
+        # Extra sections for server_stats, e.g. the request runner's counters.
+        self.sources: Dict[str, Callable[[], Dict[str, object]]] = {}
+        self._started = time.time()
+        self._tools: Dict[str, _ToolTotals] = {}
+        self._armed: Dict[str, int] = {}
+        self._profiles: Deque[Dict[str, object]] = deque(maxlen=_MAX_PROFILES)
+        self._profile_seq = 0
+        self._lock = threading.Lock()
+        # Only one request is profiled at a time: cProfile is per thread and
+        # tracemalloc is process wide.
+        self._profiling = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "Telemetry":
+        # HEAP_ANALYZER_TELEMETRY=on records stages and counters per request, =attach
+        # also returns them with each response; HEAP_ANALYZER_PROFILE_DIR is where
+        # armed requests write their cProfile and tracemalloc snapshots.
+        mode = (os.environ.get("HEAP_ANALYZER_TELEMETRY") or "off").lower()
+        return cls(mode=mode, profile_dir=os.environ.get("HEAP_ANALYZER_PROFILE_DIR") or None)
+
+    @property
+    def profile_dir(self) -> Optional[str]:
+        """The configured directory, or the one made for the first profile; None before that."""
+        return self._profile_dir
+
+    def _ensure_profile_dir(self) -> str:
+        if self._profile_dir is None:
+            import tempfile
+
+            self._profile_dir = tempfile.mkdtemp(prefix=PROFILE_DIR_PREFIX)
+            return self._profile_dir
+        return _private_dir(self._profile_dir)
+
+    @property
+    def attach(self) -> bool:
+        return self.mode == "attach"
+
+    def arm_profile(self, tool: str, calls: int = 1) -> None:
+        with self._lock:
+            self._armed[tool] = self._armed.get(tool, 0) + calls
+
+    @contextmanager
+    def request(self, tool: str) -> Iterator[Request]:
+        profiled = self._take_armed(tool)
+        stats = RequestStats(tool) if self.mode != "off" or profiled else None
+        handle = Request(stats)
+        token = _current.set(stats) if stats is not None else None
+        profiler = self._start_profile() if profiled else None
+        start = time.perf_counter()
+        try:
+            yield handle
+        finally:
+            elapsed = time.perf_counter() - start
+            if profiler is not None:
+                self._finish_profile(tool, profiler, stats)  # type: ignore[arg-type]
+            if token is not None:
+                _current.reset(token)
+            self._record(tool, elapsed, handle)
+
+    def snapshot(self) -> Dict[str, object]:
+        with self._lock:
+            tools = {name: totals.to_dict() for name, totals in sorted(self._tools.items())}
+            profiling = {
+                "dir": self.profile_dir,
+                "armed": dict(self._armed),
+                "recent": list(self._profiles),
+            }
+        out: Dict[str, object] = {
+            "uptime_s": round(time.time() - self._started, 3),
+            "telemetry": self.mode,
+            "tools": tools,
+            "profiling": profiling,
+        }
+        for name, source in self.sources.items():
+            out[name] = source()
+        return out
+
+    def _take_armed(self, tool: str) -> bool:
+        if not self._armed:
+            return False
+        with self._lock:
+            left = self._armed.get(tool)
+            if not left or not self._profiling.acquire(blocking=False):
+                return False
+            if left == 1:
+                del self._armed[tool]
+            else:
+                self._armed[tool] = left - 1
+            return True
+
+    def _start_profile(self) -> Tuple["cProfile.Profile", bool]:
+        import cProfile
+        import tracemalloc
+
+        started = not tracemalloc.is_tracing()
+        if started:
+            tracemalloc.start(10)
+        tracemalloc.reset_peak()
+        profiler = cProfile.Profile()
+        profiler.enable()
+        return profiler, started
+
+    def _finish_profile(self, tool: str, profile: Tuple["cProfile.Profile", bool], stats: RequestStats) -> None:
+        import tracemalloc
+
+        profiler, started = profile
+        try:
+            profiler.disable()
+            snapshot = tracemalloc.take_snapshot()
+            _, peak = tracemalloc.get_traced_memory()
+            if started:
+                tracemalloc.stop()
+            with self._lock:
+                self._profile_seq += 1
+                seq = self._profile_seq
+            base = os.path.join(self._ensure_profile_dir(), f"{tool}-{int(time.time())}-{seq}")
+            profiler.dump_stats(base + ".prof")
+            snapshot.dump(base + ".tracemalloc")
+            record: Dict[str, object] = {
+                "tool": tool,
+                "cprofile": base + ".prof",
+                "tracemalloc": base + ".tracemalloc",
+                "traced_peak_bytes": peak,
+            }
+        except OSError as e:
+            record = {"tool": tool, "error": f"Could not write profile: {e}"}
+        finally:
+            self._profiling.release()
+        stats.profile = record
+        with self._lock:
+            self._profiles.append(record)
+
+    def _record(self, tool: str, elapsed: float, handle: Request) -> None:
+        stats = handle.stats
+        with self._lock:
+            totals = self._tools.get(tool)
+            if totals is None:
+                totals = self._tools[tool] = _ToolTotals()
+            totals.calls += 1
+            if not handle.ok:
+                totals.errors += 1
+            totals.seconds += elapsed
+            totals.max_seconds = max(totals.max_seconds, elapsed)
+            totals.latencies.append(elapsed)
+            if stats is not None:
+                for k, v in stats.stages.items():
+                    totals.stages[k] = totals.stages.get(k, 0.0) + v
+                for k, n in stats.counters.items():
+                    totals.counters[k] = totals.counters.get(k, 0) + n
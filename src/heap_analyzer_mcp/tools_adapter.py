@@ -1,130 +1,237 @@
-import json
-import os
-from dataclasses import dataclass
-from typing import Dict, Optional
-
-from .parser import parse_thread_dump
+import threading
+from typing import Any, List, Optional
+
+from .clusters import DEFAULT_CLUSTER_DEPTH, DEFAULT_MAX_CLUSTERS
+from .defaults import (
+    DEFAULT_CAPTURE_INTERVAL_S,
+    DEFAULT_MAX_CLASSES,
+    DEFAULT_MAX_NODES,
+    DEFAULT_MAX_PATH,
+    DEFAULT_MAX_PAUSES,
+    DEFAULT_MAX_RETAINERS,
+    DEFAULT_MAX_STUCK,
+    DEFAULT_MIN_SNAPSHOTS,
+    DEFAULT_TREND_BUCKETS,
+)
+from .engine import Engine, Result
+from .pagination import DEFAULT_MAX_RESPONSE_BYTES, DEFAULT_PAGE_LIMIT
+from .parser import DEFAULT_MAX_BYTES, DEFAULT_MAX_FRAMES, DEFAULT_MAX_THREADS
+
+# Plain-Python entry points for the tools, for tests and scripts. Each function
+# dispatches through the same Engine and tool registry as the MCP server in
+# __main__.py and returns a Result instead of MCP types; arguments left as None
+# count as not given.
+
+# Shared engine (parse pool and cache), like the per-server one in __main__.py.
+# Created on the first call, so importing this module costs nothing.
+_engine: Optional[Engine] = None
+_engine_lock = threading.Lock()
+
+
+def _shared_engine() -> Engine:
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = Engine.from_env()
+    return _engine
+
+
+def _call(tool: str, **arguments: Any) -> Result:
+    return _shared_engine().call(tool, {k: v for k, v in arguments.items() if v is not None})
+
+
+# analyze_thread_dump
+
+def analyze_tool_call(
+    path: Optional[str] = None,
+    max_threads: int = DEFAULT_MAX_THREADS,
+    max_bytes: int = DEFAULT_MAX_BYTES,
+    offset: int = 0,
+    limit: int = DEFAULT_PAGE_LIMIT,
+    cursor: Optional[str] = None,
+    max_response_bytes: int = DEFAULT_MAX_RESPONSE_BYTES,
+) -> Result:
+    return _call(
+        "analyze_thread_dump",
+        path=path, max_threads=max_threads, max_bytes=max_bytes, offset=offset, limit=limit, cursor=cursor,
+        max_response_bytes=max_response_bytes,
+    )
 
 
-@dataclass
-class Result:
-    ok: bool
-    text: Optional[str] = None
-    error_code: Optional[str] = None
-    error_message: Optional[str] = None
+# analyze_heap_dump
 
-    @staticmethod
-    def ok_text(payload: Dict) -> "Result":
-        return Result(ok=True, text=json.dumps(payload))
+def heap_dump_tool_call(
+    path: str,
+    max_classes: int = DEFAULT_MAX_CLASSES,
+    sort_by: str = "shallow_size",
+) -> Result:
+    return _call("analyze_heap_dump", path=path, max_classes=max_classes, sort_by=sort_by)
 
-    @staticmethod
-    def err(code: str, message: str) -> "Result":
-        return Result(ok=False, error_code=code, error_message=message)
 
+# find_heap_retainers
 
-# Mirrors analyze_thread_dump tool logic from __main__.py but without MCP types
+def heap_retainers_tool_call(
+    path: str,
+    max_retainers: int = DEFAULT_MAX_RETAINERS,
+    max_path: int = DEFAULT_MAX_PATH,
+) -> Result:
+    return _call("find_heap_retainers", path=path, max_retainers=max_retainers, max_path=max_path)
 
-def analyze_tool_call(path: str, max_threads: int = 5000) -> Result:
-    if not isinstance(path, str) or not path:
-        return Result.err("INVALID_PARAMS", "'path' must be a non-empty string")
-    if not isinstance(max_threads, int) or max_threads <= 0:
-        return Result.err("INVALID_PARAMS", "'max_threads' must be a positive integer")
 
-    try:
-        if not os.path.exists(path):
-            return Result.err("INVALID_PARAMS", f"File not found: {path}")
-        if os.path.isdir(path):
-            return Result.err("INVALID_PARAMS", f"Path is a directory: {path}")
-        if os.path.getsize(path) > 10 * 1024 * 1024:
-            return Result.err("INTERNAL_ERROR", "File too large (>10MB)")
+# list_heap_instances
 
-        with open(path, "r", encoding="utf-8", errors="replace") as f:
-            text = f.read()
-        analysis = parse_thread_dump(text, max_threads=max_threads)
-        payload = {
-            "summary": analysis.summary,
-            "counts": analysis.counts,
-            "deadlocks": analysis.deadlocks,
-        }
-        return Result.ok_text(payload)
-    except Exception as e:  # pragma: no cover - defensive parity
-        return Result.err("INTERNAL_ERROR", f"Exception: {e}")
+def heap_instances_tool_call(
+    path: Optional[str] = None,
+    class_name: Optional[str] = None,
+    offset: int = 0,
+    limit: int = DEFAULT_PAGE_LIMIT,
+    cursor: Optional[str] = None,
+    max_response_bytes: int = DEFAULT_MAX_RESPONSE_BYTES,
+) -> Result:
+    return _call(
+        "list_heap_instances",
+        path=path, class_name=class_name, offset=offset, limit=limit, cursor=cursor,
+        max_response_bytes=max_response_bytes,
+    )
 
 
-# Mirrors compare_thread_dumps tool logic from __main__.py but without MCP types
+# compare_thread_dumps
 
 def compare_tool_call(
     path_a: str,
     path_b: str,
-    max_threads: int = 5000,
+    max_threads: int = DEFAULT_MAX_THREADS,
     diff_mode: str = "full",
+    max_bytes: int = DEFAULT_MAX_BYTES,
+) -> Result:
+    return _call(
+        "compare_thread_dumps",
+        path_a=path_a, path_b=path_b, max_threads=max_threads, diff_mode=diff_mode, max_bytes=max_bytes,
+    )
+
+
+# analyze_thread_dump_series
+
+def series_tool_call(
+    paths: Optional[List[str]] = None,
+    glob: Optional[str] = None,
+    max_threads: int = DEFAULT_MAX_THREADS,
+    max_bytes: int = DEFAULT_MAX_BYTES,
+    min_snapshots: int = DEFAULT_MIN_SNAPSHOTS,
+    stuck_states: Optional[List[str]] = None,
+    timelines: str = "stuck",
+    max_stuck: int = DEFAULT_MAX_STUCK,
+    capture: Optional[str] = None,
 ) -> Result:
-    if not isinstance(path_a, str) or not path_a:
-        return Result.err("INVALID_PARAMS", "'path_a' must be a non-empty string")
-    if not isinstance(path_b, str) or not path_b:
-        return Result.err("INVALID_PARAMS", "'path_b' must be a non-empty string")
-    if not isinstance(max_threads, int) or max_threads <= 0:
-        return Result.err("INVALID_PARAMS", "'max_threads' must be a positive integer")
-    if diff_mode not in ("summary", "states", "full"):
-        return Result.err("INVALID_PARAMS", "'diff_mode' must be one of: summary|states|full")
-
-    try:
-        for p in (path_a, path_b):
-            if not os.path.exists(p):
-                return Result.err("INVALID_PARAMS", f"File not found: {p}")
-            if os.path.isdir(p):
-                return Result.err("INVALID_PARAMS", f"Path is a directory: {p}")
-            if os.path.getsize(p) > 10 * 1024 * 1024:
-                return Result.err("INTERNAL_ERROR", f"File too large (>10MB): {p}")
-
-        with open(path_a, "r", encoding="utf-8", errors="replace") as fa:
-            text_a = fa.read()
-        with open(path_b, "r", encoding="utf-8", errors="replace") as fb:
-            text_b = fb.read()
-
-        a = parse_thread_dump(text_a, max_threads=max_threads)
-        b = parse_thread_dump(text_b, max_threads=max_threads)
-
-        states = sorted(set(list(a.counts.keys()) + list(b.counts.keys())))
-        deltas = {s: (b.counts.get(s, 0) - a.counts.get(s, 0)) for s in states}
-
-        deadlock_note: Optional[str] = None
-        if a.deadlocks and not b.deadlocks:
-            deadlock_note = "Deadlocks present only in A"
-        elif b.deadlocks and not a.deadlocks:
-            deadlock_note = "Deadlocks present only in B"
-        elif a.deadlocks and b.deadlocks:
-            deadlock_note = "Deadlocks present in both"
-
-        def make_summary() -> str:
-            parts = []
-            if diff_mode in ("summary", "full", "states"):
-                changes = ", ".join(f"{s}={deltas[s]:+d}" for s in states if deltas[s] != 0) or "no changes"
-                parts.append("State deltas: " + changes)
-            if deadlock_note:
-                parts.append(deadlock_note)
-            return "; ".join(parts) if parts else "No notable differences"
-
-        payload: Dict[str, object] = {
-            "summary": make_summary(),
-            "counts_a": a.counts,
-            "counts_b": b.counts,
-            "deltas": deltas,
-            "deadlocks_a": a.deadlocks,
-            "deadlocks_b": b.deadlocks,
-            "notes": deadlock_note or "",
-        }
-
-        if diff_mode == "summary":
-            payload = {"summary": payload["summary"], "notes": payload["notes"]}
-        elif diff_mode == "states":
-            payload = {
-                "summary": payload["summary"],
-                "counts_a": a.counts,
-                "counts_b": b.counts,
-                "deltas": deltas,
-            }
-
-        return Result.ok_text(payload)
-    except Exception as e:  # pragma: no cover - defensive parity
-        return Result.err("INTERNAL_ERROR", f"Exception: {e}")
+    return _call(
+        "analyze_thread_dump_series",
+        paths=paths, glob=glob, max_threads=max_threads, max_bytes=max_bytes, min_snapshots=min_snapshots,
+        stuck_states=stuck_states, timelines=timelines, max_stuck=max_stuck, capture=capture,
+    )
+
+
+# cluster_thread_stacks
+
+def cluster_tool_call(
+    path: Optional[str] = None,
+    max_threads: int = DEFAULT_MAX_THREADS,
+    max_bytes: int = DEFAULT_MAX_BYTES,
+    depth: int = DEFAULT_CLUSTER_DEPTH,
+    max_clusters: int = DEFAULT_MAX_CLUSTERS,
+    offset: int = 0,
+    cursor: Optional[str] = None,
+    max_response_bytes: int = DEFAULT_MAX_RESPONSE_BYTES,
+) -> Result:
+    return _call(
+        "cluster_thread_stacks",
+        path=path, max_threads=max_threads, max_bytes=max_bytes, depth=depth, max_clusters=max_clusters,
+        offset=offset, cursor=cursor, max_response_bytes=max_response_bytes,
+    )
+
+
+# list_threads
+
+def list_threads_tool_call(
+    path: Optional[str] = None,
+    max_threads: int = DEFAULT_MAX_THREADS,
+    max_bytes: int = DEFAULT_MAX_BYTES,
+    states: Optional[List[str]] = None,
+    name_contains: Optional[str] = None,
+    max_frames: int = DEFAULT_MAX_FRAMES,
+    offset: int = 0,
+    limit: int = DEFAULT_PAGE_LIMIT,
+    cursor: Optional[str] = None,
+    max_response_bytes: int = DEFAULT_MAX_RESPONSE_BYTES,
+) -> Result:
+    return _call(
+        "list_threads",
+        path=path, max_threads=max_threads, max_bytes=max_bytes, states=states, name_contains=name_contains,
+        max_frames=max_frames, offset=offset, limit=limit, cursor=cursor,
+        max_response_bytes=max_response_bytes,
+    )
+
+
+# aggregate_call_tree
+
+def call_tree_tool_call(
+    paths: Optional[List[str]] = None,
+    glob: Optional[str] = None,
+    max_threads: int = DEFAULT_MAX_THREADS,
+    max_bytes: int = DEFAULT_MAX_BYTES,
+    states: Optional[List[str]] = None,
+    format: str = "tree",
+    max_nodes: int = DEFAULT_MAX_NODES,
+    capture: Optional[str] = None,
+) -> Result:
+    return _call(
+        "aggregate_call_tree",
+        paths=paths, glob=glob, max_threads=max_threads, max_bytes=max_bytes, states=states, format=format,
+        max_nodes=max_nodes, capture=capture,
+    )
+
+
+# analyze_gc_log
+
+def gc_log_tool_call(
+    path: str,
+    include_rotated: bool = True,
+    max_bytes: int = DEFAULT_MAX_BYTES,
+    max_pauses: int = DEFAULT_MAX_PAUSES,
+    buckets: int = DEFAULT_TREND_BUCKETS,
+) -> Result:
+    return _call(
+        "analyze_gc_log",
+        path=path, include_rotated=include_rotated, max_bytes=max_bytes, max_pauses=max_pauses,
+        buckets=buckets,
+    )
+
+
+# server_stats
+
+def server_stats_tool_call(profile_next: Optional[str] = None) -> Result:
+    return _call("server_stats", profile_next=profile_next)
+
+
+# capture_thread_dumps
+
+def capture_tool_call(
+    pid: int,
+    count: int = 1,
+    interval_s: float = DEFAULT_CAPTURE_INTERVAL_S,
+    tool: str = "jcmd",
+    max_threads: int = DEFAULT_MAX_THREADS,
+    max_bytes: int = DEFAULT_MAX_BYTES,
+    wait: bool = False,
+) -> Result:
+    return _call(
+        "capture_thread_dumps",
+        pid=pid, count=count, interval_s=interval_s, tool=tool, max_threads=max_threads, max_bytes=max_bytes,
+        wait=wait,
+    )
+
+
+# list_capture_sessions
+
+def capture_sessions_tool_call(session: Optional[str] = None, stop: bool = False) -> Result:
+    return _call("list_capture_sessions", session=session, stop=stop)
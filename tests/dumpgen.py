@@ -0,0 +1,228 @@
+import random
+from typing import Dict, Iterator, List
+
+# Deterministic generator of realistic HotSpot thread dumps, for tests and benchmarks.
+#
+# The same arguments always give the same dump, byte for byte. Threads are a mix of
+# parked pool workers, sleepers, socket readers, Object.wait() callers and, with
+# lock_density, monitor holders with BLOCKED waiters queued behind them. Each of
+# the `deadlocks` cycles is `cycle_length` BLOCKED threads that each hold one
+# monitor and wait for the next, listed in the JVM's "Found one Java-level
+# deadlock" section at the end as HotSpot prints it. The `jdk` variant picks the
+# banner, header fields and frame layout of that release:
+#
+#   8   no cpu/elapsed, frames without module prefix
+#   11  cpu= and elapsed= in headers, "java.base@11.0.x/" frame prefixes
+#   17  as 11, plus the "Threads class SMR info" block
+#   21  "#N [os-id]" headers with a decimal nid
+#
+# `expected` holds what a parser should report: thread counts per state and the
+# deadlock cycles (thread names in wait order).
+
+JDK_VARIANTS = ("8", "11", "17", "21")
+
+_BANNERS = {
+    "8": ("Java HotSpot(TM) 64-Bit Server VM (25.392-b08 mixed mode)", None),
+    "11": ("OpenJDK 64-Bit Server VM (11.0.22+7 mixed mode)", "11.0.22"),
+    "17": ("OpenJDK 64-Bit Server VM (17.0.10+7 mixed mode, sharing)", "17.0.10"),
+    "21": ("OpenJDK 64-Bit Server VM (21.0.2+13-LTS mixed mode, sharing)", "21.0.2"),
+}
+
+# Roles of ordinary threads: (weight, state line, native state).
+_ROLES = {
+    "parked": (5, "WAITING (parking)", "waiting on condition"),
+    "sleeping": (2, "TIMED_WAITING (sleeping)", "waiting on condition"),
+    "socket": (2, "RUNNABLE", "runnable"),
+    "object_wait": (1, "WAITING (on object monitor)", "in Object.wait()"),
+}
+_ROLE_NAMES = tuple(_ROLES)
+_ROLE_WEIGHTS = tuple(w for w, _, _ in _ROLES.values())
+
+_APP_PACKAGES = ("com.example.orders", "com.example.billing", "com.example.search", "com.example.gateway")
+_APP_CLASSES = ("Service", "Repository", "Handler", "Client", "Processor", "Controller")
+_APP_METHODS = ("handle", "process", "load", "apply", "call", "execute")
+
+
+class DumpGenerator:
+    def __init__(
+        self,
+        threads: int = 200,
+        depth: int = 12,
+        lock_density: float = 0.1,
+        deadlocks: int = 0,
+        cycle_length: int = 2,
+        jdk: str = "17",
+        seed: int = 1,
+    ):
+        if jdk not in JDK_VARIANTS:
+            raise ValueError(f"jdk must be one of {', '.join(JDK_VARIANTS)}")
+        if cycle_length < 2:
+            raise ValueError("cycle_length must be at least 2")
+        self.threads = threads
+        self.depth = depth
+        self.lock_density = lock_density
+        self.deadlocks = deadlocks
+        self.cycle_length = cycle_length
+        self.jdk = jdk
+        self.seed = seed
+        self.expected: Dict[str, object] = {}
+
+    # Frames
+
+    def _java(self, cls, method, source, line):
+        module = _BANNERS[self.jdk][1]
+        prefix = f"java.base@{module}/" if module else ""
+        location = "Native Method" if line is None else f"{source}:{line}"
+        return f"\tat {cls}.{method}({prefix}{location})\n"
+
+    def _app_frames(self, rnd, count):
+        frames = []
+        for _ in range(count):
+            pkg = rnd.choice(_APP_PACKAGES)
+            cls = rnd.choice(_APP_CLASSES)
+            method = rnd.choice(_APP_METHODS)
+            frames.append(f"\tat {pkg}.{cls}.{method}({cls}.java:{rnd.randint(20, 400)})\n")
+        return frames
+
+    def _tail(self):
+        return [self._java("java.lang.Thread", "run", "Thread.java", 840)]
+
+    # Threads
+
+    def _header(self, index, name, daemon, native):
+        number = index + 10
+        os_id = 20000 + index
+        tid = f"0x00007f3c{index:08x}"
+        fields = f"#{number} "
+        if self.jdk == "21":
+            fields += f"[{os_id}] "
+        if daemon:
+            fields += "daemon "
+        fields += "prio=5 os_prio=0 "
+        if self.jdk != "8":
+            fields += f"cpu={index % 997 + 0.25:.2f}ms elapsed={120 + index % 60:.2f}s "
+        nid = str(os_id) if self.jdk == "21" else hex(os_id)
+        return f'"{name}" {fields}tid={tid} nid={nid} {native}  [0x00007f3b{index:08x}]\n'
+
+    def _thread(self, index, name, state, native, body, daemon=True):
+        lines = [self._header(index, name, daemon, native), f"   java.lang.Thread.State: {state}\n"]
+        lines.extend(body)
+        lines.append("\n")
+        lines.append("   Locked ownable synchronizers:\n")
+        lines.append("\t- None\n")
+        lines.append("\n")
+        return lines
+
+    def _role_body(self, rnd, role, index):
+        fill = max(0, self.depth - 4)
+        if role == "parked":
+            cond = f"0x0000000712{index % 64:06x}"
+            return [
+                self._java("jdk.internal.misc.Unsafe" if self.jdk != "8" else "sun.misc.Unsafe", "park", "", None),
+                f"\t- parking to wait for  <{cond}> (a java.util.concurrent.locks.AbstractQueuedSynchronizer$ConditionObject)\n",
+                self._java("java.util.concurrent.locks.LockSupport", "park", "LockSupport.java", 341),
+                self._java("java.util.concurrent.LinkedBlockingQueue", "take", "LinkedBlockingQueue.java", 435),
+                self._java("java.util.concurrent.ThreadPoolExecutor", "getTask", "ThreadPoolExecutor.java", 1062),
+            ] + self._app_frames(rnd, max(0, fill - 1)) + self._tail()
+        if role == "sleeping":
+            return [self._java("java.lang.Thread", "sleep", "", None)] + self._app_frames(rnd, fill + 2) + self._tail()
+        if role == "socket":
+            return [
+                self._java("sun.nio.ch.SocketDispatcher", "read0", "", None),
+                self._java("sun.nio.ch.SocketDispatcher", "read", "SocketDispatcher.java", 47),
+                self._java("sun.nio.ch.NioSocketImpl", "implRead", "NioSocketImpl.java", 330),
+            ] + self._app_frames(rnd, fill) + self._tail()
+        monitor = f"0x0000000713{index:06x}"
+        return [
+            self._java("java.lang.Object", "wait", "", None),
+            f"\t- waiting on <{monitor}> (a java.util.LinkedList)\n",
+            self._java("java.lang.Object", "wait", "Object.java", 338),
+            f"\t- locked <{monitor}> (a java.util.LinkedList)\n",
+        ] + self._app_frames(rnd, fill + 1) + self._tail()
+
+    def _contended_body(self, rnd, monitor, holder):
+        kind = "locked" if holder else "waiting to lock"
+        frames = [f"\tat com.example.cache.Registry.update(Registry.java:{88 if holder else 71})\n"]
+        frames.append(f"\t- {kind} <{monitor}> (a com.example.cache.Registry)\n")
+        return frames + self._app_frames(rnd, max(0, self.depth - 2)) + self._tail()
+
+    def lines(self) -> Iterator[str]:
+        rnd = random.Random(self.seed)
+        banner, _ = _BANNERS[self.jdk]
+        yield "2024-05-02 10:15:42\n"
+        yield f"Full thread dump {banner}:\n\n"
+        if self.jdk == "17":
+            yield "Threads class SMR info:\n"
+            yield f"_java_thread_list=0x00007f3c2c0021a0, length={self.threads}, elements={{\n}}\n\n"
+
+        counts = {s: 0 for s in ("RUNNABLE", "BLOCKED", "WAITING", "TIMED_WAITING", "NEW", "TERMINATED")}
+        cycles: List[List[str]] = []
+        cycle_threads = min(self.threads, self.deadlocks * self.cycle_length) // self.cycle_length * self.cycle_length
+        monitors = max(1, int(self.threads * self.lock_density / 4))
+        holders = set()
+
+        for index in range(self.threads):
+            if index < cycle_threads:
+                continue
+            if rnd.random() < self.lock_density:
+                m = rnd.randrange(monitors)
+                holder = m not in holders
+                holders.add(m)
+                monitor = f"0x0000000714{m:06x}"
+                state = "RUNNABLE" if holder else "BLOCKED (on object monitor)"
+                native = "runnable" if holder else "waiting for monitor entry"
+                body = self._contended_body(rnd, monitor, holder)
+                name = f"http-nio-8080-exec-{index}"
+            else:
+                role = rnd.choices(_ROLE_NAMES, _ROLE_WEIGHTS)[0]
+                _, state, native = _ROLES[role]
+                body = self._role_body(rnd, role, index)
+                name = f"pool-{index % 7 + 1}-thread-{index}" if role == "parked" else f"{role}-{index}"
+            counts[state.split()[0]] += 1
+            yield from self._thread(index, name, state, native, body)
+
+        # Deadlocked threads come last, as if they were started after the pools.
+        for c in range(cycle_threads // self.cycle_length):
+            names = [f"Transfer-{c}-{k}" for k in range(self.cycle_length)]
+            locks = [f"0x0000000715{c * self.cycle_length + k:06x}" for k in range(self.cycle_length)]
+            for k, name in enumerate(names):
+                wanted = locks[(k + 1) % self.cycle_length]
+                body = [
+                    "\tat com.example.bank.Transfer.debit(Transfer.java:31)\n",
+                    f"\t- waiting to lock <{wanted}> (a com.example.bank.Account)\n",
+                    "\tat com.example.bank.Transfer.run(Transfer.java:20)\n",
+                    f"\t- locked <{locks[k]}> (a com.example.bank.Account)\n",
+                ] + self._tail()
+                counts["BLOCKED"] += 1
+                index = self.threads + c * self.cycle_length + k
+                yield from self._thread(index, name, "BLOCKED (on object monitor)", "waiting for monitor entry",
+                                        body, daemon=False)
+            cycles.append(names)
+
+        yield 'JNI global refs: 15, weak refs: 0\n\n'
+        for c, names in enumerate(cycles):
+            n = len(names)
+            yield "Found one Java-level deadlock:\n"
+            yield "=============================\n"
+            for k, name in enumerate(names):
+                obj = f"0x0000000715{c * n + (k + 1) % n:06x}"
+                yield f'"{name}":\n'
+                yield f"  waiting to lock monitor 0x00007f3c2c00{k:04x} (object {obj}, a com.example.bank.Account),\n"
+                yield f'  which is held by "{names[(k + 1) % n]}"\n'
+            yield "\n"
+        if cycles:
+            yield f"Found {len(cycles)} deadlock{'s' if len(cycles) > 1 else ''}.\n\n"
+
+        self.expected = {"threads": sum(counts.values()), "counts": counts, "deadlocks": cycles}
+
+    def text(self) -> str:
+        return "".join(self.lines())
+
+    def write(self, path: str) -> int:
+        """Writes the dump to ``path`` and returns its size in bytes."""
+        size = 0
+        with open(path, "w", encoding="utf-8", newline="\n") as f:
+            for line in self.lines():
+                f.write(line)
+                size += len(line)
+        return size
@@ -0,0 +1,33 @@
+import os
+import sys
+import time
+
+from dumpgen import DumpGenerator
+
+# Stands in for `jcmd <pid> Thread.print -l` (and `jstack -l <pid>`) in tests: prints
+# the pid line jcmd starts with, then a generated dump of FAKE_JCMD_THREADS threads
+# with one deadlock. FAKE_JCMD_MODE=fail prints jcmd's attach error and exits 1;
+# =hang prints the first lines and then sleeps.
+
+
+def main():
+    args = [a for a in sys.argv[1:] if a not in ("Thread.print", "-l")]
+    pid = args[0]
+    mode = os.environ.get("FAKE_JCMD_MODE", "")
+    out = sys.stdout
+    out.write(f"{pid}:\n")
+    if mode == "fail":
+        out.write(f"com.sun.tools.attach.AttachNotSupportedException: Unable to open socket file /proc/{pid}/root/tmp/.java_pid{pid}\n")
+        out.flush()
+        sys.exit(1)
+    gen = DumpGenerator(threads=int(os.environ.get("FAKE_JCMD_THREADS", "40")), deadlocks=1, seed=int(pid))
+    for i, line in enumerate(gen.lines()):
+        out.write(line)
+        if mode == "hang" and i == 20:
+            out.flush()
+            time.sleep(60)
+    out.flush()
+
+
+if __name__ == "__main__":
+    main()
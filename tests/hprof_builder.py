@@ -0,0 +1,68 @@
+import struct
+
+# Writes small HPROF files for tests, with the record layouts jmap uses.
+
+_TYPE_SIZES = {2: None, 4: 1, 5: 2, 6: 4, 7: 8, 8: 1, 9: 2, 10: 4, 11: 8}
+
+
+class HprofBuilder:
+    def __init__(self, id_size=8):
+        self.id_size = id_size
+        self._id = ">I" if id_size == 4 else ">Q"
+        self.records = []
+        self.heap = []
+        self._next_string = 1
+        self._next_serial = 1
+
+    def ident(self, value):
+        return struct.pack(self._id, value)
+
+    def record(self, tag, body):
+        self.records.append(struct.pack(">BII", tag, 0, len(body)) + body)
+
+    def string(self, text):
+        sid = self._next_string
+        self._next_string += 1
+        self.record(0x01, self.ident(sid) + text.encode("utf-8"))
+        return sid
+
+    def load_class(self, class_id, name):
+        name_id = self.string(name)
+        self.record(0x02, struct.pack(">I", self._next_serial) + self.ident(class_id) + struct.pack(">I", 0) + self.ident(name_id))
+        self._next_serial += 1
+
+    def class_dump(self, class_id, super_id=0, fields=(), statics=(), instance_size=0):
+        """``fields`` are (name, type) pairs; ``statics`` are (name, type, value bytes)."""
+        body = self.ident(class_id) + struct.pack(">I", 0) + self.ident(super_id) + self.ident(0) * 5
+        body += struct.pack(">IH", instance_size, 0)
+        body += struct.pack(">H", len(statics))
+        for name, type_code, value in statics:
+            body += self.ident(self.string(name)) + bytes([type_code]) + value
+        body += struct.pack(">H", len(fields))
+        for name, type_code in fields:
+            body += self.ident(self.string(name)) + bytes([type_code])
+        self.heap.append(b"\x20" + body)
+
+    def instance(self, obj_id, class_id, values=b""):
+        self.heap.append(b"\x21" + self.ident(obj_id) + struct.pack(">I", 0) + self.ident(class_id) + struct.pack(">I", len(values)) + values)
+
+    def obj_array(self, obj_id, class_id, elements):
+        body = self.ident(obj_id) + struct.pack(">II", 0, len(elements)) + self.ident(class_id)
+        self.heap.append(b"\x22" + body + b"".join(self.ident(e) for e in elements))
+
+    def prim_array(self, obj_id, type_code, length):
+        body = self.ident(obj_id) + struct.pack(">IIB", 0, length, type_code)
+        self.heap.append(b"\x23" + body + b"\0" * (length * _TYPE_SIZES[type_code]))
+
+    def root(self, obj_id, tag=0xFF, extra=b""):
+        self.heap.append(bytes([tag]) + self.ident(obj_id) + extra)
+
+    def build(self, segment_records=None):
+        out = [b"JAVA PROFILE 1.0.2\0", struct.pack(">III", self.id_size, 0, 1000)]
+        out.extend(self.records)
+        step = segment_records or max(len(self.heap), 1)
+        for i in range(0, len(self.heap), step):
+            body = b"".join(self.heap[i:i + step])
+            out.append(struct.pack(">BII", 0x1C, 0, len(body)) + body)
+        out.append(struct.pack(">BII", 0x2C, 0, 0))
+        return b"".join(out)
@@ -0,0 +1,59 @@
+from pathlib import Path
+
+from heap_analyzer_mcp.bytescan import parse_thread_dump_mmap, scan_thread_dump
+from heap_analyzer_mcp.parallel import ParsePool
+from heap_analyzer_mcp.parser import parse_thread_dump_file
+
+BASE_DIR = Path(__file__).parent
+SAMPLES = ("sample_thread_dump.txt", "sample_thread_dump_2.txt", "sample_thread_dump_locks.txt")
+
+
+def _threads(analysis):
+    return [
+        (t.name, t.number, t.daemon, t.prio, t.os_prio, t.tid, t.nid, t.native_state, t.state, t.frames,
+         [lock.to_dict() for lock in t.locks])
+        for t in analysis.threads
+    ]
+
+
+def _assert_same(a, b):
+    assert a.counts == b.counts
+    assert a.deadlocks == b.deadlocks
+    assert a.truncated == b.truncated
+    assert _threads(a) == _threads(b)
+
+
+def test_mmap_scanner_matches_line_parser():
+    for name in SAMPLES:
+        path = str(BASE_DIR / name)
+        expected = parse_thread_dump_file(path)
+        analysis = parse_thread_dump_mmap(path)
+        _assert_same(analysis, expected)
+        assert analysis.bytes_read == expected.bytes_read
+
+        _assert_same(parse_thread_dump_mmap(path, max_threads=2), parse_thread_dump_file(path, max_threads=2))
+        by_bytes = parse_thread_dump_mmap(path, max_bytes=200)
+        _assert_same(by_bytes, parse_thread_dump_file(path, max_bytes=200))
+        assert by_bytes.bytes_read == parse_thread_dump_file(path, max_bytes=200).bytes_read
+
+
+def test_mmap_scanner_crlf_and_empty_files(tmp_path):
+    source = (BASE_DIR / "sample_thread_dump_locks.txt").read_bytes()
+    crlf = tmp_path / "crlf.txt"
+    crlf.write_bytes(source.replace(b"\n", b"\r\n"))
+    _assert_same(parse_thread_dump_mmap(str(crlf)), parse_thread_dump_file(str(BASE_DIR / "sample_thread_dump_locks.txt")))
+
+    empty = tmp_path / "empty.txt"
+    empty.write_bytes(b"")
+    analysis = parse_thread_dump_mmap(str(empty))
+    assert analysis.threads == [] and analysis.bytes_read == 0 and not analysis.truncated
+
+    # Plain bytes work as well as a mapping.
+    _assert_same(scan_thread_dump(source), parse_thread_dump_file(str(BASE_DIR / "sample_thread_dump_locks.txt")))
+
+
+def test_pool_readers_agree():
+    path = str(BASE_DIR / "sample_thread_dump_locks.txt")
+    mmap_pool = ParsePool(workers=1, reader="mmap")
+    lines_pool = ParsePool(workers=1, reader="lines")
+    _assert_same(mmap_pool.parse_file(path), lines_pool.parse_file(path))
@@ -0,0 +1,103 @@
+import os
+import shutil
+from pathlib import Path
+
+from heap_analyzer_mcp.cache import ParseCache
+from heap_analyzer_mcp.parser import DEFAULT_MAX_BYTES
+
+BASE_DIR = Path(__file__).parent
+
+
+def _copy(tmp_path: Path, name: str, target: str) -> str:
+    dest = tmp_path / target
+    shutil.copyfile(BASE_DIR / name, dest)
+    return str(dest)
+
+
+def test_cache_hits_and_invalidates_on_change(tmp_path):
+    path = _copy(tmp_path, "sample_thread_dump.txt", "dump.txt")
+    cache = ParseCache()
+
+    first = cache.get_or_parse(path)
+    second = cache.get_or_parse(path)
+    assert second is first
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+    # Different budgets are separate entries.
+    cache.get_or_parse(path, max_threads=2)
+    assert cache.stats()["misses"] == 2
+
+    shutil.copyfile(BASE_DIR / "sample_thread_dump_2.txt", path)
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+    changed = cache.get_or_parse(path)
+    assert changed is not first
+    assert changed.deadlocks == []
+
+
+def test_cache_is_content_addressed(tmp_path):
+    a = _copy(tmp_path, "sample_thread_dump.txt", "a.txt")
+    b = _copy(tmp_path, "sample_thread_dump.txt", "b.txt")
+    cache = ParseCache()
+    assert cache.get_or_parse(a) is cache.get_or_parse(b)
+    assert cache.stats()["entries"] == 1
+
+
+def test_cache_lru_eviction(tmp_path):
+    a = _copy(tmp_path, "sample_thread_dump.txt", "a.txt")
+    b = _copy(tmp_path, "sample_thread_dump_2.txt", "b.txt")
+    probe = ParseCache()
+    probe.get_or_parse(a)
+    one_entry = probe.stats()["bytes"]
+
+    cache = ParseCache(max_bytes=one_entry + one_entry // 2)
+    cache.get_or_parse(a)
+    cache.get_or_parse(b)
+    stats = cache.stats()
+    assert stats["entries"] == 1 and stats["evictions"] == 1
+
+    cache.get_or_parse(b)
+    assert cache.stats()["hits"] == 1
+
+
+def test_cache_spill_warms_a_new_instance(tmp_path):
+    path = _copy(tmp_path, "sample_thread_dump_locks.txt", "dump.txt")
+    spill = str(tmp_path / "spill")
+
+    original = ParseCache(spill_dir=spill).get_or_parse(path)
+    restarted = ParseCache(spill_dir=spill)
+    warm = restarted.get_or_parse(path)
+
+    assert restarted.stats()["disk_hits"] == 1
+    assert warm.counts == original.counts
+    assert [t.name for t in warm.threads] == [t.name for t in original.threads]
+    assert warm.find_thread("Thread-1").locks[0].address == "0x000000071a2b3c48"
+
+
+def test_spill_dir_is_private_and_bounded(tmp_path):
+    path = _copy(tmp_path, "sample_thread_dump_locks.txt", "dump.txt")
+    spill = tmp_path / "spill"
+
+    def entry(max_threads):
+        return spill / f"{ParseCache().digest(path)}-{max_threads}-{DEFAULT_MAX_BYTES}.v2.pickle"
+
+    # Budgets are part of the key, so these are three entries of the same size.
+    ParseCache(spill_dir=str(spill)).get_or_parse(path, max_threads=100)
+    assert spill.stat().st_mode & 0o777 == 0o700
+    size = entry(100).stat().st_size
+    cache = ParseCache(spill_dir=str(spill), max_spill_bytes=2 * size)
+    cache.get_or_parse(path, max_threads=101)
+    os.utime(entry(100), ns=(10**9, 10**9))
+    os.utime(entry(101), ns=(2 * 10**9, 2 * 10**9))
+    # Loading an entry makes it the most recently used one, so 101 is evicted.
+    ParseCache(spill_dir=str(spill)).get_or_parse(path, max_threads=100)
+    cache.get_or_parse(path, max_threads=102)
+    assert sorted(p.name for p in spill.iterdir()) == sorted(entry(n).name for n in (100, 102))
+
+    # A directory others can write to is not trusted with pickles.
+    os.chmod(spill, 0o777)
+    restarted = ParseCache(spill_dir=str(spill))
+    restarted.get_or_parse(path, max_threads=100)
+    restarted.get_or_parse(path, max_threads=103)
+    assert restarted.stats()["disk_hits"] == 0
+    assert not entry(103).exists()
@@ -0,0 +1,80 @@
+import json
+
+from heap_analyzer_mcp.cache import ParseCache
+from heap_analyzer_mcp.calltree import CallTree
+from heap_analyzer_mcp.engine import Engine
+from heap_analyzer_mcp.parallel import ParsePool
+from heap_analyzer_mcp.tools_adapter import call_tree_tool_call
+
+
+def _write_dump(path, stacks):
+    lines = []
+    for i, (state, frames) in enumerate(stacks):
+        lines.append(f'"t-{i}" #{i} prio=5 os_prio=0 tid=0x{i:x} nid=0x{i:x} runnable  [0x0]')
+        lines.append(f"   java.lang.Thread.State: {state}")
+        lines.extend(f"\tat {f}" for f in frames)
+        lines.append("")
+    path.write_text("\n".join(lines), encoding="utf-8")
+
+
+def test_call_tree_counts_and_folded():
+    tree = CallTree()
+    tree.add_stack(["c", "b", "a"], 3)
+    tree.add_stack(["d", "b", "a"])
+    tree.add_stack(["b", "a"])
+    tree.add_stack(["x"], 2)
+
+    assert tree.samples == 7
+    assert len(tree) - 1 == 5
+    assert tree.to_folded() == "a;b;c 3\nx 2\na;b 1\na;b;d 1\n"
+
+    root = tree.to_tree()
+    a = root["children"][0]
+    assert (a["frame"], a["total"], a["self"]) == ("a", 5, 0)
+    assert [(c["frame"], c["total"]) for c in a["children"][0]["children"]] == [("c", 3), ("d", 1)]
+
+    # Pruned subtrees are folded into their nearest kept ancestor.
+    assert tree.to_folded(max_nodes=2) == "a;b 5\nall 2\n"
+    pruned = tree.to_tree(max_nodes=2)
+    assert pruned["omitted"] == 2
+    assert pruned["children"][0]["children"][0]["omitted"] == 4
+
+
+def test_call_tree_tool_merges_dumps(tmp_path):
+    spin = ["com.example.Loop.spin(Loop.java:10)", "com.example.Main.run(Main.java:3)"]
+    park = ["jdk.internal.misc.Unsafe.park(Native Method)", "com.example.Main.run(Main.java:3)"]
+    paths = []
+    for i in range(3):
+        p = tmp_path / f"jstack-{i}.txt"
+        _write_dump(p, [("RUNNABLE", spin), ("WAITING", park), ("WAITING", park)])
+        paths.append(str(p))
+
+    res = call_tree_tool_call(paths=paths, format="both")
+    assert res.ok, res.error_message
+    payload = json.loads(res.text or "{}")
+    assert payload["dumps"] == 3 and payload["samples"] == 9 and payload["nodes"] == 3
+    assert payload["folded"].splitlines() == [
+        "com.example.Main.run(Main.java:3);jdk.internal.misc.Unsafe.park(Native Method) 6",
+        "com.example.Main.run(Main.java:3);com.example.Loop.spin(Loop.java:10) 3",
+    ]
+
+    runnable = json.loads(call_tree_tool_call(glob=str(tmp_path / "jstack-*.txt"), states=["RUNNABLE"]).text or "{}")
+    assert runnable["samples"] == 3 and "folded" not in runnable
+    assert runnable["tree"]["children"][0]["children"][0]["frame"] == "com.example.Loop.spin(Loop.java:10)"
+
+    assert call_tree_tool_call(paths=paths, format="svg").error_code == "INVALID_PARAMS"
+    assert call_tree_tool_call(paths=paths, states=["SLEEPING"]).error_code == "INVALID_PARAMS"
+
+
+def test_call_tree_keeps_no_parsed_dumps(tmp_path):
+    paths = []
+    for i in range(4):
+        p = tmp_path / f"jstack-{i}.txt"
+        _write_dump(p, [("RUNNABLE", [f"com.example.Job.step{i}(Job.java:{i})", "com.example.Main.run(Main.java:3)"])])
+        paths.append(str(p))
+    pool = ParsePool(workers=1)
+    cache = ParseCache(parser=pool.parse_file)
+    res = Engine(pool, cache).call("aggregate_call_tree", {"paths": paths})
+    assert res.ok, res.error_message
+    assert json.loads(res.text or "{}")["samples"] == 4
+    assert cache.stats()["entries"] == 0 and cache.stats()["misses"] == 0
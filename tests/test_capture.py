@@ -0,0 +1,101 @@
+import json
+import sys
+import time
+from pathlib import Path
+
+import pytest
+
+from dumpgen import DumpGenerator
+from heap_analyzer_mcp.cache import ParseCache
+from heap_analyzer_mcp.capture import CaptureError, CaptureManager, capture_thread_dump
+from heap_analyzer_mcp.engine import Engine
+from heap_analyzer_mcp.parallel import ParsePool
+
+FAKE_JCMD = [sys.executable, str(Path(__file__).parent / "fake_jcmd.py")]
+
+
+def _engine(**options):
+    pool = ParsePool(workers=1)
+    captures = CaptureManager(commands={"jcmd": FAKE_JCMD, "jstack": FAKE_JCMD}, **options)
+    return Engine(pool, ParseCache(parser=pool.parse_file), captures=captures)
+
+
+def _call(engine, name, **arguments):
+    res = engine.call(name, arguments)
+    assert res.ok, res.error_message
+    return json.loads(res.text or "{}")
+
+
+def test_capture_streams_into_the_parser():
+    expected = DumpGenerator(threads=40, deadlocks=1, seed=7)
+    text = expected.text()
+    analysis = capture_thread_dump(FAKE_JCMD + ["7", "Thread.print", "-l"])
+    assert analysis.counts == expected.expected["counts"]
+    assert [d["threads"] for d in analysis.deadlocks] == expected.expected["deadlocks"]
+    assert analysis.bytes_read == len("7:\n") + len(text) and not analysis.truncated
+
+    cut = capture_thread_dump(FAKE_JCMD + ["7"], max_threads=5)
+    assert cut.truncated and len(cut.threads) == 5
+
+
+def test_capture_errors(monkeypatch):
+    with pytest.raises(CaptureError, match="Cannot run"):
+        capture_thread_dump(["/does/not/exist/jcmd", "1"])
+    monkeypatch.setenv("FAKE_JCMD_MODE", "fail")
+    with pytest.raises(CaptureError, match="exited with status 1: .*AttachNotSupportedException"):
+        capture_thread_dump(FAKE_JCMD + ["7"])
+    monkeypatch.setenv("FAKE_JCMD_MODE", "hang")
+    start = time.monotonic()
+    with pytest.raises(CaptureError, match="timed out after 0.5s"):
+        capture_thread_dump(FAKE_JCMD + ["7"], timeout=0.5)
+    assert time.monotonic() - start < 10
+
+
+def test_capture_session_feeds_the_analyses():
+    engine = _engine()
+    session = _call(engine, "capture_thread_dumps", pid=11, count=3, interval_s=0.05, wait=True)
+    assert session["session"] == "c1" and session["state"] == "done" and session["retained"] == 3
+    assert session["command"].endswith("11 Thread.print -l")
+    assert [s["ref"] for s in session["snapshots"]] == ["capture:c1/0", "capture:c1/1", "capture:c1/2"]
+
+    latest = _call(engine, "analyze_thread_dump", path="capture:c1")
+    assert latest["counts"]["BLOCKED"] >= 2 and len(latest["deadlocks"]) == 1
+    compare = _call(engine, "compare_thread_dumps", path_a="capture:c1/0", path_b="capture:c1/-1")
+    assert set(compare["deltas"].values()) == {0}
+    threads = _call(engine, "list_threads", path="capture:c1/1", limit=5)
+    follow = _call(engine, "list_threads", cursor=threads["page"]["next_cursor"])
+    assert follow["page"]["offset"] == 5
+
+    # The same dump three times: every waiting thread looks stuck.
+    series = _call(engine, "analyze_thread_dump_series", capture="c1", min_snapshots=3)
+    assert series["paths"] == ["capture:c1/0", "capture:c1/1", "capture:c1/2"] and series["stuck_threads"]
+    tree = _call(engine, "aggregate_call_tree", capture="c1", format="folded")
+    assert tree["paths"] == series["paths"]
+
+    res = engine.call("analyze_thread_dump", {"path": "capture:c1/9"})
+    assert res.error_code == "INVALID_PARAMS" and res.error_message == "No snapshot 9 in capture session c1"
+    res = engine.call("analyze_thread_dump_series", {"capture": "c1", "paths": ["a.txt"]})
+    assert res.error_code == "INVALID_PARAMS"
+    assert engine.call("compare_thread_dumps", {"path_a": "capture:c9", "path_b": "capture:c1"}).error_message == (
+        "Unknown capture session: c9"
+    )
+
+
+def test_sessions_run_in_the_background(monkeypatch):
+    engine = _engine(capacity=2)
+    start = time.monotonic()
+    running = _call(engine, "capture_thread_dumps", pid=12, count=50, interval_s=30)
+    assert running["state"] == "running" and time.monotonic() - start < 5
+    stopped = _call(engine, "list_capture_sessions", session="c1", stop=True)
+    assert stopped["state"] == "stopped" and stopped["attempts"] <= 1
+
+    # The ring buffer keeps the latest snapshots only.
+    ring = _call(engine, "capture_thread_dumps", pid=13, count=4, interval_s=0, wait=True)
+    assert [s["seq"] for s in ring["snapshots"]] == [2, 3]
+
+    monkeypatch.setenv("FAKE_JCMD_MODE", "fail")
+    failed = _call(engine, "capture_thread_dumps", pid=14, count=2, interval_s=0, tool="jstack", wait=True)
+    assert failed["state"] == "failed" and len(failed["errors"]) == 2
+    listed = _call(engine, "list_capture_sessions")["sessions"]
+    assert [(s["session"], s["state"]) for s in listed] == [("c1", "stopped"), ("c2", "done"), ("c3", "failed")]
+    engine.shutdown()
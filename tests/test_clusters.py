@@ -0,0 +1,50 @@
+import json
+from pathlib import Path
+
+from heap_analyzer_mcp.clusters import cluster_threads
+from heap_analyzer_mcp.parser import parse_thread_dump
+from heap_analyzer_mcp.tools_adapter import cluster_tool_call
+
+BASE_DIR = Path(__file__).parent
+
+PARK = ["jdk.internal.misc.Unsafe.park(Native Method)", "java.util.concurrent.locks.LockSupport.park(LockSupport.java:341)"]
+
+
+def _dump(stacks):
+    lines = []
+    for i, (state, frames) in enumerate(stacks):
+        lines.append(f'"t-{i}" #{i} prio=5 os_prio=0 tid=0x{i:x} nid=0x{i:x} waiting on condition  [0x0]')
+        lines.append(f"   java.lang.Thread.State: {state}")
+        lines.extend(f"\tat {f}" for f in frames)
+        lines.append("")
+    return "\n".join(lines)
+
+
+def test_cluster_threads_by_top_frames():
+    stacks = [("WAITING", PARK + ["org.apache.tomcat.Pool.take(Pool.java:1)"])] * 5
+    stacks += [("WAITING", PARK + ["io.netty.Loop.run(Loop.java:2)"])] * 3
+    stacks += [("RUNNABLE", ["com.example.Main.run(Main.java:3)"])]
+    threads = parse_thread_dump(_dump(stacks)).threads
+
+    clusters = cluster_threads(threads, depth=3)
+    assert [c.size for c in clusters] == [5, 3, 1]
+    assert clusters[0].frames[-1] == "org.apache.tomcat.Pool.take(Pool.java:1)"
+    assert clusters[0].states == {"WAITING": 5}
+    assert clusters[0].sample_names == ["t-0", "t-1", "t-2", "t-3", "t-4"]
+
+    # With only the top two frames the Tomcat and Netty workers look the same.
+    assert [c.size for c in cluster_threads(threads, depth=2)] == [8, 1]
+
+
+def test_cluster_tool_limits_response(tmp_path):
+    path = tmp_path / "dump.txt"
+    path.write_text(_dump([("WAITING", PARK + [f"com.example.Job.run{i % 30}(Job.java:1)"]) for i in range(3000)]))
+    res = cluster_tool_call(str(path), max_clusters=4)
+    assert res.ok, res.error_message
+    payload = json.loads(res.text or "{}")
+    assert payload["total_threads"] == 3000 and payload["distinct_clusters"] == 30
+    assert len(payload["clusters"]) == 4 and payload["clusters"][0]["size"] == 100
+    assert len(payload["clusters"][0]["sample_threads"]) == 5
+
+    assert cluster_tool_call(str(path), depth=0).error_code == "INVALID_PARAMS"
+    assert cluster_tool_call(str(BASE_DIR / "missing.txt")).error_code == "INVALID_PARAMS"
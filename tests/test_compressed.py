@@ -0,0 +1,85 @@
+import gzip
+import json
+import lzma
+from pathlib import Path
+
+import pytest
+
+from heap_analyzer_mcp.compressed import open_input, sniff_compression
+from heap_analyzer_mcp.gclog import parse_gc_log_files, rotated_gc_logs
+from heap_analyzer_mcp.parallel import ParsePool
+from heap_analyzer_mcp.parser import parse_thread_dump_file
+from heap_analyzer_mcp.tools_adapter import analyze_tool_call, compare_tool_call, heap_dump_tool_call
+from hprof_builder import HprofBuilder
+
+BASE_DIR = Path(__file__).parent
+SAMPLE = BASE_DIR / "sample_thread_dump.txt"
+
+
+def test_sniff_and_stream(tmp_path):
+    data = b"line one\nline two\n" * 1000
+    plain = tmp_path / "dump.txt"
+    plain.write_bytes(data)
+    # Detection goes by content, not by name.
+    gz = tmp_path / "archived"
+    gz.write_bytes(gzip.compress(data))
+    xz = tmp_path / "dump.xz"
+    xz.write_bytes(lzma.compress(data))
+    assert [sniff_compression(str(p)) for p in (plain, gz, xz)] == [None, "gzip", "xz"]
+
+    for p in (plain, gz, xz):
+        with open_input(str(p)) as f:
+            assert f.read() == data
+    with open_input(str(gz), limit=25) as f:
+        assert f.readlines() == [b"line one\n", b"line two\n", b"line on"]
+
+
+def test_zstd(tmp_path):
+    zstandard = pytest.importorskip("zstandard")
+    data = SAMPLE.read_bytes()
+    path = tmp_path / "dump.zst"
+    path.write_bytes(zstandard.ZstdCompressor().compress(data))
+    assert sniff_compression(str(path)) == "zstd"
+    with open_input(str(path)) as f:
+        assert f.read() == data
+
+
+def test_compressed_thread_dumps(tmp_path):
+    data = SAMPLE.read_bytes()
+    gz = tmp_path / "dump.txt.gz"
+    gz.write_bytes(gzip.compress(data))
+    xz = tmp_path / "dump.txt.xz"
+    xz.write_bytes(lzma.compress(data))
+
+    expected = json.loads(analyze_tool_call(str(SAMPLE)).text or "{}")
+    for path in (gz, xz):
+        res = analyze_tool_call(str(path))
+        assert res.ok, res.error_message
+        payload = json.loads(res.text or "{}")
+        assert payload["counts"] == expected["counts"] and payload["deadlocks"] == expected["deadlocks"]
+        assert payload["bytes_read"] == len(data)
+    res = compare_tool_call(str(SAMPLE), str(gz))
+    assert res.ok and json.loads(res.text or "{}")["deltas"] == {s: 0 for s in expected["counts"]}
+
+    # Budgets count decompressed bytes, also through the chunking pool.
+    cut = parse_thread_dump_file(str(gz), max_bytes=len(data) // 2)
+    assert cut.truncated and 0 < cut.bytes_read <= len(data) // 2
+    pooled = ParsePool(workers=2, kind="thread", chunk_bytes=1).parse_file(str(gz), max_bytes=len(data) // 2)
+    assert pooled.truncated and pooled.bytes_read == cut.bytes_read
+
+
+def test_compressed_gc_logs_and_heap_dumps(tmp_path):
+    lines = [f"[{i}.000s][info][gc] GC({i}) Pause Young (Allocation Failure) 200M->20M(1024M) 4.000ms\n" for i in range(30)]
+    path = tmp_path / "gc.log"
+    (tmp_path / "gc.log.0.gz").write_bytes(gzip.compress("".join(lines[:20]).encode()))
+    path.write_text("".join(lines[20:]))
+    files = rotated_gc_logs(str(path))
+    assert [f.rsplit("/", 1)[1] for f in files] == ["gc.log.0.gz", "gc.log"]
+    log = parse_gc_log_files(files)
+    assert len(log.times) == 30 and log.bytes_read == sum(map(len, lines))
+    assert parse_gc_log_files([str(tmp_path / "gc.log.0.gz")], max_bytes=len(lines[0]) * 3).lines == 3
+
+    hprof = tmp_path / "heap.hprof.gz"
+    hprof.write_bytes(gzip.compress(HprofBuilder(8).build()))
+    res = heap_dump_tool_call(str(hprof))
+    assert not res.ok and "gzip-compressed" in (res.error_message or "")
@@ -0,0 +1,96 @@
+import json
+import random
+import struct
+
+from heap_analyzer_mcp.dominators import compute_dominators, compute_retention, summarize_retainers
+from heap_analyzer_mcp.heapgraph import build_heap_graph
+from heap_analyzer_mcp.tools_adapter import heap_retainers_tool_call
+from hprof_builder import HprofBuilder
+
+NODE_CLASS = 0x10
+BASE = 0x1000
+
+
+def _graph_dump(refs, roots, order=None, id_size=8):
+    """One object per key of ``refs`` (object i -> up to three referenced objects)."""
+    b = HprofBuilder(id_size)
+    ref = struct.Struct(">I" if id_size == 4 else ">Q").pack
+    b.load_class(NODE_CLASS, "com/example/Node")
+    b.class_dump(NODE_CLASS, fields=[("a", 2), ("b", 2), ("c", 2), ("pad", 11)])
+    for r in roots:
+        b.root(BASE + 16 * r)
+    for i in order or sorted(refs):
+        targets = list(refs[i]) + [None] * (3 - len(refs[i]))
+        b.instance(BASE + 16 * i, NODE_CLASS, b"".join(ref(BASE + 16 * t if t is not None else 0) for t in targets) + b"\0" * 8)
+    return b.build(segment_records=4)
+
+
+def _idoms(tree):
+    graph = tree.graph
+    obj = lambda node: (graph.object_ids[node] - BASE) // 16 if node else None  # noqa: E731
+    return {obj(tree.vertex[w]): obj(tree.vertex[tree.idom[w]]) for w in range(2, len(tree.vertex))}
+
+
+def _naive_idoms(refs, roots):
+    def reachable(skip):
+        seen, stack = set(), [r for r in roots if r != skip]
+        seen.update(stack)
+        while stack:
+            for w in refs[stack.pop()]:
+                if w != skip and w not in seen:
+                    seen.add(w)
+                    stack.append(w)
+        return seen
+
+    live = reachable(None)
+    doms = {v: {x for x in live if x != v and v not in reachable(x)} for v in live}
+    return {v: next((d for d in ds if doms[d] == ds - {d}), None) for v, ds in doms.items()}
+
+
+def test_lengauer_tarjan_example():
+    # The flow graph from Lengauer and Tarjan's paper, with R = 0.
+    R, A, B, C, D, E, F, G, H, I, J, K, L = range(13)
+    refs = {
+        R: [A, B, C], A: [D], B: [A, D, E], C: [F, G], D: [L], E: [H],
+        F: [I], G: [I, J], H: [E, K], I: [K], J: [I], K: [I, R], L: [H],
+    }
+    with build_heap_graph(_graph_dump(refs, [R])) as graph:
+        idoms = _idoms(compute_dominators(graph))
+    # The Node class object is not reachable from any root, so it has no dominator entry.
+    assert idoms == {A: R, B: R, C: R, D: R, E: R, F: C, G: C, H: R, I: R, J: G, K: R, L: D, R: None}
+
+
+def test_random_graphs_match_naive_dominators():
+    for seed in range(40):
+        rnd = random.Random(seed)
+        n = rnd.randint(1, 30)
+        refs = {i: [rnd.randrange(n) for _ in range(rnd.randint(0, 3))] for i in range(n)}
+        roots = rnd.sample(range(n), rnd.randint(1, min(3, n)))
+        order = rnd.sample(range(n), n)
+        data = _graph_dump(refs, roots, order=order, id_size=rnd.choice((4, 8)))
+        with build_heap_graph(data, spill_objects=rnd.choice((0, 10**9))) as graph:
+            assert _idoms(compute_dominators(graph)) == _naive_idoms(refs, roots), seed
+
+
+def test_retained_sizes_and_paths(tmp_path):
+    # 0 -> 1 -> {2, 3}; 3 -> 4 -> 5; 6 is shared by 2 and 5; 7 is unreachable.
+    refs = {0: [1], 1: [2, 3], 2: [6], 3: [4], 4: [5], 5: [6], 6: [], 7: [1]}
+    path = tmp_path / "heap.hprof"
+    path.write_bytes(_graph_dump(refs, [0]))
+    size = 2 * 8 + 32
+
+    with build_heap_graph(path.read_bytes()) as graph:
+        payload = summarize_retainers(graph, compute_retention(graph), max_retainers=3, max_path=4)
+    assert payload["reachable_objects"] == 7 and payload["unreachable_objects"] == 2
+    assert payload["total_retained_size"] == 7 * size
+    top = payload["retainers"]
+    assert [(r["object"], r["retained_size"]) for r in top] == [("0x1000", 7 * size), ("0x1010", 6 * size), ("0x1030", 3 * size)]
+    assert top[0]["gc_root"] == "unknown" and "dominator" not in top[0]
+    assert top[2]["dominator"] == "0x1010"
+    assert [s["object"] for s in top[2]["path"]] == ["0x1000", "0x1010", "0x1030"]
+
+    res = heap_retainers_tool_call(str(path), max_retainers=1, max_path=2)
+    assert res.ok, res.error_message
+    deep = json.loads(res.text or "{}")["retainers"][0]
+    assert deep["retained_size"] == 7 * size and deep["path_length"] == 1
+    assert heap_retainers_tool_call(str(path), max_path=1).error_code == "INVALID_PARAMS"
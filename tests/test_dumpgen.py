@@ -0,0 +1,36 @@
+import pytest
+
+from dumpgen import JDK_VARIANTS, DumpGenerator
+from heap_analyzer_mcp.bytescan import parse_thread_dump_mmap
+from heap_analyzer_mcp.locks import analyze_locks
+from heap_analyzer_mcp.parser import parse_thread_dump, parse_thread_dump_file
+
+
+def test_generator_is_deterministic():
+    a = DumpGenerator(threads=50, deadlocks=1, seed=7)
+    assert a.text() == DumpGenerator(threads=50, deadlocks=1, seed=7).text()
+    assert a.text() != DumpGenerator(threads=50, deadlocks=1, seed=8).text()
+    with pytest.raises(ValueError):
+        DumpGenerator(jdk="6")
+
+
+@pytest.mark.parametrize("jdk", JDK_VARIANTS)
+def test_parsers_match_generated_dumps(tmp_path, jdk):
+    gen = DumpGenerator(threads=300, lock_density=0.2, deadlocks=3, cycle_length=3, jdk=jdk)
+    path = tmp_path / "dump.txt"
+    size = gen.write(str(path))
+    expected = gen.expected
+    assert size == path.stat().st_size and expected["threads"] == 300
+
+    for analysis in (parse_thread_dump(gen.text()), parse_thread_dump_file(str(path)), parse_thread_dump_mmap(str(path))):
+        assert analysis.counts == expected["counts"]
+        assert [d["threads"] for d in analysis.deadlocks] == expected["deadlocks"]
+    numbered = [t for t in analysis.threads if t.number is not None and t.tid and t.nid]
+    assert len(numbered) == 300
+
+    locks = analyze_locks(analysis)
+    assert [d["threads"] for d in locks["deadlocks"]] == expected["deadlocks"]
+    assert all(d["source"] == "lock_graph" for d in locks["deadlocks"])
+    # Contended monitors have one RUNNABLE holder and BLOCKED waiters.
+    contended = [h for h in locks["hot_locks"] if h["class_name"] == "com.example.cache.Registry"]
+    assert contended and all(h["owner_state"] == "RUNNABLE" for h in contended)
@@ -0,0 +1,122 @@
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from heap_analyzer_mcp.cache import ParseCache
+from heap_analyzer_mcp.engine import COSTS, TOOLS, Engine, Param, ToolError, ToolSpec
+from heap_analyzer_mcp.parallel import ParsePool
+from heap_analyzer_mcp.tools_adapter import list_threads_tool_call
+
+BASE_DIR = Path(__file__).parent
+SAMPLE = str(BASE_DIR / "sample_thread_dump.txt")
+
+
+def _engine(tools=TOOLS):
+    pool = ParsePool(workers=1)
+    return Engine(pool, ParseCache(parser=pool.parse_file), tools)
+
+
+def test_registry_is_consistent():
+    names = [spec.name for spec in TOOLS]
+    assert len(names) == len(set(names)) == 13
+    for spec in TOOLS:
+        schema = spec.input_schema
+        assert spec.cost in COSTS
+        required = [schema.get("required", [])] + [alt["required"] for alt in schema.get("anyOf", [])]
+        assert all(set(keys) <= set(schema["properties"]) for keys in required)
+        assert ("cursor" in schema["properties"]) == spec.paged
+        for p in spec.params:
+            # Every advertised default passes the parameter's own check.
+            if "default" in p.schema:
+                assert p.default == p.schema["default"] and p.check is not None and p.check(p.default), (spec.name, p.name)
+    # A paged tool needs its query arguments or a cursor.
+    schemas = {spec.name: spec.input_schema for spec in TOOLS}
+    assert schemas["list_heap_instances"]["anyOf"] == [{"required": ["path", "class_name"]}, {"required": ["cursor"]}]
+    assert [name for name, schema in schemas.items() if "anyOf" in schema] == [
+        "analyze_thread_dump", "list_heap_instances", "cluster_thread_stacks", "list_threads",
+    ]
+
+
+def test_prepare_validates_without_io():
+    engine = _engine()
+    spec, args, digest = engine.prepare("list_threads", {"path": "/does/not/exist", "states": ["BLOCKED"]})
+    assert spec.name == "list_threads" and digest is None
+    assert args["max_frames"] > 0 and args["name_contains"] is None and args["states"] == ["BLOCKED"]
+
+    with pytest.raises(ToolError, match="Unknown tool"):
+        engine.prepare("no_such_tool", {})
+    with pytest.raises(ToolError, match="'states' must be a list of thread states"):
+        engine.prepare("list_threads", {"path": SAMPLE, "states": ["SLEEPING"]})
+    with pytest.raises(ToolError, match="'max_clusters' must be a positive integer"):
+        engine.prepare("cluster_thread_stacks", {"path": SAMPLE, "max_clusters": 0})
+    with pytest.raises(ToolError, match="Invalid cursor"):
+        engine.prepare("list_threads", {"cursor": "not-a-cursor"})
+
+    res = engine.call("list_threads", {"path": "/does/not/exist"})
+    assert res.error_code == "INVALID_PARAMS" and res.error_message == "File not found: /does/not/exist"
+
+
+def test_engine_and_adapter_agree():
+    engine = _engine()
+    direct = engine.call("list_threads", {"path": SAMPLE, "limit": 1})
+    assert direct.ok
+    first = json.loads(direct.text or "{}")
+    assert first == json.loads(list_threads_tool_call(SAMPLE, limit=1).text or "{}")
+
+    # A cursor from one entry point is valid at the other.
+    follow = list_threads_tool_call(cursor=first["page"]["next_cursor"], limit=1)
+    assert json.loads(follow.text or "{}")["page"]["offset"] == 1
+
+
+def test_custom_tool_and_internal_errors():
+    def boom(engine, args, cancel, cursor_digest):
+        if args["mode"] == "user":
+            raise ToolError("bad input")
+        raise RuntimeError("kaput")
+
+    spec = ToolSpec(
+        name="boom",
+        description="Fails on purpose",
+        params=(Param("mode", {"type": "string"}, lambda v: v in ("user", "bug"), "'mode' must be user|bug", "bug"),),
+        handler=boom,
+    )
+    engine = _engine((spec,))
+    assert engine.spec("boom") is spec and engine.spec("list_threads") is None
+    assert engine.call("boom", {"mode": "user"}).error_code == "INVALID_PARAMS"
+    res = engine.call("boom", None)
+    assert res.error_code == "INTERNAL_ERROR" and res.error_message == "Exception: kaput"
+
+
+_LAZY_CHECK = """
+import json, sys
+from heap_analyzer_mcp import tools_adapter
+from heap_analyzer_mcp.engine import Engine
+engine = Engine.from_env()
+schemas = [spec.input_schema for spec in engine.specs]
+before = sorted(sys.modules)
+res = engine.call("analyze_thread_dump", {"path": sys.argv[1]})
+print(json.dumps({"ok": res.ok, "before": before, "after": sorted(sys.modules)}))
+engine.shutdown()
+"""
+
+
+def test_registry_loads_analyzers_lazily():
+    # A fresh interpreter, so modules imported by other tests do not count.
+    src = str(BASE_DIR.parent / "src")
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, (src, os.environ.get("PYTHONPATH")))))
+    out = subprocess.run(
+        [sys.executable, "-c", _LAZY_CHECK, SAMPLE], env=env, check=True, capture_output=True, text=True
+    ).stdout
+    result = json.loads(out)
+    heavy = {
+        "heap_analyzer_mcp.cache", "heap_analyzer_mcp.capture", "heap_analyzer_mcp.gclog",
+        "heap_analyzer_mcp.heapgraph", "heap_analyzer_mcp.heapindex", "heap_analyzer_mcp.parallel",
+        "multiprocessing", "subprocess",
+    }
+    assert not heavy & set(result["before"])
+    assert result["ok"] and {"heap_analyzer_mcp.cache", "heap_analyzer_mcp.parallel"} <= set(result["after"])
+    assert "heap_analyzer_mcp.gclog" not in result["after"]
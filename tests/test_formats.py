@@ -0,0 +1,109 @@
+import gzip
+import json
+from pathlib import Path
+
+from dumpgen import DumpGenerator
+from heap_analyzer_mcp.cache import ParseCache
+from heap_analyzer_mcp.engine import Engine
+from heap_analyzer_mcp.formats import parse_dump_file, sniff_file_format, sniff_format
+from heap_analyzer_mcp.logdump import LogDumpParser, prefix_pattern
+from heap_analyzer_mcp.parallel import ParsePool
+from heap_analyzer_mcp.parser import parse_thread_dump
+
+BASE_DIR = Path(__file__).parent
+SAMPLE = BASE_DIR / "sample_thread_dump.txt"
+JAVACORE = BASE_DIR / "sample_javacore.txt"
+
+_JSON_DUMP = {
+    "threadDump": {
+        "processId": "4242",
+        "threadContainers": [
+            {"container": "<root>", "threads": [
+                {"tid": "1", "name": "main", "stack": ["java.base/java.lang.Thread.sleep0(Native Method)"]},
+            ]},
+        ],
+    }
+}
+
+
+def _logged(lines, stamp="2024-03-12 10:41:{:02d},{:03d} INFO  [stdout] "):
+    return [stamp.format(i % 60, i % 1000) + line for i, line in enumerate(lines)]
+
+
+def test_sniff_format():
+    assert sniff_format(SAMPLE.read_text()) == "hotspot"
+    assert sniff_format(JAVACORE.read_bytes()) == "javacore"
+    assert sniff_format("\ufeff" + json.dumps(_JSON_DUMP, indent=2)) == "json"
+    assert sniff_format('{"other": 1}') == "log"
+    assert sniff_format("\n".join(_logged(SAMPLE.read_text().splitlines()))) == "log"
+    assert sniff_format("") == "hotspot"
+
+
+def test_prefix_pattern():
+    pattern = prefix_pattern("2024-03-12 10:41:07,113 INFO  [stdout] ")
+    assert pattern.match("2025-11-02 23:59:59,9 INFO  [stdout] at x").end() == 37
+    assert pattern.match("2024-03-12 10:41:07,113 INFO  [stdout]") is not None
+    assert pattern.match("2024-03-12 10:41:07,113 WARN  [stdout] ") is None
+
+
+def test_log_dump_matches_plain_dump(tmp_path):
+    gen = DumpGenerator(threads=60, deadlocks=1, seed=3)
+    lines = gen.text().splitlines()
+    noise = ["2024-03-12 10:41:00,000 INFO  [app] started", "2024-03-12 10:41:00,001 WARN  [app] slow request"]
+    logged = noise + _logged(lines)
+    # Another logger's record in the middle of the dump is dropped.
+    logged.insert(len(logged) // 2, "2024-03-12 10:41:07,500 ERROR [http] connection reset")
+    path = tmp_path / "server.log"
+    path.write_text("\n".join(logged) + "\n")
+
+    assert sniff_file_format(str(path)) == "log"
+    analysis = parse_dump_file(str(path))
+    assert analysis.format == "log"
+    assert analysis.counts == gen.expected["counts"]
+    assert [d["threads"] for d in analysis.deadlocks] == gen.expected["deadlocks"]
+    plain = parse_thread_dump("\n".join(lines))
+    assert [t.to_dict() for t in analysis.threads] == [t.to_dict() for t in plain.threads]
+
+
+def test_log_dump_with_unprefixed_continuation_lines():
+    # A logger that writes the dump as one message prefixes only its first line.
+    lines = SAMPLE.read_text().splitlines()
+    parser = LogDumpParser()
+    prefix = "2024-03-12 10:41:07 [main] INFO "
+    parser.feed_lines([prefix + "Dumping threads", prefix + lines[0]])
+    parser.feed_lines(lines[1:])
+    analysis = parser.finish()
+    assert parser.prefix == prefix
+    assert analysis.counts == parse_thread_dump(SAMPLE.read_text()).counts
+
+
+def test_every_format_through_the_engine(tmp_path):
+    json_path = tmp_path / "threads.json"
+    json_path.write_text(json.dumps(_JSON_DUMP, indent=2))
+    gz_path = tmp_path / "javacore.gz"
+    gz_path.write_bytes(gzip.compress(JAVACORE.read_bytes()))
+    log_path = tmp_path / "console.out"
+    log_path.write_text("\n".join(_logged(SAMPLE.read_text().splitlines())) + "\n")
+    broken = tmp_path / "broken.json"
+    broken.write_text('{"threadDump": {"threadContainers": [}]}\n')
+
+    pool = ParsePool(workers=1)
+    engine = Engine(pool, ParseCache(parser=pool.parse_file))
+    formats = {}
+    for path in (SAMPLE, json_path, gz_path, log_path):
+        res = engine.call("analyze_thread_dump", {"path": str(path)})
+        assert res.ok, res.error_message
+        payload = json.loads(res.text)
+        formats[path.name] = payload["format"]
+        assert not payload["truncated"]
+    assert formats == {
+        "sample_thread_dump.txt": "hotspot", "threads.json": "json", "javacore.gz": "javacore", "console.out": "log",
+    }
+
+    deadlock = json.loads(engine.call("analyze_thread_dump", {"path": str(gz_path)}).text)["deadlocks"]
+    assert deadlock[0]["threads"] == ["order-worker-1", "order-worker-2"]
+    threads = json.loads(engine.call("list_threads", {"path": str(json_path)}).text)["threads"]
+    assert [(t["name"], t["state"]) for t in threads] == [("main", "TIMED_WAITING")]
+
+    res = engine.call("analyze_thread_dump", {"path": str(broken)})
+    assert res.error_code == "INVALID_PARAMS" and "Invalid JSON thread dump at offset 37" in res.error_message
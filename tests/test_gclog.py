@@ -0,0 +1,154 @@
+import json
+
+from heap_analyzer_mcp.gclog import parse_gc_lines, parse_gc_log_files, rotated_gc_logs, summarize_gc_log
+from heap_analyzer_mcp.tools_adapter import gc_log_tool_call
+
+UNIFIED_G1 = """\
+[0.010s][info][gc] Using G1
+[0.011s][info][gc,init] Heap Region Size: 1M
+[1.000s][info][gc,start    ] GC(0) Pause Young (Normal) (G1 Evacuation Pause)
+[1.000s][info][gc,task     ] GC(0) Using 8 workers of 8 for evacuation
+[1.005s][info][gc,phases   ] GC(0)   Pre Evacuate Collection Set: 0.1ms
+[1.005s][info][gc,heap     ] GC(0) Eden regions: 50->0(45)
+[1.005s][info][gc,heap     ] GC(0) Survivor regions: 0->5(7)
+[1.005s][info][gc,heap     ] GC(0) Old regions: 10->12
+[1.005s][info][gc          ] GC(0) Pause Young (Normal) (G1 Evacuation Pause) 60M->17M(256M) 5.000ms
+[1.500s][info][gc          ] GC(1) Concurrent Mark Cycle 120.500ms
+[2.000s][info][gc,heap     ] GC(2) Eden regions: 45->0(45)
+[2.000s][info][gc,heap     ] GC(2) Survivor regions: 5->4(7)
+[2.000s][info][gc          ] GC(2) Pause Young (Concurrent Start) (G1 Humongous Allocation) 62M->20M(256M) 8.000ms
+[2.100s][info][gc          ] GC(3) Pause Remark 21M->21M(256M) 2.000ms
+[3.000s][info][gc          ] GC(4) Pause Full (System.gc()) 70M->15M(256M) 40.000ms
+"""
+
+LEGACY_PARALLEL = """\
+2024-05-01T10:00:01.000+0000: 1.000: [GC (Allocation Failure) [PSYoungGen: 65536K->10240K(76288K)] 65536K->12288K(251392K), 0.0100000 secs] [Times: user=0.03 sys=0.01, real=0.01 secs]
+2024-05-01T10:00:03.000+0000: 3.000: [GC (Allocation Failure) [PSYoungGen: 75776K->8192K(76288K)] 77824K->20480K(251392K), 0.0200000 secs] [Times: user=0.03 sys=0.01, real=0.02 secs]
+2024-05-01T10:00:05.000+0000: 5.000: [Full GC (Ergonomics) [PSYoungGen: 8192K->0K(76288K)] [ParOldGen: 12288K->15360K(175104K)] 20480K->15360K(251392K), [Metaspace: 3000K->3000K(1056768K)], 0.1000000 secs] [Times: user=0.3 sys=0.0, real=0.1 secs]
+6.000: [GC concurrent-mark-start]
+"""
+
+LEGACY_G1 = """\
+1.000: [GC pause (G1 Evacuation Pause) (young), 0.0123000 secs]
+   [Parallel Time: 11.0 ms, GC Workers: 8]
+   [Eden: 24.0M(24.0M)->0.0B(23.0M) Survivors: 0.0B->3072.0K Heap: 24.0M(256.0M)->4096.0K(256.0M)]
+2.000: [GC pause (G1 Evacuation Pause) (mixed) 30M->10M(256M), 0.0050000 secs]
+"""
+
+
+def _leaky(full_gcs, step_mb):
+    lines = ["[0.001s][info][gc] Using Parallel"]
+    gc = 0
+    for i in range(full_gcs):
+        for j in range(5):
+            t = i * 60 + j * 10 + 1
+            base = 100 + i * step_mb
+            lines.append(f"[{t}.000s][info][gc] GC({gc}) Pause Young (Allocation Failure) {base + 200}M->{base + 20}M(1024M) 4.000ms")
+            gc += 1
+        lines.append(f"[{i * 60 + 55}.000s][info][gc] GC({gc}) Pause Full (Ergonomics) {base + 150}M->{base}M(1024M) 90.000ms")
+        gc += 1
+    return [line + "\n" for line in lines]
+
+
+def test_unified_g1_log():
+    log = parse_gc_lines(UNIFIED_G1.splitlines(True))
+    payload = summarize_gc_log(log, max_pauses=2)
+    assert payload["collector"] == "G1" and payload["formats"] == {"unified": 4}
+    assert payload["collections"] == 4 and payload["full_gcs"] == 1
+    assert payload["pauses"]["count"] == 4 and payload["pauses"]["max_ms"] == 40.0 and payload["pauses"]["p50_ms"] == 5.0
+    assert [p["gc_id"] for p in payload["longest_pauses"]] == [4, 2]
+    assert payload["longest_pauses"][1]["kind"] == "Pause Young (Concurrent Start)"
+    assert payload["longest_pauses"][1]["cause"] == "G1 Humongous Allocation"
+    assert payload["causes"]["G1 Evacuation Pause"] == 1 and payload["by_kind"]["Pause Remark"]["pauses"] == 1
+    assert payload["longest_pauses"][0]["kind"] == "Pause Full" and payload["causes"]["System.gc()"] == 1
+    assert payload["concurrent"] == {"Concurrent Mark Cycle": {"count": 1, "total_ms": 120.5, "max_ms": 120.5}}
+    mb = 1 << 20
+    # GC(0): young 50 -> 5 regions, heap 60M -> 17M: 2M promoted. GC(2): 50 -> 4, 62M -> 20M: 4M.
+    assert payload["promotion"]["collections"] == 2 and payload["promotion"]["total_bytes"] == 6 * mb
+    # Heap growth between collections: 62-17, 21-20, 70-21.
+    assert payload["allocation"]["total_bytes"] == (45 + 1 + 49) * mb
+    assert payload["heap_capacity"] == 256 * mb
+
+
+def test_legacy_logs():
+    log = parse_gc_lines(LEGACY_PARALLEL.splitlines(True))
+    payload = summarize_gc_log(log)
+    assert payload["formats"] == {"legacy": 3} and payload["time_base"] == "uptime"
+    kinds = [p["kind"] for p in payload["longest_pauses"]]
+    assert kinds == ["Full GC", "GC", "GC"] and payload["longest_pauses"][0]["pause_ms"] == 100.0
+    # First young GC: young 64M -> 10M while the heap went 64M -> 12M, so 2M were promoted.
+    assert payload["promotion"]["total_bytes"] == 2048 * 1024 + (67584 - 57344) * 1024
+
+    g1 = summarize_gc_log(parse_gc_lines(LEGACY_G1.splitlines(True)))
+    assert [(p["kind"], p["heap_before"], p["heap_after"]) for p in g1["longest_pauses"]] == [
+        ("GC pause (young)", 24 << 20, 4 << 20),
+        ("GC pause (mixed)", 30 << 20, 10 << 20),
+    ]
+    assert g1["promotion"]["total_bytes"] == (24 << 20) - (3 << 20) - (20 << 20)
+
+    explicit = "1.5: [Full GC (System.gc()) [PSYoungGen: 1024K->0K(2048K)] 4096K->3072K(8192K), 0.05 secs]\n"
+    pause = summarize_gc_log(parse_gc_lines([explicit]))["longest_pauses"][0]
+    assert (pause["kind"], pause["cause"], pause["heap_after"]) == ("Full GC", "System.gc()", 3072 << 10)
+
+
+def test_leak_detection():
+    rising = summarize_gc_log(parse_gc_lines(_leaky(6, 60)))
+    assert rising["leak"]["suspected"] and rising["leak"]["baseline"] == "full_gc"
+    assert rising["leak"]["slope_bytes_per_hour"] == 60 * 60 * (1 << 20)
+    assert rising["leak"]["hours_to_capacity"] > 0 and "possible leak" in rising["summary"]
+
+    flat = summarize_gc_log(parse_gc_lines(_leaky(6, 0)))
+    assert not flat["leak"]["suspected"]
+    assert len(flat["heap_after_gc"]) == 20 and flat["pause_time_percent"] > 0
+
+
+def test_rotated_files_and_tool(tmp_path):
+    lines = _leaky(4, 50)
+    path = tmp_path / "gc.log"
+    # gc.log.1 is the older rotation; gc.log is the file being written.
+    (tmp_path / "gc.log.1").write_text("".join(lines[:10]))
+    path.write_text("".join(lines[10:]))
+    (tmp_path / "other.log").write_text("unrelated\n")
+    files = rotated_gc_logs(str(path))
+    assert [f.rsplit("/", 1)[1] for f in files] == ["gc.log.1", "gc.log"]
+    log = parse_gc_log_files(files)
+    times = list(log.times)
+    assert times == sorted(times) and len(times) == 24 and log.restarts == 0
+
+    res = gc_log_tool_call(str(path), max_pauses=3)
+    assert res.ok, res.error_message
+    payload = json.loads(res.text or "{}")
+    assert payload["collections"] == 24 and len(payload["files"]) == 2 and len(payload["longest_pauses"]) == 3
+    single = json.loads(gc_log_tool_call(str(path), include_rotated=False).text or "{}")
+    assert single["collections"] == 24 - 10 + 1  # the first 10 lines held the "Using" line and 9 collections
+    assert parse_gc_log_files([str(path)], max_bytes=200).truncated
+
+    assert gc_log_tool_call(str(tmp_path / "missing.log")).error_code == "INVALID_PARAMS"
+    assert gc_log_tool_call(str(tmp_path)).error_code == "INVALID_PARAMS"
+    assert gc_log_tool_call(str(path), buckets=0).error_code == "INVALID_PARAMS"
+
+
+def test_rotation_order_and_jvm_restarts(tmp_path):
+    def young(t, gc_id):
+        return f"[{t:.3f}s][info][gc] GC({gc_id}) Pause Young (Normal) (G1 Evacuation Pause) 300M->100M(1024M) 5.000ms\n"
+
+    for index in (0, 2, 10):
+        (tmp_path / f"gc.log.{index}").write_text("")
+    assert [f.rsplit("/", 1)[1] for f in rotated_gc_logs(str(tmp_path / "gc.log"))] == ["gc.log.0", "gc.log.2", "gc.log.10"]
+
+    # Two JVM runs: the second one's uptime starts again at 1s.
+    first = tmp_path / "run1.log"
+    first.write_text("".join(young(10.0 * i, i) for i in range(1, 6)))
+    second = tmp_path / "run2.log"
+    second.write_text("".join(young(1.0 + 10.0 * i, i) for i in range(4)))
+    log = parse_gc_log_files([str(first), str(second)])
+    assert log.restarts == 1
+    assert list(log.times) == [10.0, 20.0, 30.0, 40.0, 50.0, 50.0, 60.0, 70.0, 80.0]
+    payload = summarize_gc_log(log)
+    assert payload["jvm_restarts"] == 1 and "2 JVM runs" in payload["summary"]
+    assert payload["duration_s"] == 70.0
+
+    # Out of budget: the files not read are named.
+    cut = parse_gc_log_files([str(first), str(second)], max_bytes=first.stat().st_size - 1)
+    assert cut.truncated and cut.skipped_files == [str(second)]
+    assert "1 newer files not read" in summarize_gc_log(cut)["summary"]
@@ -0,0 +1,77 @@
+import struct
+from array import array
+
+from heap_analyzer_mcp.heapgraph import (
+    DEFAULT_MAX_OBJECTS,
+    DEFAULT_SPILL_OBJECTS,
+    build_heap_graph,
+    graph_options_from_env,
+)
+from hprof_builder import HprofBuilder
+
+NODE_CLASS = 0x10
+HOLDER_CLASS = 0x20
+ARRAY_CLASS = 0x30
+
+
+def _dump(id_size=8):
+    b = HprofBuilder(id_size)
+    ref = struct.Struct(">I" if id_size == 4 else ">Q").pack
+    b.load_class(NODE_CLASS, "com/example/Node")
+    b.load_class(HOLDER_CLASS, "com/example/Holder")
+    b.load_class(ARRAY_CLASS, "[Lcom/example/Node;")
+    # Holder extends Node: its instances hold Holder's fields, then Node's.
+    b.class_dump(NODE_CLASS, fields=[("next", 2), ("size", 10)])
+    b.class_dump(HOLDER_CLASS, super_id=NODE_CLASS, fields=[("items", 2)], statics=[("INSTANCE", 2, ref(0x900))])
+    b.root(0x900, tag=0x08, extra=struct.pack(">II", 1, 1))
+    b.instance(0x900, HOLDER_CLASS, ref(0x950) + ref(0x910) + struct.pack(">i", 3))
+    b.instance(0x910, NODE_CLASS, ref(0x920) + struct.pack(">i", 1))
+    b.instance(0x920, NODE_CLASS, ref(0xDEAD) + struct.pack(">i", 2))  # dangling reference
+    b.obj_array(0x950, ARRAY_CLASS, [0x910, 0, 0x920])
+    return b
+
+
+def _edges(graph, node):
+    return [graph.describe(t)["object"] for t in graph.successors(node)]
+
+
+def test_graph_nodes_and_references():
+    for id_size in (4, 8):
+        for spill in (0, 10**9):
+            with build_heap_graph(_dump(id_size).build(segment_records=3), spill_objects=spill) as graph:
+                assert graph.node_count == 7 and not graph.truncated
+                names = [graph.describe(n)["class"] for n in range(1, 7)]
+                assert names == [
+                    "class com.example.Node", "class com.example.Holder", "com.example.Holder",
+                    "com.example.Node", "com.example.Node", "com.example.Node[]",
+                ]
+                assert _edges(graph, 0) == ["0x900"]
+                assert graph.root_kinds == {3: "thread object"}
+                assert _edges(graph, 2) == ["0x10", "0x900"]  # superclass, static field
+                assert _edges(graph, 3) == ["0x950", "0x910"]
+                assert _edges(graph, 5) == []
+                assert _edges(graph, 6) == ["0x910", "0x920"]
+                assert graph.shallow[3] == 2 * id_size + 2 * id_size + 4
+                assert graph.shallow[6] == 2 * id_size + 4 + 3 * id_size
+
+                starts, sources = graph.predecessors()
+                assert sorted(sources[starts[4]:starts[5]]) == [3, 6]
+
+
+def test_truncated_graph():
+    data = _dump().build()
+    with build_heap_graph(data[: len(data) - 40]) as graph:
+        assert graph.truncated and graph.node_count < 7
+
+
+def test_largest_accepted_graphs_spill(monkeypatch):
+    assert DEFAULT_SPILL_OBJECTS < DEFAULT_MAX_OBJECTS
+    monkeypatch.delenv("HEAP_ANALYZER_GRAPH_SPILL_OBJECTS", raising=False)
+    monkeypatch.setenv("HEAP_ANALYZER_GRAPH_MAX_OBJECTS", "6")
+    options = graph_options_from_env()
+    assert options["spill_objects"] == 3 and options["max_objects"] == 6
+    with build_heap_graph(_dump().build(), **options) as graph:
+        assert graph.storage.spill and not isinstance(graph.targets, array)
+        assert _edges(graph, 3) == ["0x950", "0x910"]
+    monkeypatch.setenv("HEAP_ANALYZER_GRAPH_MAX_OBJECTS", "0")
+    assert graph_options_from_env()["spill_objects"] == DEFAULT_SPILL_OBJECTS
@@ -0,0 +1,147 @@
+import json
+import os
+import struct
+
+import pytest
+
+from heap_analyzer_mcp.dominators import compute_retention, summarize_retainers
+from heap_analyzer_mcp.heapgraph import build_heap_graph
+from heap_analyzer_mcp.heapindex import SECTION_NODES, SECTION_RETENTION, open_heap_index
+from heap_analyzer_mcp.hprof import HprofFormatError, class_histogram
+from heap_analyzer_mcp.tools_adapter import heap_instances_tool_call, heap_retainers_tool_call
+from hprof_builder import HprofBuilder
+
+NODE_CLASS = 0x10
+ARRAY_CLASS = 0x20
+
+
+def _dump(nodes=6, id_size=8):
+    # A chain 0 -> 1 -> ... held by an array, plus byte[] payloads.
+    b = HprofBuilder(id_size)
+    ref = struct.Struct(">I" if id_size == 4 else ">Q").pack
+    b.load_class(NODE_CLASS, "com/example/Node")
+    b.load_class(ARRAY_CLASS, "[Lcom/example/Node;")
+    b.class_dump(NODE_CLASS, fields=[("next", 2), ("data", 2)])
+    b.root(0x500)
+    b.obj_array(0x500, ARRAY_CLASS, [0x1000])
+    for i in range(nodes):
+        nxt = 0x1000 + 16 * (i + 1) if i + 1 < nodes else 0
+        b.instance(0x1000 + 16 * i, NODE_CLASS, ref(nxt) + ref(0x8000 + i))
+        b.prim_array(0x8000 + i, 8, 10 * (i + 1))
+    return b.build(segment_records=5)
+
+
+def test_index_matches_direct_analysis(tmp_path):
+    path = tmp_path / "heap.hprof"
+    data = _dump()
+    path.write_bytes(data)
+
+    with open_heap_index(str(path)) as index:
+        hist = index.histogram()
+        assert index.info()["built"] == [SECTION_NODES]
+        assert [(c.name, c.instances, c.shallow_size) for c in hist.classes] == [
+            (c.name, c.instances, c.shallow_size) for c in class_histogram(data).classes
+        ]
+        # Every object's offset points at its sub-record tag.
+        assert {data[index.record_offsets[n]] for n in range(1, index.node_count)} <= {0x20, 0x21, 0x22, 0x23}
+
+    with open_heap_index(str(path)) as index:
+        # The nodes section is reused; only the retention section is added.
+        payload = summarize_retainers(index, index.retention(), max_retainers=3, max_path=4)
+        assert index.info()["built"] == [SECTION_RETENTION]
+    with build_heap_graph(data) as graph:
+        assert payload == summarize_retainers(graph, compute_retention(graph), max_retainers=3, max_path=4)
+
+    with open_heap_index(str(path)) as index:
+        index.retention()
+        assert index.info() == {"location": str(path) + ".index", "sections": [SECTION_NODES, SECTION_RETENTION], "built": []}
+
+
+def test_stale_index_is_revalidated_or_rebuilt(tmp_path):
+    path = tmp_path / "heap.hprof"
+    path.write_bytes(_dump())
+    with open_heap_index(str(path)) as index:
+        index.retention()
+
+    # Touched but unchanged: the digest matches, so nothing is rebuilt.
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    with open_heap_index(str(path)) as index:
+        assert index.has(SECTION_RETENTION)
+        index.retention()
+        assert index.info()["built"] == []
+
+    # A damaged column costs only its own section.
+    with open(str(path) + ".index/retained.bin", "r+b") as f:
+        f.truncate(8)
+    with open_heap_index(str(path)) as index:
+        index.retention()
+        assert index.info()["built"] == [SECTION_RETENTION]
+
+    # New content drops every section.
+    path.write_bytes(_dump(nodes=9))
+    with open_heap_index(str(path)) as index:
+        assert not index.has(SECTION_NODES)
+        assert index.histogram().total_instances == 1 + 9 + 9
+
+
+def test_index_locations(tmp_path, monkeypatch):
+    path = tmp_path / "heap.hprof"
+    path.write_bytes(_dump())
+    elsewhere = tmp_path / "indexes"
+    monkeypatch.setenv("HEAP_ANALYZER_INDEX_DIR", str(elsewhere))
+    with open_heap_index(str(path)) as index:
+        index.histogram()
+        assert os.path.dirname(index.info()["location"]) == str(elsewhere)
+    assert not os.path.exists(str(path) + ".index")
+
+    monkeypatch.setenv("HEAP_ANALYZER_INDEX", "off")
+    with open_heap_index(str(path)) as index:
+        assert index.histogram().total_instances == 13
+        assert index.retention().reachable == 13
+        assert index.info()["location"] is None
+
+
+def test_list_heap_instances_tool(tmp_path):
+    path = tmp_path / "heap.hprof"
+    path.write_bytes(_dump())
+    res = heap_instances_tool_call(str(path), class_name="com.example.Node", limit=4)
+    assert res.ok, res.error_message
+    first = json.loads(res.text or "{}")
+    assert first["instances"] == 6 and first["classes_matched"] == 1
+    assert [o["object"] for o in first["objects"]] == ["0x1000", "0x1010", "0x1020", "0x1030"]
+    assert "retained_size" not in first["objects"][0]
+
+    res = heap_instances_tool_call(cursor=first["page"]["next_cursor"], limit=4)
+    second = json.loads(res.text or "{}")
+    assert [o["object"] for o in second["objects"]] == ["0x1040", "0x1050"]
+    assert second["page"]["next_cursor"] is None
+
+    missing = json.loads(heap_instances_tool_call(str(path), class_name="Node").text or "{}")
+    assert missing["instances"] == 0 and missing["similar_classes"] == ["com.example.Node", "com.example.Node[]"]
+
+    path.write_bytes(_dump(nodes=7))
+    stale = heap_instances_tool_call(cursor=first["page"]["next_cursor"])
+    assert stale.error_code == "INVALID_PARAMS" and "stale" in (stale.error_message or "")
+    assert heap_instances_tool_call(str(path)).error_code == "INVALID_PARAMS"
+
+
+def test_dump_too_large_for_the_graph_is_refused(tmp_path, monkeypatch):
+    path = tmp_path / "heap.hprof"
+    data = _dump()
+    path.write_bytes(data)
+    with pytest.raises(HprofFormatError, match="has 14 objects; .* up to 13 "):
+        build_heap_graph(data, max_objects=13)
+    with build_heap_graph(data, max_objects=14) as graph:
+        assert graph.node_count == 15
+
+    monkeypatch.setenv("HEAP_ANALYZER_GRAPH_MAX_OBJECTS", "13")
+    res = heap_retainers_tool_call(str(path))
+    assert res.error_code == "INVALID_PARAMS" and "HEAP_ANALYZER_GRAPH_MAX_OBJECTS" in (res.error_message or "")
+    with open_heap_index(str(path)) as index:
+        assert not index.has(SECTION_NODES)
+        index.histogram()
+        # With the nodes section in place the count is known without reading the dump.
+        with pytest.raises(HprofFormatError, match="has 14 objects"):
+            index.retention(max_objects=13)
+        assert index.retention(max_objects=0).reachable == 13
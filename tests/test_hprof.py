@@ -0,0 +1,71 @@
+import json
+import struct
+
+import pytest
+
+from heap_analyzer_mcp.hprof import HprofFormatError, class_histogram, java_class_name, parse_hprof_file
+from heap_analyzer_mcp.tools_adapter import heap_dump_tool_call
+from hprof_builder import HprofBuilder
+
+STRING_CLASS = 0x100
+OBJECT_ARRAY_CLASS = 0x200
+
+
+def _sample(id_size=8):
+    b = HprofBuilder(id_size)
+    b.load_class(STRING_CLASS, "java/lang/String")
+    b.load_class(OBJECT_ARRAY_CLASS, "[Ljava/lang/Object;")
+    b.class_dump(STRING_CLASS, fields=[("value", 2), ("hash", 10)], statics=[("serialVersionUID", 11, b"\0" * 8)])
+    b.root(0x1000, tag=0x08, extra=struct.pack(">II", 1, 1))
+    for i in range(3):
+        b.instance(0x1000 + i, STRING_CLASS, b"\0" * (id_size + 4))
+        b.prim_array(0x2000 + i, 8, 10)
+    b.obj_array(0x3000, OBJECT_ARRAY_CLASS, [0x1000, 0x1001])
+    b.prim_array(0x4000, 10, 100)
+    return b
+
+
+def test_class_histogram_counts_and_sizes():
+    for id_size in (4, 8):
+        hist = class_histogram(_sample(id_size).build(segment_records=4))
+        header = 2 * id_size
+        by_name = {c.name: (c.instances, c.shallow_size) for c in hist.classes}
+        assert by_name == {
+            "java.lang.String": (3, 3 * (header + id_size + 4)),
+            "byte[]": (3, 3 * (header + 4 + 10)),
+            "java.lang.Object[]": (1, header + 4 + 2 * id_size),
+            "int[]": (1, header + 4 + 400),
+        }
+        assert hist.classes[0].name == "int[]"
+        assert (hist.id_size, hist.timestamp_ms, hist.classes_loaded, hist.truncated) == (id_size, 1000, 2, False)
+
+
+def test_truncated_and_invalid_dumps(tmp_path):
+    data = _sample().build()
+    cut = class_histogram(data[: len(data) - 60])
+    assert cut.truncated and cut.total_instances < class_histogram(data).total_instances
+
+    with pytest.raises(HprofFormatError):
+        class_histogram(b"not a heap dump")
+    empty = tmp_path / "empty.hprof"
+    empty.write_bytes(b"")
+    with pytest.raises(HprofFormatError):
+        parse_hprof_file(str(empty))
+
+    assert java_class_name("[[I") == "int[][]"
+    assert java_class_name("java/util/HashMap$Node") == "java.util.HashMap$Node"
+
+
+def test_heap_histogram_tool(tmp_path):
+    path = tmp_path / "heap.hprof"
+    path.write_bytes(_sample().build())
+    res = heap_dump_tool_call(str(path), max_classes=2, sort_by="instances")
+    assert res.ok, res.error_message
+    payload = json.loads(res.text or "{}")
+    assert [c["class"] for c in payload["histogram"]] == ["byte[]", "java.lang.String"]
+    assert payload["total_instances"] == 8 and payload["omitted_classes"] == 2
+
+    assert heap_dump_tool_call(str(path), sort_by="retained").error_code == "INVALID_PARAMS"
+    text = tmp_path / "dump.txt"
+    text.write_text("not hprof")
+    assert heap_dump_tool_call(str(text)).error_code == "INVALID_PARAMS"
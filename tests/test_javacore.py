@@ -0,0 +1,76 @@
+from pathlib import Path
+
+from heap_analyzer_mcp.javacore import JavacoreParser
+from heap_analyzer_mcp.locks import analyze_locks
+from heap_analyzer_mcp.model import LOCK_LOCKED, LOCK_OWNS, LOCK_PARKING, LOCK_WAITING_ON, LOCK_WAITING_TO_LOCK
+
+JAVACORE = Path(__file__).parent / "sample_javacore.txt"
+
+
+def _parse(max_threads=5000):
+    parser = JavacoreParser(max_threads=max_threads)
+    parser.feed_lines(JAVACORE.read_bytes().splitlines(keepends=True))
+    return parser.finish()
+
+
+def test_threads_and_states():
+    analysis = _parse()
+    assert analysis.format == "javacore" and not analysis.truncated
+    # The current thread is listed once, anonymous native threads not at all.
+    assert [t.name for t in analysis.threads] == [
+        "main", "Signal Dispatcher", "order-worker-1", "order-worker-2", "order-worker-3", "pool-1-thread-1",
+        "http-listener",
+    ]
+    assert {k: v for k, v in analysis.counts.items() if v} == {"RUNNABLE": 2, "BLOCKED": 3, "WAITING": 2}
+
+    main = analysis.find_thread("main")
+    assert (main.number, main.daemon, main.prio, main.tid, main.nid) == (1, False, 5, "0x0000000000A0A200", "0xAF0")
+    assert main.frames[0] == "java.lang.Object.wait0(Native Method)"
+    assert main.frames[3] == "com.example.orders.Main.awaitShutdown(Main.java:58)"
+    assert [(lock.kind, lock.frame_index) for lock in main.locks] == [(LOCK_WAITING_ON, 0), (LOCK_LOCKED, 3)]
+    assert analysis.find_thread("Signal Dispatcher").frames == ()
+
+    pool = analysis.find_thread("pool-1-thread-1")
+    assert pool.daemon and pool.locks[0].kind == LOCK_PARKING
+    assert pool.locks[0].class_name == "java.util.concurrent.locks.AbstractQueuedSynchronizer$ConditionObject"
+
+
+def test_locks_and_deadlock():
+    analysis = _parse()
+    assert analysis.deadlocks == [{
+        "threads": ["order-worker-1", "order-worker-2"],
+        "monitor": 'java/lang/Object@0x00000000FFE1A2C8: Flat locked by "order-worker-2" '
+                   "(J9VMThread:0x0000000000A1F900), entry count 1",
+    }]
+    worker = analysis.find_thread("order-worker-1")
+    assert [(lock.kind, lock.address) for lock in worker.locks] == [
+        (LOCK_WAITING_TO_LOCK, "0x00000000FFE1A2C8"), (LOCK_LOCKED, "0x00000000FFE1A2B8"),
+    ]
+    locks = analyze_locks(analysis)
+    assert [d["threads"] for d in locks["deadlocks"]] == [["order-worker-1", "order-worker-2"]]
+    assert locks["hot_locks"][0]["waiter_names"] == ["order-worker-2", "order-worker-3"]
+
+
+def test_owner_named_by_a_blocked_thread():
+    # The owner's stack does not show the monitor it holds; the blocked thread names it.
+    parser = JavacoreParser()
+    parser.feed_lines([
+        '3XMTHREADINFO      "holder" J9VMThread:0x01, omrthread_t:0x2, java/lang/Thread:0x3, state:R, prio=5',
+        "4XESTACKTRACE                at com/example/Cache.refresh(Cache.java:10)",
+        '3XMTHREADINFO      "waiter" J9VMThread:0x04, omrthread_t:0x5, java/lang/Thread:0x6, state:B, prio=5',
+        '3XMTHREADBLOCK     Blocked on: com/example/Cache@0x10 Owned by: "holder" (J9VMThread:0x01, java/lang/Thread:0x3)',
+        "4XESTACKTRACE                at com/example/Cache.get(Cache.java:20)",
+    ])
+    analysis = parser.finish()
+    holder = analysis.find_thread("holder")
+    assert [(lock.kind, lock.address, lock.class_name, lock.frame_index) for lock in holder.locks] == [
+        (LOCK_OWNS, "0x10", "com.example.Cache", -1),
+    ]
+    assert analyze_locks(analysis)["holder_chains"][0]["holder"] == "holder"
+
+
+def test_thread_budget():
+    analysis = _parse(max_threads=3)
+    assert analysis.truncated
+    assert [t.name for t in analysis.threads] == ["main", "Signal Dispatcher", "order-worker-1"]
+    assert len(analysis.threads[2].frames) == 3
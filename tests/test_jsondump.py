@@ -0,0 +1,152 @@
+import json
+
+import pytest
+
+from heap_analyzer_mcp.jsondump import JsonDumpParser, infer_state
+from heap_analyzer_mcp.locks import analyze_locks
+from heap_analyzer_mcp.model import LOCK_LOCKED, LOCK_OWNS, LOCK_PARKING, LOCK_WAITING_TO_LOCK
+from heap_analyzer_mcp.parser import DumpFormatError, parse_stream
+
+_PARK = [
+    "java.base/jdk.internal.misc.Unsafe.park(Native Method)",
+    "java.base/java.util.concurrent.locks.LockSupport.park(LockSupport.java:371)",
+    "com.example.Queue.take(Queue.java:40)",
+]
+_VIRTUAL_PARK = [
+    "java.base/jdk.internal.vm.Continuation.yield(Continuation.java:357)",
+    "java.base/java.lang.VirtualThread.yieldContinuation(VirtualThread.java:370)",
+    "java.base/java.lang.VirtualThread.parkNanos(VirtualThread.java:621)",
+    "java.base/java.lang.VirtualThread.sleepNanos(VirtualThread.java:791)",
+    "java.base/java.lang.Thread.sleep(Thread.java:507)",
+    "com.example.Handler.handle(Handler.java:12)",
+]
+
+
+def _dump(*containers):
+    return {"threadDump": {
+        "processId": "4242",
+        "time": "2024-03-12T09:41:27.113Z",
+        "runtimeVersion": "21.0.2+13-LTS",
+        "threadContainers": [
+            {"container": name, "parent": None, "owner": None, "threads": threads, "threadCount": str(len(threads))}
+            for name, threads in containers
+        ],
+    }}
+
+
+def _parse(doc, max_threads=5000, indent=2):
+    parser = JsonDumpParser(max_threads=max_threads)
+    parser.feed_lines(json.dumps(doc, indent=indent).splitlines())
+    return parser.finish()
+
+
+def test_jdk21_states_are_inferred():
+    doc = _dump(
+        ("<root>", [
+            {"tid": "1", "name": "main", "stack": ["java.base/java.lang.Thread.sleep0(Native Method)"]},
+            {"tid": "12", "name": "pool-1-thread-1", "stack": _PARK},
+            {"tid": "13", "name": "waiter", "stack": ["java.base/java.lang.Object.wait0(Native Method)"]},
+            {"tid": "14", "name": "acceptor", "stack": ["java.base/sun.nio.ch.Net.accept(Native Method)"]},
+        ]),
+        ("java.util.concurrent.ThreadPerTaskExecutor@4f023edb", [
+            {"tid": str(100 + i), "name": "", "stack": _VIRTUAL_PARK if i % 2 else []} for i in range(4)
+        ]),
+    )
+    for indent in (2, None):
+        analysis = _parse(doc, indent=indent)
+        assert analysis.format == "json" and not analysis.truncated
+        assert [t.state for t in analysis.threads] == [
+            "TIMED_WAITING", "WAITING", "WAITING", "RUNNABLE", None, "TIMED_WAITING", None, "TIMED_WAITING",
+        ]
+        assert {k: v for k, v in analysis.counts.items() if v} == {"RUNNABLE": 1, "WAITING": 2, "TIMED_WAITING": 3}
+    virtual = analysis.threads[5]
+    assert (virtual.name, virtual.tid, virtual.number) == ("", "101", 101)
+    # Identical stacks share one interned tuple.
+    assert virtual.frames is analysis.threads[7].frames
+    assert infer_state(("java.base/jdk.internal.misc.Unsafe.park(Native Method)",
+                        "java.base/java.util.concurrent.locks.LockSupport.parkNanos(LockSupport.java:269)")) == (
+        "TIMED_WAITING"
+    )
+
+
+def test_lock_fields_of_newer_jdks():
+    doc = _dump(("<root>", [
+        {"tid": "21", "name": "a", "state": "BLOCKED", "virtual": False,
+         "stack": ["com.example.Ledger.transfer(Ledger.java:42)", "com.example.Worker.run(Worker.java:19)"],
+         "blockedOn": "java.lang.Object@1a2b", "monitorsOwned": [{"depth": 0, "locks": ["java.lang.Object@3c4d"]}]},
+        {"tid": "22", "name": "b", "state": "BLOCKED", "virtual": False,
+         "stack": ["com.example.Ledger.transfer(Ledger.java:42)", "com.example.Worker.run(Worker.java:19)"],
+         "blockedOn": "java.lang.Object@3c4d", "monitorsOwned": [{"depth": 0, "locks": ["java.lang.Object@1a2b"]}]},
+        {"tid": "23", "name": "c", "state": "WAITING", "virtual": True, "stack": _PARK,
+         "parkBlocker": {"object": "java.util.concurrent.locks.ReentrantLock$NonfairSync@5e6f", "owner": "24"}},
+        {"tid": "24", "name": "d", "state": "RUNNABLE", "stack": ["com.example.Job.run(Job.java:7)"]},
+    ]))
+    analysis = _parse(doc)
+    a, b, c, d = analysis.threads
+    assert [(lock.kind, lock.address, lock.frame_index) for lock in a.locks] == [
+        (LOCK_WAITING_TO_LOCK, "0x1a2b", 0), (LOCK_LOCKED, "0x3c4d", 0),
+    ]
+    assert c.virtual and not c.daemon and c.locks[0].kind == LOCK_PARKING
+    assert not a.virtual and a.to_dict()["virtual"] is False
+    assert [(lock.kind, lock.address, lock.frame_index) for lock in d.locks] == [(LOCK_OWNS, "0x5e6f", -1)]
+    locks = analyze_locks(analysis)
+    assert [dl["threads"] for dl in locks["deadlocks"]] == [["a", "b"]]
+    assert locks["holder_chains"][0]["holder"] == "d"
+
+
+def test_budgets_truncation_and_errors():
+    doc = _dump(("<root>", [{"tid": str(i), "name": f"t{i}", "stack": _PARK} for i in range(10)]))
+    lines = json.dumps(doc, indent=2).splitlines()
+    cut = _parse(doc, max_threads=4)
+    assert cut.truncated and [t.name for t in cut.threads] == ["t0", "t1", "t2", "t3"]
+
+    parser = JsonDumpParser()
+    for line in lines[:len(lines) // 2]:
+        parser.feed_lines([line])
+    partial = parser.finish()
+    assert partial.truncated and 0 < len(partial.threads) < 10
+
+    with pytest.raises(DumpFormatError, match="offset 0: expected a JSON object"):
+        JsonDumpParser().feed_lines(["[1, 2]"])
+    with pytest.raises(DumpFormatError, match="Expecting ',' delimiter"):
+        JsonDumpParser().feed_lines(['{"threadDump": {"threadContainers": [{"threads": [{"tid": "1" "name": "x"}]}]}}'])
+
+
+def test_pieces_cut_anywhere():
+    doc = _dump(("<root>", [
+        {"tid": 7, "name": "main", "priority": 5, "weight": -1.5e3, "virtual": False, "stack": _PARK},
+        {"tid": "8", "name": "esc\u00e9ped", "virtual": True, "stack": _VIRTUAL_PARK},
+    ]))
+    doc["threadDump"]["processId"] = 4242
+    text = json.dumps(doc, separators=(",", ":"))
+    whole = _parse(doc, indent=None)
+    parser = JsonDumpParser()
+    for c in text:
+        parser.feed_text(c)
+    analysis = parser.finish()
+    assert not analysis.truncated
+    assert [t.to_dict() for t in analysis.threads] == [t.to_dict() for t in whole.threads]
+    assert [(t.tid, t.name) for t in analysis.threads] == [("7", "main"), ("8", "esc\u00e9ped")]
+
+
+@pytest.mark.parametrize("indent", [2, None])
+def test_large_dump_is_streamed(tmp_path, indent):
+    threads = [{"tid": str(i), "name": "", "stack": _VIRTUAL_PARK} for i in range(20000)]
+    path = tmp_path / "threads.json"
+    doc = _dump(("<root>", []), ("java.util.concurrent.ThreadPerTaskExecutor@1", threads))
+    # Minified, the whole dump is a single line.
+    path.write_text(json.dumps(doc, indent=indent))
+
+    class Recording(JsonDumpParser):
+        largest = 0
+
+        def feed_text(self, text):
+            super().feed_text(text)
+            Recording.largest = max(Recording.largest, len(self._buf) - self._pos)
+
+    with open(path, "rb") as f:
+        analysis = parse_stream(Recording(max_threads=50000), f)
+    assert len(analysis.threads) == 20000 and analysis.counts["TIMED_WAITING"] == 20000
+    assert analysis.bytes_read == path.stat().st_size > 6 * 1024 * 1024
+    # What is left over after a piece is at most one unfinished thread.
+    assert 0 < Recording.largest < 2048
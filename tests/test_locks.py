@@ -0,0 +1,84 @@
+from pathlib import Path
+
+from heap_analyzer_mcp.locks import analyze_locks, build_lock_graph, find_cycles
+from heap_analyzer_mcp.parser import parse_thread_dump, parse_thread_dump_file
+
+BASE_DIR = Path(__file__).parent
+
+
+def _thread(name, state, top, locks=()):
+    lines = [f'"{name}" #1 prio=5 os_prio=0 tid=0x{abs(hash(name)) % 4096:x} nid=0x1 waiting  [0x0]']
+    lines.append(f"   java.lang.Thread.State: {state}")
+    lines.append(f"\tat {top}")
+    lines.extend(f"\t- {lock}" for lock in locks)
+    lines.append("\tat java.lang.Thread.run(Thread.java:840)")
+    lines.append("")
+    return lines
+
+
+def test_deadlock_from_lock_lines():
+    result = analyze_locks(parse_thread_dump_file(str(BASE_DIR / "sample_thread_dump_locks.txt")))
+
+    # The cycle comes from the lock graph; the banner names the same threads and is dropped.
+    assert len(result["deadlocks"]) == 1
+    deadlock = result["deadlocks"][0]
+    assert deadlock["source"] == "lock_graph"
+    assert deadlock["threads"] == ["Thread-1", "Thread-2"]
+    assert [(lock["thread"], lock["waiting_for"], lock["held_by"]) for lock in deadlock["locks"]] == [
+        ("Thread-1", "0x000000071a2b3c48", "Thread-2"),
+        ("Thread-2", "0x000000071a2b3c38", "Thread-1"),
+    ]
+    assert result["hot_locks"][0]["waiters"] == 2
+    assert result["hot_locks"][0]["owner"] is None
+
+
+def test_banner_is_kept_without_lock_lines():
+    text = (BASE_DIR / "sample_thread_dump.txt").read_text(encoding="utf-8")
+    deadlocks = analyze_locks(parse_thread_dump(text))["deadlocks"]
+    assert [(d["threads"], d["source"]) for d in deadlocks] == [(["Thread-1", "Thread-2"], "banner")]
+
+
+def test_hot_locks_and_holder_chains():
+    lines = []
+    lines += _thread("holder", "RUNNABLE", "com.example.Cache.load(Cache.java:10)",
+                     ["locked <0x10> (a java.lang.Object)"])
+    lines += _thread("middle", "BLOCKED", "com.example.Cache.get(Cache.java:20)",
+                     ["waiting to lock <0x10> (a java.lang.Object)", "locked <0x20> (a java.lang.Object)"])
+    for i in range(3):
+        lines += _thread(f"waiter-{i}", "BLOCKED", "com.example.Api.call(Api.java:5)",
+                         ["waiting to lock <0x20> (a java.lang.Object)"])
+    # Object.wait() releases the monitor it also reports as locked.
+    lines += _thread("sleeper", "WAITING", "java.lang.Object.wait(Native Method)",
+                     ["waiting on <0x30> (a java.lang.Object)", "locked <0x30> (a java.lang.Object)"])
+    lines += _thread("notifier", "BLOCKED", "com.example.Queue.put(Queue.java:7)",
+                     ["waiting to lock <0x30> (a java.lang.Object)"])
+    result = analyze_locks(parse_thread_dump("\n".join(lines)))
+
+    assert result["deadlocks"] == []
+    hot = result["hot_locks"]
+    assert [(h["address"], h["waiters"], h["owner"]) for h in hot] == [
+        ("0x20", 3, "middle"), ("0x10", 1, "holder"), ("0x30", 1, None),
+    ]
+    chains = result["holder_chains"]
+    assert len(chains) == 1
+    assert chains[0]["holder"] == "holder" and chains[0]["blocked_threads"] == 4
+    assert chains[0]["max_depth"] == 2
+    assert chains[0]["longest_chain"] == ["waiter-0", "middle", "holder"]
+
+
+def test_find_cycles_on_large_graph():
+    # A 3-cycle, a self-loop and a long tail leading into the 3-cycle.
+    n = 50_000
+    edges = [i + 1 for i in range(n)]
+    edges[n - 1] = n - 3
+    edges[0] = -1
+    edges.append(n)
+    cycles = find_cycles(edges)
+    assert sorted(sorted(c) for c in cycles) == [[n - 3, n - 2, n - 1], [n]]
+
+
+def test_lock_graph_ignores_unowned_waits():
+    text = "\n".join(_thread("parked", "WAITING", "jdk.internal.misc.Unsafe.park(Native Method)",
+                             ["parking to wait for  <0x99> (a java.util.concurrent.locks.ReentrantLock$NonfairSync)"]))
+    graph = build_lock_graph(parse_thread_dump(text).threads)
+    assert graph.waiting_for == ["0x99"] and graph.edges == [-1]
@@ -0,0 +1,71 @@
+from pathlib import Path
+
+from heap_analyzer_mcp.model import LOCK_LOCKED, LOCK_OWNS, LOCK_WAITING_TO_LOCK, InternTable, parse_thread_header
+from heap_analyzer_mcp.parser import ThreadDumpParser, parse_thread_dump_file
+
+BASE_DIR = Path(__file__).parent
+
+
+def test_thread_model_headers_frames_and_locks():
+    analysis = parse_thread_dump_file(str(BASE_DIR / "sample_thread_dump_locks.txt"))
+
+    names = [t.name for t in analysis.threads]
+    assert names == [
+        "main", "Thread-1", "Thread-2", "pool-1-thread-1", "pool-1-thread-2",
+        "GC Thread#0", "VM Periodic Task Thread",
+    ]
+
+    t1 = analysis.find_thread("Thread-1")
+    assert t1 is not None
+    assert (t1.number, t1.daemon, t1.prio, t1.os_prio) == (14, False, 5, 0)
+    assert t1.tid == "0x00007f3c6c1a1b40" and t1.nid == "0x1a3c"
+    assert t1.native_state == "waiting for monitor entry"
+    assert t1.state == "BLOCKED"
+    assert t1.top_frame == "com.example.Transfer.debit(Transfer.java:31)"
+    assert [(lock.kind, lock.address, lock.frame_index) for lock in t1.locks] == [
+        (LOCK_WAITING_TO_LOCK, "0x000000071a2b3c48", 0),
+        (LOCK_LOCKED, "0x000000071a2b3c38", 1),
+    ]
+
+    worker = analysis.find_thread("pool-1-thread-1")
+    assert worker is not None and worker.daemon
+    assert worker.locks[-1].kind == LOCK_OWNS and worker.locks[-1].frame_index == -1
+
+    # The "Java stack information" section of the deadlock report does not
+    # append frames to the last real thread.
+    vm = analysis.find_thread("VM Periodic Task Thread")
+    assert vm is not None and vm.frames == () and vm.state is None
+    assert len(analysis.threads_in_state("WAITING")) == 2
+
+
+def test_identical_stacks_share_storage():
+    strings = InternTable()
+    parser = ThreadDumpParser(strings=strings)
+    for i in range(3):
+        parser.feed_lines([
+            f'"worker-{i}" #{i} prio=5 os_prio=0 tid=0x{i} nid=0x{i} waiting on condition  [0x0]',
+            "   java.lang.Thread.State: WAITING (parking)",
+            "\tat jdk.internal.misc.Unsafe.park(Native Method)",
+            "\tat java.util.concurrent.locks.LockSupport.park(LockSupport.java:341)",
+            "",
+        ])
+    analysis = parser.finish()
+
+    stacks = [t.frames for t in analysis.threads]
+    assert len(stacks) == 3
+    assert stacks[0] is stacks[1] is stacks[2]
+    assert strings.distinct_stacks == 1
+
+
+def test_parse_thread_header_variants():
+    strings = InternTable()
+    gc = parse_thread_header('"GC Thread#0" os_prio=0 cpu=3.21ms elapsed=35.15s tid=0x7f nid=0x1a2d runnable  ', strings)
+    assert gc is not None
+    assert (gc.name, gc.number, gc.prio, gc.native_state) == ("GC Thread#0", None, None, "runnable")
+
+    jdk21 = parse_thread_header(
+        '"main" #1 [4242] prio=5 os_prio=0 cpu=10ms elapsed=1s tid=0x1 nid=4242 waiting on condition  [0x00007f]',
+        strings,
+    )
+    assert jdk21 is not None
+    assert (jdk21.number, jdk21.nid, jdk21.native_state) == (1, "4242", "waiting on condition")
@@ -0,0 +1,81 @@
+import json
+
+import pytest
+
+from heap_analyzer_mcp import tools_adapter
+from heap_analyzer_mcp.pagination import CursorError, decode_cursor, encode_cursor, paginate
+from heap_analyzer_mcp.tools_adapter import cluster_tool_call, list_threads_tool_call
+
+
+def _write_dump(path, count):
+    lines = []
+    for i in range(count):
+        state = "RUNNABLE" if i % 3 == 0 else "WAITING"
+        lines.append(f'"worker-{i}" #{i} prio=5 os_prio=0 tid=0x{i:x} nid=0x{i:x} runnable  [0x0]')
+        lines.append(f"   java.lang.Thread.State: {state}")
+        lines.append(f"\tat com.example.Job.run{i % 7}(Job.java:1)")
+        lines.append("")
+    path.write_text("\n".join(lines), encoding="utf-8")
+
+
+def test_paginate_limit_and_byte_budget():
+    items = [{"n": i, "pad": "x" * 50} for i in range(10)]
+    page, info = paginate(items, 2, 3, 10_000)
+    assert [i["n"] for i in page] == [2, 3, 4]
+    assert info == {"offset": 2, "returned": 3, "total": 10, "omitted": 5, "truncated_by": "limit", "next_offset": 5}
+
+    page, info = paginate(items, 0, 10, 150)
+    assert len(page) == 2 and info["truncated_by"] == "max_response_bytes" and info["next_offset"] == 2
+
+    # A single item over budget is still returned so paging always advances.
+    page, info = paginate(items, 9, 10, 1)
+    assert len(page) == 1 and info["truncated_by"] is None and info["next_offset"] is None
+
+
+def test_cursor_round_trip_and_validation():
+    cursor = encode_cursor("list_threads", {"path": "a.txt"}, 40, "abc")
+    state = decode_cursor(cursor, "list_threads")
+    assert (state["query"], state["offset"], state["digest"]) == ({"path": "a.txt"}, 40, "abc")
+    with pytest.raises(CursorError):
+        decode_cursor(cursor, "cluster_thread_stacks")
+    with pytest.raises(CursorError):
+        decode_cursor("not-a-cursor", "list_threads")
+
+
+def test_list_threads_pages_from_cache(tmp_path):
+    path = tmp_path / "dump.txt"
+    _write_dump(path, 250)
+
+    first = json.loads(list_threads_tool_call(str(path), states=["WAITING"], limit=100).text or "{}")
+    assert first["page"]["total"] == 166 and first["page"]["returned"] == 100
+    misses = tools_adapter._engine.cache.stats()["misses"]
+
+    seen = [t["name"] for t in first["threads"]]
+    cursor = first["page"]["next_cursor"]
+    while cursor:
+        res = list_threads_tool_call(cursor=cursor, limit=100, max_response_bytes=2000)
+        assert res.ok, res.error_message
+        payload = json.loads(res.text or "{}")
+        assert all(t["state"] == "WAITING" for t in payload["threads"])
+        seen.extend(t["name"] for t in payload["threads"])
+        cursor = payload["page"]["next_cursor"]
+    assert len(seen) == len(set(seen)) == 166
+    assert tools_adapter._engine.cache.stats()["misses"] == misses
+
+    single = json.loads(list_threads_tool_call(str(path), name_contains="worker-12", max_frames=0).text or "{}")
+    assert [t["name"] for t in single["threads"]] == ["worker-12"] + [f"worker-{i}" for i in range(120, 130)]
+    assert single["threads"][0]["frames"] == []
+
+
+def test_stale_cursor_and_cluster_pages(tmp_path):
+    path = tmp_path / "dump.txt"
+    _write_dump(path, 70)
+    payload = json.loads(cluster_tool_call(str(path), max_clusters=3).text or "{}")
+    assert payload["page"]["total"] == 7 and payload["page"]["omitted"] == 4
+    rest = json.loads(cluster_tool_call(cursor=payload["page"]["next_cursor"]).text or "{}")
+    assert len(rest["clusters"]) == 4 and rest["page"]["next_cursor"] is None
+
+    _write_dump(path, 71)
+    res = cluster_tool_call(cursor=payload["page"]["next_cursor"])
+    assert res.error_code == "INVALID_PARAMS" and "stale" in (res.error_message or "")
+    assert list_threads_tool_call(cursor=payload["page"]["next_cursor"]).error_code == "INVALID_PARAMS"
@@ -0,0 +1,95 @@
+from pathlib import Path
+
+from heap_analyzer_mcp.parallel import ParsePool, find_chunk_ranges
+from heap_analyzer_mcp.parser import parse_thread_dump_file
+
+BASE_DIR = Path(__file__).parent
+
+
+def _write_dump(path: Path, threads: int) -> None:
+    states = ("RUNNABLE", "WAITING", "TIMED_WAITING", "BLOCKED")
+    lines = ["Full thread dump OpenJDK 64-Bit Server VM (17.0.9+9 mixed mode):", ""]
+    for i in range(threads):
+        lines.append(f'"worker-{i}" #{i + 1} daemon prio=5 os_prio=0 tid=0x{i:x} nid=0x{i:x} runnable  [0x0]')
+        lines.append(f"   java.lang.Thread.State: {states[i % 4]}")
+        lines.append(f"\tat com.example.Worker.step{i % 3}(Worker.java:{i % 7})")
+        lines.append("\tat java.lang.Thread.run(Thread.java:840)")
+        lines.append("")
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    # Append the deadlock banner from the sample so merging keeps it.
+    with open(path, "a", encoding="utf-8") as f:
+        f.write((BASE_DIR / "sample_thread_dump.txt").read_text(encoding="utf-8").split("\n\n")[-1])
+
+
+def _assert_same(a, b, same_bytes=True):
+    assert a.counts == b.counts
+    assert a.deadlocks == b.deadlocks
+    assert a.truncated == b.truncated
+    if same_bytes:
+        assert a.bytes_read == b.bytes_read
+    assert [(t.name, t.state, t.frames) for t in a.threads] == [(t.name, t.state, t.frames) for t in b.threads]
+
+
+def test_chunk_ranges_start_at_thread_blocks(tmp_path):
+    path = tmp_path / "dump.txt"
+    _write_dump(path, 200)
+    size = path.stat().st_size
+    ranges = find_chunk_ranges(str(path), size, 4)
+    assert len(ranges) == 4
+    assert ranges[0][0] == 0 and ranges[-1][1] == size
+    data = path.read_bytes()
+    for (start, end), (next_start, _) in zip(ranges, ranges[1:]):
+        assert end == next_start
+        assert data[next_start:next_start + 1] == b'"' and data[next_start - 2:next_start] == b"\n\n"
+
+
+def test_chunked_parse_matches_sequential(tmp_path):
+    path = tmp_path / "dump.txt"
+    _write_dump(path, 500)
+    pool = ParsePool(workers=3, kind="thread", chunk_bytes=1)
+    try:
+        _assert_same(pool.parse_file(str(path)), parse_thread_dump_file(str(path)))
+        # bytes_read is batch-granular once the thread budget stops a parse early.
+        _assert_same(
+            pool.parse_file(str(path), max_threads=123),
+            parse_thread_dump_file(str(path), max_threads=123),
+            same_bytes=False,
+        )
+        _assert_same(pool.parse_file(str(path), max_bytes=5000), parse_thread_dump_file(str(path), max_bytes=5000))
+    finally:
+        pool.shutdown()
+
+
+def test_thread_budget_in_the_last_chunk_drops_its_deadlock_banner(tmp_path):
+    path = tmp_path / "dump.txt"
+    _write_dump(path, 3000)
+    sequential = parse_thread_dump_file(str(path), max_threads=2999)
+    assert sequential.truncated and not sequential.deadlocks
+    for workers in (2, 3, 5):
+        pool = ParsePool(workers=workers, kind="thread", chunk_bytes=1)
+        try:
+            _assert_same(pool.parse_file(str(path), max_threads=2999), sequential, same_bytes=False)
+            _assert_same(pool.parse_file(str(path), max_threads=3001), parse_thread_dump_file(str(path)))
+        finally:
+            pool.shutdown()
+
+
+def test_process_pool_parses_files_concurrently(tmp_path):
+    a = tmp_path / "a.txt"
+    b = tmp_path / "b.txt"
+    _write_dump(a, 300)
+    _write_dump(b, 50)
+    pool = ParsePool(workers=2, kind="process", chunk_bytes=1)
+    try:
+        results = pool.parse_files([str(a), str(b)])
+    finally:
+        pool.shutdown()
+    _assert_same(results[0], parse_thread_dump_file(str(a)))
+    _assert_same(results[1], parse_thread_dump_file(str(b)))
+    # Frames are re-interned across chunks after crossing the process boundary.
+    stacks = {t.frames for t in results[0].threads}
+    assert len({id(s) for s in stacks}) == len(stacks)
+    by_frames = {}
+    for t in results[0].threads:
+        by_frames.setdefault(t.frames, t.frames)
+        assert by_frames[t.frames] is t.frames
@@ -0,0 +1,133 @@
+import asyncio
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+from heap_analyzer_mcp.cache import ParseCache
+from heap_analyzer_mcp.parser import ParseCancelled, parse_thread_dump_file
+from heap_analyzer_mcp.runner import RequestRunner, RequestTimeout
+
+BASE_DIR = Path(__file__).parent
+
+
+def _wait_for_cancel(observed: list):
+    def work(cancel: threading.Event) -> str:
+        observed.append(cancel.wait(timeout=5))
+        return "finished"
+    return work
+
+
+def test_timeout_sets_cancel_event():
+    runner = RequestRunner(max_concurrent=2, timeout=0.05)
+    observed: list = []
+
+    async def scenario():
+        with pytest.raises(RequestTimeout):
+            await runner.run(_wait_for_cancel(observed))
+
+    asyncio.run(scenario())
+    runner.shutdown()
+    deadline = time.time() + 5
+    while not observed and time.time() < deadline:
+        time.sleep(0.01)
+    assert observed == [True]
+    assert runner.stats()["timeouts"] == 1
+
+
+def test_task_cancellation_sets_cancel_event():
+    runner = RequestRunner(max_concurrent=2, timeout=10)
+    observed: list = []
+
+    async def scenario():
+        task = asyncio.ensure_future(runner.run(_wait_for_cancel(observed)))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(scenario())
+    runner.shutdown()
+    deadline = time.time() + 5
+    while not observed and time.time() < deadline:
+        time.sleep(0.01)
+    assert observed == [True]
+    assert runner.stats()["cancelled"] == 1
+
+
+def test_concurrency_limit_and_event_loop_stays_responsive():
+    runner = RequestRunner(max_concurrent=1, timeout=10)
+    running = []
+    peak = []
+
+    def work(cancel: threading.Event) -> int:
+        running.append(1)
+        peak.append(len(running))
+        time.sleep(0.05)
+        running.pop()
+        return 1
+
+    async def scenario():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.005)
+                ticks += 1
+
+        tick_task = asyncio.ensure_future(ticker())
+        results = await asyncio.gather(*(runner.run(work) for _ in range(3)))
+        tick_task.cancel()
+        return results, ticks
+
+    results, ticks = asyncio.run(scenario())
+    runner.shutdown()
+    assert results == [1, 1, 1]
+    assert max(peak) == 1
+    assert ticks > 5
+
+
+def test_timed_out_work_keeps_its_slot_until_it_returns():
+    runner = RequestRunner(max_concurrent=1, timeout=10)
+    release = threading.Event()
+    events = []
+
+    def stubborn(cancel: threading.Event) -> str:
+        # Ignores cancel, like a heap pass between two checks.
+        release.wait(timeout=5)
+        events.append("first done")
+        return "first"
+
+    def quick(cancel: threading.Event) -> str:
+        events.append("second ran")
+        return "second"
+
+    async def scenario():
+        first = asyncio.ensure_future(runner.run(stubborn, timeout=0.05))
+        await asyncio.sleep(0.01)
+        second = asyncio.ensure_future(runner.run(quick, timeout=0.2))
+        with pytest.raises(RequestTimeout):
+            await first
+        assert runner.stats()["active"] == 1 and not second.done()
+        # Longer than the second request's own timeout: waiting for the slot does not count.
+        await asyncio.sleep(0.3)
+        assert not second.done()
+        release.set()
+        return await second
+
+    assert asyncio.run(scenario()) == "second"
+    runner.shutdown()
+    assert events == ["first done", "second ran"]
+    assert runner.stats()["timeouts"] == 1 and runner.stats()["active"] == 0
+
+
+def test_parse_and_cache_honour_cancel():
+    cancel = threading.Event()
+    cancel.set()
+    path = str(BASE_DIR / "sample_thread_dump.txt")
+    with pytest.raises(ParseCancelled):
+        parse_thread_dump_file(path, cancel=cancel)
+    with pytest.raises(ParseCancelled):
+        ParseCache().get_or_parse(path, cancel=cancel)
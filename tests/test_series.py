@@ -0,0 +1,97 @@
+import json
+
+from heap_analyzer_mcp.cache import ParseCache
+from heap_analyzer_mcp.engine import Engine
+from heap_analyzer_mcp.parallel import ParsePool
+from heap_analyzer_mcp.series import build_series
+from heap_analyzer_mcp.tools_adapter import series_tool_call
+
+
+def _write_dump(path, threads):
+    lines = []
+    for i, (name, state, top) in enumerate(threads):
+        lines.append(f'"{name}" #{i + 1} prio=5 os_prio=0 tid=0x{i + 1:x} nid=0x{i + 1:x} runnable  [0x0]')
+        lines.append(f"   java.lang.Thread.State: {state}")
+        lines.append(f"\tat {top}")
+        lines.append("\tat java.lang.Thread.run(Thread.java:840)")
+        lines.append("")
+    path.write_text("\n".join(lines), encoding="utf-8")
+
+
+def _series(tmp_path):
+    snapshots = [
+        [("spinner", "RUNNABLE", "com.example.Loop.spin(Loop.java:10)"),
+         ("worker", "RUNNABLE", "com.example.Job.step1(Job.java:1)")],
+        [("spinner", "RUNNABLE", "com.example.Loop.spin(Loop.java:10)"),
+         ("worker", "RUNNABLE", "com.example.Job.step2(Job.java:2)")],
+        [("spinner", "RUNNABLE", "com.example.Loop.spin(Loop.java:10)"),
+         ("worker", "BLOCKED", "com.example.Job.step3(Job.java:3)"),
+         ("late", "WAITING", "jdk.internal.misc.Unsafe.park(Native Method)")],
+    ]
+    paths = []
+    for i, threads in enumerate(snapshots):
+        p = tmp_path / f"jstack-{i:02d}.txt"
+        _write_dump(p, threads)
+        paths.append(str(p))
+    return paths
+
+
+def test_series_detects_stuck_threads_and_builds_timelines(tmp_path):
+    paths = _series(tmp_path)
+    res = series_tool_call(paths=paths, timelines="all")
+    assert res.ok, res.error_message
+    payload = json.loads(res.text or "{}")
+
+    assert payload["dumps"] == 3
+    assert payload["state_series"]["RUNNABLE"] == [2, 2, 1]
+    assert payload["state_series"]["BLOCKED"] == [0, 0, 1]
+
+    stuck = payload["stuck_threads"]
+    assert [s["name"] for s in stuck] == ["spinner"]
+    assert stuck[0]["snapshots"] == 3 and stuck[0]["top_frame"] == "com.example.Loop.spin(Loop.java:10)"
+
+    timelines = {t["name"]: t["states"] for t in payload["timelines"]}
+    assert timelines["worker"] == ["RUNNABLE", "RUNNABLE", "BLOCKED"]
+    assert timelines["late"] == [None, None, "WAITING"]
+
+
+def test_series_glob_and_validation(tmp_path):
+    _series(tmp_path)
+    res = series_tool_call(glob=str(tmp_path / "jstack-*.txt"), min_snapshots=2, stuck_states=["RUNNABLE", "WAITING"])
+    assert res.ok, res.error_message
+    payload = json.loads(res.text or "{}")
+    assert payload["paths"] == sorted(payload["paths"])
+    assert [t["name"] for t in payload["timelines"]] == ["spinner"]
+
+    assert series_tool_call().error_code == "INVALID_PARAMS"
+    assert series_tool_call(glob=str(tmp_path / "nothing-*.txt")).error_code == "INVALID_PARAMS"
+    assert series_tool_call(paths=[str(tmp_path / "missing.txt")]).error_code == "INVALID_PARAMS"
+    assert series_tool_call(paths=[str(tmp_path)], timelines="bogus").error_code == "INVALID_PARAMS"
+
+
+def test_stuck_run_is_not_hidden_by_a_longer_run_in_another_state():
+    key = ("poller", "0x1")
+    runs = [("RUNNABLE", "com.example.Poller.poll(Poller.java:5)")] * 3 + [("WAITING", "java.lang.Object.wait")] * 4
+    snapshots = [({}, {key: sig}) for sig in runs]
+    stuck = build_series(snapshots, min_snapshots=3)["stuck_threads"]
+    assert [(s["state"], s["snapshots"], s["first_index"], s["last_index"]) for s in stuck] == [("RUNNABLE", 3, 0, 2)]
+
+
+def test_too_few_dumps_report_no_stuck_threads(tmp_path):
+    paths = _series(tmp_path)
+    payload = json.loads(series_tool_call(paths=paths[:1]).text or "{}")
+    assert payload["dumps"] == 1 and payload["stuck_threads"] == [] and payload["stuck_total"] == 0
+    assert "too few" in payload["summary"]
+    payload = json.loads(series_tool_call(paths=paths[:2], min_snapshots=3).text or "{}")
+    assert payload["stuck_threads"] == []
+    assert series_tool_call(paths=paths, min_snapshots=1).error_code == "INVALID_PARAMS"
+
+
+def test_series_does_not_fill_the_parse_cache(tmp_path):
+    pool = ParsePool(workers=1)
+    cache = ParseCache(parser=pool.parse_file)
+    engine = Engine(pool, cache)
+    res = engine.call("analyze_thread_dump_series", {"paths": _series(tmp_path)})
+    assert res.ok, res.error_message
+    assert json.loads(res.text or "{}")["stuck_total"] == 1
+    assert cache.stats()["entries"] == 0 and cache.stats()["misses"] == 0
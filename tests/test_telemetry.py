@@ -0,0 +1,108 @@
+import json
+import pstats
+import tracemalloc
+from pathlib import Path
+
+from heap_analyzer_mcp.cache import ParseCache
+from heap_analyzer_mcp.engine import Engine
+from heap_analyzer_mcp.parallel import ParsePool
+from heap_analyzer_mcp.telemetry import Telemetry, count, stage
+
+BASE_DIR = Path(__file__).parent
+SAMPLE = str(BASE_DIR / "sample_thread_dump.txt")
+SAMPLE_2 = str(BASE_DIR / "sample_thread_dump_2.txt")
+
+
+def _engine(telemetry):
+    pool = ParsePool(workers=1)
+    return Engine(pool, ParseCache(parser=pool.parse_file), telemetry=telemetry)
+
+
+def _stats(engine, **arguments):
+    res = engine.call("server_stats", arguments)
+    assert res.ok, res.error_message
+    return json.loads(res.text or "{}")
+
+
+def test_disabled_telemetry_only_counts_calls():
+    engine = _engine(Telemetry())
+    assert engine.call("analyze_thread_dump", {"path": SAMPLE}).ok
+    assert not engine.call("analyze_thread_dump", {"path": "/does/not/exist"}).ok
+    payload = json.loads(engine.call("analyze_thread_dump", {"path": SAMPLE}).text or "{}")
+    assert "telemetry" not in payload
+
+    stats = _stats(engine)
+    tool = stats["tools"]["analyze_thread_dump"]
+    assert tool["calls"] == 3 and tool["errors"] == 1 and tool["p50_ms"] <= tool["max_ms"]
+    assert "stages_ms" not in tool and "counters" not in tool
+    assert stats["cache"]["hits"] == 1 and stats["cache"]["misses"] == 1 and stats["telemetry"] == "off"
+
+    # Outside a recorded request the probes do nothing.
+    with stage("parse"):
+        count("bytes", 10)
+
+
+def test_attached_stages_and_counters():
+    engine = _engine(Telemetry(mode="attach"))
+    first = json.loads(engine.call("analyze_thread_dump", {"path": SAMPLE}).text or "{}")["telemetry"]
+    assert first["tool"] == "analyze_thread_dump"
+    assert {"digest", "parse", "handler", "analyze"} <= set(first["stages_ms"])
+    counters = first["counters"]
+    assert counters["cache_misses"] == 1 and counters["threads"] == 4
+    assert counters["bytes"] == Path(SAMPLE).stat().st_size
+
+    second = json.loads(engine.call("analyze_thread_dump", {"path": SAMPLE}).text or "{}")["telemetry"]
+    assert second["counters"] == {"cache_hits": 1} and "parse" not in second["stages_ms"]
+
+    # Parses fanned out to worker threads still report into the request.
+    compare = json.loads(engine.call("compare_thread_dumps", {"path_a": SAMPLE, "path_b": SAMPLE_2}).text or "{}")
+    assert compare["telemetry"]["counters"]["cache_hits"] == 1
+    assert compare["telemetry"]["counters"]["cache_misses"] == 1
+
+    totals = _stats(engine)["tools"]["analyze_thread_dump"]
+    assert totals["counters"]["cache_hits"] == 1 and totals["counters"]["response_bytes"] > 0
+    assert "serialize" in totals["stages_ms"]
+
+
+def test_profile_next_call(tmp_path):
+    engine = _engine(Telemetry(profile_dir=str(tmp_path)))
+    res = engine.call("server_stats", {"profile_next": "no_such_tool"})
+    assert res.error_code == "INVALID_PARAMS"
+    assert _stats(engine, profile_next="analyze_thread_dump")["profiling"]["armed"] == {"analyze_thread_dump": 1}
+
+    assert engine.call("analyze_thread_dump", {"path": SAMPLE}).ok
+    assert engine.call("analyze_thread_dump", {"path": SAMPLE}).ok
+    recent = _stats(engine)["profiling"]["recent"]
+    assert len(recent) == 1 and recent[0]["tool"] == "analyze_thread_dump"
+    pstats.Stats(recent[0]["cprofile"])
+    assert tracemalloc.Snapshot.load(recent[0]["tracemalloc"]).traces
+    assert not tracemalloc.is_tracing()
+
+
+def test_profile_dir_must_be_private(tmp_path):
+    shared = tmp_path / "shared"
+    shared.mkdir()
+    shared.chmod(0o777)
+    engine = _engine(Telemetry(profile_dir=str(shared)))
+    engine.call("server_stats", {"profile_next": "analyze_thread_dump"})
+    assert engine.call("analyze_thread_dump", {"path": SAMPLE}).ok
+    recent = _stats(engine)["profiling"]["recent"]
+    assert "writable by group or others" in recent[0]["error"] and not list(shared.iterdir())
+
+    created = tmp_path / "new" / "profiles"
+    engine = _engine(Telemetry(profile_dir=str(created)))
+    engine.call("server_stats", {"profile_next": "analyze_thread_dump"})
+    assert engine.call("analyze_thread_dump", {"path": SAMPLE}).ok
+    assert created.stat().st_mode & 0o777 == 0o700
+
+
+def test_default_profile_dir_is_made_per_server(monkeypatch, tmp_path):
+    monkeypatch.setattr("tempfile.tempdir", str(tmp_path))
+    engine = _engine(Telemetry())
+    assert _stats(engine, profile_next="analyze_thread_dump")["profiling"]["dir"] is None
+    assert engine.call("analyze_thread_dump", {"path": SAMPLE}).ok
+    profiling = _stats(engine)["profiling"]
+    made = Path(profiling["dir"])
+    assert made.parent == tmp_path and made.name.startswith("heap-analyzer-profiles-")
+    assert made.stat().st_mode & 0o777 == 0o700
+    assert Path(profiling["recent"][0]["cprofile"]).parent == made
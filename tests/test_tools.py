@@ -1,6 +1,19 @@
 from pathlib import Path
 
-from heap_analyzer_mcp.parser import parse_thread_dump
+from heap_analyzer_mcp.parser import (
+    LINE_BLANK,
+    LINE_DEADLOCK,
+    LINE_FRAME,
+    LINE_HEADER,
+    LINE_LOCK,
+    LINE_OTHER,
+    LINE_STATE,
+    ThreadDumpParser,
+    classify_line,
+    parse_thread_dump,
+    parse_thread_dump_file,
+    parse_thread_dump_stream,
+)
 
 BASE_DIR = Path(__file__).parent
 
@@ -35,3 +48,61 @@ def test_compare_thread_dumps_deltas():
 
     assert len(a.deadlocks) >= 1
     assert len(b.deadlocks) == 0
+
+
+def test_parse_thread_dump_file_matches_text_parser():
+    path = BASE_DIR / "sample_thread_dump.txt"
+    expected = parse_thread_dump(path.read_text(encoding="utf-8"))
+
+    from_path = parse_thread_dump_file(str(path))
+    with open(path, "rb") as f:
+        from_binary = parse_thread_dump_file(f)
+    with open(path, "r", encoding="utf-8") as f:
+        from_text = parse_thread_dump_stream(f)
+
+    for analysis in (from_path, from_binary, from_text):
+        assert analysis.counts == expected.counts
+        assert analysis.deadlocks == expected.deadlocks
+    assert from_path.bytes_read == path.stat().st_size
+    assert not from_path.truncated
+
+
+def test_parse_thread_dump_file_budgets():
+    path = BASE_DIR / "sample_thread_dump.txt"
+
+    by_threads = parse_thread_dump_file(str(path), max_threads=2)
+    assert sum(by_threads.counts.values()) == 2
+    assert by_threads.truncated
+
+    # Only the first thread block fits in the byte budget.
+    by_bytes = parse_thread_dump_file(str(path), max_bytes=200)
+    assert by_bytes.counts["RUNNABLE"] == 1
+    assert by_bytes.deadlocks == []
+    assert by_bytes.truncated
+    assert by_bytes.bytes_read <= 200
+
+
+def test_classify_line():
+    assert classify_line("") == LINE_BLANK
+    assert classify_line("   ") == LINE_BLANK
+    assert classify_line('"main" #1 prio=5 os_prio=31 tid=0x0 nid=0x1 runnable') == LINE_HEADER
+    assert classify_line('"Thread-1":') == LINE_OTHER
+    assert classify_line("   java.lang.Thread.State: RUNNABLE") == LINE_STATE
+    assert classify_line("\tat java.lang.Thread.sleep(Native Method)") == LINE_FRAME
+    assert classify_line("\t- locked <0x000000076ab62208> (a java.lang.Object)") == LINE_LOCK
+    assert classify_line("Found one Java-level deadlock:") == LINE_DEADLOCK
+    assert classify_line("Full thread dump OpenJDK 64-Bit Server VM") == LINE_OTHER
+
+
+def test_thread_dump_parser_hooks_and_incremental_feed():
+    text = (BASE_DIR / "sample_thread_dump.txt").read_text(encoding="utf-8")
+    parser = ThreadDumpParser()
+    frames = []
+    parser.add_hook(LINE_FRAME, frames.append)
+    for line in text.splitlines(keepends=True):
+        parser.feed(line)
+    analysis = parser.finish()
+
+    assert frames == ["\tat java.lang.Thread.sleep(Native Method)"]
+    assert analysis.counts == parse_thread_dump(text).counts
+    assert analysis.deadlocks[0]["threads"] == ["Thread-1", "Thread-2"]